@@ -0,0 +1,173 @@
+"""
+Compares the throughput and accuracy of several audio resamplers.
+
+The resamplers are the streaming `vesper.signal.resampling_utils.Resampler`,
+`resampy` with its `kaiser_best` and `kaiser_fast` filters, and, if it
+is installed, `soxr` at its high and very high quality settings. The
+`Resampler` is run on its input in chunks, as it is by the MPG Ranch
+NFC detectors, and `soxr` is also run in chunks if its `ResampleStream`
+class is available. The other resamplers are run on all of their input
+at once.
+
+Throughput is reported in multiples of real time. Accuracy is reported
+as the signal-to-error ratio in decibels of the resampling of a sum of
+sinusoids in the 0 to 10000 Hz band that interests NFC detectors, with
+respect to the same sum computed directly at the output sample rate,
+excluding a short interval at each end of the signal.
+"""
+
+
+import time
+
+import numpy as np
+import resampy
+
+from vesper.signal.resampling_utils import Resampler
+
+try:
+    import soxr
+except ImportError:
+    soxr = None
+
+
+OUTPUT_RATE = 24000
+INPUT_RATES = (22050, 32000, 44100, 48000)
+DURATION = 60                           # seconds
+CHUNK_DURATION = 10                     # seconds
+NUM_TRIALS = 3
+FREQUENCIES = (500, 2000, 4000, 6500, 8000, 9500)       # hertz
+EXCLUDED_DURATION = .1                  # seconds, at each end of signal
+
+
+def main():
+
+    print(
+        'resampler,input rate,output rate,times faster than real time,'
+        'signal to error ratio (dB)')
+
+    for input_rate in INPUT_RATES:
+
+        samples = create_test_signal(input_rate)
+        expected = create_test_signal(OUTPUT_RATE)
+
+        for name, resample in get_resamplers():
+            compare(name, resample, samples, input_rate, expected)
+
+
+def create_test_signal(sample_rate):
+    length = DURATION * sample_rate
+    times = np.arange(length) / sample_rate
+    samples = sum(np.sin(2 * np.pi * f * times) for f in FREQUENCIES)
+    samples /= len(FREQUENCIES)
+    return samples.astype(np.float32)
+
+
+def get_resamplers():
+
+    resamplers = [
+        ('Vesper Resampler', resample_with_resampler),
+        ('resampy kaiser_best', create_resampy_resampler('kaiser_best')),
+        ('resampy kaiser_fast', create_resampy_resampler('kaiser_fast')),
+    ]
+
+    if soxr is not None:
+        for quality in ('HQ', 'VHQ'):
+            resamplers.append(
+                (f'soxr {quality}', create_soxr_resampler(quality)))
+
+    return resamplers
+
+
+def resample_with_resampler(samples, input_rate):
+
+    resampler = Resampler(input_rate, OUTPUT_RATE)
+
+    # Write output for all chunks to one preallocated array.
+    output = np.empty(
+        resampler.get_output_length(len(samples), flush=True),
+        dtype=resampler.dtype)
+    output_length = 0
+
+    for chunk in get_chunks(samples, input_rate):
+        output_length += len(
+            resampler.resample(chunk, out=output[output_length:]))
+
+    resampler.flush(out=output[output_length:])
+
+    return output
+
+
+def get_chunks(samples, sample_rate):
+    chunk_size = CHUNK_DURATION * sample_rate
+    return [
+        samples[i:i + chunk_size]
+        for i in range(0, len(samples), chunk_size)]
+
+
+def create_resampy_resampler(filter_name):
+
+    def resample(samples, input_rate):
+        return resampy.resample(
+            samples, input_rate, OUTPUT_RATE, filter=filter_name)
+
+    return resample
+
+
+def create_soxr_resampler(quality):
+
+    def resample(samples, input_rate):
+
+        if hasattr(soxr, 'ResampleStream'):
+            # can resample in chunks
+
+            stream = soxr.ResampleStream(
+                input_rate, OUTPUT_RATE, 1, dtype='float32',
+                quality=quality)
+
+            chunks = get_chunks(samples, input_rate)
+            last_chunk_num = len(chunks) - 1
+
+            return np.concatenate([
+                stream.resample_chunk(chunk, last=i == last_chunk_num)
+                for i, chunk in enumerate(chunks)])
+
+        else:
+            return soxr.resample(
+                samples, input_rate, OUTPUT_RATE, quality=quality)
+
+    return resample
+
+
+def compare(name, resample, samples, input_rate, expected):
+
+    elapsed_times = []
+
+    for _ in range(NUM_TRIALS):
+        start_time = time.perf_counter()
+        resampled_samples = resample(samples, input_rate)
+        elapsed_times.append(time.perf_counter() - start_time)
+
+    rate = DURATION / min(elapsed_times)
+
+    snr = get_signal_to_error_ratio(resampled_samples, expected)
+
+    print(f'{name},{input_rate},{OUTPUT_RATE},{rate:.1f},{snr:.1f}')
+
+
+def get_signal_to_error_ratio(samples, expected):
+
+    # Some resamplers output a sample more or less than others.
+    length = min(len(samples), len(expected))
+
+    n = int(EXCLUDED_DURATION * OUTPUT_RATE)
+    samples = samples[n:length - n].astype(np.float64)
+    expected = expected[n:length - n].astype(np.float64)
+
+    signal_power = np.mean(expected ** 2)
+    error_power = np.mean((samples - expected) ** 2)
+
+    return 10 * np.log10(signal_power / error_power)
+
+
+if __name__ == '__main__':
+    main()
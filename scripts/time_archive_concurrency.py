@@ -0,0 +1,329 @@
+"""
+Times concurrent writes to and reads from a Vesper archive database.
+
+The script runs two kinds of write workloads concurrently, each in
+its own processes, while the main process queries the database:
+
+    detect - writes batches of new clips with a `ClipBatchWriter`, as
+        a detection job does.
+
+    annotate - annotates small sets of existing clips from several
+        threads, as a Vesper server does for several users classifying
+        clips at once.
+
+It reports the throughput and latency of each workload and the latency
+of the queries. It also checks that the clip counts that the workloads
+maintained incrementally match counts rebuilt from the clips, which
+verifies that concurrent clip count updates were not lost, including
+under the "none" archive lock policy that is the default for
+PostgreSQL archives. The results depend on the archive lock policy and the
+SQLite journal mode, which are controlled by the
+`VESPER_ARCHIVE_LOCK_POLICY` and `VESPER_ARCHIVE_SQLITE_WAL` settings
+(see `vesper.util.archive_lock`), and on `USE_ARCHIVE_WRITER`, which
+determines whether the annotate workload writes via
+`archive_lock.write` or, as Vesper used to, by locking the archive
+for each write.
+
+The script runs against whatever database the archive uses, so it can
+also be used for PostgreSQL archives. It modifies the archive's clip
+annotations, and although it deletes the clips it creates when it
+finishes, it should be run only on a scratch copy of an archive, for
+example with:
+
+    cd "/path/to/archive copy"
+    python /path/to/time_archive_concurrency.py
+
+The archive must have at least one recording channel, an
+"Old Bird Tseep Detector Redux 1.1" processor, and a "Classification"
+annotation, and at least `ANNOTATE_CLIP_COUNT` clips.
+"""
+
+
+from multiprocessing import Process, Queue
+from threading import Thread
+import os
+import random
+import time
+
+import vesper.util.django_utils as django_utils
+
+
+DETECT_PROCESS_COUNT = 2
+DETECT_BATCH_COUNT = 50
+DETECT_BATCH_SIZE = 20
+
+ANNOTATE_PROCESS_COUNT = 2
+ANNOTATE_THREAD_COUNT = 8
+ANNOTATE_WRITE_COUNT = 50
+"""Number of annotation writes per annotate thread."""
+
+ANNOTATE_CLIP_COUNT = 5
+"""Number of clips annotated by each annotation write."""
+
+QUERY_PERIOD = .01
+"""Period in seconds of the main process's queries."""
+
+USE_ARCHIVE_WRITER = True
+
+_PROCESSOR_NAME = 'Old Bird Tseep Detector Redux 1.1'
+_ANNOTATION_NAME = 'Classification'
+_ANNOTATION_VALUES = ('Call.AMRE', 'Call.CHSP', 'Call.WTSP', 'Noise')
+
+_CLIP_LENGTH = 1000
+_START_INDEX_SPACING = 2 * _CLIP_LENGTH + 1
+
+
+def main():
+
+    django_utils.set_up_django()
+
+    from django.db import connection, connections
+
+    from vesper.django.app.models import Clip, Job
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    archive_lock.create_lock()
+
+    with archive_lock.atomic():
+        job = Job.objects.create(
+            command='{"name": "time_archive_concurrency"}',
+            creation_time=time_utils.get_utc_now(), status='Running')
+
+    clip_ids = list(
+        Clip.objects.exclude(creating_job=job).values_list('id', flat=True))
+
+    print(f'Database vendor: {connection.vendor}')
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            print(f'SQLite journal mode: {cursor.fetchone()[0]}')
+    print(f'Archive lock policy: {archive_lock.get_lock_policy_name()}')
+    print(f'Use archive writer: {USE_ARCHIVE_WRITER}')
+    print()
+
+    # Close database connections before starting other processes so
+    # that they do not inherit them.
+    connections.close_all()
+
+    result_queue = Queue()
+
+    processes = [
+        Process(
+            target=_run_detect_workload,
+            args=(i, archive_lock.get_lock(), job.id, result_queue))
+        for i in range(DETECT_PROCESS_COUNT)]
+
+    processes += [
+        Process(
+            target=_run_annotate_workload,
+            args=(i, archive_lock.get_lock(), clip_ids, result_queue))
+        for i in range(ANNOTATE_PROCESS_COUNT)]
+
+    start_time = time.perf_counter()
+
+    for process in processes:
+        process.start()
+
+    # Query database while workloads run.
+    query_latencies = []
+    results = []
+    while len(results) != len(processes):
+        query_start_time = time.perf_counter()
+        Clip.objects.filter(creating_job=job).count()
+        query_latencies.append(time.perf_counter() - query_start_time)
+        time.sleep(QUERY_PERIOD)
+        while not result_queue.empty():
+            results.append(result_queue.get())
+
+    elapsed_time = time.perf_counter() - start_time
+
+    for process in processes:
+        process.join()
+
+    print(f'All workloads finished in {elapsed_time:.2f} seconds.')
+    print()
+
+    for name, unit in (('detect', 'clip'), ('annotate', 'write')):
+
+        workload_results = [r for r in results if r[0] == name]
+        count = sum(r[1] for r in workload_results)
+        workload_time = max(r[2] for r in workload_results)
+        latencies = sum((r[3] for r in workload_results), [])
+
+        print(
+            f'{name}: {count} {unit}s in {workload_time:.2f} seconds, or '
+            f'{count / workload_time:.1f} {unit}s per second')
+        _show_latencies('write', latencies)
+
+    _show_latencies('query', query_latencies)
+
+    import vesper.django.app.model_utils as model_utils
+
+    print()
+    clip_counts = _get_clip_counts()
+    model_utils.rebuild_clip_counts()
+    rebuilt_clip_counts = _get_clip_counts()
+    keys = set(clip_counts) | set(rebuilt_clip_counts)
+    bad_keys = [
+        k for k in keys if clip_counts.get(k) != rebuilt_clip_counts.get(k)]
+    if len(bad_keys) == 0:
+        print('Clip counts match rebuilt clip counts.')
+    else:
+        print(
+            f'{len(bad_keys)} of {len(keys)} clip counts do not match '
+            f'rebuilt clip counts.')
+
+    created_clip_count = Clip.objects.filter(creating_job=job).count()
+    expected_clip_count = \
+        DETECT_PROCESS_COUNT * DETECT_BATCH_COUNT * DETECT_BATCH_SIZE
+    print(
+        f'Created {created_clip_count} of {expected_clip_count} clips. '
+        f'Deleting them...')
+
+    with archive_lock.atomic():
+        Clip.objects.filter(creating_job=job).delete()
+        job.delete()
+
+    model_utils.rebuild_clip_counts()
+
+    # Exit via `os._exit` since Django may have started threads that
+    # would otherwise keep this process alive.
+    os._exit(0)
+
+
+def _show_latencies(name, latencies):
+    latencies = sorted(latencies)
+    mean = sum(latencies) / len(latencies)
+    median = latencies[len(latencies) // 2]
+    maximum = latencies[-1]
+    print(
+        f'    {name} latency: mean {mean * 1000:.1f}, median '
+        f'{median * 1000:.1f}, max {maximum * 1000:.1f} milliseconds')
+
+
+def _get_clip_counts():
+
+    from vesper.django.app.models import ClipCount
+
+    field_names = (
+        'station_id', 'mic_output_id', 'detector_id', 'date',
+        'annotation_info_id', 'annotation_value', 'tag_info_id')
+
+    return dict(
+        (tuple(values), count)
+        for *values, count in
+        ClipCount.objects.values_list(*field_names, 'count'))
+
+
+def _run_detect_workload(process_num, lock, job_id, result_queue):
+
+    django_utils.set_up_django()
+
+    from vesper.django.app.clip_batch_writer import ClipBatchWriter
+    from vesper.django.app.models import (
+        AnnotationInfo, Job, Processor, RecordingChannel)
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    archive_lock.set_lock(lock)
+
+    channels = RecordingChannel.objects.order_by('id')
+    channel = channels[process_num % channels.count()]
+
+    writer = ClipBatchWriter(
+        channel, Processor.objects.get(name=_PROCESSOR_NAME),
+        Job.objects.get(id=job_id),
+        lambda name: AnnotationInfo.objects.get(name=name))
+
+    # Give clips start indices that are unique to this process and
+    # unlikely to be those of existing clips.
+    start_index = \
+        process_num * DETECT_BATCH_COUNT * DETECT_BATCH_SIZE * \
+        _START_INDEX_SPACING + 17
+
+    latencies = []
+    start_time = time.perf_counter()
+
+    for _ in range(DETECT_BATCH_COUNT):
+
+        clips = []
+        for _ in range(DETECT_BATCH_SIZE):
+            clips.append((start_index, _CLIP_LENGTH, None))
+            start_index += _START_INDEX_SPACING
+
+        write_start_time = time.perf_counter()
+        writer.write(clips, time_utils.get_utc_now())
+        latencies.append(time.perf_counter() - write_start_time)
+
+    elapsed_time = time.perf_counter() - start_time
+
+    result_queue.put((
+        'detect', DETECT_BATCH_COUNT * DETECT_BATCH_SIZE, elapsed_time,
+        latencies))
+
+
+def _run_annotate_workload(process_num, lock, clip_ids, result_queue):
+
+    django_utils.set_up_django()
+
+    from django.db import connection, transaction
+
+    from vesper.django.app.models import AnnotationInfo
+    import vesper.django.app.model_utils as model_utils
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    archive_lock.set_lock(lock)
+
+    annotation_info = AnnotationInfo.objects.get(name=_ANNOTATION_NAME)
+
+    def annotate(clip_ids, value):
+        model_utils.annotate_clips(
+            clip_ids, annotation_info, value,
+            creation_time=time_utils.get_utc_now())
+
+    def run(thread_num, latencies):
+
+        rng = random.Random(process_num * ANNOTATE_THREAD_COUNT + thread_num)
+
+        for _ in range(ANNOTATE_WRITE_COUNT):
+
+            ids = rng.sample(clip_ids, ANNOTATE_CLIP_COUNT)
+            value = rng.choice(_ANNOTATION_VALUES)
+
+            write_start_time = time.perf_counter()
+
+            if USE_ARCHIVE_WRITER:
+                archive_lock.write(annotate, ids, value)
+            else:
+                with archive_lock.atomic(), transaction.atomic():
+                    annotate(ids, value)
+
+            latencies.append(time.perf_counter() - write_start_time)
+
+        connection.close()
+
+    latency_lists = [[] for _ in range(ANNOTATE_THREAD_COUNT)]
+
+    threads = [
+        Thread(target=run, args=(i, latency_lists[i]))
+        for i in range(ANNOTATE_THREAD_COUNT)]
+
+    start_time = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed_time = time.perf_counter() - start_time
+
+    result_queue.put((
+        'annotate', ANNOTATE_THREAD_COUNT * ANNOTATE_WRITE_COUNT,
+        elapsed_time, sum(latency_lists, [])))
+
+
+if __name__ == '__main__':
+    main()
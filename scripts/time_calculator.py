@@ -0,0 +1,128 @@
+"""
+Times calculator program execution for typical clip table expressions.
+
+For each expression, the script times three ways of evaluating the
+expression for a column of clip values:
+
+    interpreted - compile and execute the expression once per value,
+        as the calculator did before it cached compiled programs.
+
+    compiled - execute a cached compiled program once per value, as
+        the clip metadata exporter's per-clip export path does.
+
+    vectorized - evaluate a compiled program for the whole column at
+        once, as the clip metadata exporter does for each station-night
+        of clips.
+
+The script also checks that the three ways yield identical results.
+"""
+
+
+import time
+
+import numpy as np
+
+from vesper.util.calculator import Calculator, Program, compile_program
+
+
+_VALUE_COUNT = 10000
+
+_NUM_TRIALS = 5
+
+_CASES = (
+
+    # clip duration in milliseconds, rounded
+    ('x 1000 mul round', 'duration'),
+
+    # clip start time in minutes after recording start, to the nearest
+    # millisecond
+    ('x 60 div 1000 mul round 1000 div', 'time'),
+
+    # clip frequency in kilohertz
+    ('x 1000 div', 'frequency'),
+
+    # whether or not clip score exceeds a threshold
+    ('x 50 ge', 'score'),
+
+)
+
+
+def main():
+
+    rng = np.random.default_rng(0)
+
+    columns = {
+        'duration': rng.uniform(.1, 1, _VALUE_COUNT).tolist(),
+        'time': rng.uniform(0, 36000, _VALUE_COUNT).tolist(),
+        'frequency': rng.integers(2000, 11000, _VALUE_COUNT).tolist(),
+        'score': rng.uniform(0, 100, _VALUE_COUNT).tolist(),
+    }
+
+    print(
+        f'Seconds to evaluate expressions for {_VALUE_COUNT} values, '
+        f'best of {_NUM_TRIALS} trials:')
+    print()
+
+    for code, column_name in _CASES:
+
+        values = columns[column_name]
+
+        interpreted_results, interpreted_time = \
+            _time(_evaluate_interpreted, code, values)
+
+        compiled_results, compiled_time = \
+            _time(_evaluate_compiled, code, values)
+
+        vectorized_results, vectorized_time = \
+            _time(_evaluate_vectorized, code, values)
+
+        assert compiled_results == interpreted_results
+        assert vectorized_results == interpreted_results
+
+        print(f'"{code}":')
+        print(f'    interpreted: {interpreted_time:.4f}')
+        print(
+            f'    compiled: {compiled_time:.4f} '
+            f'({interpreted_time / compiled_time:.1f}x)')
+        print(
+            f'    vectorized: {vectorized_time:.4f} '
+            f'({interpreted_time / vectorized_time:.1f}x)')
+
+
+def _time(function, code, values):
+
+    times = []
+
+    for _ in range(_NUM_TRIALS):
+        start_time = time.perf_counter()
+        results = function(code, values)
+        times.append(time.perf_counter() - start_time)
+
+    return results, min(times)
+
+
+def _evaluate_interpreted(code, values):
+    calculator = Calculator()
+    return [_execute(calculator, Program(code), v) for v in values]
+
+
+def _execute(calculator, program, value):
+    calculator.clear()
+    calculator.dict_stack.put('x', value)
+    program.execute(calculator)
+    return calculator.operand_stack.pop()
+
+
+def _evaluate_compiled(code, values):
+    calculator = Calculator()
+    program = compile_program(code)
+    return [_execute(calculator, program, v) for v in values]
+
+
+def _evaluate_vectorized(code, values):
+    program = compile_program(code)
+    return program.evaluate(values)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Compares the performance of two ways of storing clip audio.
+
+The script times writing, reading, and deleting the audio of
+`CLIP_COUNT` synthetic clips, both with one WAVE file per clip, as
+Vesper's "Files" clip audio storage does, and with a
+`ClipAudioPackStore`, as Vesper's "Packs" clip audio storage does.
+The clips are divided evenly among `NIGHT_COUNT` station-nights.
+Clip reads are in random order, and read either whole clips or
+`READ_LENGTH`-sample parts of them. After deleting `DELETE_FRACTION`
+of the clips, the script also times compaction of the packs and
+reports the disk space used by each kind of storage.
+
+The script writes only to a temporary directory, which it deletes
+when it finishes. Set `DIR_PATH` to put the directory on a particular
+file system. Note that reads are likely to be served from the
+operating system's file cache, so the read times are best case ones.
+"""
+
+
+from pathlib import Path
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from vesper.util.clip_audio_pack_store import ClipAudioPackStore
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+CLIP_COUNT = 20000
+NIGHT_COUNT = 10
+CLIP_LENGTH = 14400
+"""Clip length in samples, .6 seconds at 24000 hertz."""
+
+SAMPLE_RATE = 24000
+READ_LENGTH = 1000
+DELETE_FRACTION = .5
+DIR_PATH = None
+
+_STATION_ID = 1
+_START_NIGHT = datetime.date(2050, 5, 1)
+
+
+def main():
+
+    with tempfile.TemporaryDirectory(dir=DIR_PATH) as dir_path:
+
+        dir_path = Path(dir_path)
+
+        rng = np.random.default_rng(0)
+        samples = rng.integers(
+            -1000, 1000, CLIP_LENGTH, dtype='int16').reshape((1, -1))
+
+        clip_ids = list(range(1, CLIP_COUNT + 1))
+        read_ids = random.Random(1).sample(clip_ids, len(clip_ids))
+        delete_ids = read_ids[:int(DELETE_FRACTION * CLIP_COUNT)]
+
+        print(
+            f'{CLIP_COUNT} clips of {CLIP_LENGTH} samples in {NIGHT_COUNT} '
+            f'station-nights:')
+        print()
+
+        _time_files(dir_path / 'Files', samples, clip_ids, read_ids,
+                    delete_ids)
+        print()
+        _time_packs(dir_path / 'Packs', samples, clip_ids, read_ids,
+                    delete_ids)
+
+
+def _time_files(dir_path, samples, clip_ids, read_ids, delete_ids):
+
+    print('One file per clip:')
+
+    def get_path(clip_id):
+        # Use the same kind of directory hierarchy as Vesper.
+        id_parts = f'{clip_id:09d}'
+        return dir_path / id_parts[:3] / id_parts[3:6] / f'{clip_id}.wav'
+
+    def write(clip_id):
+        path = get_path(clip_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        audio_file_utils.write_wave_file(str(path), samples, SAMPLE_RATE)
+
+    _time('write', write, clip_ids)
+
+    def read(clip_id):
+        audio_file_utils.read_wave_file(str(get_path(clip_id)))
+
+    _time('read', read, read_ids)
+
+    def read_part(clip_id):
+        # A clip audio file is read whole even if only part of it is
+        # needed.
+        s, _ = audio_file_utils.read_wave_file(str(get_path(clip_id)))
+        return s[0, 100:100 + READ_LENGTH]
+
+    _time('partial read', read_part, read_ids)
+
+    _show_size(dir_path)
+
+    def delete(clip_id):
+        os.remove(get_path(clip_id))
+
+    _time('delete', delete, delete_ids)
+
+    _show_size(dir_path)
+
+
+def _time_packs(dir_path, samples, clip_ids, read_ids, delete_ids):
+
+    print('Packs:')
+
+    store = ClipAudioPackStore(dir_path)
+
+    def get_night(clip_id):
+        return _START_NIGHT + datetime.timedelta(days=clip_id % NIGHT_COUNT)
+
+    def write(clip_id):
+        store.write_samples(
+            _STATION_ID, get_night(clip_id), clip_id, samples, SAMPLE_RATE)
+
+    def flush():
+        for station_id, night in store.get_pack_keys():
+            store.flush(station_id, night)
+
+    _time('write', write, clip_ids, flush)
+
+    # Read with another store so reads are not served from the
+    # in-memory indices of the writing store.
+    store = ClipAudioPackStore(dir_path)
+
+    def read(clip_id):
+        store.read_samples(_STATION_ID, get_night(clip_id), clip_id)
+
+    _time('read', read, read_ids)
+
+    def read_part(clip_id):
+        store.read_samples(
+            _STATION_ID, get_night(clip_id), clip_id, 100, READ_LENGTH)
+
+    _time('partial read', read_part, read_ids)
+
+    _show_size(dir_path)
+
+    def delete(clip_id):
+        store.delete_clip(_STATION_ID, get_night(clip_id), clip_id)
+
+    _time('delete', delete, delete_ids, flush)
+
+    def compact(key):
+        store.compact(*key)
+
+    _time('compact', compact, store.get_pack_keys(), unit='pack')
+
+    _show_size(dir_path)
+
+
+def _time(name, function, items, finish=None, unit='clip'):
+
+    start_time = time.perf_counter()
+
+    for item in items:
+        function(item)
+
+    if finish is not None:
+        finish()
+
+    elapsed_time = time.perf_counter() - start_time
+    count = len(items)
+
+    print(
+        f'    {name}: {count} {unit}s in {elapsed_time:.2f} seconds, or '
+        f'{count / elapsed_time:.0f} {unit}s per second')
+
+
+def _show_size(dir_path):
+
+    file_count = 0
+    size = 0
+
+    for dir_path_, _, file_names in os.walk(dir_path):
+        for file_name in file_names:
+            path = os.path.join(dir_path_, file_name)
+            size += os.stat(path).st_blocks * 512
+            file_count += 1
+
+    print(
+        f'    disk usage: {size / 2 ** 20:.1f} MB in {file_count} files')
+
+
+if __name__ == '__main__':
+    main()
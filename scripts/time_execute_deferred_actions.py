@@ -0,0 +1,144 @@
+"""
+Times the execution of deferred clip creation actions.
+
+The script writes a deferred action file of `CLIP_COUNT` clips, some
+with annotations, for each of the first `CHANNEL_COUNT` recording
+channels of an archive, as a detection job that defers clip creation
+would. It then times the `execute_deferred_actions` command for the
+files. To check that the command is idempotent, it moves the files back
+to the deferred action directory and executes them again, which should
+create no clips. Finally, it deletes the clips it created.
+
+The script creates and deletes clips, jobs, and files in the archive,
+so run it only on a scratch copy of an archive, for example with:
+
+    cd "/path/to/archive copy"
+    python /path/to/time_execute_deferred_actions.py
+
+The archive must have an "Old Bird Tseep Detector Redux 1.1" processor
+and a "Classification" annotation, and its deferred action directory
+should be empty.
+"""
+
+
+import os
+import time
+
+import vesper.util.django_utils as django_utils
+
+
+CLIP_COUNT = 20000
+"""Number of clips per recording channel."""
+
+CHANNEL_COUNT = 2
+
+ANNOTATION_PERIOD = 10
+"""Period in clips of clips with annotations."""
+
+_PROCESSOR_NAME = 'Old Bird Tseep Detector Redux 1.1'
+_ANNOTATION_NAME = 'Classification'
+
+_CLIP_LENGTH = 1000
+_START_INDEX_SPACING = 2 * _CLIP_LENGTH + 1
+
+
+def main():
+
+    django_utils.set_up_django()
+
+    from vesper.archive_paths import archive_paths
+    from vesper.command.execute_deferred_actions_command import \
+        ExecuteDeferredActionsCommand
+    from vesper.django.app.models import (
+        Clip, Job, Processor, RecordingChannel)
+    from vesper.util.bunch import Bunch
+    import vesper.command.deferred_action_file as deferred_action_file
+    import vesper.django.app.model_utils as model_utils
+    import vesper.util.archive_lock as archive_lock
+    import vesper.util.time_utils as time_utils
+
+    archive_lock.create_lock()
+
+    def create_job(name):
+        with archive_lock.atomic():
+            return Job.objects.create(
+                command=f'{{"name": "{name}"}}',
+                creation_time=time_utils.get_utc_now(), status='Running')
+
+    detection_job = create_job('detect')
+    processor = Processor.objects.get(name=_PROCESSOR_NAME)
+    channels = RecordingChannel.objects.order_by('id')[:CHANNEL_COUNT]
+
+    dir_path = archive_paths.deferred_action_dir_path
+    dir_path.mkdir(parents=True, exist_ok=True)
+
+    file_names = []
+
+    for i, channel in enumerate(channels):
+
+        # Give clips start indices that are unlikely to be those of
+        # existing clips.
+        clips = []
+        for j in range(CLIP_COUNT):
+            if j % ANNOTATION_PERIOD == 0:
+                annotations = {_ANNOTATION_NAME: 'Call.WTSP'}
+            else:
+                annotations = None
+            clips.append([
+                channel.id, j * _START_INDEX_SPACING + 17, _CLIP_LENGTH,
+                time_utils.get_utc_now(), detection_job.id, processor.id,
+                annotations])
+
+        file_name = f'Job {detection_job.id} Part {i:03d}.npz'
+        deferred_action_file.write_create_clips_file(
+            dir_path / file_name, clips)
+        file_names.append(file_name)
+
+    clip_count = CLIP_COUNT * len(channels)
+
+    def execute():
+        job = create_job('execute_deferred_actions')
+        command = ExecuteDeferredActionsCommand({})
+        start_time = time.time()
+        command.execute(Bunch(job_id=job.id))
+        return time.time() - start_time
+
+    elapsed_time = execute()
+
+    created_count = Clip.objects.filter(creating_job=detection_job).count()
+
+    print(
+        f'Executed deferred actions for {clip_count} clips in '
+        f'{elapsed_time:.2f} seconds, or {clip_count / elapsed_time:.0f} '
+        f'clips per second. Created {created_count} clips.')
+
+    # Move files back to deferred action directory and execute again.
+    for file_name in file_names:
+        (dir_path / 'Executed' / file_name).rename(dir_path / file_name)
+
+    elapsed_time = execute()
+
+    count = Clip.objects.filter(creating_job=detection_job).count()
+
+    print(
+        f'Executed deferred actions again in {elapsed_time:.2f} seconds. '
+        f'Created {count - created_count} clips.')
+
+    print('Deleting clips and deferred action files...')
+
+    with archive_lock.atomic():
+        Clip.objects.filter(creating_job=detection_job).delete()
+        Job.objects.filter(id__gte=detection_job.id).delete()
+
+    model_utils.rebuild_clip_counts()
+
+    for file_name in file_names:
+        (dir_path / 'Executed' / file_name).unlink()
+
+    # Exit via `os._exit` since Django may have started threads that
+    # would otherwise keep this process alive.
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
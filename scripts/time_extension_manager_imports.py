@@ -0,0 +1,126 @@
+"""
+Times Vesper web worker and job process startup.
+
+The script starts several fresh Python processes for each of two kinds
+of startup, and reports the median elapsed time of each kind along with
+the number of modules that were imported and whether or not TensorFlow
+was imported. The two kinds of startup are:
+
+    web worker - set up Django and import Vesper's URL configuration
+        and views, as a Django server worker process does before it can
+        serve its first request.
+
+    job - set up Django and get the classes of the `detect` command and
+        of the Old Bird Tseep Detector Redux 1.1, as a job process that
+        runs that detector does.
+
+Each kind of startup is timed twice: once with lazy extension loading,
+in which the extension manager imports only the extension modules that
+are needed, and once with eager extension loading, in which it imports
+the modules of all extensions of each extension point that is used, as
+it did before extension loading became lazy.
+
+Run the script from a Vesper archive directory, for example with:
+
+    cd "/path/to/archive"
+    python /path/to/time_extension_manager_imports.py
+"""
+
+
+import statistics
+import subprocess
+import sys
+
+
+NUM_TRIALS = 5
+
+_PROLOGUE = '''
+import sys
+import time
+start_time = time.perf_counter()
+import vesper.util.django_utils as django_utils
+django_utils.set_up_django()
+from vesper.singleton.extension_manager import extension_manager
+if {eager}:
+    get_extensions = extension_manager.get_extensions
+    def _get_extensions_eagerly(extension_point_name):
+        extensions = get_extensions(extension_point_name)
+        list(extensions.values())
+        return extensions
+    extension_manager.get_extensions = _get_extensions_eagerly
+'''
+
+_WEB_WORKER_STARTUP = '''
+import vesper.django.project.urls
+import vesper.django.app.views
+'''
+
+_JOB_STARTUP = '''
+extension_manager.get_extensions('Command')['detect']
+extension_manager.get_extensions('Detector')[
+    'Old Bird Tseep Detector Redux 1.1']
+'''
+
+# The epilogue exits via `os._exit` so that the process exits
+# immediately after printing its results, without waiting for any
+# threads or processes that Django or Vesper may have started.
+_EPILOGUE = '''
+import os
+elapsed_time = time.perf_counter() - start_time
+print(elapsed_time, len(sys.modules), 'tensorflow' in sys.modules)
+sys.stdout.flush()
+os._exit(0)
+'''
+
+
+def main():
+
+    print(
+        f'Median startup times over {NUM_TRIALS} trials, with module '
+        f'counts:')
+    print()
+
+    for name, code in (
+            ('web worker', _WEB_WORKER_STARTUP),
+            ('job', _JOB_STARTUP)):
+
+        for eager in (False, True):
+            time_startup(name, code, eager)
+
+
+def time_startup(name, code, eager):
+
+    code = _PROLOGUE.format(eager=eager) + code + _EPILOGUE
+
+    results = [run_startup(code) for _ in range(NUM_TRIALS)]
+
+    elapsed_time = statistics.median(r[0] for r in results)
+    module_count = results[-1][1]
+    tensorflow_imported = results[-1][2]
+
+    loading = 'eager' if eager else 'lazy'
+
+    print(
+        f'{name} ({loading} extension loading): {elapsed_time:.3f} '
+        f'seconds, {module_count} modules, TensorFlow imported: '
+        f'{tensorflow_imported}')
+
+
+def run_startup(code):
+
+    process = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True,
+        check=True)
+
+    # The last line of the output contains the results. Preceding lines
+    # may contain other output, for example from logging.
+    elapsed_time, module_count, tensorflow_imported = \
+        process.stdout.strip().split('\n')[-1].split()
+
+    return (
+        float(elapsed_time), int(module_count),
+        tensorflow_imported == 'True')
+
+
+if __name__ == '__main__':
+    main()
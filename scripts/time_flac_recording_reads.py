@@ -0,0 +1,183 @@
+"""
+Compares the speed of recording reads from WAVE and FLAC files.
+
+The script writes a synthetic one-channel recording as both a WAVE
+file and a FLAC file, or uses an existing WAVE recording and a FLAC
+version of it that it writes, and then times two kinds of reads of
+each file, both via `RecordingManager.open_recording_file` as Vesper
+performs them:
+
+    detection reads - sequential reads of `DETECTION_CHUNK_SIZE`
+        sample frames through the whole recording, as the `detect`
+        command performs them.
+
+    clip reads - `CLIP_COUNT` reads of clips of random start times,
+        from a `RecordingFilePool`, as the clip manager performs them.
+
+For comparison with `compare_wave_and_flac_reads.py`, it also times
+FLAC clip reads via `soundfile` seeks, and it reports the time taken
+to build the FLAC file's seek table when the file is first opened.
+"""
+
+
+from pathlib import Path
+import random
+import tempfile
+import time
+
+import numpy as np
+import soundfile
+
+from vesper.signal.flac_file_signal import FlacFileSignal
+from vesper.util.recording_file_pool import RecordingFilePool
+from vesper.util.recording_manager import RecordingManager
+import vesper.signal.flac_file_signal as flac_file_signal
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+INPUT_FILE_PATH = None
+"""
+Path of WAVE recording to use, or `None` to use a synthetic recording.
+"""
+
+DURATION = 3600
+"""Duration in seconds of synthetic recording."""
+
+SAMPLE_RATE = 24000
+DETECTION_CHUNK_SIZE = 100000
+CLIP_COUNT = 10000
+CLIP_DURATION = .6
+
+
+def main():
+
+    with tempfile.TemporaryDirectory() as dir_path:
+
+        dir_path = Path(dir_path)
+
+        if INPUT_FILE_PATH is None:
+            wave_file_path = dir_path / 'Recording.wav'
+            _write_synthetic_recording(wave_file_path)
+        else:
+            wave_file_path = Path(INPUT_FILE_PATH)
+
+        flac_file_path = dir_path / 'Recording.flac'
+        samples, sample_rate = soundfile.read(wave_file_path, dtype='int16')
+        soundfile.write(flac_file_path, samples, sample_rate)
+        del samples
+
+        wave_size = wave_file_path.stat().st_size
+        flac_size = flac_file_path.stat().st_size
+        print(
+            f'WAVE file size {wave_size / 2 ** 20:.1f} MB, FLAC file size '
+            f'{flac_size / 2 ** 20:.1f} MB ({flac_size / wave_size:.0%}).')
+
+        start_time = time.perf_counter()
+        with FlacFileSignal(flac_file_path) as signal:
+            elapsed_time = time.perf_counter() - start_time
+            print(
+                f'Built seek table of {signal.frame_count} FLAC frames in '
+                f'{elapsed_time:.2f} seconds.')
+            frame_count = len(signal)
+            clip_length = int(round(CLIP_DURATION * signal.frame_rate))
+
+        print()
+
+        for path in (wave_file_path, flac_file_path):
+            _time_detection_reads(path)
+
+        print()
+
+        rng = random.Random(0)
+        start_indices = [
+            rng.randrange(frame_count - clip_length)
+            for _ in range(CLIP_COUNT)]
+
+        for path in (wave_file_path, flac_file_path):
+            _time_clip_reads(path, start_indices, clip_length)
+
+        _time_soundfile_clip_reads(flac_file_path, start_indices, clip_length)
+
+
+def _write_synthetic_recording(path):
+
+    # Write noise plus a slowly varying tone, which compresses roughly
+    # as well as a typical nocturnal flight call recording.
+    rng = np.random.default_rng(0)
+    frame_count = DURATION * SAMPLE_RATE
+    times = np.arange(frame_count) / SAMPLE_RATE
+    samples = \
+        1000 * np.sin(2 * np.pi * (500 + 100 * np.sin(times)) * times) + \
+        rng.normal(0, 100, frame_count)
+    samples = samples.astype('<i2').reshape((1, -1))
+    audio_file_utils.write_wave_file(str(path), samples, SAMPLE_RATE)
+
+
+def _time_detection_reads(path):
+
+    start_time = time.perf_counter()
+
+    with RecordingManager.open_recording_file(path) as signal:
+
+        frame_count = len(signal)
+        index = 0
+
+        while index != frame_count:
+            length = min(DETECTION_CHUNK_SIZE, frame_count - index)
+            samples = signal.read(index, length, frame_first=False)
+            # Make sure samples are actually read from a WAVE file's
+            # memory map.
+            samples.sum()
+            index += length
+
+    elapsed_time = time.perf_counter() - start_time
+    duration = frame_count / signal.frame_rate
+
+    print(
+        f'Read {path.suffix} file for detection in {elapsed_time:.2f} '
+        f'seconds, {duration / elapsed_time:.0f} times faster than real '
+        f'time.')
+
+
+def _time_clip_reads(path, start_indices, clip_length):
+
+    # Clear seek table cache so the pool builds the seek table of a
+    # FLAC file.
+    flac_file_signal._seek_table_cache.clear()
+
+    pool = RecordingFilePool(1)
+
+    start_time = time.perf_counter()
+
+    for start_index in start_indices:
+        pool.read(path, 0, start_index, clip_length)
+
+    elapsed_time = time.perf_counter() - start_time
+
+    pool.clear()
+
+    _show_clip_read_rate(f'{path.suffix} file', elapsed_time)
+
+
+def _time_soundfile_clip_reads(path, start_indices, clip_length):
+
+    start_time = time.perf_counter()
+
+    with soundfile.SoundFile(path) as file_:
+        for start_index in start_indices:
+            file_.seek(start_index)
+            file_.read(clip_length, dtype='int16')
+
+    elapsed_time = time.perf_counter() - start_time
+
+    _show_clip_read_rate(f'{path.suffix} file via soundfile', elapsed_time)
+
+
+def _show_clip_read_rate(name, elapsed_time):
+    print(
+        f'Read {CLIP_COUNT} clips from {name} in {elapsed_time:.2f} '
+        f'seconds, or {CLIP_COUNT / elapsed_time:.0f} clips per second.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Times the Vesper job manager for many tiny jobs.
+
+The script submits `JOB_COUNT` jobs of the `test` command, each of
+which does essentially nothing, to a job manager, waits for all of
+the jobs to finish, and reports the elapsed time along with the job
+manager's queue wait time and startup time statistics. Since the jobs
+do so little, the elapsed time is dominated by job startup overhead.
+
+The script creates jobs in the archive database and job log files in
+the archive directory. Run it from a Vesper archive directory, for
+example with:
+
+    cd "/path/to/archive"
+    python /path/to/time_job_manager.py
+"""
+
+
+import os
+import time
+
+import vesper.util.django_utils as django_utils
+
+
+JOB_COUNT = 100
+
+MAX_CONCURRENT_JOBS = 4
+
+_COMMAND_SPEC = {
+    'name': 'test',
+    'arguments': {
+        'iteration_count': 1,
+        'iteration_period': 0,
+    }
+}
+
+
+def main():
+
+    django_utils.set_up_django()
+
+    from vesper.command.job_manager import JobManager
+    from vesper.django.app.models import Job
+
+    manager = JobManager(MAX_CONCURRENT_JOBS)
+
+    start_time = time.time()
+
+    job_ids = [
+        manager.start_job(_COMMAND_SPEC, None) for _ in range(JOB_COUNT)]
+
+    submission_time = time.time() - start_time
+
+    while True:
+
+        stats = manager.get_stats()
+
+        if stats.finished_job_count == JOB_COUNT:
+            break
+
+        time.sleep(.01)
+
+    elapsed_time = time.time() - start_time
+
+    statuses = Job.objects.filter(id__in=job_ids).values_list(
+        'status', flat=True)
+    completed_count = sum(s == 'Completed' for s in statuses)
+
+    print(
+        f'Ran {JOB_COUNT} jobs with at most {MAX_CONCURRENT_JOBS} at once '
+        f'in {elapsed_time:.2f} seconds, or {JOB_COUNT / elapsed_time:.1f} '
+        f'jobs per second. {completed_count} jobs completed.')
+    print(f'Job submission time: {submission_time:.2f} seconds')
+    print(
+        'Job worker startup times: ' +
+        ', '.join(f'{t:.2f}' for t in stats.worker_startup_times) +
+        ' seconds')
+    print(
+        f'Job queue wait time: mean {stats.mean_queue_wait_time:.3f}, '
+        f'max {stats.max_queue_wait_time:.3f} seconds')
+    print(
+        f'Job startup time: mean {stats.mean_startup_time:.3f}, '
+        f'max {stats.max_startup_time:.3f} seconds')
+
+    manager.shut_down()
+
+    # Exit via `os._exit` since Django may have started threads that
+    # would otherwise keep this process alive.
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Times the Old Bird Tseep and Thrush Detector Redux 1.1 detectors.
+
+The script runs each detector on synthetic input, in chunks of the size
+that the `detect` command uses, and reports the speed of the detector
+in multiples of real time. It also runs a reference version of each
+detector that integrates via FFT convolution and sorts threshold
+crossings with Python's `sorted` function, as the detectors did before
+their integrators were reimplemented with block cumulative sums, and
+reports the speed-up of the current detectors relative to the reference
+ones. Finally, it checks that the current and reference detectors
+detect the same clips.
+
+The synthetic input comprises Gaussian noise with frequency sweeps of
+random start times, start frequencies, and amplitudes added to it.
+"""
+
+
+import time
+
+import numpy as np
+import scipy.signal as signal
+
+import vesper.old_bird.old_bird_detector_redux_1_1 as detector_module
+
+
+SAMPLE_RATES = (22050, 24000, 48000)
+DURATION = 600                          # seconds
+CHUNK_SIZE = 100000                     # sample frames
+NUM_TRIALS = 3
+NOISE_AMPLITUDE = 300
+SWEEP_DURATION = .15                    # seconds
+SWEEP_RATE = 4000                       # hertz per second
+
+
+class Listener:
+
+
+    def __init__(self):
+        self.clips = []
+
+
+    def process_clip(self, start_index, length):
+        self.clips.append((start_index, length))
+
+
+class ReferenceIntegrator(detector_module._FirFilter):
+
+    """Integrator that integrates via FFT convolution."""
+
+
+    def __init__(self, integration_length):
+        coefficients = np.ones(integration_length) / integration_length
+        super().__init__(coefficients)
+
+
+def create_reference_detector_class(detector_class):
+
+    class ReferenceDetector(detector_class):
+
+
+        def _create_signal_processor(self):
+
+            chain = super()._create_signal_processor()
+
+            processors = [
+                ReferenceIntegrator(p._integration_length)
+                if isinstance(p, detector_module._Integrator) else p
+                for p in chain._processors]
+
+            return detector_module._SignalProcessorChain(processors)
+
+
+        def _get_threshold_crossings(self, ratios, offset):
+
+            offset += 1
+
+            x0 = ratios[:-1]
+            x1 = ratios[1:]
+
+            t = self.settings.ratio_threshold
+            rise_indices = np.where((x0 <= t) & (x1 > t))[0] + offset
+
+            t = 1 / t
+            fall_indices = np.where((x0 >= t) & (x1 < t))[0] + offset
+
+            return sorted(
+                [(i, True) for i in rise_indices] +
+                [(i, False) for i in fall_indices])
+
+
+    return ReferenceDetector
+
+
+def main():
+
+    print(
+        'detector,sample rate,reference times faster than real time,'
+        'times faster than real time,speed-up,clips,clips identical')
+
+    for sample_rate in SAMPLE_RATES:
+
+        samples = create_test_signal(sample_rate)
+
+        for name in ('Tseep', 'Thrush'):
+
+            detector_class = getattr(detector_module, f'{name}Detector')
+            reference_class = create_reference_detector_class(detector_class)
+
+            reference_rate, reference_clips = \
+                time_detector(reference_class, samples, sample_rate)
+
+            rate, clips = time_detector(detector_class, samples, sample_rate)
+
+            print(
+                f'{name},{sample_rate},{reference_rate:.1f},{rate:.1f},'
+                f'{rate / reference_rate:.2f},{len(clips)},'
+                f'{clips == reference_clips}')
+
+
+def create_test_signal(sample_rate):
+
+    rng = np.random.default_rng(0)
+
+    length = DURATION * sample_rate
+    samples = rng.normal(scale=NOISE_AMPLITUDE, size=length)
+
+    sweep_length = int(round(SWEEP_DURATION * sample_rate))
+    sweep_times = np.arange(sweep_length) / sample_rate
+
+    # Add one frequency sweep per second.
+    for i in range(DURATION):
+        start_index = int(rng.uniform(i, i + 1 - SWEEP_DURATION) * sample_rate)
+        f0 = rng.uniform(2500, 9000)
+        f1 = f0 + SWEEP_RATE * SWEEP_DURATION
+        amplitude = rng.uniform(50, 3000)
+        sweep = signal.chirp(sweep_times, f0, SWEEP_DURATION, f1)
+        end_index = start_index + sweep_length
+        samples[start_index:end_index] += amplitude * sweep
+
+    return np.round(samples).astype('int16')
+
+
+def time_detector(detector_class, samples, sample_rate):
+
+    elapsed_times = []
+
+    for _ in range(NUM_TRIALS):
+
+        listener = Listener()
+        detector = detector_class(sample_rate, listener)
+
+        start_time = time.perf_counter()
+
+        for i in range(0, len(samples), CHUNK_SIZE):
+            detector.detect(samples[i:i + CHUNK_SIZE])
+        detector.complete_detection()
+
+        elapsed_times.append(time.perf_counter() - start_time)
+
+    rate = DURATION / min(elapsed_times)
+
+    return rate, listener.clips
+
+
+if __name__ == '__main__':
+    main()
@@ -268,6 +268,20 @@ def get_detector_classes():
     return _detector_classes
 
 
+def unload_detector_classes():
+    
+    """
+    Unloads the BirdVoxDetector detector classes for this archive.
+    
+    The classes are created again the next time `get_detector_classes`
+    is called, according to the detectors in the archive database at
+    that time.
+    """
+    
+    global _detector_classes
+    _detector_classes = None
+
+
 def _create_detector_classes():
     
     detectors = Processor.objects.filter(type='Detector')
@@ -1,8 +1,29 @@
 """Module containing class `Annotator`."""
 
 
-from vesper.django.app.models import StringAnnotation
+from collections import defaultdict
+import logging
+
+from django.db import transaction
+
+from vesper.django.app.models import Processor, StringAnnotation
 import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.time_utils as time_utils
+
+
+_logger = logging.getLogger(__name__)
+
+
+_CLIP_BATCH_SIZE = 500
+"""
+Maximum number of clips per database query of the batch methods of the
+`Annotator` class.
+
+Queries of the form `clip_id__in=<clip IDs>` include one SQL parameter
+per clip ID, and some SQLite versions limit the number of parameters
+per query to 999.
+"""
 
 
 class Annotator:
@@ -58,4 +79,134 @@ class Annotator:
             return None
         else:
             return annotation.value
+
+
+    # The following batch methods are intended for annotators that
+    # annotate clips in batches via an `annotate_clips` method. They
+    # perform one database query per batch of `_CLIP_BATCH_SIZE`
+    # clips rather than one query per clip.
+
+
+    def _get_annotation_values(self, clips, annotation_info=None):
+        
+        """
+        Gets the values of an annotation for the specified clips.
+        
+        The annotation is this annotator's annotation unless
+        `annotation_info` is specified. Returns a list of values in
+        the order of `clips`, with `None` for clips that are not
+        annotated.
+        """
+        
+        if annotation_info is None:
+            annotation_info = self._annotation_info
+            
+        values = {}
+        
+        for clip_ids in _get_clip_id_batches(clips):
+            values.update(
+                StringAnnotation.objects.filter(
+                    clip_id__in=clip_ids, info=annotation_info
+                ).values_list('clip_id', 'value'))
+            
+        return [values.get(clip.id) for clip in clips]
+    
+    
+    def _get_clip_types(self, clips):
+        
+        """
+        Gets the types of the specified clips.
+        
+        The clip types are as returned by `model_utils.get_clip_type`,
+        but are obtained with a single query for the clips' creating
+        processors rather than one query per clip.
+        """
+        
+        processor_ids = set(clip.creating_processor_id for clip in clips)
+        processor_ids.discard(None)
+        
+        processors = Processor.objects.in_bulk(processor_ids)
+        
+        clip_types = dict(
+            (i, model_utils.get_processor_clip_type(p))
+            for i, p in processors.items())
+        
+        return [clip_types.get(clip.creating_processor_id) for clip in clips]
+    
+    
+    def _annotate_batch(self, clips, annotation_values, annotation_info=None):
+        
+        """
+        Annotates the specified clips with the specified values.
+        
+        The annotation is this annotator's annotation unless
+        `annotation_info` is specified. The clips are grouped by
+        annotation value, and each group is annotated with
+        `model_utils.annotate_clips`, all in one transaction rather
+        than one transaction per clip.
+        """
+        
+        if annotation_info is None:
+            annotation_info = self._annotation_info
+            
+        clip_ids = defaultdict(list)
+        for clip, value in zip(clips, annotation_values):
+            clip_ids[value].append(clip.id)
+            
+        creation_time = time_utils.get_utc_now()
+        
+        with archive_lock.atomic(), transaction.atomic():
+            
+            for value, ids in clip_ids.items():
+                for i in range(0, len(ids), _CLIP_BATCH_SIZE):
+                    model_utils.annotate_clips(
+                        ids[i:i + _CLIP_BATCH_SIZE], annotation_info,
+                        value, creation_time=creation_time,
+                        creating_user=self._creating_user,
+                        creating_job=self._creating_job,
+                        creating_processor=self._creating_processor)
+                    
+                    
+    def _annotate_clips_individually(self, clips, get_annotation_value):
+        
+        """
+        Annotates clips with values computed one clip at a time.
+        
+        `get_annotation_value` is a function that computes the
+        annotation value for a clip, or returns `None` if the clip
+        should not be annotated. If the function raises an exception
+        for a clip, the error is logged and the clip is not annotated.
+        The clips are annotated with `_annotate_batch` after all of
+        the values are computed.
+        
+        Returns the number of clips annotated.
+        """
+        
+        annotated_clips = []
+        annotation_values = []
+        
+        for clip in clips:
+            
+            try:
+                value = get_annotation_value(clip)
+                
+            except Exception as e:
+                _logger.error(
+                    f'Classification failed for clip "{str(clip)}". '
+                    f'Error message was: {str(e)}')
+                continue
+            
+            if value is not None:
+                annotated_clips.append(clip)
+                annotation_values.append(value)
+                
+        self._annotate_batch(annotated_clips, annotation_values)
+        
+        return len(annotated_clips)
+
+
+def _get_clip_id_batches(clips):
+    clip_ids = [clip.id for clip in clips]
+    for i in range(0, len(clip_ids), _CLIP_BATCH_SIZE):
+        yield clip_ids[i:i + _CLIP_BATCH_SIZE]
     
\ No newline at end of file
@@ -7,6 +7,7 @@ import time
 from vesper.command.command import Command
 from vesper.django.app.models import AnnotationInfo, Job, Processor
 from vesper.singleton.extension_manager import extension_manager
+from vesper.singleton.model_registry import model_registry
 import vesper.command.command_utils as command_utils
 import vesper.django.app.model_utils as model_utils
 import vesper.util.text_utils as text_utils
@@ -83,6 +84,8 @@ class ClassifyCommand(Command):
         _logger.info(
             f'Command classified a total of {total_classified_count} '
             f'of {total_visited_count} visited clips{timing_text}.')
+        
+        model_registry.log_stats(_logger)
 
         return True
 
@@ -3,6 +3,13 @@ class ClipExporter:
 
     clip_query_set_select_related_args = None
 
+    exports_subsets = False
+    """
+    `True` if and only if this exporter exports each subset of clips
+    at once via its `export_subset` method rather than one clip at a
+    time via its `export` method.
+    """
+
     
     def begin_exports(self):
         pass
@@ -17,6 +24,19 @@ class ClipExporter:
         pass
 
 
+    def export_subset(self, clips):
+
+        """
+        Exports a subset of clips.
+
+        `clips` is a Django query set of the clips of one station, mic
+        output, date, and detector, in order of increasing start time.
+        The method returns the number of clips exported.
+        """
+
+        raise NotImplementedError()
+
+
     def end_subset_exports(self):
         pass
 
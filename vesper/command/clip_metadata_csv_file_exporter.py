@@ -5,18 +5,24 @@ from collections import defaultdict, deque
 from datetime import timedelta as TimeDelta
 from pathlib import Path
 import csv
+import gzip
 import logging
 import tempfile
+import time
+
+import numpy as np
 
 from vesper.command.clip_exporter import ClipExporter
 from vesper.command.command import CommandExecutionError
-from vesper.django.app.models import AnnotationInfo, TagInfo
+from vesper.django.app.models import (
+    AnnotationInfo, StringAnnotation, Tag, TagInfo)
 from vesper.ephem.sun_moon import SunMoon, SunMoonCache
 from vesper.singleton.clip_manager import clip_manager
 from vesper.singleton.preset_manager import preset_manager
 from vesper.singleton.recording_manager import recording_manager
 from vesper.util.bunch import Bunch
-from vesper.util.calculator import Calculator as Calculator_
+from vesper.util.calculator import (
+    Calculator as Calculator_, compile_program)
 from vesper.util.datetime_formatter import DateTimeFormatter
 from vesper.util.time_difference_formatter import TimeDifferenceFormatter
 import vesper.command.command_utils as command_utils
@@ -330,9 +336,29 @@ _SUN_MOONS = SunMoonCache()
 
 class ClipMetadataCsvFileExporter(ClipExporter):
     
+    """
+    Exports clip metadata to a CSV or Parquet file.
+
+    The exporter writes one table row per clip, with columns specified
+    by a clip table format preset. It writes a Parquet file if the
+    output file path ends with ".parquet", a gzip-compressed CSV file
+    if the path ends with ".gz", and a plain CSV file otherwise.
+
+    The exporter exports the clips of each station, mic output, date,
+    and detector at once, computing each column for all of the clips.
+    It gets clip annotations and tags for all of the clips with one
+    query per annotation or tag, rather than one query per clip.
+    """
+    
     
     extension_name = 'Clip Metadata CSV File Exporter'
     
+    clip_query_set_select_related_args = (
+        'station', 'mic_output__device', 'recording_channel__recording',
+        'creating_processor')
+    
+    exports_subsets = True
+    
     _OUTPUT_CHUNK_SIZE = 100
     
     
@@ -345,32 +371,44 @@ class ClipMetadataCsvFileExporter(ClipExporter):
         self._table_format = _get_table_format(self._table_format_name)
         self._columns = _create_table_columns(self._table_format)
         self._delimiter = _get_delimiter(self._table_format)
+        self._output_file_format = \
+            _get_output_file_format(self._output_file_path)
         self._rows = []
     
     
     def begin_exports(self):
+        
         self._open_output_file()
-        column_names = [c.name for c in self._columns]
-        self._write_row(column_names)
+        
+        self._clip_count = 0
+        self._query_time = 0
+        self._measurement_time = 0
+        self._write_time = 0
     
     
     def _open_output_file(self):
         
+        column_names = [c.name for c in self._columns]
+        
         # Create output file in temporary file directory.
         try:
-            self._output_file = tempfile.NamedTemporaryFile(
-                'wt', newline='', prefix='vesper-', suffix='.csv',
+            file = tempfile.NamedTemporaryFile(
+                prefix='vesper-', suffix=self._output_file_format.suffix,
                 delete=False)
+            file.close()
+            self._temp_file_path = Path(file.name)
         except Exception as e:
             self._handle_output_error('Could not open output file.', e)
         
-        # Create output CSV writer.
+        # Create output table writer.
         try:
-            self._output_writer = \
-                csv.writer(self._output_file, delimiter=self._delimiter)
+            self._table_writer = self._output_file_format.writer_class(
+                self._temp_file_path, column_names, self._delimiter)
+        except CommandExecutionError:
+            raise
         except Exception as e:
             self._handle_output_error(
-                'Could not create output file CSV writer.', e)
+                'Could not create output file table writer.', e)
     
     
     def _handle_output_error(self, message, e):
@@ -387,7 +425,7 @@ class ClipMetadataCsvFileExporter(ClipExporter):
         
         # Write output rows.
         try:
-            self._output_writer.writerows(self._rows)
+            self._table_writer.write_rows(self._rows)
         except Exception as e:
             self._handle_output_error('Could not write to output file.', e)
         
@@ -400,25 +438,266 @@ class ClipMetadataCsvFileExporter(ClipExporter):
         return True
     
     
+    def export_subset(self, clips):
+        
+        start_time = time.time()
+        
+        # Get clips and their annotations and tags.
+        clips = _ClipBatch(clips)
+        
+        query_end_time = time.time()
+        
+        # Compute table columns.
+        columns = [_get_column_values(c, clips) for c in self._columns]
+        
+        measurement_end_time = time.time()
+        
+        # Write table rows.
+        self._rows.extend(zip(*columns))
+        self._write_rows()
+        
+        end_time = time.time()
+        
+        self._clip_count += len(clips)
+        self._query_time += query_end_time - start_time
+        self._measurement_time += measurement_end_time - query_end_time
+        self._write_time += end_time - measurement_end_time
+        
+        return len(clips)
+    
+    
     def end_exports(self):
         
         if len(self._rows) != 0:
             self._write_rows()
             
-        temp_file_path = Path(self._output_file.name)
-        
         # Close output file.
         try:
-            self._output_file.close()
+            self._table_writer.close()
         except Exception as e:
             self._handle_output_error('Could not close output file.', e)
         
         # Copy temporary output file to specified path.
         try:
-            os_utils.copy_file(temp_file_path, self._output_file_path)
+            os_utils.copy_file(self._temp_file_path, self._output_file_path)
         except Exception as e:
             self._handle_output_error(
                 'Could not copy temporary output file to specified path.', e)
+            
+        self._log_performance()
+        
+        
+    def _log_performance(self):
+        
+        total_time = \
+            self._query_time + self._measurement_time + self._write_time
+        
+        if self._clip_count == 0 or total_time == 0:
+            return
+        
+        rate = self._clip_count / total_time
+        
+        logging.info(
+            f'Clip metadata exporter exported {self._clip_count} clips '
+            f'in {total_time:.1f} seconds, an average of {rate:.1f} clips '
+            f'per second. It spent {self._query_time:.1f} seconds '
+            f'querying the archive database, '
+            f'{self._measurement_time:.1f} seconds computing table '
+            f'columns, and {self._write_time:.1f} seconds writing the '
+            f'output file.')
+    
+    
+class _CsvTableWriter:
+    
+    
+    def __init__(self, file_path, column_names, delimiter):
+        self._file = open(file_path, 'wt', newline='')
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+        self._writer.writerow(column_names)
+        
+        
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        
+        
+    def close(self):
+        self._file.close()
+        
+        
+class _GzipCsvTableWriter(_CsvTableWriter):
+    
+    
+    def __init__(self, file_path, column_names, delimiter):
+        self._file = gzip.open(file_path, 'wt', newline='')
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+        self._writer.writerow(column_names)
+    
+    
+class _ParquetTableWriter:
+    
+    """
+    Writes a Parquet table with one nullable string column per table
+    column, and one row group per `write_rows` invocation.
+    """
+    
+    
+    def __init__(self, file_path, column_names, delimiter):
+        
+        # We import PyArrow here rather than at the top of this module
+        # since it is needed only for Parquet output and is not
+        # required by Vesper.
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise CommandExecutionError(
+                'Could not import PyArrow, which is required to write '
+                'Parquet files. Please install PyArrow or specify an '
+                'output file path that does not end with ".parquet".')
+        
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema(
+            [(name, pyarrow.string()) for name in column_names])
+        self._writer = pyarrow.parquet.ParquetWriter(
+            str(file_path), self._schema)
+        
+        
+    def write_rows(self, rows):
+        
+        if len(rows) == 0:
+            return
+        
+        pa = self._pyarrow
+        columns = [pa.array(c, pa.string()) for c in zip(*rows)]
+        table = pa.Table.from_arrays(columns, schema=self._schema)
+        self._writer.write_table(table)
+        
+        
+    def close(self):
+        self._writer.close()
+        
+        
+_OUTPUT_FILE_FORMATS = (
+    Bunch(suffix='.parquet', writer_class=_ParquetTableWriter),
+    Bunch(suffix='.gz', writer_class=_GzipCsvTableWriter),
+)
+
+_DEFAULT_OUTPUT_FILE_FORMAT = Bunch(suffix='.csv', writer_class=_CsvTableWriter)
+
+
+def _get_output_file_format(file_path):
+    
+    suffix = Path(file_path).suffix.lower()
+    
+    for f in _OUTPUT_FILE_FORMATS:
+        if suffix == f.suffix:
+            return f
+        
+    return _DEFAULT_OUTPUT_FILE_FORMAT
+
+
+class _ClipBatch:
+    
+    """
+    The clips of one station, mic output, date, and detector.
+    
+    A clip batch gets its clips with one database query when it is
+    created, and gets the annotation values and tags of its clips
+    with one query per annotation or tag as needed. It also provides
+    clip field values as NumPy arrays.
+    """
+    
+    
+    def __init__(self, clips):
+        self._query_set = clips
+        self._clips = list(clips)
+        self._ids = [c.id for c in self._clips]
+        self._arrays = {}
+        self._annotation_values = {}
+        self._tagged_clip_ids = {}
+        
+        
+    def __len__(self):
+        return len(self._clips)
+    
+    
+    def __iter__(self):
+        return iter(self._clips)
+    
+    
+    @property
+    def ids(self):
+        return self._ids
+    
+    
+    def get_array(self, field_name):
+        
+        """
+        Gets a NumPy array of the values of the specified clip field,
+        or `None` if the field is null for any clip.
+        """
+        
+        try:
+            return self._arrays[field_name]
+        
+        except KeyError:
+            
+            values = [getattr(c, field_name) for c in self._clips]
+            
+            if any(v is None for v in values):
+                array = None
+            else:
+                array = np.array(values)
+                
+            self._arrays[field_name] = array
+            
+            return array
+        
+        
+    def get_annotation_values(self, annotation_info):
+        
+        """
+        Gets a mapping from clip ID to annotation value for the clips
+        of this batch that have the specified annotation.
+        """
+        
+        try:
+            return self._annotation_values[annotation_info.id]
+        
+        except KeyError:
+            
+            annotations = StringAnnotation.objects.filter(
+                info=annotation_info,
+                clip__in=self._query_set.values('id')
+            ).values_list('clip_id', 'value')
+            
+            values = dict(annotations)
+            self._annotation_values[annotation_info.id] = values
+            
+            return values
+        
+        
+    def get_tagged_clip_ids(self, tag_info):
+        
+        """
+        Gets the set of IDs of the clips of this batch that have the
+        specified tag.
+        """
+        
+        try:
+            return self._tagged_clip_ids[tag_info.id]
+        
+        except KeyError:
+            
+            tags = Tag.objects.filter(
+                info=tag_info,
+                clip__in=self._query_set.values('id')
+            ).values_list('clip_id', flat=True)
+            
+            clip_ids = frozenset(tags)
+            self._tagged_clip_ids[tag_info.id] = clip_ids
+            
+            return clip_ids
     
     
 def _get_table_format(table_format_name):
@@ -626,6 +905,11 @@ def _format_value(value, clip, formatter):
             
             value = formatter.format(value, clip)
     
+    return _get_string_value(value)
+
+
+def _get_string_value(value):
+    
     if value is None:
         return _NO_VALUE_STRING
     
@@ -636,6 +920,28 @@ def _format_value(value, clip, formatter):
         return value
     
     
+def _get_column_values(column, clips):
+    
+    values = column.measurement.measure_clips(clips)
+    
+    formatter = column.formatter
+    
+    if formatter is not None:
+    
+        if isinstance(formatter, (list, tuple)):
+            # sequence of formatters
+            
+            for f in formatter:
+                values = f.format_values(values, clips)
+                
+        else:
+            # single formatter
+            
+            values = formatter.format_values(values, clips)
+    
+    return [_get_string_value(v) for v in values]
+    
+    
 class Measurement:
     
     def _get_required_setting(self, settings, name):
@@ -647,6 +953,16 @@ class Measurement:
     
     def measure(self, clip):
         raise NotImplementedError()
+    
+    def measure_clips(self, clips):
+        
+        """
+        Measures the clips of a `_ClipBatch`, returning a list of
+        values. Subclasses can override this method to measure clips
+        more efficiently than one at a time.
+        """
+        
+        return [self.measure(clip) for clip in clips]
 
 
 class AnnotationValueMeasurement(Measurement):
@@ -662,6 +978,10 @@ class AnnotationValueMeasurement(Measurement):
     def measure(self, clip):
         return model_utils.get_clip_annotation_value(
             clip, self._annotation_info)
+    
+    def measure_clips(self, clips):
+        values = clips.get_annotation_values(self._annotation_info)
+        return [values.get(i) for i in clips.ids]
         
 
 class _SolarEventTimeMeasurement(Measurement):
@@ -724,6 +1044,11 @@ class DurationMeasurement(Measurement):
     def measure(self, clip):
         return clip.duration
     
+    def measure_clips(self, clips):
+        lengths = clips.get_array('length')
+        sample_rates = clips.get_array('sample_rate')
+        return (lengths / sample_rates).tolist()
+    
     
 class _IndexMeasurement(Measurement):
     
@@ -749,6 +1074,21 @@ class _IndexMeasurement(Measurement):
         
         return clip_index - reference_index
     
+    def measure_clips(self, clips):
+        
+        if self._reference_name == 'Recording Start Index':
+            
+            start_indices = clips.get_array('start_index')
+            
+            if start_indices is not None:
+                # all clips have start indices
+                
+                return self._get_indices(start_indices, clips).tolist()
+        
+        # If we get here, the reference index varies from clip to clip
+        # or some clips lack start indices.
+        return super().measure_clips(clips)
+    
     def _get_reference_index(self, clip):
         
         reference_name = self._reference_name
@@ -804,6 +1144,9 @@ class EndIndexMeasurement(_IndexMeasurement):
     
     def _get_index(self, clip):
         return clip.end_index
+    
+    def _get_indices(self, start_indices, clips):
+        return start_indices + clips.get_array('length')
 
 
 class EndTimeMeasurement(Measurement):
@@ -1112,9 +1455,17 @@ class RecentClipCountMeasurement(Measurement):
         return TimeDelta(seconds=window_size)
 
     def measure(self, clip):
-        
         classification = \
             model_utils.get_clip_annotation_value(clip, self._annotation_info)
+        return self._measure(clip, classification)
+    
+    def measure_clips(self, clips):
+        classifications = clips.get_annotation_values(self._annotation_info)
+        return [
+            self._measure(clip, classifications.get(clip.id))
+            for clip in clips]
+        
+    def _measure(self, clip, classification):
         
         if classification is None:
             return None
@@ -1389,6 +1740,9 @@ class StartIndexMeasurement(_IndexMeasurement):
     def _get_index(self, clip):
         return clip.start_index
     
+    def _get_indices(self, start_indices, clips):
+        return start_indices
+    
     
 class StartTimeMeasurement(Measurement):
     
@@ -1424,6 +1778,10 @@ class TagStatusMeasurement(Measurement):
     
     def measure(self, clip):
         return model_utils.is_clip_tagged(clip, self._tag_info)
+    
+    def measure_clips(self, clips):
+        tagged_clip_ids = clips.get_tagged_clip_ids(self._tag_info)
+        return [i in tagged_clip_ids for i in clips.ids]
 
 
 _MEASUREMENT_CLASSES = dict((c.name, c) for c in [
@@ -1510,6 +1868,16 @@ class Formatter:
             return None
         else:
             return self._format(value, clip)
+    
+    def format_values(self, values, clips):
+        
+        """
+        Formats the values of a column of a `_ClipBatch`, returning a
+        list of formatted values. Subclasses can override this method
+        to format values more efficiently than one at a time.
+        """
+        
+        return [self.format(v, clip) for v, clip in zip(values, clips)]
         
         
 class Calculator(Formatter):
@@ -1518,6 +1886,7 @@ class Calculator(Formatter):
     
     def __init__(self, settings):
         self._code = self._get_required_setting(settings, 'code')
+        self._program = compile_program(self._code)
         self._calculator = Calculator_()
     
     def _format(self, value, clip):
@@ -1525,12 +1894,32 @@ class Calculator(Formatter):
         try:
             c.clear()
             c.dict_stack.put('x', value)
-            c.execute(self._code)
+            self._program.execute(c)
             return c.operand_stack.pop()
         except Exception as e:
-            raise CommandExecutionError(
-                f'Execution of calculator code "{self._code}" failed. '
-                f'Calculator error message was: {str(e)}')
+            self._handle_execution_error(e)
+            
+    def _handle_execution_error(self, e):
+        raise CommandExecutionError(
+            f'Execution of calculator code "{self._code}" failed. '
+            f'Calculator error message was: {str(e)}')
+    
+    def format_values(self, values, clips):
+        
+        # Evaluate calculator program for all non-`None` values at once.
+        
+        indices = [i for i, v in enumerate(values) if v is not None]
+        
+        try:
+            results = self._program.evaluate([values[i] for i in indices])
+        except Exception as e:
+            self._handle_execution_error(e)
+            
+        formatted_values = [None] * len(values)
+        for i, result in zip(indices, results):
+            formatted_values[i] = result
+            
+        return formatted_values
     
     
 class DecimalFormatter(Formatter):
@@ -0,0 +1,72 @@
+"""Module containing class `CompactClipAudioPacksCommand`."""
+
+
+import logging
+import time
+
+from vesper.command.command import Command
+from vesper.singleton.clip_manager import clip_manager
+import vesper.command.command_utils as command_utils
+import vesper.util.text_utils as text_utils
+
+
+class CompactClipAudioPacksCommand(Command):
+    
+    """
+    Compacts the clip audio packs of an archive.
+    
+    Clip audio that is replaced or deleted remains in a pack until the
+    pack is compacted. This command compacts each pack that contains
+    such audio. Since a pack must not be written while it is being
+    compacted, do not run this command while other jobs are creating
+    or deleting clips.
+    """
+    
+    
+    extension_name = 'compact_clip_audio_packs'
+    
+    
+    def execute(self, job_info):
+        
+        logger = logging.getLogger()
+        
+        logger.info('Compacting clip audio packs...')
+        
+        start_time = time.time()
+        
+        store = clip_manager.clip_audio_pack_store
+        
+        keys = store.get_pack_keys()
+        
+        num_compacted_packs = 0
+        total_freed_size = 0
+        
+        for station_id, night in keys:
+            
+            stats = store.get_pack_stats(station_id, night)
+            
+            if stats.unused_size != 0:
+                
+                try:
+                    freed_size = store.compact(station_id, night)
+                except Exception as e:
+                    command_utils.log_and_reraise_fatal_exception(
+                        e, f'Compaction of pack for station {station_id} '
+                        f'and night {night}')
+                
+                logger.info(
+                    f'Compacted pack for station {station_id} and night '
+                    f'{night}, freeing {freed_size} bytes.')
+                
+                num_compacted_packs += 1
+                total_freed_size += freed_size
+                
+        count_text = text_utils.create_count_text(len(keys), 'pack')
+        elapsed_time = time.time() - start_time
+        timing_text = command_utils.get_timing_text(
+            elapsed_time, len(keys), 'packs')
+        logger.info(
+            f'Compacted {num_compacted_packs} of {count_text}, freeing '
+            f'{total_freed_size} bytes{timing_text}.')
+        
+        return True
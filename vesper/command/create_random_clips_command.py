@@ -13,6 +13,8 @@ from vesper.singleton.archive import archive
 from vesper.singleton.preset_manager import preset_manager
 from vesper.util.schedule import Interval, Schedule
 import vesper.command.command_utils as command_utils
+import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
 import vesper.util.signal_utils as signal_utils
 import vesper.util.time_utils as time_utils
 
@@ -494,5 +496,7 @@ class _ClipCreator:
 
     def flush(self):
         if len(self._clips) != 0:
-            Clip.objects.bulk_create(self._clips)
+            with archive_lock.atomic(), django.db.transaction.atomic():
+                Clip.objects.bulk_create(self._clips)
+                model_utils.add_clip_counts([c.id for c in self._clips])
             self._clips.clear()
@@ -0,0 +1,232 @@
+"""
+Functions that read and write deferred action files.
+
+A detection job that defers clip creation writes the clips that it
+would otherwise create to *deferred action files* in the archive's
+deferred action directory, and the `execute_deferred_actions` command
+later creates the clips from the files.
+
+A deferred action file is a NumPy `.npz` file, i.e. a zip file of
+NumPy arrays. The `header` array of the file is a string containing a
+JSON object with the following items:
+
+    format - "Vesper Deferred Actions".
+
+    version - the version number of the file format, currently 1.
+
+    action - the name of the file's action, currently always
+        "create_clips".
+
+    annotation_names - the names of the annotations of the file's clips.
+
+The other arrays of a file are the columns of a table with one row per
+clip: the `int64` arrays `recording_channel_ids`, `start_indices`,
+`lengths`, `creating_job_ids`, and `creating_processor_ids`, the
+`datetime64[us]` array `creation_times` of UTC creation times, and for
+the annotation with index `i` in `annotation_names` the string array
+`annotation_values_i` and the boolean array `annotation_flags_i`, which
+indicates which clips have the annotation.
+
+Earlier versions of Vesper wrote pickle files of lists of clips instead.
+The `read_file` function reads those files, too.
+"""
+
+
+from zoneinfo import ZoneInfo
+import json
+import pickle
+
+import numpy as np
+
+from vesper.util.bunch import Bunch
+
+
+FILE_NAME_EXTENSIONS = ('.npz', '.pkl')
+"""Deferred action file name extensions, new format first."""
+
+_FORMAT_NAME = 'Vesper Deferred Actions'
+_FORMAT_VERSION = 1
+
+_UTC = ZoneInfo('UTC')
+
+_ID_COLUMN_NAMES = (
+    'recording_channel_ids', 'start_indices', 'lengths',
+    'creating_job_ids', 'creating_processor_ids')
+
+
+def write_create_clips_file(file_path, clips):
+
+    """
+    Writes a deferred action file that creates clips.
+
+    Parameters
+    ----------
+    file_path : Path
+        the path of the file to write, whose extension should be ".npz".
+
+    clips : list
+        list of `[recording_channel_id, start_index, length,
+        creation_time, creating_job_id, creating_processor_id,
+        annotations]` lists, where `creation_time` is a UTC `datetime`
+        and `annotations` is either `None` or a dictionary that maps
+        annotation names to values.
+    """
+
+    columns = _get_columns(clips)
+
+    annotation_names = sorted(columns.annotations.keys())
+
+    header = {
+        'format': _FORMAT_NAME,
+        'version': _FORMAT_VERSION,
+        'action': 'create_clips',
+        'annotation_names': annotation_names
+    }
+
+    arrays = dict((name, getattr(columns, name)) for name in _ID_COLUMN_NAMES)
+    arrays['header'] = np.array(json.dumps(header))
+    arrays['creation_times'] = columns.creation_times
+
+    for i, name in enumerate(annotation_names):
+        values = columns.annotations[name]
+        flags = np.array([v is not None for v in values], dtype='bool')
+        arrays[f'annotation_values_{i}'] = \
+            np.array(['' if v is None else v for v in values], dtype='str')
+        arrays[f'annotation_flags_{i}'] = flags
+
+    with open(file_path, 'wb') as file_:
+        np.savez_compressed(file_, **arrays)
+
+
+def _get_columns(clips):
+
+    (recording_channel_ids, start_indices, lengths, creation_times,
+     creating_job_ids, creating_processor_ids, annotations) = \
+        zip(*clips) if len(clips) != 0 else [()] * 7
+
+    def to_array(values):
+        return np.array(values, dtype='int64')
+
+    columns = Bunch(
+        recording_channel_ids=to_array(recording_channel_ids),
+        start_indices=to_array(start_indices),
+        lengths=to_array(lengths),
+        creating_job_ids=to_array(creating_job_ids),
+        creating_processor_ids=to_array(creating_processor_ids))
+
+    columns.creation_times = np.array(
+        [_to_naive_utc(t) for t in creation_times], dtype='datetime64[us]')
+
+    # Get annotation value lists, with `None` for clips that do not
+    # have an annotation.
+    names = set()
+    for a in annotations:
+        if a is not None:
+            names.update(a.keys())
+    columns.annotations = dict(
+        (name, [_get_annotation_value(a, name) for a in annotations])
+        for name in names)
+
+    return columns
+
+
+def _to_naive_utc(dt):
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(_UTC).replace(tzinfo=None)
+    return dt
+
+
+def _get_annotation_value(annotations, name):
+    if annotations is None:
+        return None
+    value = annotations.get(name)
+    return None if value is None else str(value)
+
+
+def read_file(file_path):
+
+    """
+    Reads a deferred action file.
+
+    Parameters
+    ----------
+    file_path : Path
+        the path of the file to read, with either a ".npz" or a ".pkl"
+        extension.
+
+    Returns
+    -------
+    list of Bunch
+        the actions of the file. Each action has a `name` attribute,
+        currently always "create_clips", and a `clips` attribute with
+        `recording_channel_ids`, `start_indices`, `lengths`,
+        `creation_times`, `creating_job_ids`, and
+        `creating_processor_ids` NumPy array attributes and an
+        `annotations` attribute, a dictionary that maps each annotation
+        name to a list of clip annotation values, with `None` for clips
+        that do not have the annotation.
+
+    Raises
+    ------
+    ValueError
+        if the file is not a deferred action file of a known version.
+    """
+
+    if file_path.suffix == '.pkl':
+        return _read_pickle_file(file_path)
+    else:
+        return _read_npz_file(file_path)
+
+
+def _read_pickle_file(file_path):
+
+    with open(file_path, 'rb') as file_:
+        data = pickle.load(file_)
+
+    return [
+        Bunch(name=a['name'], clips=_get_columns(a['arguments']['clips']))
+        for a in data.get('actions', [])]
+
+
+def _read_npz_file(file_path):
+
+    with np.load(file_path, allow_pickle=False) as arrays:
+
+        try:
+            header = json.loads(str(arrays['header']))
+        except Exception:
+            raise ValueError(
+                f'File "{file_path}" is not a deferred action file.')
+
+        if header.get('format') != _FORMAT_NAME:
+            raise ValueError(
+                f'File "{file_path}" is not a deferred action file.')
+
+        version = header.get('version')
+        if version != _FORMAT_VERSION:
+            raise ValueError(
+                f'Deferred action file "{file_path}" has unsupported '
+                f'format version {version}.')
+
+        clips = Bunch(**dict(
+            (name, arrays[name]) for name in _ID_COLUMN_NAMES))
+        clips.creation_times = arrays['creation_times']
+
+        clips.annotations = {}
+        for i, name in enumerate(header['annotation_names']):
+            values = arrays[f'annotation_values_{i}'].tolist()
+            flags = arrays[f'annotation_flags_{i}'].tolist()
+            clips.annotations[name] = [
+                v if f else None for v, f in zip(values, flags)]
+
+    return [Bunch(name=header['action'], clips=clips)]
+
+
+def get_creation_times(clips):
+
+    """
+    Gets the creation times of the clips of a "create_clips" action,
+    as a list of UTC `datetime` objects.
+    """
+
+    return [t.replace(tzinfo=_UTC) for t in clips.creation_times.tolist()]
@@ -193,7 +193,7 @@ class DeleteClipsCommand(ClipSetCommand):
                     
                     # Delete clips from archive database.
                     ids = [clip.id for clip in chunk]
-                    Clip.objects.filter(id__in=ids).delete()
+                    model_utils.delete_clips(Clip.objects.filter(id__in=ids))
                     
         # Delete clip audio files. We do this after the transaction so
         # that if the transaction fails, leaving the clips in the
@@ -10,6 +10,7 @@ from vesper.command.command import Command, CommandExecutionError
 from vesper.django.app.models import Clip, Recording, Station
 from vesper.singleton.clip_manager import clip_manager
 import vesper.command.command_utils as command_utils
+import vesper.django.app.model_utils as model_utils
 import vesper.util.archive_lock as archive_lock
 
 
@@ -117,4 +118,8 @@ class DeleteRecordingsCommand(Command):
                 for clip in clips:
                     clip_manager.delete_audio_file(clip)
                 
+                # Delete clips before recording so that they are
+                # removed from the clip counts.
+                model_utils.delete_clips(clips)
+                
                 recording.delete()
@@ -2,28 +2,35 @@
 
 
 from collections import defaultdict
-import datetime
+from multiprocessing import Process, Queue
 import itertools
 import logging
-import pickle
+import queue
 import random
 import time
 
-from django.db import transaction
+from django.db import connections
 
 from vesper.archive_paths import archive_paths
-from vesper.command.command import Command, CommandExecutionError
+from vesper.command.command import (
+    Command, CommandExecutionError, CommandSyntaxError)
+from vesper.django.app.clip_batch_writer import ClipBatchWriter
 from vesper.django.app.models import (
     AnnotationInfo, Clip, Job, Recording, RecordingChannel, Station)
 from vesper.old_bird.old_bird_detector_runner import OldBirdDetectorRunner
-from vesper.signal.wave_file_signal import WaveFileSignal
 from vesper.singleton.archive import archive
 from vesper.singleton.extension_manager import extension_manager
+from vesper.singleton.model_registry import model_registry
 from vesper.singleton.preset_manager import preset_manager
+from vesper.singleton.recording_manager import recording_manager
+from vesper.util.bunch import Bunch
 from vesper.util.schedule import Interval, Schedule
 import vesper.command.command_utils as command_utils
+import vesper.command.deferred_action_file as deferred_action_file
+import vesper.command.detection_worker as detection_worker
 import vesper.django.app.model_utils as model_utils
-import vesper.util.archive_lock as archive_lock
+import vesper.util.detection_front_end as detection_front_end
+import vesper.util.inference_batcher as inference_batcher
 import vesper.util.os_utils as os_utils
 import vesper.util.signal_utils as signal_utils
 import vesper.util.text_utils as text_utils
@@ -49,7 +56,7 @@ _DETECTION_CHUNK_SIZE = 100000
 """Detection chunk size in sample frames."""
 
 
-_CLIP_BATCH_SIZE = 10
+_CLIP_BATCH_SIZE = 100
 """
 Number of clips to write to archive in a single database transaction.
 
@@ -70,8 +77,25 @@ of the detector run in number of times faster than real time.
         1000             462              1088
         10000            2483             1063
         
-A batch size of 10 provides both a reasonably short transaction duration,
-which is important for concurrency support, and fast detection.
+The statistics above were collected when clips and their annotations were
+created one database row at a time. Clips are now created in batches
+with `bulk_create` (see the `vesper.django.app.clip_batch_writer`
+module), which makes each transaction much shorter. The following table
+shows statistics for writing 5000 clips, each with a "Detector Score"
+annotation, to an SQLite archive with various batch sizes. The "Rate"
+column shows the number of clips written per second.
+
+    Batch Size      Duration (ms)      Rate (clips/s)
+    ----------      -------------      --------------
+        10 (rows)        29                 340
+        10               5.6                1785
+        100              39                 2578
+        1000             420                2380
+        10000            2048               2441
+        
+The first row of the table is for row-by-row creation. A batch size of
+100 provides both a reasonably short transaction duration, which is
+important for concurrency support, and fast clip creation.
 """
 
 
@@ -97,7 +121,25 @@ End index of shuffled station-nights for which to run detectors, when
 """
 
 
-_DEFERRED_DATABASE_WRITE_FILE_NAME_FORMAT = 'Job {} Part {:03d}.pkl'
+_DEFERRED_DATABASE_WRITE_FILE_NAME_FORMAT = 'Job {} Part {:03d}.npz'
+
+
+_RESULT_QUEUE_SIZE = 100
+"""
+Maximum number of messages in the detection worker result queue.
+
+When the queue is full, detection workers wait for the main job process
+to create clips before they continue, so the queue size bounds the
+amount of memory used for clips that have been detected but not yet
+created.
+"""
+
+
+_RESULT_QUEUE_TIMEOUT = 1
+"""
+Time in seconds that the main job process waits for a message from the
+detection workers before checking that at least one worker is alive.
+"""
 
 
 class DetectCommand(Command):
@@ -117,6 +159,7 @@ class DetectCommand(Command):
         self._end_date = get('end_date', args)
         self._schedule_name = get('schedule', args)
         self._defer_clip_creation = get('defer_clip_creation', args)
+        self._worker_count = _get_worker_count(args)
         
         self._schedule = _get_schedule(self._schedule_name)
         self._station_schedules = {}
@@ -137,15 +180,38 @@ class DetectCommand(Command):
         recording_lists = self._get_recording_lists()
         station_nights = sorted(recording_lists.keys())
         
-        for i, station_night in enumerate(station_nights):
+        if self._worker_count == 1:
+            # will run detectors in this process
             
-            self._log_station_night(station_night, i, len(station_nights))
+            for i, station_night in enumerate(station_nights):
+                
+                self._log_station_night(
+                    station_night, i, len(station_nights))
+                
+                recordings = recording_lists[station_night]
+                self._run_old_bird_detectors(old_bird_detectors, recordings)
+                self._run_other_detectors(other_detectors, recordings)
+                
+            model_registry.log_stats(self._logger)
             
-            recordings = recording_lists[station_night]
-            self._run_old_bird_detectors(old_bird_detectors, recordings)
-            self._run_other_detectors(other_detectors, recordings)
+            return True
+        
+        else:
+            # will run detectors other than Old Bird detectors in
+            # worker processes
             
-        return True
+            work_units = []
+            
+            for i, station_night in enumerate(station_nights):
+                
+                self._log_station_night(
+                    station_night, i, len(station_nights))
+                
+                recordings = recording_lists[station_night]
+                self._run_old_bird_detectors(old_bird_detectors, recordings)
+                work_units += self._get_work_units(other_detectors, recordings)
+                
+            return self._run_work_units(other_detectors, work_units)
     
     
     def _get_detectors(self):
@@ -400,41 +466,61 @@ class DetectCommand(Command):
     def _run_other_detectors_on_file(
             self, detector_models, file_, recording_intervals):
                 
+        abs_path = self._get_recording_file_path(file_)
+        
+        if abs_path is not None:
+            
+            with recording_manager.open_recording_file(abs_path) as signal:
+            
+                intervals = self._get_file_intervals(
+                    file_, abs_path, recording_intervals)
+                    
+                for interval in intervals:
+                    self._run_other_detectors_on_file_interval(
+                        detector_models, file_, abs_path, signal, interval)
+                    
+                    
+    def _get_recording_file_path(self, file_):
+        
+        """
+        Gets the absolute path of the specified recording file, or `None`
+        (after logging an error message) if the path is not available.
+        """
+        
         if file_.path is None:
             
             self._logger.error(
                 f'        Archive has no path for file {file_.num} of '
                 f'recording, so no detectors will be run on it.')
+            
+            return None
         
         else:
             
             try:
-                abs_path = model_utils.get_absolute_recording_file_path(file_)
+                return model_utils.get_absolute_recording_file_path(file_)
                 
             except ValueError as e:
                 self._logger.error('        ' + str(e))
-                
-            else:
-                # have absolute path of recording file
-                
-                with WaveFileSignal(abs_path) as signal:
-                
-                    intervals = _get_file_detection_intervals(
-                        file_, recording_intervals)
-                    
-                    if len(intervals) == 0:
-                        self._logger.info(
-                            f'        The detection schedule '
-                            f'"{self._schedule_name}" does not include any '
-                            f'portion of the time interval of the file '
-                            f'"{abs_path}", so no detectors will be run on '
-                            f'it.')
-                        
-                    for interval in intervals:
-                        self._run_other_detectors_on_file_interval(
-                            detector_models, file_, abs_path, signal, interval)
-                    
-                    
+                return None
+            
+            
+    def _get_file_intervals(
+            self, file_, file_path, recording_intervals):
+        
+        intervals = _get_file_detection_intervals(file_, recording_intervals)
+        
+        if len(intervals) == 0:
+            self._logger.info(
+                f'        The detection schedule '
+                f'"{self._schedule_name}" does not include any '
+                f'portion of the time interval of the file '
+                f'"{file_path}", so no detectors will be run on '
+                f'it.')
+            
+        return intervals
+    
+    
     def _run_other_detectors_on_file_interval(
             self, detector_models, file_, file_path, signal, time_interval):
         
@@ -454,21 +540,47 @@ class DetectCommand(Command):
             detectors = self._create_detectors(
                 detector_models, file_.recording, file_.start_index,
                 index_interval.start)
+            
+            # Create detection front ends, through which detectors
+            # share front-end computations like resampling and
+            # spectrogram computation.
+            front_ends = detection_front_end.create_front_ends(
+                detectors, file_.num_channels)
+            
+            # Create inference batcher, through which detectors score
+            # analysis records of all channels in large batches.
+            batcher = inference_batcher.create_inference_batcher(detectors)
                   
             # Detect.
             for samples in _generate_sample_buffers(signal, index_interval):
+                
+                for channel_num, front_end in enumerate(front_ends):
+                    front_end.process(samples[channel_num])
+                    
                 for detector in detectors:
                     channel_samples = samples[detector.channel_num]
                     detector.detect(channel_samples)
+                    
+                batcher.process()
                       
             # Wrap up detection.
+            for front_end in front_ends:
+                front_end.complete_processing()
             for detector in detectors:
                 detector.complete_detection()
+            batcher.complete_processing()
+                
+            front_end_time_saved = \
+                detection_front_end.get_time_saved(front_ends)
+            inference_stats = batcher.get_stats()
                 
         else:
             # don't run detectors
             
             time.sleep(.1)
+            
+            front_end_time_saved = 0
+            inference_stats = None
 
         processing_time = time.time() - start_time
         
@@ -477,7 +589,7 @@ class DetectCommand(Command):
             (time_interval.end - time_interval.start).total_seconds()
         self._log_detection_performance(
             len(detector_models), file_.num_channels, interval_duration,
-            processing_time)
+            processing_time, front_end_time_saved, inference_stats)
                     
                 
     def _log_detection_start(
@@ -522,13 +634,46 @@ class DetectCommand(Command):
             self, detector_models, recording, file_start_index,
             interval_start_index):
         
-        channel_count = recording.num_channels
+        listeners = self._create_detector_listeners(
+            detector_models, recording, file_start_index,
+            interval_start_index)
         
         detectors = []
         
+        for (detector_num, channel_num), listener in listeners.items():
+            
+            detector = _create_detector(
+                detector_models[detector_num], recording, listener)
+            
+            # We add a `channel_num` attribute to each detector to keep
+            # track of which recording channel it is for.
+            detector.channel_num = channel_num
+            
+            detectors.append(detector)
+            
+        return detectors
+    
+    
+    def _create_detector_listeners(
+            self, detector_models, recording, file_start_index,
+            interval_start_index):
+        
+        """
+        Creates detector listeners for the specified detectors and all
+        channels of the specified recording.
+        
+        The listeners are returned in a dictionary whose keys are
+        `(detector_num, channel_num)` pairs. The dictionary items are
+        ordered first by detector number and then by channel number.
+        """
+        
+        channel_count = recording.num_channels
+        
+        listeners = {}
+        
         job = Job.objects.get(id=self._job_info.job_id)
 
-        for detector_model in detector_models:
+        for detector_num, detector_model in enumerate(detector_models):
             
             for channel_num in range(channel_count):
                 
@@ -540,21 +685,15 @@ class DetectCommand(Command):
                     file_start_index, interval_start_index,
                     self._defer_clip_creation, job, self._logger)
                 
-                detector = _create_detector(
-                    detector_model, recording, listener)
-                
-                # We add a `channel_num` attribute to each detector to keep
-                # track of which recording channel it is for.
-                detector.channel_num = channel_num
-                
-                detectors.append(detector)
+                listeners[(detector_num, channel_num)] = listener
             
-        return detectors
+        return listeners
 
 
     def _log_detection_performance(
             self, detector_count, channel_count, interval_duration,
-            processing_time):
+            processing_time, front_end_time_saved, inference_stats,
+            worker_num=None):
         
         format_ = text_utils.format_number
         
@@ -563,10 +702,15 @@ class DetectCommand(Command):
         
         detectors_text = text_utils.create_count_text(
             detector_count, 'detector')
+        
+        if worker_num is None:
+            worker_text = ''
+        else:
+            worker_text = f' in worker {worker_num}'
 
         message = (
             f'        Ran {detectors_text} on {dur} seconds of '
-            f'{channel_count}-channel audio in {time} seconds')
+            f'{channel_count}-channel audio{worker_text} in {time} seconds')
         
         if processing_time != 0:
             total_duration = detector_count * channel_count * interval_duration
@@ -577,6 +721,331 @@ class DetectCommand(Command):
             
         self._logger.info(message)
         
+        if front_end_time_saved != 0:
+            time_saved = format_(front_end_time_saved)
+            self._logger.info(
+                f'        Sharing front-end computations among detectors '
+                f'saved an estimated {time_saved} seconds.')
+            
+        if inference_stats is not None and inference_stats.record_count != 0:
+            self._log_inference_performance(inference_stats)
+            
+            
+    def _log_inference_performance(self, stats):
+        
+        format_ = text_utils.format_number
+        count_text = text_utils.create_count_text
+        
+        scored_count = stats.record_count - stats.shared_record_count
+        
+        records_text = count_text(stats.record_count, 'analysis record')
+        batches_text = count_text(stats.batch_count, 'batch', 'batches')
+        time = format_(stats.scoring_time)
+        
+        message = (
+            f'        Scored {records_text} in {batches_text} of '
+            f'{stats.batch_size} in {time} seconds')
+        
+        if stats.scoring_time != 0:
+            rate = format_(scored_count / stats.scoring_time)
+            message += f', {rate} records per second.'
+        else:
+            message += '.'
+            
+        if stats.shared_record_count != 0:
+            shared_text = count_text(stats.shared_record_count, 'record')
+            message += (
+                f' Scores of {shared_text} were shared among detectors '
+                f'rather than computed.')
+            
+        self._logger.info(message)
+        
+        
+    def _get_work_units(self, detector_models, recordings):
+        
+        """
+        Gets work units for running the specified detectors on the
+        specified recordings in detection worker processes.
+        
+        This method logs the same recording and file messages as the
+        `_run_other_detectors` method, but does not run any detectors.
+        """
+        
+        if len(detector_models) == 0:
+            return []
+        
+        work_units = []
+        
+        recording_count = len(recordings)
+        
+        for i, recording in enumerate(recordings):
+            
+            self._logger.info(
+                f'    Getting work for recording {i + 1} of '
+                f'{recording_count} - "{str(recording)}"...')
+            
+            recording_files = recording.files.all()
+            
+            if len(recording_files) == 0:
+                self._logger.error(
+                    '        Archive has no file information for this '
+                    'recording, so no detectors will be run on it.')
+                continue
+                
+            recording_intervals = self._get_detection_intervals(recording)
+            
+            for file_ in recording_files:
+                
+                abs_path = self._get_recording_file_path(file_)
+                
+                if abs_path is None:
+                    continue
+                
+                intervals = self._get_file_intervals(
+                    file_, abs_path, recording_intervals)
+                
+                for interval in intervals:
+                    
+                    index_interval = _get_index_interval(
+                        interval, file_.start_time, file_.sample_rate)
+                    
+                    work_units.append(Bunch(
+                        file=file_,
+                        file_path=abs_path,
+                        time_interval=interval,
+                        index_interval=index_interval))
+                    
+        return work_units
+    
+    
+    def _run_work_units(self, detector_models, work_units):
+        
+        """
+        Runs the specified detectors on the specified work units in
+        detection worker processes.
+        
+        The workers run detectors and send the resulting clips to this
+        process, which creates them in the archive. This process is
+        thus the only process of the job that writes to the archive
+        database, and it does so while holding the archive lock just
+        as it would if it ran the detectors itself.
+        
+        Returns `True` if all work units were processed, or `False`
+        if processing was interrupted by a stop request.
+        """
+        
+        if len(work_units) == 0:
+            return not self._job_info.stop_requested
+        
+        worker_count = min(self._worker_count, len(work_units))
+        
+        detector_names = [m.name for m in detector_models]
+        
+        for unit in work_units:
+            unit.listeners = None
+            unit.status = None
+            
+        task_queue = Queue()
+        result_queue = Queue(_RESULT_QUEUE_SIZE)
+        
+        for unit_num, unit in enumerate(work_units):
+            recording = unit.file.recording
+            task_queue.put(Bunch(
+                num=unit_num,
+                file_path=str(unit.file_path),
+                sample_rate=recording.sample_rate,
+                channel_count=recording.num_channels,
+                detector_names=detector_names,
+                start_index=unit.index_interval.start,
+                end_index=unit.index_interval.end,
+                chunk_size=_DETECTION_CHUNK_SIZE))
+            
+        for _ in range(worker_count):
+            task_queue.put(None)
+            
+        workers_text = text_utils.create_count_text(worker_count, 'worker')
+        units_text = text_utils.create_count_text(
+            len(work_units), 'file interval')
+        self._logger.info(
+            f'Running detectors on {units_text} with {workers_text}...')
+        
+        # Close this process's database connections before starting
+        # worker processes so that the workers do not inherit them.
+        # Django will reopen connections in this process as needed.
+        connections.close_all()
+        
+        workers = [
+            Process(
+                target=detection_worker.run_worker,
+                args=(i + 1, self._job_info, task_queue, result_queue))
+            for i in range(worker_count)]
+        
+        for worker in workers:
+            worker.start()
+            
+        worker_stats = defaultdict(lambda: Bunch(
+            unit_count=0, audio_duration=0, processing_time=0))
+        
+        remaining_count = len(work_units)
+        
+        while remaining_count != 0:
+            
+            try:
+                message = result_queue.get(timeout=_RESULT_QUEUE_TIMEOUT)
+                
+            except queue.Empty:
+                
+                if not any(w.is_alive() for w in workers):
+                    units_text = text_utils.create_count_text(
+                        remaining_count, 'file interval')
+                    self._logger.error(
+                        f'All detection workers exited with {units_text} '
+                        f'unprocessed.')
+                    break
+                
+                continue
+            
+            name = message[0]
+            unit = work_units[message[1]]
+            
+            if name == 'start':
+                self._start_work_unit(detector_models, unit)
+                
+            elif name == 'events':
+                _replay_listener_events(unit.listeners, message[2])
+                
+            else:
+                # work unit done
+                
+                self._complete_work_unit(
+                    detector_models, unit, *message[2:], worker_stats)
+                remaining_count -= 1
+                
+        for worker in workers:
+            worker.join()
+            
+        self._log_worker_performance(len(detector_models), worker_stats)
+        
+        return not self._job_info.stop_requested
+    
+    
+    def _start_work_unit(self, detector_models, unit):
+        
+        file_ = unit.file
+        recording = file_.recording
+        
+        self._log_detection_start(
+            detector_models, unit.file_path, file_, unit.time_interval)
+        
+        unit.listeners = self._create_detector_listeners(
+            detector_models, recording, file_.start_index,
+            unit.index_interval.start)
+        
+        
+    def _complete_work_unit(
+            self, detector_models, unit, worker_num, status,
+            processing_time, front_end_time_saved, inference_stats, error,
+            worker_stats):
+        
+        unit.status = status
+        
+        if status != detection_worker.COMPLETED:
+            # Detection on this unit stopped early, so its listeners
+            # may still hold clips that were detected but not yet
+            # written. Those clips are valid, so we write them rather
+            # than dropping them.
+            self._flush_detector_listeners(unit.listeners)
+        
+        unit.listeners = None
+        
+        file_ = unit.file
+        time_interval = unit.time_interval
+        interval_duration = \
+            (time_interval.end - time_interval.start).total_seconds()
+        
+        if status == detection_worker.COMPLETED:
+            
+            self._log_detection_performance(
+                len(detector_models), file_.num_channels, interval_duration,
+                processing_time, front_end_time_saved, inference_stats,
+                worker_num)
+            
+            stats = worker_stats[worker_num]
+            stats.unit_count += 1
+            stats.audio_duration += file_.num_channels * interval_duration
+            stats.processing_time += processing_time
+            
+        elif status == detection_worker.INTERRUPTED:
+            
+            self._logger.info(
+                f'        Detection on file "{unit.file_path}" was '
+                f'interrupted by a stop request.')
+            
+        else:
+            # work unit failed
+            
+            self._logger.error(
+                f'        Detection on file "{unit.file_path}" in worker '
+                f'{worker_num} failed with an exception. See below for '
+                f'exception traceback.\n{error}')
+        
+        
+    def _flush_detector_listeners(self, listeners):
+        
+        if listeners is None:
+            return
+        
+        for listener in listeners.values():
+            
+            if not listener.processing_completed:
+                
+                try:
+                    listener.complete_processing()
+                    
+                except Exception as e:
+                    self._logger.error(
+                        f'        Attempt to write remaining clips of '
+                        f'interrupted detection failed with message: '
+                        f'{str(e)}. The clips will be ignored.')
+        
+        
+    def _log_worker_performance(self, detector_count, worker_stats):
+        
+        format_ = text_utils.format_number
+        
+        for worker_num in sorted(worker_stats.keys()):
+            
+            stats = worker_stats[worker_num]
+            
+            units_text = text_utils.create_count_text(
+                stats.unit_count, 'file interval')
+            time = format_(stats.processing_time)
+            
+            message = (
+                f'Detection worker {worker_num} processed {units_text} '
+                f'in {time} seconds')
+            
+            if stats.processing_time != 0:
+                total_duration = detector_count * stats.audio_duration
+                speedup = format_(total_duration / stats.processing_time)
+                message += f', {speedup} times faster than real time.'
+            else:
+                message += '.'
+                
+            self._logger.info(message)
+        
+
+def _get_worker_count(args):
+    
+    count = command_utils.get_optional_arg('worker_count', args, 1)
+    
+    if not isinstance(count, int) or count < 1:
+        raise CommandSyntaxError(
+            f'Bad detection worker count "{count}". The count must be '
+            f'a positive integer.')
+        
+    return count
+
 
 def _get_schedule(schedule_name):
     
@@ -678,6 +1147,18 @@ def _generate_sample_buffers(signal, interval):
         index += length
         
         
+def _replay_listener_events(listeners, events):
+    
+    """
+    Invokes detector listener methods as specified by events received
+    from a detection worker.
+    """
+    
+    for key, method_name, args in events:
+        method = getattr(listeners[key], method_name)
+        method(*args)
+        
+        
 def _format_datetime(dt):
     return dt.strftime('%Y-%m-%d %H:%M:%S UTC')
 
@@ -705,12 +1186,6 @@ def _create_detector(detector_model, recording, listener):
     return cls(recording.sample_rate, listener)
 
 
-class _ClipCreationError(Exception):
-    
-    def __init__(self, wrapped_exception):
-        self.wrapped_exception = wrapped_exception
-        
-        
 class _DetectorListener:
     
     
@@ -739,8 +1214,13 @@ class _DetectorListener:
         self._deferred_clips = []
         self._clip_count = 0
         self._failure_count = 0
+        self._processing_completed = False
         
         self._annotation_info_cache = {}
+        
+        self._clip_writer = ClipBatchWriter(
+            recording_channel, detector_model, job,
+            self._get_annotation_info)
  
 #         self._transaction_count = 0
 #         self._total_transactions_duration = 0
@@ -788,101 +1268,47 @@ class _DetectorListener:
         else:
             # database writes not deferred
                 
-            station = self._recording.station
-            sample_rate = self._recording.sample_rate
-            mic_output = recording_channel.mic_output
-        
+            clips = [
+                (start_index + start_offset, length, annotations)
+                for start_index, length, annotations in self._clips]
+            
             # Create database records for current batch of clips in one
             # database transaction.
             
 #             trans_start_time = time.time()
             
             try:
+                failures = self._clip_writer.write(clips, creation_time)
                 
-                with archive_lock.atomic(), transaction.atomic():
-                    
-                    for start_index, length, annotations in self._clips:
-                        
-                        # Get clip start time as a `datetime`.
-                        start_index += start_offset
-                        start_delta = datetime.timedelta(
-                            seconds=start_index / sample_rate)
-                        start_time = \
-                            self._recording.start_time + start_delta
-                         
-                        end_time = signal_utils.get_end_time(
-                            start_time, length, sample_rate)
-                         
-                        try:
-                        
-                            # TODO: Consider using Django's `bulk_create`
-                            # here to creat clips and annotations more
-                            # efficiently.
-                            
-                            clip = Clip.objects.create(
-                                station=station,
-                                mic_output=mic_output,
-                                recording_channel=recording_channel,
-                                start_index=start_index,
-                                length=length,
-                                sample_rate=sample_rate,
-                                start_time=start_time,
-                                end_time=end_time,
-                                date=station.get_night(start_time),
-                                creation_time=creation_time,
-                                creating_user=None,
-                                creating_job=self._job,
-                                creating_processor=detector_model
-                            )
-                            
-                            if annotations is not None:
-                                
-                                for name, value in annotations.items():
-                                    
-                                    annotation_info = \
-                                        self._get_annotation_info(name)
-                                    
-                                    model_utils.annotate_clip(
-                                        clip, annotation_info, str(value),
-                                        creation_time=creation_time,
-                                        creating_user=None,
-                                        creating_job=self._job,
-                                        creating_processor=detector_model)
-                        
-                        except Exception as e:
-                            
-                            # Note that it's important not to perform any
-                            # database queries here. If the database raised
-                            # the exception, we have to wait until we're
-                            # outside of the transaction to query the
-                            # database again.
-                            raise _ClipCreationError(e)
-
-#                     trans_end_time = time.time()
-#                     self._transaction_count += 1
-#                     self._total_transactions_duration += \
-#                         trans_end_time - trans_start_time
-            
-            except _ClipCreationError as e:
-                
-                duration = signal_utils.get_duration(length, sample_rate)
-                    
-                clip_string = Clip.get_string(
-                    station.name, mic_output.name, detector_model.name,
-                    start_time, duration)
+            except Exception as e:
                 
-                batch_size = len(self._clips)
+                batch_size = len(clips)
                 self._failure_count += batch_size
                 
-                if batch_size == 1:
-                    prefix = 'Clip'
-                else:
-                    prefix = f'All {batch_size} clips in this batch'
-                    
                 self._logger.error(
-                    f'            Attempt to create clip {clip_string} '
-                    f'failed with message: {str(e.wrapped_exception)}. '
-                    f'{prefix} will be ignored.')
+                    f'            Attempt to create batch of {batch_size} '
+                    f'clips failed with message: {str(e)}. All clips in '
+                    f'this batch will be ignored.')
+                
+            else:
+                
+                for clip, e in failures:
+                    
+                    self._failure_count += 1
+                    
+                    clip_string = Clip.get_string(
+                        clip.station.name, clip.mic_output.name,
+                        detector_model.name, clip.start_time, clip.duration)
+                    
+                    self._logger.error(
+                        f'            Attempt to create clip {clip_string} '
+                        f'failed with message: {str(e)}. Clip will be '
+                        f'ignored.')
+                    
+#             trans_end_time = time.time()
+#             self._transaction_count += 1
+#             self._total_transactions_duration += \
+#                 trans_end_time - trans_start_time
                             
         self._clips = []
         
@@ -930,8 +1356,15 @@ class _DetectorListener:
             return info
     
     
+    @property
+    def processing_completed(self):
+        return self._processing_completed
+    
+    
     def complete_processing(self, threshold=None):
         
+        self._processing_completed = True
+        
         # Create remaining clips.
         self._create_clips(threshold)
         
@@ -969,17 +1402,6 @@ class _DetectorListener:
 
     def _write_deferred_clips_file(self):
         
-        actions = {
-            'actions': [
-                {
-                    'name': 'create_clips',
-                    'arguments': {
-                        'clips': self._deferred_clips
-                    }
-                }
-            ]
-        }
-        
         dir_path = archive_paths.deferred_action_dir_path
         os_utils.create_directory(dir_path)
         
@@ -987,5 +1409,5 @@ class _DetectorListener:
             self._job.id, self._serial_number)
         file_path = dir_path / file_name
         
-        with open(file_path, 'wb') as file_:
-            pickle.dump(actions, file_)
+        deferred_action_file.write_create_clips_file(
+            file_path, self._deferred_clips)
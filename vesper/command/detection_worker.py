@@ -0,0 +1,270 @@
+"""
+Module containing function that runs a Vesper detection worker.
+
+The `run_worker` function runs in a new process for each worker of a
+parallel detection job. The function is in its own module rather than in
+the `detect_command` module in order to minimize the number of imports
+that the module containing the function, and hence the new process, must
+perform before Django is set up.
+
+A detection worker gets *work units* from a task queue. Each work unit
+specifies a recording file, an index interval of that file, and a set
+of detectors to run on all channels of that interval. The worker reads
+the interval's samples in chunks, runs the detectors on them, and sends
+the clips that the detectors produce back to the main job process via a
+result queue. The worker does not access the archive database: all clip
+creation is performed by the main job process.
+
+A worker sends three kinds of messages to the main job process:
+
+    ('start', unit_num, worker_num)
+        sent when the worker starts processing a work unit.
+
+    ('events', unit_num, events)
+        sent after each chunk of a work unit with the detector listener
+        events generated for that chunk. Each event is a tuple of the
+        form `(listener_key, method_name, args)`, where `listener_key`
+        is a `(detector_num, channel_num)` pair, `method_name` is
+        either `'process_clip'` or `'complete_processing'`, and `args`
+        is a tuple of arguments for that listener method.
+
+    ('done', unit_num, worker_num, status, processing_time,
+     front_end_time_saved, inference_stats, error)
+        sent when the worker stops processing a work unit. `status`
+        is one of `COMPLETED`, `INTERRUPTED`, or `FAILED`,
+        `front_end_time_saved` is the estimated processing time saved
+        by sharing front-end computations among detectors (see the
+        `vesper.util.detection_front_end` module), `inference_stats`
+        is the `get_stats` result of the work unit's inference batcher
+        (see the `vesper.util.inference_batcher` module) or `None`,
+        and `error` is a traceback string for a failed work unit and
+        `None` otherwise.
+"""
+
+
+from logging.handlers import QueueHandler
+import logging
+import time
+import traceback
+
+import vesper.util.django_utils as django_utils
+
+
+COMPLETED = 'Completed'
+INTERRUPTED = 'Interrupted'
+FAILED = 'Failed'
+
+
+class _WorkerDetectorListener:
+
+    """
+    Detector listener that records listener method invocations as events.
+
+    The events are forwarded to the main job process, which replays them
+    on the detector listeners that actually create clips.
+    """
+
+
+    def __init__(self, key, events):
+        self._key = key
+        self._events = events
+
+
+    def process_clip(
+            self, start_index, length, threshold=None, annotations=None):
+        self._events.append(
+            (self._key, 'process_clip',
+             (start_index, length, threshold, annotations)))
+
+
+    def complete_processing(self, threshold=None):
+        self._events.append((self._key, 'complete_processing', (threshold,)))
+
+
+def run_worker(worker_num, job_info, task_queue, result_queue):
+
+    """
+    Runs a detection worker in a new process.
+
+    Parameters:
+
+        worker_num : `int`
+            the number of this worker, used in log messages.
+
+        job_info : `vesper.command.job_info.JobInfo`
+            information pertaining to the job of this worker.
+
+        task_queue : `multiprocessing.Queue`
+            queue from which this worker gets work units. A `None`
+            work unit indicates that there is no more work.
+
+        result_queue : `multiprocessing.Queue`
+            queue to which this worker sends messages to the main job
+            process.
+    """
+
+    # Set up Django for this process. See the `run_job` function of
+    # the `job_runner` module for a discussion of why we do this here.
+    django_utils.set_up_django()
+
+    # These imports are here rather than at the top of this module so
+    # they will be executed after Django is set up in this process.
+    from vesper.singleton.extension_manager import extension_manager
+    from vesper.singleton.model_registry import model_registry
+
+    _configure_logger(job_info)
+
+    detector_classes = extension_manager.get_extensions('Detector')
+
+    while True:
+
+        unit = task_queue.get()
+
+        if unit is None:
+            # no more work
+
+            break
+
+        if job_info.stop_requested:
+            result_queue.put(
+                ('done', unit.num, worker_num, INTERRUPTED, 0, 0, None,
+                 None))
+            continue
+
+        result_queue.put(('start', unit.num, worker_num))
+
+        start_time = time.time()
+
+        front_end_time_saved = 0
+        inference_stats = None
+
+        try:
+            completed, front_end_time_saved, inference_stats = \
+                _process_work_unit(
+                    unit, detector_classes, job_info, result_queue)
+
+        except Exception:
+            status = FAILED
+            error = traceback.format_exc()
+
+        else:
+            status = COMPLETED if completed else INTERRUPTED
+            error = None
+
+        processing_time = time.time() - start_time
+
+        result_queue.put(
+            ('done', unit.num, worker_num, status, processing_time,
+             front_end_time_saved, inference_stats, error))
+
+    # Each worker process has its own model registry, so detectors
+    # created for successive work units share models.
+    model_registry.log_stats(
+        registry_name=f'Model registry of detection worker {worker_num}')
+
+
+def _configure_logger(job_info):
+
+    logger = logging.getLogger()
+
+    # A worker process started with the "fork" start method inherits
+    # the configured root logger of the main job process. Remove any
+    # inherited queue handlers so that each log message is written to
+    # the job log only once.
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler):
+            logger.removeHandler(handler)
+
+    job_info.configure_logger(logger)
+
+
+def _process_work_unit(unit, detector_classes, job_info, result_queue):
+
+    # This import is here rather than at the top of this module so it
+    # will be executed after Django is set up in this process.
+    from vesper.singleton.recording_manager import recording_manager
+    import vesper.util.detection_front_end as detection_front_end
+    import vesper.util.inference_batcher as inference_batcher
+
+    events = []
+
+    detectors = _create_detectors(unit, detector_classes, events)
+
+    front_ends = detection_front_end.create_front_ends(
+        detectors, unit.channel_count)
+
+    batcher = inference_batcher.create_inference_batcher(detectors)
+
+    with recording_manager.open_recording_file(unit.file_path) as signal:
+
+        index = unit.start_index
+
+        while index != unit.end_index:
+
+            if job_info.stop_requested:
+                return (
+                    False, detection_front_end.get_time_saved(front_ends),
+                    batcher.get_stats())
+
+            length = min(unit.chunk_size, unit.end_index - index)
+            samples = signal.read(index, length, frame_first=False)
+
+            for channel_num, front_end in enumerate(front_ends):
+                front_end.process(samples[channel_num])
+
+            for detector in detectors:
+                detector.detect(samples[detector.channel_num])
+
+            batcher.process()
+
+            _send_events(unit, events, result_queue)
+
+            index += length
+
+    for front_end in front_ends:
+        front_end.complete_processing()
+
+    for detector in detectors:
+        detector.complete_detection()
+
+    batcher.complete_processing()
+
+    _send_events(unit, events, result_queue)
+
+    return (
+        True, detection_front_end.get_time_saved(front_ends),
+        batcher.get_stats())
+
+
+def _create_detectors(unit, detector_classes, events):
+
+    # We create detectors in the same order as the `_create_detectors`
+    # method of the `DetectCommand` class so that detector listener keys
+    # match those of the main job process.
+
+    detectors = []
+
+    for detector_num, detector_name in enumerate(unit.detector_names):
+
+        try:
+            cls = detector_classes[detector_name]
+        except KeyError:
+            raise ValueError(f'Unrecognized detector "{detector_name}".')
+
+        for channel_num in range(unit.channel_count):
+
+            key = (detector_num, channel_num)
+            listener = _WorkerDetectorListener(key, events)
+
+            detector = cls(unit.sample_rate, listener)
+            detector.channel_num = channel_num
+
+            detectors.append(detector)
+
+    return detectors
+
+
+def _send_events(unit, events, result_queue):
+    if len(events) != 0:
+        result_queue.put(('events', unit.num, list(events)))
+        events.clear()
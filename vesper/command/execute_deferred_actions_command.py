@@ -4,25 +4,44 @@
 from zoneinfo import ZoneInfo
 import datetime
 import logging
-import pickle
 import time
 
-from django.db import transaction
+import numpy as np
 
 from vesper.archive_paths import archive_paths
 from vesper.command.command import Command, CommandExecutionError
+from vesper.django.app.clip_batch_writer import ClipBatchWriter
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, Job, Processor, RecordingChannel)
+    AnnotationInfo, Job, Processor, RecordingChannel)
 import vesper.command.command_utils as command_utils
-import vesper.django.app.model_utils as model_utils
-import vesper.util.signal_utils as signal_utils
+import vesper.command.deferred_action_file as deferred_action_file
 
 
 _LOGGING_PERIOD = 10000
 
+_CLIP_BATCH_SIZE = 5000
+"""
+Maximum number of clips to create in a single database transaction.
+"""
+
 
 class ExecuteDeferredActionsCommand(Command):
     
+    """
+    Command that executes deferred actions.
+    
+    The command executes the actions of the deferred action files of
+    the archive's deferred action directory (see
+    `vesper.command.deferred_action_file`), moving each file to the
+    directory's "Executed" subdirectory after executing its actions.
+    
+    The command creates the clips of a file in large batches, each in
+    its own database transaction, skipping clips that already exist.
+    So if the command is interrupted, it can simply be run again: the
+    clips of a partly executed file that were created the first time
+    will not be created again.
+    """
+    
     
     extension_name = 'execute_deferred_actions'
     
@@ -31,9 +50,7 @@ class ExecuteDeferredActionsCommand(Command):
         
         super().__init__(args)
         
-        self._recording_channel_cache = {}
-        self._job_cache = {}
-        self._processor_cache = {}
+        self._clip_writer_cache = {}
         self._annotation_info_cache = {}
     
     
@@ -56,7 +73,9 @@ class ExecuteDeferredActionsCommand(Command):
             
         else:
 
-            file_paths = sorted(dir_path.glob('*.pkl'))
+            file_paths = sorted(
+                p for p in dir_path.iterdir()
+                if p.suffix in deferred_action_file.FILE_NAME_EXTENSIONS)
             num_files = len(file_paths)
             
             self._logger.info((
@@ -64,36 +83,41 @@ class ExecuteDeferredActionsCommand(Command):
                 '"{}"...').format(num_files, dir_path))
                 
             try:
-                with transaction.atomic():
-                    for i, file_path in enumerate(file_paths):
-                        self._logger.info((
-                            'Executing actions from file {} of {} - '
-                            '"{}"...').format(
-                                i + 1, num_files, file_path.name))
-                        self._execute_deferred_actions(file_path)
+                
+                for i, file_path in enumerate(file_paths):
+                    
+                    self._logger.info((
+                        'Executing actions from file {} of {} - '
+                        '"{}"...').format(i + 1, num_files, file_path.name))
+                    
+                    self._execute_deferred_actions(file_path)
+                    
+                    # If we get here, the execution of the file's
+                    # actions succeeded and we can move the file to
+                    # the `Executed` directory.
+                    self._move_deferred_action_file(file_path)
               
             except Exception:
                 self._logger.error(
                     'Execution of deferred actions failed with an '
-                    'exception. Archive database has been restored '
-                    'to its state before the job began. See below '
-                    'for exception traceback.')
+                    'exception. Clips created before the failure remain '
+                    'in the archive database, and the files whose '
+                    'actions were not all executed remain in the '
+                    'deferred action directory. You can run this '
+                    'command again to finish executing them, without '
+                    'creating duplicate clips. See below for exception '
+                    'traceback.')
                 raise
             
-            # If we get here, the execution of all of the deferred
-            # actions succeeded and we can move the action files
-            # to the `Executed` directory.
-            self._move_deferred_action_files(file_paths)
-              
         return True
     
     
     def _execute_deferred_actions(self, file_path):
         
-        with open(file_path, 'rb') as file_:
-            data = pickle.load(file_)
-            
-        actions = data.get('actions', [])
+        try:
+            actions = deferred_action_file.read_file(file_path)
+        except ValueError as e:
+            raise CommandExecutionError(str(e))
         
         for action in actions:
             self._execute_deferred_action(action)
@@ -101,81 +125,129 @@ class ExecuteDeferredActionsCommand(Command):
             
     def _execute_deferred_action(self, action):
         
-        name = action['name']
-        args = action['arguments']
-        
-        if name == 'create_clips':
-            self._execute_create_clips_action(args)
+        if action.name == 'create_clips':
+            self._execute_create_clips_action(action.clips)
             
         
-    def _execute_create_clips_action(self, args):
+    def _execute_create_clips_action(self, clips):
         
-        clips = args['clips']
-        num_clips = len(clips)
+        num_clips = len(clips.start_indices)
         
         self._logger.info('Creating {} clips...'.format(num_clips))
         
         start_time = time.time()
         
+        start_indices = clips.start_indices.tolist()
+        lengths = clips.lengths.tolist()
+        creation_times = deferred_action_file.get_creation_times(clips)
+        annotations = self._get_clip_annotations(clips, num_clips)
+        
+        # Group clips by recording channel, processor, and job, since
+        # a clip batch writer creates clips for just one of each.
+        keys = np.stack((
+            clips.recording_channel_ids, clips.creating_processor_ids,
+            clips.creating_job_ids), axis=1)
+        unique_keys, key_nums = np.unique(keys, axis=0, return_inverse=True)
+        key_nums = key_nums.reshape(-1)
+        
         clip_num = 0
+        skipped_count = 0
+        failure_count = 0
         
-        for clip in clips:
+        for i, key in enumerate(unique_keys.tolist()):
             
-            self._create_clip(clip)
+            writer = self._get_clip_writer(*key)
             
-            clip_num += 1
+            indices = np.flatnonzero(key_nums == i).tolist()
             
-            if clip_num % _LOGGING_PERIOD == 0:
-                self._logger.info('Created {} clips...'.format(clip_num))
+            for j in range(0, len(indices), _CLIP_BATCH_SIZE):
+                
+                batch_indices = indices[j:j + _CLIP_BATCH_SIZE]
+                
+                batch_clips = [
+                    (start_indices[k], lengths[k], annotations[k])
+                    for k in batch_indices]
+                batch_creation_times = [
+                    creation_times[k] for k in batch_indices]
+                
+                old_skipped_count = writer.skipped_clip_count
+                
+                failures = writer.write(
+                    batch_clips, batch_creation_times, skip_existing=True)
+                
+                skipped_count += \
+                    writer.skipped_clip_count - old_skipped_count
+                failure_count += len(failures)
+                
+                for clip, e in failures:
+                    self._logger.error(
+                        f'Attempt to create clip {clip} failed with '
+                        f'message: {str(e)}. Clip will be ignored.')
+                
+                old_clip_num = clip_num
+                clip_num += len(batch_indices)
+                
+                if clip_num // _LOGGING_PERIOD != \
+                        old_clip_num // _LOGGING_PERIOD:
+                    self._logger.info(
+                        'Processed {} clips...'.format(clip_num))
                     
+        created_count = num_clips - skipped_count - failure_count
+        
         elapsed_time = time.time() - start_time
         timing_text = command_utils.get_timing_text(
             elapsed_time, num_clips, 'clips')
-        self._logger.info(
-            'Created {} clips{}.'.format(num_clips, timing_text))
+        self._logger.info('Created {} of {} clips{}.'.format(
+            created_count, num_clips, timing_text))
+        
+        if skipped_count != 0:
+            self._logger.info(
+                'Skipped {} clips that already existed.'.format(
+                    skipped_count))
+            
+        if failure_count != 0:
+            self._logger.info(
+                'Could not create {} clips.'.format(failure_count))
 
 
-    def _create_clip(self, clip_info):
+    def _get_clip_annotations(self, clips, num_clips):
         
-        (recording_channel_id, start_index, length, creation_time,
-         creating_job_id, creating_processor_id, annotations) = clip_info
-         
-        channel, station, mic_output, sample_rate, start_time = \
-            self._get_recording_channel_info(recording_channel_id)
+        """
+        Gets a list of annotation dictionaries, one per clip, with
+        `None` for clips without annotations.
+        """
+        
+        annotations = [None] * num_clips
+        
+        for name, values in clips.annotations.items():
+            for i, value in enumerate(values):
+                if value is not None:
+                    if annotations[i] is None:
+                        annotations[i] = {}
+                    annotations[i][name] = value
+                    
+        return annotations
+    
+    
+    def _get_clip_writer(
+            self, recording_channel_id, processor_id, job_id):
+        
+        key = (recording_channel_id, processor_id, job_id)
+        
+        try:
+            return self._clip_writer_cache[key]
+        
+        except KeyError:
             
-        start_offset = signal_utils.get_duration(start_index, sample_rate)
-        start_time += datetime.timedelta(seconds=start_offset)
-        end_time = signal_utils.get_end_time(start_time, length, sample_rate)
+            writer = ClipBatchWriter(
+                RecordingChannel.objects.get(id=recording_channel_id),
+                Processor.objects.get(id=processor_id),
+                Job.objects.get(id=job_id),
+                self._get_annotation_info)
             
-        job = self._get_job(creating_job_id)
-        processor = self._get_processor(creating_processor_id)
-         
-        clip = Clip.objects.create(
-            station=station,
-            mic_output=mic_output,
-            recording_channel=channel,
-            start_index=start_index,
-            length=length,
-            sample_rate=sample_rate,
-            start_time=start_time,
-            end_time=end_time,
-            date=station.get_night(start_time),
-            creation_time=creation_time,
-            creating_user=None,
-            creating_job=job,
-            creating_processor=processor
-        )
-        
-        if annotations is not None:
+            self._clip_writer_cache[key] = writer
             
-            for name, value in annotations.items():
-                
-                annotation_info = self._get_annotation_info(name)
-                
-                model_utils.annotate_clip(
-                    clip, annotation_info, str(value),
-                    creation_time=creation_time, creating_user=None,
-                    creating_job=self._job, creating_processor=processor)
+            return writer
 
 
     # TODO: The `_get_annotation_info` method and the code above that
@@ -207,63 +279,10 @@ class ExecuteDeferredActionsCommand(Command):
                 return info
 
         
-    def _get_recording_channel_info(self, recording_channel_id):
-
-        try:
-            return self._recording_channel_cache[recording_channel_id]
-        
-        except KeyError:
-            
-            channel = RecordingChannel.objects.get(id=recording_channel_id)
-            recording = channel.recording
-            station = recording.station
-            mic_output = channel.mic_output
-             
-            sample_rate = recording.sample_rate
-            start_time = recording.start_time
-            
-            info = (channel, station, mic_output, sample_rate, start_time)
-            
-            self._recording_channel_cache[recording_channel_id] = info
-            
-            return info
-        
-        
-    def _get_job(self, job_id):
-        
-        try:
-            return self._job_cache[job_id]
-        
-        except KeyError:
-            job = Job.objects.get(id=job_id)
-            self._job_cache[job_id] = job
-            return job
-
-         
-    def _get_processor(self, processor_id):
-        
-        try:
-            return self._processor_cache[processor_id]
-        
-        except KeyError:
-            processor = Processor.objects.get(id=processor_id)
-            self._processor_cache[processor_id] = processor
-            return processor
-        
-        
-    def _move_deferred_action_files(self, file_paths):
-        
-        if len(file_paths) > 0:
-            
-            self._logger.info(
-                'Moving deferred action files to "Executed" directory...')
-            
-            executed_dir_path = file_paths[0].parent / 'Executed'
-            executed_dir_path.mkdir(parents=True, exist_ok=True)
-            
-            for old_path in file_paths:
-                new_path = executed_dir_path / old_path.name
-                old_path.rename(new_path)
+    def _move_deferred_action_file(self, file_path):
+        executed_dir_path = file_path.parent / 'Executed'
+        executed_dir_path.mkdir(parents=True, exist_ok=True)
+        file_path.rename(executed_dir_path / file_path.name)
         
          
 def _parse_datetime(dt):
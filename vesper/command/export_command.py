@@ -81,8 +81,14 @@ class ExportCommand(ClipSetCommand):
                 station, mic_output, date, detector, clip_count)
 
             try:
-                visited_count, exported_count = \
-                    _export_clips(clips, exporter)
+
+                if exporter.exports_subsets:
+                    visited_count, exported_count = \
+                        _export_subset(clips, clip_count, exporter)
+                    
+                else:
+                    visited_count, exported_count = \
+                        _export_clips(clips, exporter)
                     
             except Exception:
                 _logger.error(
@@ -178,6 +184,11 @@ def _export_clips(clips, exporter):
         if visited_count % _LOGGING_PERIOD == 0:
             _logger.info(f'Visited {visited_count} clips...')
             
+    return _log_export_results(start_time, visited_count, exported_count)
+
+
+def _log_export_results(start_time, visited_count, exported_count):
+
     elapsed_time = time.time() - start_time
     timing_text = command_utils.get_timing_text(
         elapsed_time, exported_count, 'clips')
@@ -187,3 +198,9 @@ def _export_clips(clips, exporter):
         f'{timing_text}.')
 
     return visited_count, exported_count
+
+
+def _export_subset(clips, clip_count, exporter):
+    start_time = time.time()
+    exported_count = exporter.export_subset(clips)
+    return _log_export_results(start_time, clip_count, exported_count)
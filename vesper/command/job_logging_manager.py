@@ -5,7 +5,6 @@ from collections import defaultdict
 from logging import FileHandler, Handler
 from logging.handlers import QueueHandler, QueueListener
 from multiprocessing import Queue
-import logging
 
 import vesper.util.logging_utils as logging_utils
 import vesper.util.os_utils as os_utils
@@ -45,6 +44,8 @@ class JobLoggingManager:
         Configures the specified logger to write log records to this job's
         logging queue.
         
+        Returns the logging handler added to the logger.
+        
         For the `logging_config` argument, the main job process can pass
         the `logging_config` attribute of its `JobLoggingManager`. This
         information is also passed to the `execute` method of the job's
@@ -60,6 +61,8 @@ class JobLoggingManager:
         
         handler = QueueHandler(queue)
         logger.addHandler(handler)
+        
+        return handler
 
         
     def __init__(self, job, level):
@@ -77,6 +80,7 @@ class JobLoggingManager:
         os_utils.create_parent_directory(job.log_file_path)
         file_handler = FileHandler(job.log_file_path, 'w')
         file_handler.setFormatter(formatter)
+        self._file_handler = file_handler
 
         # We used to create a second handler here, of type StreamHandler,
         # which wrote messages to stderr, and add it to the QueueListener
@@ -113,4 +117,9 @@ class JobLoggingManager:
         # Tell logging listener to terminate, and wait for it to do so.
         self._listener.stop()
         
-        logging.shutdown()
+        # Close the job log file and logging queue. We do this rather
+        # than calling `logging.shutdown`, since the main job process
+        # is a job worker process that may run other jobs.
+        self._file_handler.close()
+        self.queue.close()
+        self.queue.join_thread()
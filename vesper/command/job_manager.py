@@ -1,116 +1,426 @@
 """Module containing class `JobManager`."""
 
 
-from multiprocessing import Event, Lock, Process
+from collections import deque
+from multiprocessing import Event, Process, Queue
+from queue import Empty
+from threading import Lock, Thread
 import datetime
 import json
+import logging
+import time
+
+from django.conf import settings
 
 from vesper.django.app.models import Job
 from vesper.util.bunch import Bunch
-from vesper.util.repeating_timer import RepeatingTimer
 import vesper.command.job_runner as job_runner
 import vesper.util.archive_lock as archive_lock
 import vesper.util.time_utils as time_utils
 
 
+_logger = logging.getLogger(__name__)
+
+
+_WORKER_CHECK_PERIOD = 1
+"""
+Period in seconds at which the job manager checks for job worker
+processes that have terminated unexpectedly.
+"""
+
+
 class JobManager:
-    
+
     """
     Manager of Vesper jobs.
 
-    A Vesper job executes one Vesper command. Each job runs in its own
-    process, which may or may not start additional processes. The
-    `start_job` method of this class starts a job for a specified command,
-    and the `stop_job` method requests that a running job stop. A job is
-    not required to honor a stop request, but most jobs should, especially
+    A Vesper job executes one Vesper command. Jobs run in a pool of
+    *job worker* processes, each of which runs one job at a time and
+    may start additional processes while it does. A worker sets up
+    Django when it starts rather than once per job, so short jobs
+    start quickly.
+
+    The `start_job` method of this class creates a job for a specified
+    command and appends it to a first-in, first-out queue of pending
+    jobs. The manager starts pending jobs in the order in which they
+    were created, running at most `max_concurrent_jobs` jobs at once.
+    It starts workers as they are needed, up to that number, and keeps
+    them for subsequent jobs. A worker that terminates unexpectedly is
+    replaced, and the job it was running is marked failed.
+
+    The `stop_job` method requests that a job stop. A pending job is
+    removed from the queue and marked interrupted. A running job is not
+    required to honor a stop request, but most jobs should, especially
     longer-running ones.
+
+    The `get_stats` method gets job queue wait time and startup time
+    statistics.
     """
-    
-    
-    def __init__(self):
-        
-        self._job_infos = {}
+
+
+    def __init__(self, max_concurrent_jobs=None):
+
+        if max_concurrent_jobs is None:
+            max_concurrent_jobs = settings.VESPER_MAX_CONCURRENT_JOBS
+
+        if max_concurrent_jobs <= 0:
+            raise ValueError('Max concurrent jobs must be positive.')
+
+        self._max_concurrent_jobs = max_concurrent_jobs
+
+        self._pending_jobs = deque()
+        """Queue of `Bunch` objects describing jobs not yet started."""
+
+        self._workers = []
         """
-        Mapping from job IDs to `Bunch` objects containing job information.
-        
-        An item is added to this dictionary when each job is started.
-        A job's item is removed from the dictionary after the job terminates.
-        The removal is performed by the `_delete_terminated_jobs` method,
-        which runs off a repeating timer.
+        List of `Bunch` objects describing job workers.
+
+        The `job_id` attribute of a worker is the ID of the job that the
+        worker is running, or `None` if the worker is idle.
         """
 
+        self._next_worker_num = 1
+
+        self._event_queue = Queue()
+        """Queue through which workers report events to this manager."""
+
         self._lock = Lock()
         """
-        Lock used to synchronize access to the `_job_infos` dictionary
-        from multiple threads. (The lock can synchronize access from
-        multiple threads and/or processes, but we access the dictionary
-        only from threads of the main Vesper process.)
+        Lock used to synchronize access to the state of this manager
+        from multiple threads of the main Vesper process.
+        """
+
+        self._dispatcher_thread = None
         """
+        Thread that handles worker events and replaces terminated
+        workers, started when the first worker is started.
+        """
+
+        self._stats = Bunch(
+            worker_startup_times=[],
+            started_job_count=0,
+            finished_job_count=0,
+            total_queue_wait_time=0,
+            max_queue_wait_time=0,
+            total_startup_time=0,
+            max_startup_time=0)
 
-        self._timer = RepeatingTimer(10, self._delete_terminated_jobs)
-        """Repeating timer that deletes terminated jobs from `_job_infos`."""
-        
-        self._timer.start()
+
+    @property
+    def max_concurrent_jobs(self):
+        return self._max_concurrent_jobs
 
 
     def start_job(self, command_spec, user):
-        
-        info = Bunch()
-        info.command_spec = command_spec
-        info.job_id = _create_job(command_spec, user)
-        info.archive_lock = archive_lock.get_lock()
-        info.stop_event = Event()
+
+        job = Bunch(
+            job_id=_create_job(command_spec, user),
+            command_spec=command_spec,
+            submission_time=time.time())
 
         with self._lock:
-            self._job_infos[info.job_id] = info
-            
-        info.process = Process(target=job_runner.run_job, args=(info,))
-        info.process.start()
-        
-        return info.job_id
-        
-        
+            self._pending_jobs.append(job)
+            self._start_pending_jobs()
+
+        return job.job_id
+
+
+    def _start_pending_jobs(self):
+
+        while len(self._pending_jobs) != 0:
+
+            worker = self._get_idle_worker()
+
+            if worker is None:
+                # no worker available
+
+                break
+
+            job = self._pending_jobs.popleft()
+
+            worker.job_id = job.job_id
+            worker.stop_event.clear()
+            worker.job_queue.put(job)
+
+
+    def _get_idle_worker(self):
+
+        for worker in self._workers:
+            if worker.job_id is None:
+                return worker
+
+        if len(self._workers) < self._max_concurrent_jobs:
+            return self._start_worker()
+
+        else:
+            return None
+
+
+    def _start_worker(self):
+
+        worker = Bunch(
+            worker_num=self._next_worker_num,
+            archive_lock=archive_lock.get_lock(),
+            stop_event=Event(),
+            job_queue=Queue(),
+            event_queue=self._event_queue)
+
+        self._next_worker_num += 1
+
+        # Note that we do not make job worker processes daemonic since
+        # daemonic processes cannot start child processes, as some jobs
+        # (for example, detection jobs) do.
+        process = Process(
+            target=job_runner.run_job_worker, args=(worker,),
+            name=f'Job Worker {worker.worker_num}')
+        process.start()
+
+        worker.process = process
+        worker.job_id = None
+
+        self._workers.append(worker)
+
+        if self._dispatcher_thread is None:
+            self._dispatcher_thread = Thread(
+                target=self._run_dispatcher, name='Job Dispatcher',
+                daemon=True)
+            self._dispatcher_thread.start()
+
+        return worker
+
+
     def stop_job(self, job_id):
+
         with self._lock:
-            try:
-                job_info = self._job_infos[job_id]
-            except KeyError:
+
+            for job in self._pending_jobs:
+                if job.job_id == job_id:
+                    self._pending_jobs.remove(job)
+                    break
+
+            else:
+                # job not pending
+
+                for worker in self._workers:
+                    if worker.job_id == job_id:
+                        worker.stop_event.set()
+
                 return
+
+        # If we get here, the job was pending.
+        _end_job(job_id, 'Interrupted')
+
+
+    def shut_down(self):
+
+        """
+        Shuts down this manager's job workers.
+
+        This method discards pending jobs, marking them interrupted,
+        tells each job worker to terminate after it finishes its current
+        job, if any, and waits for the workers to terminate.
+        """
+
+        with self._lock:
+            jobs = list(self._pending_jobs)
+            self._pending_jobs.clear()
+            workers = self._workers
+            self._workers = []
+
+        for job in jobs:
+            _end_job(job.job_id, 'Interrupted')
+
+        for worker in workers:
+            worker.job_queue.put(None)
+
+        for worker in workers:
+            worker.process.join()
+
+
+    def _run_dispatcher(self):
+
+        while True:
+
+            try:
+                event = self._event_queue.get(timeout=_WORKER_CHECK_PERIOD)
+            except Empty:
+                event = None
+
+            self._dispatch(event)
+
+
+    def _dispatch(self, event):
+
+        """
+        Handles a worker event, if any, replaces terminated workers,
+        and starts pending jobs as workers become available.
+        """
+
+        with self._lock:
+
+            if event is not None:
+                self._handle_worker_event(event)
+
+            failed_job_ids = self._delete_terminated_workers()
+
+            self._start_pending_jobs()
+
+        for job_id in failed_job_ids:
+            _end_job(job_id, 'Failed')
+
+
+    def _handle_worker_event(self, event):
+
+        name, worker_num, data = event
+
+        stats = self._stats
+
+        if name == 'ready':
+            stats.worker_startup_times.append(data.startup_time)
+
+        elif name == 'started':
+
+            stats.started_job_count += 1
+
+            stats.total_queue_wait_time += data.queue_wait_time
+            stats.max_queue_wait_time = \
+                max(stats.max_queue_wait_time, data.queue_wait_time)
+
+            stats.total_startup_time += data.startup_time
+            stats.max_startup_time = \
+                max(stats.max_startup_time, data.startup_time)
+
+        elif name == 'finished':
+
+            stats.finished_job_count += 1
+
+            for worker in self._workers:
+                if worker.worker_num == worker_num:
+                    worker.job_id = None
+
+
+    def _delete_terminated_workers(self):
+
+        failed_job_ids = []
+        workers = []
+
+        for worker in self._workers:
+
+            if worker.process.is_alive():
+                workers.append(worker)
+
             else:
-                job_info.stop_event.set()
-            
-        
-    def _delete_terminated_jobs(self):
-        
-        terminated_job_ids = set()
-        
+
+                _logger.warning(
+                    f'Job worker {worker.worker_num} terminated '
+                    f'unexpectedly with exit code '
+                    f'{worker.process.exitcode}.')
+
+                if worker.job_id is not None:
+                    failed_job_ids.append(worker.job_id)
+
+        self._workers = workers
+
+        return failed_job_ids
+
+
+    def get_stats(self):
+
+        """
+        Gets job statistics.
+
+        Returns:
+            a `Bunch` with the following attributes:
+
+                pending_job_count - the number of jobs waiting to start.
+
+                running_job_count - the number of jobs running.
+
+                worker_count - the number of job worker processes.
+
+                worker_startup_times - the times in seconds that job
+                    workers took to start, in order of worker startup.
+
+                started_job_count - the number of jobs started.
+
+                finished_job_count - the number of jobs finished.
+
+                mean_queue_wait_time, max_queue_wait_time - the mean
+                    and maximum times in seconds that started jobs
+                    waited in the pending job queue, including for a
+                    new worker to start, or `None` if no jobs have
+                    started.
+
+                mean_startup_time, max_startup_time - the mean and
+                    maximum times in seconds from when a worker
+                    received a job to when it began executing the
+                    job's command, or `None` if no jobs have started.
+        """
+
         with self._lock:
-            
-            for info in self._job_infos.values():
-                if not info.process.is_alive():
-                    terminated_job_ids.add(info.job_id)
-                    
-            for job_id in terminated_job_ids:
-                del self._job_infos[job_id]
+
+            stats = self._stats
+            count = stats.started_job_count
+
+            if count == 0:
+                mean_queue_wait_time = None
+                max_queue_wait_time = None
+                mean_startup_time = None
+                max_startup_time = None
+
+            else:
+                mean_queue_wait_time = stats.total_queue_wait_time / count
+                max_queue_wait_time = stats.max_queue_wait_time
+                mean_startup_time = stats.total_startup_time / count
+                max_startup_time = stats.max_startup_time
+
+            return Bunch(
+                pending_job_count=len(self._pending_jobs),
+                running_job_count=sum(
+                    w.job_id is not None for w in self._workers),
+                worker_count=len(self._workers),
+                worker_startup_times=list(stats.worker_startup_times),
+                started_job_count=count,
+                finished_job_count=stats.finished_job_count,
+                mean_queue_wait_time=mean_queue_wait_time,
+                max_queue_wait_time=max_queue_wait_time,
+                mean_startup_time=mean_startup_time,
+                max_startup_time=max_startup_time)
 
 
 def _create_job(command_spec, user):
-    
+
     with archive_lock.atomic():
         job = Job.objects.create(
             command=json.dumps(command_spec, default=_json_date_serializer),
             creation_time=time_utils.get_utc_now(),
             creating_user=user,
             status='Unstarted')
-    
+
     return job.id
-    
-    
+
+
 def _json_date_serializer(obj):
-    
+
     """Date serializer for `json.dumps`."""
-    
+
     if isinstance(obj, datetime.date):
         return str(obj)
     else:
         raise TypeError('{} is not JSON serializable'.format(repr(obj)))
+
+
+def _end_job(job_id, status):
+
+    """
+    Sets the status of a job that has not yet ended.
+
+    This function is used for jobs that end without running to
+    completion in a job worker, i.e. for pending jobs that are stopped
+    and for jobs whose workers terminate unexpectedly.
+    """
+
+    with archive_lock.atomic():
+        Job.objects.filter(
+            id=job_id, status__in=('Unstarted', 'Running')
+        ).update(status=status, end_time=time_utils.get_utc_now())
@@ -1,26 +1,39 @@
 """
-Module containing function that runs a Vesper job.
+Module containing function that runs a Vesper job worker.
 
-The `run_job` function runs in a new process for each job that Vesper
-executes. The new process is called the *main job process* for the job.
-The `run_job` function is in its own module rather than in the `job_manager
-module in order to minimize the number of imports that the module containing
-the function, and hence the new process, must perform.
+The `run_job_worker` function runs in each job worker process that the
+Vesper job manager starts. A job worker runs one job at a time, and
+the worker process is called the *main job process* for each job that
+it runs. The `run_job_worker` function is in its own module rather
+than in the `job_manager` module in order to minimize the number of
+imports that the module containing the function, and hence the new
+process, must perform.
 """
 
 
 from datetime import date
+from queue import Empty
 import json
 import logging
+import multiprocessing
+import time
 import traceback
 
 from vesper.command.command import CommandSyntaxError
 from vesper.command.job_info import JobInfo
 from vesper.command.job_logging_manager import JobLoggingManager
+from vesper.util.bunch import Bunch
 import vesper.util.django_utils as django_utils
 import vesper.util.time_utils as time_utils
 
 
+_PARENT_CHECK_PERIOD = 1
+"""
+Period in seconds at which an idle job worker checks whether or not
+the process that started it is still alive.
+"""
+
+
 '''
 Job status values:
 
@@ -43,59 +56,160 @@ class _CommandArgsEncoder(json.JSONEncoder):
             return super().default(obj)
         
         
-def run_job(job_info):
+def run_job_worker(worker_info):
     
     """
-    Runs a job in a new process.
+    Runs a job worker process.
     
     This function is executed by the Vesper job manager each time it
-    starts a new job. The function is executed in a new process, called
-    the *main job process* of the job.
+    starts a new job worker. It sets up Django for the worker process
+    and then runs jobs that it receives from the manager, one at a
+    time, until it receives `None` instead of a job or the process
+    that started it terminates.
+    
+    Parameters:
+    
+        worker_info : `Bunch`
+            information pertaining to the new worker.
+            
+            The information includes the worker number, the archive
+            lock, the stop event for the worker's jobs, the queue
+            from which the worker receives jobs, and the queue to
+            which the worker reports events to the job manager.
+            
+            Each job is a `Bunch` that includes the ID of the Django
+            Job model instance for the job rather than the instance
+            itself so that it can be unpickled in the worker process
+            without first setting up Django.
+    """
+    
+    start_time = time.time()
+    
+    # Set up Django for the job worker process. We must do this before
+    # we try to use anything Django (e.g. the ORM) in the new process.
+    # We perform the setup inside of this function rather than at the
+    # top of this module so that it happens only in a new job worker
+    # process, and not in a parent process that is importing this
+    # module merely to be able to execute this function. In the latter
+    # case Django will already have been set up in the importing
+    # process if it is needed, and it would be redundant and
+    # potentially problematic to perform the setup again.
+    django_utils.set_up_django()
+    
+    # These imports are here rather than at the top of this module so
+    # they will be executed after Django is set up in the worker process.
+    from django.db import connections
+    import vesper.util.archive_lock as archive_lock
+    
+    # Set the archive lock for this process. The lock is provided to
+    # this process by its creator.
+    archive_lock.set_lock(worker_info.archive_lock)
+    
+    _report_event(
+        worker_info, 'ready', startup_time=time.time() - start_time)
+    
+    parent_process = multiprocessing.parent_process()
+    
+    while True:
+        
+        try:
+            job_info = worker_info.job_queue.get(
+                timeout=_PARENT_CHECK_PERIOD)
+            
+        except Empty:
+            
+            if parent_process.is_alive():
+                continue
+            else:
+                break
+        
+        if job_info is None:
+            break
+        
+        job_info.receipt_time = time.time()
+        job_info.stop_event = worker_info.stop_event
+        
+        try:
+            _refresh_extensions_and_presets()
+            _run_job(job_info, worker_info)
+            
+        except Exception:
+            logging.getLogger().error(
+                f'Job worker {worker_info.worker_num} could not run job '
+                f'{job_info.job_id}. See traceback below.\n' +
+                traceback.format_exc())
+            
+        finally:
+            
+            # Close this process's database connections, as Django
+            # does at the end of each request, so the next job starts
+            # with fresh connections.
+            connections.close_all()
+            
+            _report_event(worker_info, 'finished')
+        
+
+def _refresh_extensions_and_presets():
+    
+    """
+    Refreshes the extensions and presets of this process.
+    
+    A job worker runs many jobs, so detectors and presets may have
+    been created since it loaded its extensions and presets. Detector
+    extensions that are derived from the archive database are reloaded
+    if the database has changed, and presets are reloaded from their
+    files when next requested.
+    """
+    
+    # These imports are here rather than at the top of this module so
+    # they will be executed after Django is set up in the worker process.
+    from vesper.singleton.extension_manager import extension_manager
+    from vesper.singleton.preset_manager import preset_manager
+    
+    extension_manager.refresh_archive_extensions()
+    preset_manager.unload_presets()
     
-    The function sets up Django and configures the root logger for the
-    main job process, constructs the command to be executed, and invokes
-    the command's `execute` method. Logging is shut down after that method
-    returns.
+    
+def _report_event(worker_info, name, **kwargs):
+    event = (name, worker_info.worker_num, Bunch(**kwargs))
+    worker_info.event_queue.put(event)
+    
+    
+def _run_job(job_info, worker_info):
+    
+    """
+    Runs a job in a job worker process.
+    
+    The function configures the root logger of the worker process for
+    the job, constructs the command to be executed, and invokes the
+    command's `execute` method. Logging for the job is shut down after
+    that method returns.
     
     Parameters:
     
         job_info : `Bunch`
-            information pertaining to the new job.
+            information pertaining to the job.
             
             The information includes the command specification for the
-            new job, the ID of the Django Job model instance for the job,
-            and the stop event for the job.
-            
-            The information includes the ID of the Django job model
-            instance rather than the instance itself so that the job
-            info can be unpickled in the new process without first
-            setting up Django.
+            job, the ID of the Django Job model instance for the job,
+            the time at which the job was submitted to the job manager,
+            the time at which the worker received it, and the stop
+            event for the job.
             
             This object is *not* of type `vesper.command.job_info.JobInfo`,
             which contains somewhat different (though overlapping)
             information. This function invokes the `execute` method of the
-            command of the new job with an argument of type
+            command of the job with an argument of type
             `vesper.command.job_info.JobInfo`.
+            
+        worker_info : `Bunch`
+            information pertaining to the job worker.
     """
     
-    # Set up Django for the main job process. We must do this before we try
-    # to use anything Django (e.g. the ORM) in the new process. We perform
-    # the setup inside of this function rather than at the top of this module
-    # so that it happens only in a new job process, and not in a parent
-    # process that is importing this module merely to be able to execute
-    # this function. In the latter case Django will already have been set up
-    # in the importing process if it is needed, and it would be redundant
-    # and potentially problematic to perform the setup again.
-    django_utils.set_up_django()
-    
     # These imports are here rather than at the top of this module so
-    # they will be executed after Django is set up in the main job process.
+    # they will be executed after Django is set up in the worker process.
     from vesper.django.app.models import Job
     import vesper.util.archive_lock as archive_lock
-    
-    # Set the archive lock for this process. The lock is provided to
-    # this process by its creator.
-    archive_lock.set_lock(job_info.archive_lock)
 
     # Get the Django model instance for this job.
     job = Job.objects.get(id=job_info.job_id)
@@ -109,7 +223,7 @@ def run_job(job_info):
     # Configure root logger for the main job process.
     logger = logging.getLogger()
     logging_config = logging_manager.logging_config
-    JobLoggingManager.configure_logger(logger, logging_config)
+    handler = JobLoggingManager.configure_logger(logger, logging_config)
     
     try:
         
@@ -138,6 +252,17 @@ def run_job(job_info):
             lines = args.splitlines()
             for line in lines:
                 logger.info('    {}'.format(line))
+                
+        # Publish job queue wait and startup times.
+        queue_wait_time = job_info.receipt_time - job_info.submission_time
+        startup_time = time.time() - job_info.receipt_time
+        logger.info(
+            f'Job waited {queue_wait_time:.3f} seconds to start and '
+            f'took {startup_time:.3f} seconds to start up in job '
+            f'worker {worker_info.worker_num}.')
+        _report_event(
+            worker_info, 'started', queue_wait_time=queue_wait_time,
+            startup_time=startup_time)
     
         # Execute command.
         info = JobInfo(job_info.job_id, logging_config, job_info.stop_event)
@@ -186,6 +311,10 @@ def run_job(job_info):
         # reported in log displays. See record counts handler
         # TODO in `job_logging_manager` module for more detail.
         
+        # Stop sending log records to this job's log, since the worker
+        # process may run other jobs.
+        logger.removeHandler(handler)
+        
         logging_manager.shut_down_logging()
 
 
@@ -0,0 +1,117 @@
+"""Module containing class `MigrateClipAudioFilesCommand`."""
+
+
+import logging
+import os
+import time
+
+from vesper.command.command import Command
+from vesper.django.app.models import Clip
+from vesper.singleton.clip_manager import clip_manager
+import vesper.command.command_utils as command_utils
+import vesper.util.audio_file_utils as audio_file_utils
+import vesper.util.os_utils as os_utils
+import vesper.util.text_utils as text_utils
+
+
+_logger = logging.getLogger()
+
+
+class MigrateClipAudioFilesCommand(Command):
+    
+    """
+    Migrates the clip audio files of an archive to its clip audio
+    pack store.
+    
+    The command processes the clips of an archive a station-night at a
+    time. For each station-night, it copies the samples of each clip
+    audio file to the station-night's pack, flushes the pack, and then
+    deletes the files. The command can be interrupted and run again
+    safely, since it only copies files that still exist.
+    
+    The clip manager reads migrated clip audio only when the
+    `VESPER_CLIP_AUDIO_STORAGE` environment variable is "Packs", so
+    set it before running this command.
+    """
+    
+    
+    extension_name = 'migrate_clip_audio_files'
+    
+    
+    def execute(self, job_info):
+        
+        if clip_manager.clip_audio_storage_type != 'Packs':
+            _logger.warning(
+                'Clip audio storage type is not "Packs", so Vesper will '
+                'not read the clip audio that this command migrates. Set '
+                'the VESPER_CLIP_AUDIO_STORAGE environment variable to '
+                '"Packs" to have it do so.')
+        
+        start_time = time.time()
+        
+        store = clip_manager.clip_audio_pack_store
+        
+        keys = Clip.objects.values_list('station_id', 'date') \
+            .distinct().order_by('station_id', 'date')
+        
+        total_num_clips = 0
+        total_num_migrated_files = 0
+        
+        for station_id, date in keys:
+            
+            clips = Clip.objects.filter(station_id=station_id, date=date) \
+                .only('id', 'sample_rate')
+            
+            migrated_file_paths = []
+            
+            for clip in clips:
+                
+                path = clip_manager.get_audio_file_path(clip)
+                
+                if os.path.exists(path):
+                    
+                    try:
+                        samples, sample_rate = \
+                            audio_file_utils.read_wave_file(path)
+                        store.write_samples(
+                            station_id, date, clip.id, samples[0],
+                            sample_rate)
+                    
+                    except Exception as e:
+                        command_utils.log_and_reraise_fatal_exception(
+                            e, f'Migration of audio file "{path}"')
+                    
+                    migrated_file_paths.append(path)
+                    
+            num_clips = len(clips)
+            num_migrated_files = len(migrated_file_paths)
+            
+            if num_migrated_files != 0:
+                
+                # Make sure pack holds samples before deleting files.
+                store.flush(station_id, date)
+                
+                for path in migrated_file_paths:
+                    os_utils.delete_file(path)
+                    
+                # Log migrations for this station-night.
+                count_text = text_utils.create_count_text(num_clips, 'clip')
+                _logger.info(
+                    f'Migrated audio files for {num_migrated_files} of '
+                    f'{count_text} for station {station_id} and date '
+                    f'{date}.')
+                
+            total_num_clips += num_clips
+            total_num_migrated_files += num_migrated_files
+            
+        # Log total migrations and migration rate.
+        count_text = text_utils.create_count_text(
+            total_num_migrated_files, 'clip audio file')
+        elapsed_time = time.time() - start_time
+        timing_text = command_utils.get_timing_text(
+            elapsed_time, total_num_clips, 'clips')
+        _logger.info(
+            f'Migrated {count_text} for a total of {total_num_clips} '
+            f'clips{timing_text}.')
+        
+        return True
@@ -0,0 +1,45 @@
+"""Module containing class `RebuildClipCountsCommand`."""
+
+
+import logging
+import time
+
+from vesper.command.command import Command
+import vesper.command.command_utils as command_utils
+import vesper.django.app.model_utils as model_utils
+import vesper.util.text_utils as text_utils
+
+
+class RebuildClipCountsCommand(Command):
+    
+    """
+    Rebuilds the clip count table of an archive from its clips.
+    
+    The clip count table is maintained incrementally as clips are
+    created, annotated, tagged, and deleted, so this command is needed
+    only if the table has somehow become inconsistent with the clips of
+    the archive, for example because clips were modified by software
+    other than Vesper.
+    """
+    
+    
+    extension_name = 'rebuild_clip_counts'
+    
+    
+    def execute(self, job_info):
+        
+        logger = logging.getLogger()
+        
+        logger.info('Rebuilding clip counts...')
+        
+        start_time = time.time()
+        
+        count = model_utils.rebuild_clip_counts()
+        
+        elapsed_time = time.time() - start_time
+        count_text = text_utils.create_count_text(count, 'clip count')
+        timing_text = command_utils.get_timing_text(
+            elapsed_time, count, 'clip counts')
+        logger.info(f'Created {count_text}{timing_text}.')
+        
+        return True
@@ -205,15 +205,16 @@ class TagClipsCommand(ClipSetCommand):
                     chunk = clip_ids[i:i + max_chunk_size]
                     
                     # Create tags.
-                    Tag.objects.bulk_create([
-                        Tag(
-                            clip_id=clip_id,
-                            info=tag_info,
-                            creation_time=creation_time,
-                            creating_user=None,
-                            creating_job=creating_job,
-                            creating_processor=None)
-                        for clip_id in chunk])
+                    with model_utils.updating_clip_counts(chunk):
+                        Tag.objects.bulk_create([
+                            Tag(
+                                clip_id=clip_id,
+                                info=tag_info,
+                                creation_time=creation_time,
+                                creating_user=None,
+                                creating_job=creating_job,
+                                creating_processor=None)
+                            for clip_id in chunk])
                     
                     # Create tag edits.
                     TagEdit.objects.bulk_create([
@@ -1,27 +1,45 @@
 """Module containing class `TestCommand`."""
 
 
+import logging
 import time
 
 from vesper.command.command import Command
 
 
+_logger = logging.getLogger()
+
+
 class TestCommand(Command):
     
+    """
+    Command that logs a sequence of numbers, pausing before each.
+    
+    The command has two optional arguments, `iteration_count` (default
+    50) and `iteration_period` (default .5 seconds). It is useful for
+    testing job execution, including job stop requests.
+    """
+    
     
     extension_name = 'test'
     
     
-    def execute(self, context):
+    def __init__(self, args):
+        super().__init__(args)
+        self._iteration_count = args.get('iteration_count', 50)
+        self._iteration_period = args.get('iteration_period', .5)
+        
+        
+    def execute(self, job_info):
         
-        for i in range(50):
+        for i in range(self._iteration_count):
             
-            time.sleep(.5)
+            time.sleep(self._iteration_period)
             
-            if context.stop_requested:
+            if job_info.stop_requested:
                 return False
             
             else:
-                context.job.logger.info(str(i))
+                _logger.info(str(i))
                 
         return True
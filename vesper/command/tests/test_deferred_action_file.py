@@ -0,0 +1,133 @@
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import datetime
+import pickle
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+import vesper.command.deferred_action_file as deferred_action_file
+
+
+_UTC = ZoneInfo('UTC')
+
+
+def _create_clips():
+
+    creation_time = datetime.datetime(2050, 5, 1, 12, 34, 56, 789, _UTC)
+
+    return [
+        [1, 1000, 100, creation_time, 10, 20, None],
+        [1, 2000, 200, creation_time, 10, 20, {'Score': 1.5}],
+        [2, 3000, 300, creation_time + datetime.timedelta(seconds=1), 11,
+         21, {'Score': 2, 'Classification': 'Call.WTSP'}],
+    ]
+
+
+class DeferredActionFileTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_write_and_read_file(self):
+
+        clips = _create_clips()
+
+        file_path = self._dir_path / 'Job 1 Part 000.npz'
+        deferred_action_file.write_create_clips_file(file_path, clips)
+
+        self._assert_actions(deferred_action_file.read_file(file_path), clips)
+
+
+    def _assert_actions(self, actions, clips):
+
+        self.assertEqual(len(actions), 1)
+        action = actions[0]
+        self.assertEqual(action.name, 'create_clips')
+
+        columns = action.clips
+        names = (
+            'recording_channel_ids', 'start_indices', 'lengths',
+            'creating_job_ids', 'creating_processor_ids')
+        indices = (0, 1, 2, 4, 5)
+        for name, i in zip(names, indices):
+            self.assertEqual(
+                getattr(columns, name).tolist(), [c[i] for c in clips])
+
+        self.assertEqual(
+            deferred_action_file.get_creation_times(columns),
+            [c[3] for c in clips])
+
+        self.assertEqual(columns.annotations, {
+            'Score': [None, '1.5', '2'],
+            'Classification': [None, None, 'Call.WTSP']
+        })
+
+
+    def test_read_pickle_file(self):
+
+        clips = _create_clips()
+
+        actions = {
+            'actions': [
+                {
+                    'name': 'create_clips',
+                    'arguments': {
+                        'clips': clips
+                    }
+                }
+            ]
+        }
+
+        file_path = self._dir_path / 'Job 1 Part 000.pkl'
+        with open(file_path, 'wb') as file_:
+            pickle.dump(actions, file_)
+
+        self._assert_actions(deferred_action_file.read_file(file_path), clips)
+
+
+    def test_write_and_read_empty_file(self):
+
+        file_path = self._dir_path / 'Job 1 Part 000.npz'
+        deferred_action_file.write_create_clips_file(file_path, [])
+
+        actions = deferred_action_file.read_file(file_path)
+        self.assertEqual(len(actions), 1)
+        clips = actions[0].clips
+        self.assertEqual(len(clips.start_indices), 0)
+        self.assertEqual(deferred_action_file.get_creation_times(clips), [])
+        self.assertEqual(clips.annotations, {})
+
+
+    def test_read_file_errors(self):
+
+        file_path = self._dir_path / 'Job 1 Part 000.npz'
+
+        headers = (
+
+            # unsupported version
+            '{"format": "Vesper Deferred Actions", "version": 2}',
+
+            # not JSON
+            'bobo',
+
+            # not a deferred action file
+            '{"format": "Bobo", "version": 1}',
+
+        )
+
+        for header in headers:
+
+            with open(file_path, 'wb') as file_:
+                np.savez(file_, header=np.array(header))
+
+            self.assert_raises(
+                ValueError, deferred_action_file.read_file, file_path)
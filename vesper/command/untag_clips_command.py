@@ -221,7 +221,9 @@ class UntagClipsCommand(ClipSetCommand):
                     chunk = clip_ids[i:i + max_chunk_size]
                     
                     # Delete tags.
-                    Tag.objects.filter(info=tag_info, clip_id__in=chunk).delete()
+                    with model_utils.updating_clip_counts(chunk):
+                        Tag.objects.filter(
+                            info=tag_info, clip_id__in=chunk).delete()
                     
                     # Create tag edits.
                     TagEdit.objects.bulk_create([
@@ -36,6 +36,8 @@ def _set_archive_paths():
 
     p.archive_dir_path = archive_dir_path
     p.clip_dir_path = archive_dir_path / 'Clips'
+    p.clip_audio_pack_dir_path = archive_dir_path / 'Clip Audio Packs'
+    p.clip_feature_cache_dir_path = archive_dir_path / 'Clip Feature Cache'
     p.deferred_action_dir_path = archive_dir_path / 'Deferred Actions'
     p.job_log_dir_path = archive_dir_path / 'Logs' / 'Jobs'
     p.preference_file_path = archive_dir_path / 'Preferences.yaml'
@@ -4,28 +4,25 @@
 from collections import defaultdict
 import itertools
 
+from django.db.models.signals import post_delete, post_save
+
 from vesper.django.app.models import (
-    AnnotationConstraint, AnnotationInfo, Processor, TagInfo)
+    AnnotationConstraint, AnnotationInfo, Processor, TagInfo,
+    get_archive_metadata_version)
 from vesper.singleton.preference_manager import preference_manager
 from vesper.singleton.preset_manager import preset_manager
         
 import vesper.util.yaml_utils as yaml_utils
 
 
-# TODO: Reconsider archive data caches. When I first implemented them,
-# I didn't consider that there can be multiple Django server processes
-# (as there are, for example, with the Django test server), so that
-# refreshing a cache in one process (e.g. refreshing a processer cache
-# after creating a new processor) will not refresh the cache in all of
-# the processes. There are various options for addressing this issue,
-# including not using caches or having them refresh automatically
-# every so often, e.g. if when a request for cache content arrives the
-# cache was last refreshed more than some interval ago. In the interim,
-# I have modified the `_refresh_processor_cache_if_needed` and
-# `_refresh_string_annotation_values_cache_if_needed` methods to always
-# refresh their caches, i.e. so that each cache is refreshed on every
-# access. If we decide to retain the caches, note that for read-only
-# archives we could populate them only once.
+# Archive data caches are invalidated via the archive metadata version
+# stored in the archive database (see the `ArchiveMetadataVersion`
+# model). The version is incremented whenever a processor, annotation
+# constraint, or annotation info is created, modified, or deleted, in
+# any process. Each cache records the version from which it was built,
+# and is refreshed on access only if the current version differs. This
+# costs one small query per access rather than a full reload, and works
+# with multiple Django server and job processes.
 
 # TODO: Move code that modifies lists of items for presentation in
 # the UI to the client? This includes, for example, wildcard additions
@@ -125,6 +122,29 @@ class Archive:
         no value, any or no value, and any value, respectively.
         """
 
+        self._processor_cache_version = None
+        """Archive metadata version from which processor cache was built."""
+        
+        self._string_anno_values_cache_version = None
+        """
+        Archive metadata version from which string annotation values
+        cache was built.
+        """
+        
+        self._processor_cache_dirty = True
+        self._string_anno_values_cache_dirty = True
+        
+        # Mark caches dirty when archive metadata change in this process.
+        # This is needed in addition to the version check since a
+        # version that is rolled back along with a failed transaction
+        # can be reused by a later one.
+        for sender in (Processor, AnnotationConstraint, AnnotationInfo):
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    self._on_metadata_change, sender=sender, weak=False)
+    
+    
+    def _on_metadata_change(self, sender, **kwargs):
         self._processor_cache_dirty = True
         self._string_anno_values_cache_dirty = True
         
@@ -160,18 +180,18 @@ class Archive:
     
     
     def _refresh_processor_cache_if_needed(self):
-
-        # For the time being, we refresh the cache on every access to
-        # work around a multi-process caching issue. See todo item
-        # near the top of this module for more.
-        self.refresh_processor_cache()
-
-        # if self._processor_cache_dirty:
-        #     self.refresh_processor_cache()
+        if self._processor_cache_dirty or not _is_cache_version_current(
+                self._processor_cache_version):
+            self.refresh_processor_cache()
             
             
     def refresh_processor_cache(self):
-            
+        
+        # Get version before reading processors so that if processors
+        # change while we read them the cache will be refreshed again
+        # on next access.
+        version = get_archive_metadata_version()
+        
         ui_names_pref = self._ui_names.get('processors', {})
         
         by_type = defaultdict(list)
@@ -204,6 +224,7 @@ class Archive:
                 (k, self._get_visible_processors(v, hidden_names))
                 for k, v in self._processors_by_type.items())
 
+        self._processor_cache_version = version
         self._processor_cache_dirty = False
         
             
@@ -266,19 +287,18 @@ class Archive:
      
     
     def _refresh_string_annotation_values_cache_if_needed(self):
-
-        # For the time being, we refresh the cache on every access to
-        # work around a multi-process caching issue. See todo item
-        # near the top of this module for more.
-        self.refresh_string_annotation_values_cache()
-
-        # if self._string_anno_values_cache_dirty:
-        #     self.refresh_string_annotation_values_cache()
+        if self._string_anno_values_cache_dirty or \
+                not _is_cache_version_current(
+                    self._string_anno_values_cache_version):
+            self.refresh_string_annotation_values_cache()
              
              
     def refresh_string_annotation_values_cache(self):
         
-        infos = AnnotationInfo.objects.all()
+        # See note in `refresh_processor_cache`.
+        version = get_archive_metadata_version()
+        
+        infos = list(AnnotationInfo.objects.all())
         
         self._string_anno_archive_value_tuples = dict(
             (i.name, _get_string_annotation_archive_values(i.name))
@@ -299,14 +319,15 @@ class Archive:
         self._visible_string_anno_ui_values = dict(
             (i.name, self._get_visible_string_annotation_ui_values(
                 i.name, hidden_values_pref))
-            for i in AnnotationInfo.objects.all())
+            for i in infos)
         
         self._visible_string_anno_ui_value_specs = dict(
             (i.name,
              self._get_visible_string_annotation_ui_value_specs(
                  i.name, hidden_values_pref))
-            for i in AnnotationInfo.objects.all())
+            for i in infos)
 
+        self._string_anno_values_cache_version = version
         self._string_anno_values_cache_dirty = False
          
              
@@ -477,6 +498,16 @@ def _get_hidden_objects(preferences):
     return objects
 
 
+def _is_cache_version_current(cache_version):
+    
+    # Note that if the archive database does not contain a metadata
+    # version, e.g. because it has not been migrated, we consider
+    # caches to always be stale.
+    
+    return cache_version is not None and \
+        cache_version == get_archive_metadata_version()
+
+
 def _handle_unrecognized_processor_name(name):
     raise ValueError(
         'Archive cache does not recognize processor name "{}".'.format(name))
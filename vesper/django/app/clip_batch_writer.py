@@ -0,0 +1,425 @@
+"""
+Module containing class `ClipBatchWriter`.
+
+A `ClipBatchWriter` creates clips for one recording channel and processor
+in the archive database in batches. For each batch it computes clip start
+times, end times, and nights with vectorized NumPy arithmetic, and then
+inserts the batch's clips and their string annotations and annotation
+edits with Django's `bulk_create`, all in a single database transaction.
+
+If a batch violates the `('recording_channel', 'start_time',
+'creating_processor')` uniqueness constraint of the `Clip` model (for
+example because a detector was run more than once on the same recording),
+the writer falls back to creating the clips of the batch one at a time,
+so that only the clips that violate the constraint are not created.
+Alternatively, the writer can skip clips whose start times are those of
+existing clips before it inserts a batch, so that writing a batch more
+than once (for example when applying a deferred action file again after
+an interruption) creates each clip just once, without falling back.
+"""
+
+
+from zoneinfo import ZoneInfo
+import datetime
+
+from django.db import IntegrityError, connection, transaction
+import numpy as np
+
+from vesper.django.app.models import (
+    Clip, StringAnnotation, StringAnnotationEdit)
+import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+
+
+_UTC = ZoneInfo('UTC')
+_ONE_DAY = datetime.timedelta(days=1)
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=_UTC)
+
+
+class ClipBatchWriter:
+
+    """
+    Writes batches of clips to the archive database.
+
+    Each clip of a batch is specified by a `(start_index, length,
+    annotations)` tuple, where `start_index` is the index of the clip in
+    its recording and `annotations` is either `None` or a dictionary
+    that maps annotation names to values.
+    """
+
+
+    def __init__(
+            self, recording_channel, creating_processor, creating_job,
+            get_annotation_info):
+
+        """
+        Initializes this writer.
+
+        Parameters
+        ----------
+        recording_channel : RecordingChannel
+            the recording channel of the clips.
+
+        creating_processor : Processor
+            the processor that created the clips.
+
+        creating_job : Job
+            the job that created the clips.
+
+        get_annotation_info : callable
+            function that gets the `AnnotationInfo` for an annotation
+            name.
+        """
+
+        recording = recording_channel.recording
+
+        self._recording_channel = recording_channel
+        self._station = recording.station
+        self._mic_output = recording_channel.mic_output
+        self._sample_rate = recording.sample_rate
+        self._recording_start_time = recording.start_time
+        self._creating_processor = creating_processor
+        self._creating_job = creating_job
+        self._get_annotation_info = get_annotation_info
+        self._skipped_clip_count = 0
+
+
+    @property
+    def skipped_clip_count(self):
+
+        """
+        the number of clips that this writer has skipped because they
+        already existed.
+        """
+
+        return self._skipped_clip_count
+
+
+    def write(self, clips, creation_time, skip_existing=False):
+
+        """
+        Writes a batch of clips to the archive database.
+
+        Parameters
+        ----------
+        clips : list
+            list of `(start_index, length, annotations)` tuples.
+
+        creation_time : datetime or list of datetime
+            the creation time of all of the clips, or a list of
+            creation times, one per clip.
+
+        skip_existing : bool
+            `True` if and only if clips that have the same start times
+            as existing clips of this writer's recording channel and
+            processor should be skipped. Skipped clips are counted by
+            the `skipped_clip_count` property rather than returned as
+            failures.
+
+        Returns
+        -------
+        list
+            list of `(clip, exception)` pairs for clips that could not
+            be created because they violated a uniqueness constraint,
+            where `clip` is an unsaved `Clip` and `exception` is the
+            exception that was raised when the clip was created.
+        """
+
+        if len(clips) == 0:
+            return []
+
+        clip_objects = self._create_clip_objects(clips, creation_time)
+
+        if skip_existing:
+            clip_objects, clips = self._skip_existing(clip_objects, clips)
+            if len(clips) == 0:
+                return []
+
+        # Get annotation infos before starting the transaction so that
+        # any annotation infos that must be created are not discarded
+        # if the transaction is rolled back.
+        annotation_infos = self._get_annotation_infos(clips)
+
+        try:
+
+            with archive_lock.atomic(), transaction.atomic():
+                self._insert_clips(clip_objects, clips, annotation_infos)
+
+        except IntegrityError:
+            # at least one clip of batch violates uniqueness constraint
+
+            for clip in clip_objects:
+                clip.pk = None
+
+            return self._write_one_at_a_time(
+                clip_objects, clips, annotation_infos)
+
+        else:
+            return []
+
+
+    def _get_annotation_infos(self, clips):
+
+        names = set()
+        for _, _, annotations in clips:
+            if annotations is not None:
+                names.update(annotations.keys())
+
+        return dict(
+            (name, self._get_annotation_info(name)) for name in names)
+
+
+    def _create_clip_objects(self, clips, creation_time):
+
+        if isinstance(creation_time, datetime.datetime):
+            creation_times = [creation_time] * len(clips)
+        else:
+            creation_times = creation_time
+
+        start_indices = np.array([c[0] for c in clips], dtype='int64')
+        lengths = np.array([c[1] for c in clips], dtype='int64')
+
+        start_times, end_times = get_clip_times(
+            self._recording_start_time, self._sample_rate, start_indices,
+            lengths)
+
+        nights = get_nights(self._station, start_times)
+
+        return [
+            Clip(
+                station=self._station,
+                mic_output=self._mic_output,
+                recording_channel=self._recording_channel,
+                start_index=start_index,
+                length=length,
+                sample_rate=self._sample_rate,
+                start_time=start_time,
+                end_time=end_time,
+                date=night,
+                creation_time=creation_time,
+                creating_user=None,
+                creating_job=self._creating_job,
+                creating_processor=self._creating_processor)
+            for (start_index, length, start_time, end_time, night,
+                 creation_time) in zip(
+                    start_indices.tolist(), lengths.tolist(), start_times,
+                    end_times, nights, creation_times)]
+
+
+    def _skip_existing(self, clip_objects, clips):
+
+        start_times = [clip.start_time for clip in clip_objects]
+
+        existing_start_times = frozenset(Clip.objects.filter(
+            recording_channel=self._recording_channel,
+            creating_processor=self._creating_processor,
+            start_time__gte=min(start_times),
+            start_time__lte=max(start_times)
+        ).values_list('start_time', flat=True))
+
+        if len(existing_start_times) == 0:
+            return clip_objects, clips
+
+        pairs = [
+            pair for pair in zip(clip_objects, clips)
+            if pair[0].start_time not in existing_start_times]
+
+        self._skipped_clip_count += len(clips) - len(pairs)
+
+        return [p[0] for p in pairs], [p[1] for p in pairs]
+
+
+    def _insert_clips(self, clip_objects, clips, annotation_infos):
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            # database backend sets primary keys of bulk-created objects
+
+            Clip.objects.bulk_create(clip_objects)
+
+        else:
+            # database backend does not set primary keys of bulk-created
+            # objects
+
+            # We need the primary keys of the clips to annotate them.
+            for clip in clip_objects:
+                clip.save(force_insert=True)
+
+        self._insert_annotations(clip_objects, clips, annotation_infos)
+
+        model_utils.add_clip_counts([clip.id for clip in clip_objects])
+
+
+    def _insert_annotations(self, clip_objects, clips, annotation_infos):
+
+        # Since the clips were just created, they have no existing
+        # annotations, so unlike `model_utils.annotate_clips` we do
+        # not need to query for them.
+
+        kwargs = {
+            'creating_user': None,
+            'creating_job': self._creating_job,
+            'creating_processor': self._creating_processor
+        }
+
+        annotations = []
+        edits = []
+
+        for clip, (_, _, clip_annotations) in zip(clip_objects, clips):
+
+            if clip_annotations is not None:
+
+                for name, value in clip_annotations.items():
+
+                    info = annotation_infos[name]
+                    value = str(value)
+
+                    annotations.append(StringAnnotation(
+                        clip_id=clip.id, info=info, value=value,
+                        creation_time=clip.creation_time, **kwargs))
+
+                    edits.append(StringAnnotationEdit(
+                        clip_id=clip.id, info=info,
+                        action=StringAnnotationEdit.ACTION_SET,
+                        value=value, creation_time=clip.creation_time,
+                        **kwargs))
+
+        StringAnnotation.objects.bulk_create(annotations)
+        StringAnnotationEdit.objects.bulk_create(edits)
+
+
+    def _write_one_at_a_time(self, clip_objects, clips, annotation_infos):
+
+        failures = []
+
+        with archive_lock.atomic(), transaction.atomic():
+
+            for clip_object, clip in zip(clip_objects, clips):
+
+                try:
+                    with transaction.atomic():
+                        self._insert_clips(
+                            [clip_object], [clip], annotation_infos)
+
+                except IntegrityError as e:
+                    clip_object.pk = None
+                    failures.append((clip_object, e))
+
+        return failures
+
+
+def get_clip_times(recording_start_time, sample_rate, start_indices, lengths):
+
+    """
+    Gets the start and end times of clips of a recording.
+
+    The times are computed with vectorized arithmetic, but are the same
+    as those computed one at a time with `datetime.timedelta` and
+    `vesper.util.signal_utils.get_end_time`.
+
+    Parameters
+    ----------
+    recording_start_time : datetime
+        the start time of the recording.
+
+    sample_rate : number
+        the sample rate of the recording.
+
+    start_indices : NumPy array
+        the start indices of the clips in the recording.
+
+    lengths : NumPy array
+        the lengths of the clips.
+
+    Returns
+    -------
+    tuple of two lists
+        the start times and end times of the clips, as lists of UTC
+        `datetime` objects.
+    """
+
+    start_offsets = _to_microseconds(start_indices / sample_rate)
+    spans = _to_microseconds(np.maximum(lengths - 1, 0) / sample_rate)
+
+    start_times = _get_datetimes(recording_start_time, start_offsets)
+    end_times = _get_datetimes(recording_start_time, start_offsets, spans)
+
+    return start_times, end_times
+
+
+def _to_microseconds(seconds):
+
+    # This rounds in the same way as `datetime.timedelta`, i.e. by
+    # rounding the fractional part of each number of seconds to the
+    # nearest microsecond, with ties going to even.
+    fractions, wholes = np.modf(seconds)
+    return \
+        wholes.astype('int64') * 1000000 + \
+        np.round(fractions * 1e6).astype('int64')
+
+
+def _get_datetimes(start_time, *offsets):
+
+    start_time = np.datetime64(_to_naive_utc(start_time), 'us')
+
+    times = start_time
+    for offset in offsets:
+        times = times + offset.astype('timedelta64[us]')
+
+    return [t.replace(tzinfo=_UTC) for t in times.tolist()]
+
+
+def _to_naive_utc(dt):
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(_UTC).replace(tzinfo=None)
+    return dt
+
+
+def get_nights(station, times):
+
+    """
+    Gets the nights of the specified times at the specified station.
+
+    The night of each time is the same as that returned by the station's
+    `get_night` method for the time, but this function converts only
+    a few noon times to UTC rather than converting every time to local
+    time.
+
+    Parameters
+    ----------
+    station : Station
+        the station whose time zone determines the nights.
+
+    times : list of datetime
+        UTC times, in any order.
+
+    Returns
+    -------
+    list of date
+        the nights of the times.
+    """
+
+    if len(times) == 0:
+        return []
+
+    first_night = station.get_night(min(times))
+    last_night = station.get_night(max(times))
+    night_count = (last_night - first_night).days + 1
+
+    # Get UTC noon at the start of every night, plus the UTC noon that
+    # ends the last night, in microseconds since the epoch.
+    noons = [
+        _get_epoch_microseconds(
+            station.get_noon_utc(first_night + i * _ONE_DAY))
+        for i in range(night_count + 1)]
+
+    times = [_get_epoch_microseconds(t) for t in times]
+
+    night_nums = np.searchsorted(noons, times, side='right') - 1
+
+    return [first_night + i * _ONE_DAY for i in night_nums.tolist()]
+
+
+def _get_epoch_microseconds(dt):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_UTC)
+    return (dt - _EPOCH) // datetime.timedelta(microseconds=1)
@@ -8,6 +8,7 @@ import vesper.django.app.form_utils as form_utils
 _FORM_TITLE = 'Detect'
 _SCHEDULE_FIELD_LABEL = 'Detection schedule preset'
 _DEFER_CLIP_CREATION_LABEL = 'Defer clip creation'
+_WORKER_COUNT_LABEL = 'Worker count'
     
     
 def _get_field_default(name, default):
@@ -33,6 +34,11 @@ class DetectForm(forms.Form):
         initial=_get_field_default(_DEFER_CLIP_CREATION_LABEL, False),
         required=False)
     
+    worker_count = forms.IntegerField(
+        label=_WORKER_COUNT_LABEL,
+        initial=_get_field_default(_WORKER_COUNT_LABEL, 1),
+        min_value=1)
+    
     
     def __init__(self, *args, **kwargs):
         
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:09
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+# This migration populates the new clip count table from the clips of
+# the archive, so that the counts are valid as soon as the migration
+# completes. The code that does so intentionally duplicates that of
+# `vesper.django.app.model_utils.rebuild_clip_counts`, since migrations
+# must use the historical versions of models.
+
+
+_CLIP_FIELD_NAMES = (
+    'station_id', 'mic_output_id', 'creating_processor_id', 'date')
+
+_CLIP_COUNT_KEY_FIELD_NAMES = (
+    'station_id', 'mic_output_id', 'detector_id', 'date',
+    'annotation_info_id', 'annotation_value', 'tag_info_id')
+
+_BULK_CREATE_BATCH_SIZE = 500
+
+
+def _populate_clip_counts(apps, schema_editor):
+
+    Clip = apps.get_model('vesper', 'Clip')
+    ClipCount = apps.get_model('vesper', 'ClipCount')
+    StringAnnotation = apps.get_model('vesper', 'StringAnnotation')
+    Tag = apps.get_model('vesper', 'Tag')
+
+    counts = []
+
+    related_field_names = tuple('clip__' + n for n in _CLIP_FIELD_NAMES)
+
+    # all clips
+    for *clip_values, count in _count(Clip.objects.all(), _CLIP_FIELD_NAMES):
+        counts.append(((*clip_values, None, None, None), count))
+
+    # annotated clips
+    field_names = related_field_names + ('info_id', 'value')
+    for *values, count in _count(StringAnnotation.objects.all(), field_names):
+        counts.append(((*values, None), count))
+
+    # tagged clips
+    field_names = related_field_names + ('info_id',)
+    for *clip_values, tag_info_id, count in \
+            _count(Tag.objects.all(), field_names):
+        counts.append(((*clip_values, None, None, tag_info_id), count))
+
+    # annotated and tagged clips
+    annotations = StringAnnotation.objects.filter(clip__tag__isnull=False)
+    field_names = \
+        related_field_names + ('info_id', 'value', 'clip__tag__info_id')
+    for *values, count in _count(annotations, field_names):
+        counts.append((tuple(values), count))
+
+    clip_counts = [
+        ClipCount(count=count, **dict(zip(_CLIP_COUNT_KEY_FIELD_NAMES, key)))
+        for key, count in counts]
+
+    ClipCount.objects.bulk_create(
+        clip_counts, batch_size=_BULK_CREATE_BATCH_SIZE)
+
+
+def _count(objects, field_names):
+    return objects.order_by().values(*field_names).annotate(
+        count=Count('id')).values_list(*field_names, 'count')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClipCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('annotation_value', models.CharField(blank=True, max_length=255, null=True)),
+                ('count', models.BigIntegerField()),
+                ('annotation_info', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='clip_counts', related_query_name='clip_count', to='vesper.annotationinfo')),
+                ('detector', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='clip_counts', related_query_name='clip_count', to='vesper.processor')),
+                ('mic_output', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clip_counts', related_query_name='clip_count', to='vesper.deviceoutput')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clip_counts', related_query_name='clip_count', to='vesper.station')),
+                ('tag_info', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='clip_counts', related_query_name='clip_count', to='vesper.taginfo')),
+            ],
+            options={
+                'db_table': 'vesper_clip_count',
+                'indexes': [models.Index(fields=['station', 'mic_output', 'detector', 'date'], name='vesper_clip_station_940f17_idx')],
+            },
+        ),
+        migrations.RunPython(
+            _populate_clip_counts, migrations.RunPython.noop),
+    ]
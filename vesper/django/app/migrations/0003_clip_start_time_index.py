@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0002_clip_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clip',
+            index=models.Index(fields=['station', 'mic_output', 'creating_processor', 'start_time', 'id'], name='vesper_clip_station_2c8944_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 08:02
+
+from django.db import migrations, models
+
+
+def _create_archive_metadata_version(apps, schema_editor):
+    ArchiveMetadataVersion = apps.get_model('vesper', 'ArchiveMetadataVersion')
+    ArchiveMetadataVersion.objects.create(id=1, version=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0003_clip_start_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMetadataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'vesper_archive_metadata_version',
+            },
+        ),
+        migrations.RunPython(
+            _create_archive_metadata_version, migrations.RunPython.noop),
+    ]
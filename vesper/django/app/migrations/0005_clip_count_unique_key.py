@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.functions.comparison
+
+
+# Before this migration, concurrent writers that did not hold the
+# archive lock could create duplicate clip counts. This migration
+# merges any such duplicates before adding the constraint that
+# prevents them.
+
+
+_CLIP_COUNT_KEY_FIELD_NAMES = (
+    'station_id', 'mic_output_id', 'detector_id', 'date',
+    'annotation_info_id', 'annotation_value', 'tag_info_id')
+
+
+def _merge_duplicate_clip_counts(apps, schema_editor):
+
+    ClipCount = apps.get_model('vesper', 'ClipCount')
+
+    duplicates = ClipCount.objects.order_by().values(
+        *_CLIP_COUNT_KEY_FIELD_NAMES).annotate(
+            total=Sum('count'), row_count=Count('id')).filter(row_count__gt=1)
+
+    for duplicate in list(duplicates):
+
+        total = duplicate.pop('total')
+        del duplicate['row_count']
+
+        ClipCount.objects.filter(**duplicate).delete()
+
+        if total != 0:
+            ClipCount.objects.create(count=total, **duplicate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vesper', '0004_archive_metadata_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _merge_duplicate_clip_counts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='clipcount',
+            constraint=models.UniqueConstraint(models.F('station'), models.F('mic_output'), django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.Cast('detector', models.IntegerField()), models.Value(0)), models.F('date'), django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.Cast('annotation_info', models.IntegerField()), models.Value(0)), django.db.models.functions.comparison.Coalesce('annotation_value', models.Value('')), django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.Cast('tag_info', models.IntegerField()), models.Value(0)), name='vesper_clip_count_unique_key'),
+        ),
+    ]
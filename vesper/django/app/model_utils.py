@@ -2,17 +2,18 @@
 
 
 from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
 import datetime
 import itertools
 
 from django.db import transaction
-from django.db.models import Count, F
+from django.db.models import Count, F, Q, Sum
 
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, DeviceConnection, Recording, RecordingChannel,
-    StationDevice, StringAnnotation, StringAnnotationEdit, Tag, TagEdit,
-    TagInfo)
+    AnnotationInfo, Clip, ClipCount, DeviceConnection, Recording,
+    RecordingChannel, StationDevice, StringAnnotation, StringAnnotationEdit,
+    Tag, TagEdit, TagInfo)
 from vesper.singleton.archive import archive
 from vesper.singleton.recording_manager import recording_manager
 from vesper.util.bunch import Bunch
@@ -391,30 +392,90 @@ def get_clip_counts(
         station, mic_output, detector, annotation_name=None,
         annotation_value=None, tag_name=None):
     
+    """
+    Gets per-date clip counts from the clip count table.
+    
+    The arguments have the same meanings as those of the `get_clips`
+    function, and the counts are the numbers of clips that that
+    function would return for them, but they are obtained from the
+    clip count table rather than by counting clips.
+    """
+    
     dates = get_recording_dates(station, mic_output)
     
     counts = dict((date, 0) for date in dates)
     
-    clips = get_clips(
-        station=station,
-        mic_output=mic_output,
-        detector=detector,
-        annotation_name=annotation_name,
-        annotation_value=annotation_value,
-        tag_name=tag_name,
-        order=False)
+    clip_counts = _get_base_clip_counts(station, mic_output, detector)
     
-    count_dicts = clips.values('date').annotate(count=Count('date'))
+    if tag_name is None:
+        tag_info = None
+    else:
+        tag_info = TagInfo.objects.get(name=tag_name)
+        
+    clip_counts = clip_counts.filter(tag_info=tag_info)
     
-    for d in count_dicts:
-        counts[d['date']] = d['count']
+    if annotation_name is None:
+        # want all clips regardless of annotation
+        
+        _add_clip_counts(counts, clip_counts.filter(annotation_info=None))
+        
+    else:
+        # want to count clips according to annotation
+        
+        info = AnnotationInfo.objects.get(name=annotation_name)
+        
+        if annotation_value is None:
+            # want only unannotated clips
+            
+            # The numbers of unannotated clips are the numbers of all
+            # clips minus the numbers of annotated clips.
+            _add_clip_counts(
+                counts, clip_counts.filter(annotation_info=None))
+            _add_clip_counts(
+                counts, clip_counts.filter(annotation_info=info), -1)
+            
+        else:
+            # want only annotated clips
+            
+            clip_counts = clip_counts.filter(annotation_info=info)
+            
+            wildcard = archive.STRING_ANNOTATION_VALUE_WILDCARD
+            
+            if not annotation_value.endswith(wildcard):
+                # want clips with a particular annotation value
+                
+                clip_counts = clip_counts.filter(
+                    annotation_value=annotation_value)
+                
+            elif annotation_value != wildcard:
+                # want clips whose annotation values start with a prefix
+                
+                prefix = annotation_value[:-len(wildcard)]
+                
+                clip_counts = clip_counts.filter(
+                    annotation_value__startswith=prefix)
+                
+            _add_clip_counts(counts, clip_counts)
+            
+    return counts
     
-#     print('_get_clip_counts', count_dicts.query)
-#     
-#     for date, count in counts.items():
-#         print('_get_clip_counts {}: {}'.format(str(date), count))
     
-    return counts
+def _get_base_clip_counts(station, mic_output, detector):
+    kwargs = {}
+    _add_kwarg_if_needed(kwargs, 'station', station)
+    _add_kwarg_if_needed(kwargs, 'mic_output', mic_output)
+    _add_kwarg_if_needed(kwargs, 'detector', detector)
+    return ClipCount.objects.filter(**kwargs)
+
+
+def _add_clip_counts(counts, clip_counts, sign=1):
+    
+    date_counts = clip_counts.order_by().values('date').annotate(
+        count=Sum('count'))
+    
+    for d in date_counts:
+        date = d['date']
+        counts[date] = counts.get(date, 0) + sign * d['count']
     
     
 def get_clips(**kwargs):
@@ -442,6 +503,69 @@ def get_clips(**kwargs):
     return clips
 
 
+def get_clip_page(clips, field_names, after=None, size=1000):
+    
+    """
+    Gets one page of clip field values, in order of clip start time.
+    
+    Pages are delimited by *keyset pagination*: a page is requested
+    by the key of the last clip of the previous page rather than by an
+    offset, so that getting a page requires no more work of the
+    database than scanning the clips of that page, wherever the page
+    is located in the clip sequence.
+    
+    Parameters
+    ----------
+    clips : QuerySet
+        the clips to page through.
+        
+    field_names : sequence of str
+        the names of the clip fields whose values to get.
+        
+    after : (datetime, int) pair or None
+        the `(start_time, id)` key of the last clip of the previous
+        page, or `None` for the first page.
+        
+    size : int
+        the maximum number of clips of the page.
+        
+    Returns
+    -------
+    tuple
+        the list of field value tuples of the page and the key of the
+        last clip of the page, or `None` if there are no more clips.
+    """
+    
+    clips = clips.order_by('start_time', 'id')
+    
+    if after is not None:
+        start_time, clip_id = after
+        clips = clips.filter(
+            Q(start_time__gt=start_time) |
+            Q(start_time=start_time, id__gt=clip_id))
+        
+    # Get one more row than requested to find out whether or not there
+    # are more clips.
+    rows = list(clips.values_list(
+        *field_names, 'start_time', 'id')[:size + 1])
+    
+    if len(rows) > size:
+        # more clips follow page
+        
+        rows = rows[:size]
+        last_row = rows[-1]
+        next_after = last_row[-2:]
+        
+    else:
+        # page is last
+        
+        next_after = None
+        
+    rows = [row[:-2] for row in rows]
+    
+    return rows, next_after
+
+
 def _get_base_clips(station, mic_output, date, detector):
     
     kwargs = {}
@@ -613,20 +737,23 @@ def annotate_clips(
 
     # TODO: Consider operating on objects in limited-size batches.
 
-    # Create annotations for unannotated clips.
-    annotations = [
-        StringAnnotation(clip_id=i, info=annotation_info, **kwargs)
-        for i in unannotated_clip_ids]
-    StringAnnotation.objects.bulk_create(annotations)
-
-    # Update annotations of already-annotated clips.
-    StringAnnotation.objects.filter(
-        clip_id__in=annotated_clip_ids,
-        info=annotation_info
-    ).update(**kwargs)
+    edited_clip_ids = unannotated_clip_ids | annotated_clip_ids
+    
+    with updating_clip_counts(edited_clip_ids):
+        
+        # Create annotations for unannotated clips.
+        annotations = [
+            StringAnnotation(clip_id=i, info=annotation_info, **kwargs)
+            for i in unannotated_clip_ids]
+        StringAnnotation.objects.bulk_create(annotations)
+    
+        # Update annotations of already-annotated clips.
+        StringAnnotation.objects.filter(
+            clip_id__in=annotated_clip_ids,
+            info=annotation_info
+        ).update(**kwargs)
 
     # Create edits for new annotations.
-    edited_clip_ids = unannotated_clip_ids | annotated_clip_ids
     edits = [
         StringAnnotationEdit(
             clip_id=i,
@@ -662,7 +789,8 @@ def unannotate_clips(
     annotated_clip_ids = [a.clip_id for a in annotations]
 
     # Delete annotations.
-    annotations.delete()
+    with updating_clip_counts(annotated_clip_ids):
+        annotations.delete()
 
     if creation_time is None:
         creation_time = time_utils.get_utc_now()
@@ -745,10 +873,11 @@ def tag_clips(
     # TODO: Consider operating on objects in limited-size batches.
 
     # Tag untagged clips.
-    tags = [
-        Tag(clip_id=i, info=tag_info, **kwargs)
-        for i in untagged_clip_ids]
-    Tag.objects.bulk_create(tags)
+    with updating_clip_counts(untagged_clip_ids):
+        tags = [
+            Tag(clip_id=i, info=tag_info, **kwargs)
+            for i in untagged_clip_ids]
+        Tag.objects.bulk_create(tags)
 
     # Create edits for new tags.
     edits = [
@@ -785,7 +914,8 @@ def untag_clips(
     tagged_clip_ids = frozenset(t.clip_id for t in tags)
 
     # Delete tags.
-    tags.delete()
+    with updating_clip_counts(tagged_clip_ids):
+        tags.delete()
 
     if creation_time is None:
         creation_time = time_utils.get_utc_now()
@@ -821,6 +951,245 @@ def untag_clip(
         creating_processor)
     
     
+def create_clip(**kwargs):
+    
+    """
+    Creates a clip and adds it to the clip counts.
+    
+    The keyword arguments are those of `Clip.objects.create`.
+    
+    This function should be called within an archive lock and a
+    database transaction.
+    """
+    
+    clip = Clip.objects.create(**kwargs)
+    add_clip_counts([clip.id])
+    return clip
+
+
+def delete_clips(clips):
+    
+    """
+    Deletes clips and removes them from the clip counts.
+    
+    Parameters
+    ----------
+    clips : QuerySet
+        the clips to delete.
+        
+    This function should be called within an archive lock and a
+    database transaction.
+    """
+    
+    _update_clip_counts(_get_clip_count_contributions(clips), -1)
+    clips.delete()
+
+
+def add_clip_counts(clip_ids):
+    
+    """
+    Adds newly created clips to the clip counts.
+    
+    This function should be called within an archive lock and a
+    database transaction, after the clips and any annotations and
+    tags created with them have been saved.
+    """
+    
+    if len(clip_ids) != 0:
+        clips = Clip.objects.filter(id__in=clip_ids)
+        _update_clip_counts(_get_clip_count_contributions(clips))
+
+
+@contextmanager
+def updating_clip_counts(clip_ids):
+    
+    """
+    Updates the clip counts of clips whose annotations or tags change.
+    
+    The counts are updated upon exit from the body of a `with`
+    statement that should modify the annotations and/or tags of only
+    the specified clips. The `with` statement should itself be within
+    an archive lock and a database transaction.
+    """
+    
+    if len(clip_ids) == 0:
+        yield
+        
+    else:
+        
+        clips = Clip.objects.filter(id__in=clip_ids)
+        
+        old_contributions = _get_clip_count_contributions(clips)
+        
+        yield
+        
+        contributions = _get_clip_count_contributions(clips)
+        
+        for key, count in old_contributions.items():
+            contributions[key] -= count
+            
+        _update_clip_counts(contributions)
+
+
+@archive_lock.atomic
+@transaction.atomic
+def rebuild_clip_counts():
+    
+    """Rebuilds the clip count table from the clips of the archive."""
+    
+    ClipCount.objects.all().delete()
+    
+    contributions = _get_clip_count_contributions(Clip.objects.all())
+    
+    clip_counts = [
+        _create_clip_count(key, count)
+        for key, count in contributions.items()]
+    
+    ClipCount.objects.bulk_create(
+        clip_counts, batch_size=_CLIP_COUNT_BATCH_SIZE)
+    
+    return len(clip_counts)
+
+
+_CLIP_COUNT_BATCH_SIZE = 500
+"""Maximum number of clip counts created or updated per query."""
+
+_CLIP_COUNT_KEY_FIELD_NAMES = (
+    'station_id', 'mic_output_id', 'detector_id', 'date',
+    'annotation_info_id', 'annotation_value', 'tag_info_id')
+"""Names of the fields of a clip count that identify it."""
+
+_CLIP_FIELD_NAMES = (
+    'station_id', 'mic_output_id', 'creating_processor_id', 'date')
+"""Names of the clip fields that correspond to clip count fields."""
+
+
+def _get_clip_count_contributions(clips):
+    
+    """
+    Gets the contributions of the specified clips to the clip counts.
+    
+    The contributions are computed in the database with four
+    aggregate queries, one for each of the kinds of count described in
+    the comment preceding the `ClipCount` model class.
+    
+    Returns
+    -------
+    defaultdict
+        mapping from clip count keys to the numbers of the specified
+        clips that contribute to the counts. A clip count key is a
+        tuple of values of the fields named in
+        `_CLIP_COUNT_KEY_FIELD_NAMES`.
+    """
+    
+    contributions = defaultdict(int)
+    
+    clip_ids = clips.values('id')
+    
+    related_field_names = tuple('clip__' + n for n in _CLIP_FIELD_NAMES)
+    
+    # all clips
+    for *clip_values, count in _count(clips, _CLIP_FIELD_NAMES):
+        contributions[(*clip_values, None, None, None)] += count
+        
+    # annotated clips
+    annotations = StringAnnotation.objects.filter(clip_id__in=clip_ids)
+    field_names = related_field_names + ('info_id', 'value')
+    for *values, count in _count(annotations, field_names):
+        contributions[(*values, None)] += count
+    
+    # tagged clips
+    tags = Tag.objects.filter(clip_id__in=clip_ids)
+    field_names = related_field_names + ('info_id',)
+    for *clip_values, tag_info_id, count in _count(tags, field_names):
+        contributions[(*clip_values, None, None, tag_info_id)] += count
+        
+    # annotated and tagged clips
+    annotations = StringAnnotation.objects.filter(
+        clip_id__in=clip_ids, clip__tag__isnull=False)
+    field_names = \
+        related_field_names + ('info_id', 'value', 'clip__tag__info_id')
+    for *values, count in _count(annotations, field_names):
+        contributions[tuple(values)] += count
+        
+    return contributions
+
+
+def _count(objects, field_names):
+    return objects.order_by().values(*field_names).annotate(
+        count=Count('id')).values_list(*field_names, 'count')
+
+
+def _update_clip_counts(contributions, sign=1):
+    
+    """
+    Adds clip count contributions to the clip count table.
+    
+    Counts that become zero are deleted from the table.
+    
+    Contributions are added to counts in the database rather than in
+    Python, and new counts are created with inserts that ignore
+    conflicts with counts created concurrently by other writers, so
+    concurrent writers do not lose each other's updates even when
+    they do not hold the archive lock. Counts are updated in key order
+    so that concurrent writers do not deadlock.
+    """
+    
+    contributions = dict(
+        (key, sign * count) for key, count in contributions.items()
+        if count != 0)
+    
+    if len(contributions) == 0:
+        return
+    
+    with transaction.atomic():
+        
+        for key in sorted(contributions, key=_get_clip_count_sort_key):
+            _add_to_clip_count(key, contributions[key])
+            
+        # Get dates of contributions for each (station, mic output,
+        # detector) triple.
+        dates = defaultdict(set)
+        for key in contributions:
+            dates[key[:3]].add(key[3])
+            
+        # Delete counts that became zero.
+        for (station_id, mic_output_id, detector_id), triple_dates in \
+                dates.items():
+            
+            ClipCount.objects.filter(
+                station_id=station_id, mic_output_id=mic_output_id,
+                detector_id=detector_id, date__in=triple_dates,
+                count=0).delete()
+    
+    
+def _get_clip_count_sort_key(key):
+    
+    # Clip count keys can contain `None`, which does not compare with
+    # other values, so we precede each value with whether or not it
+    # is `None`.
+    return tuple((v is not None, v) for v in key)
+
+
+def _add_to_clip_count(key, count):
+    
+    kwargs = dict(zip(_CLIP_COUNT_KEY_FIELD_NAMES, key))
+    clip_counts = ClipCount.objects.filter(**kwargs)
+    
+    while clip_counts.update(count=F('count') + count) == 0:
+        
+        # There is no count for this key, so create a zero count and
+        # try again. If another writer creates a count for the key
+        # first, the insert is ignored and we add to that count.
+        ClipCount.objects.bulk_create(
+            [ClipCount(count=0, **kwargs)], ignore_conflicts=True)
+    
+    
+def _create_clip_count(key, count):
+    kwargs = dict(zip(_CLIP_COUNT_KEY_FIELD_NAMES, key))
+    return ClipCount(count=count, **kwargs)
+
+
 def get_clip_detector_name(clip):
     
     processor = clip.creating_processor
@@ -833,8 +1202,10 @@ def get_clip_detector_name(clip):
 
 
 def get_clip_type(clip):
-    
-    processor = clip.creating_processor
+    return get_processor_clip_type(clip.creating_processor)
+
+
+def get_processor_clip_type(processor):
     
     if processor is None:
         return None
@@ -8,9 +8,12 @@ import os.path
 
 from django.contrib.auth.models import User
 from django.db.models import (
-    BigIntegerField, CASCADE, CharField, DateField, DateTimeField,
-    FloatField, ForeignKey, IntegerField, ManyToManyField, Model,
-    SET_NULL, TextField)
+    BigIntegerField, CASCADE, CharField, DateField, DateTimeField, F,
+    FloatField, ForeignKey, Index, IntegerField, ManyToManyField, Model,
+    SET_NULL, TextField, UniqueConstraint, Value)
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from vesper.archive_paths import archive_paths
 import vesper.util.os_utils as os_utils
@@ -803,6 +806,13 @@ class Clip(Model):
         db_table = 'vesper_clip'
         index_together = (
             'station', 'mic_output', 'date', 'creating_processor')
+        # This index supports getting clips of a station, mic output,
+        # and detector in order of start time one page at a time, as
+        # the clip album does.
+        indexes = [
+            Index(fields=(
+                'station', 'mic_output', 'creating_processor', 'start_time',
+                'id'))]
         unique_together = (
             'recording_channel', 'start_time', 'creating_processor')
         
@@ -1058,6 +1068,158 @@ class TagEdit(Model):
         db_table = 'vesper_tag_edit'
 
 
+# A clip count is the number of clips of one station, microphone output,
+# detector, and date that have a particular annotation value and/or tag.
+# Clip counts are materialized in this table so that the clip calendar
+# can display them without counting the clips of the archive on every
+# page load, which can take many seconds for archives with millions of
+# clips.
+#
+# Each clip contributes one to each of the following counts for its
+# station, microphone output, detector, and date:
+#
+#     * the count with null annotation and tag fields, which counts
+#       all clips.
+#     * for each of its annotations, the count with the annotation's
+#       info and value and a null tag field.
+#     * for each of its tags, the count with null annotation fields
+#       and the tag's info.
+#     * for each of its (annotation, tag) pairs, the count with the
+#       annotation's info and value and the tag's info.
+#
+# Counts of unannotated clips are not stored, since they are the
+# differences of other counts. Counts that are zero are not stored.
+#
+# Clip counts are maintained incrementally by the functions of the
+# `model_utils` module that create, annotate, unannotate, tag, untag,
+# and delete clips. The counts can be rebuilt from scratch with the
+# `rebuild_clip_counts` command.
+#
+# The table has at most one count for each combination of station,
+# microphone output, detector, date, annotation info, annotation value,
+# and tag info. This is enforced by a unique constraint so that
+# concurrent writers cannot create duplicate counts, even when they do
+# not hold the archive lock. Since SQL unique constraints consider nulls
+# distinct, the constraint is on the key fields with nulls replaced by
+# values (zero for IDs and the empty string for annotation values) that
+# cannot otherwise occur in the same combination.
+def _coalesce_id(field_name):
+    return Coalesce(Cast(field_name, IntegerField()), Value(0))
+
+
+class ClipCount(Model):
+    
+    station = ForeignKey(
+        Station, CASCADE,
+        related_name='clip_counts',
+        related_query_name='clip_count')
+    mic_output = ForeignKey(
+        DeviceOutput, CASCADE,
+        related_name='clip_counts',
+        related_query_name='clip_count')
+    detector = ForeignKey(
+        Processor, CASCADE, null=True, blank=True,
+        related_name='clip_counts',
+        related_query_name='clip_count')
+    date = DateField()
+    annotation_info = ForeignKey(
+        AnnotationInfo, CASCADE, null=True, blank=True,
+        related_name='clip_counts',
+        related_query_name='clip_count')
+    annotation_value = CharField(max_length=255, null=True, blank=True)
+    tag_info = ForeignKey(
+        TagInfo, CASCADE, null=True, blank=True,
+        related_name='clip_counts',
+        related_query_name='clip_count')
+    count = BigIntegerField()
+    
+    def __str__(self):
+        detector_name = 'None' if self.detector is None else \
+            self.detector.name
+        return '{} / {} / {} / {} / {} / {} / {} / {}'.format(
+            self.station.name, self.mic_output.name, detector_name,
+            self.date, self.annotation_info, self.annotation_value,
+            self.tag_info, self.count)
+    
+    class Meta:
+        db_table = 'vesper_clip_count'
+        indexes = [
+            Index(fields=('station', 'mic_output', 'detector', 'date'))]
+        constraints = [
+            UniqueConstraint(
+                'station', 'mic_output', _coalesce_id('detector'), 'date',
+                _coalesce_id('annotation_info'),
+                Coalesce('annotation_value', Value('')),
+                _coalesce_id('tag_info'),
+                name='vesper_clip_count_unique_key')]
+
+
+# The archive metadata version is a single integer that is incremented
+# whenever a processor, annotation constraint, or annotation info is
+# created, modified, or deleted. The `vesper.django.app.archive.Archive`
+# class caches information derived from those objects, and compares the
+# version with that of its caches to decide whether or not it must
+# reload them. Since the version is stored in the archive database,
+# a change made in one process (for example, a job process that creates
+# a new classifier) invalidates the caches of all processes.
+#
+# The version is incremented by the `post_save` and `post_delete`
+# signal receivers below. Note that Django does not send those signals
+# for queryset `update` and `delete` and model `bulk_create` calls, so
+# code that modifies processors, annotation constraints, or annotation
+# infos in those ways must call `increment_archive_metadata_version`
+# itself.
+class ArchiveMetadataVersion(Model):
+    
+    ID = 1
+    """The ID of the one and only archive metadata version."""
+    
+    version = BigIntegerField(default=0)
+    
+    def __str__(self):
+        return str(self.version)
+    
+    class Meta:
+        db_table = 'vesper_archive_metadata_version'
+
+
+def get_archive_metadata_version():
+    
+    """
+    Gets the current archive metadata version.
+    
+    Returns `None` if the archive database does not contain a version.
+    """
+    
+    try:
+        return ArchiveMetadataVersion.objects.get(
+            id=ArchiveMetadataVersion.ID).version
+    except ArchiveMetadataVersion.DoesNotExist:
+        return None
+
+
+def increment_archive_metadata_version():
+    
+    count = ArchiveMetadataVersion.objects.filter(
+        id=ArchiveMetadataVersion.ID).update(version=F('version') + 1)
+    
+    if count == 0:
+        # version does not yet exist
+        
+        ArchiveMetadataVersion.objects.get_or_create(
+            id=ArchiveMetadataVersion.ID, defaults={'version': 1})
+
+
+@receiver(post_save, sender=Processor)
+@receiver(post_delete, sender=Processor)
+@receiver(post_save, sender=AnnotationConstraint)
+@receiver(post_delete, sender=AnnotationConstraint)
+@receiver(post_save, sender=AnnotationInfo)
+@receiver(post_delete, sender=AnnotationInfo)
+def _increment_archive_metadata_version(sender, **kwargs):
+    increment_archive_metadata_version()
+
+
 # class RecordingJob(Model):
 #     
 #     recording = ForeignKey(
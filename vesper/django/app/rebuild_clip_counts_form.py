@@ -0,0 +1,5 @@
+from django import forms
+
+
+class RebuildClipCountsForm(forms.Form):
+    pass
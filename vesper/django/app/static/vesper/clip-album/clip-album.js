@@ -322,6 +322,14 @@ export class ClipAlbum {
         this._readOnly = state.archiveReadOnly;
         this._clipFilter = state.clipFilter;
         this._clips = state.clips.map(_parseClip);
+        
+        // Reader of any clips of this album that were not included in
+        // `state.clips`. Such clips are read as the user navigates
+        // toward them.
+        this._clipPages =
+            state.clipPages === undefined ? null : state.clipPages;
+        this._readingClips = null;
+        
         this._recordings = state.recordings.map(_parseRecording);
         this._solarEventTimes = _parseSolarEventTimes(state.solarEventTimes);
         this._timeZone = new IANAZone(state.timeZoneName);
@@ -374,6 +382,88 @@ export class ClipAlbum {
         
         this._initUrlAndHistory();
         
+        this._readMoreClipsIfNeeded(state.pageNum - 1);
+        
+    }
+    
+    
+    get _hasMoreClips() {
+        return this._clipPages !== null && !this._clipPages.done;
+    }
+    
+    
+    /*
+     * Reads more clips from the server if the specified page is among
+     * the last two pages of the clips read so far, and more clips
+     * remain to be read.
+     *
+     * If the specified page is not the current page because it did not
+     * exist until clips were read, this method goes to it.
+     */
+    async _readMoreClipsIfNeeded(pageNum) {
+        
+        while (this._hasMoreClips && pageNum >= this.numPages - 2)
+            await this._readMoreClips();
+        
+        if (pageNum > this.pageNum && pageNum < this.numPages)
+            this.pageNum = pageNum;
+        
+    }
+    
+    
+    // Reads all clips of this album that have not yet been read.
+    async _readAllClips() {
+        while (this._hasMoreClips)
+            await this._readMoreClips();
+    }
+    
+    
+    async _readMoreClips() {
+        
+        // Read only one page at a time, even if this method is called
+        // again while a read is in progress.
+        if (this._readingClips === null)
+            this._readingClips = this._readMoreClipsAux();
+        
+        try {
+            await this._readingClips;
+        } finally {
+            this._readingClips = null;
+        }
+        
+    }
+    
+    
+    async _readMoreClipsAux() {
+        
+        const clipInfos = await this._clipPages.readPage();
+        
+        if (clipInfos.length === 0) {
+            this._update();
+            return;
+        }
+        
+        const viewSettings = this.settings.clipView;
+        
+        for (const clipInfo of clipInfos) {
+            const clip = _parseClip(clipInfo, this._clips.length);
+            clip.view = new this.clipViewClass(this, clip, viewSettings);
+            this._clips.push(clip);
+            this._clipViews.push(clip.view);
+        }
+        
+        // Lay out clip views again since the pagination of the last
+        // page can change, and create a new clip manager for the new
+        // pagination.
+        const pageNum = this.pageNum;
+        this._layout = this._createLayout(this.settings);
+        this._clipManager = this._createClipManager();
+        
+        // Set `this._pageNum` to `null` so setting page number again
+        // triggers full page update.
+        this._pageNum = null;
+        this._setPageNum(pageNum);
+        
     }
     
     
@@ -963,14 +1053,18 @@ export class ClipAlbum {
 			const numPages = this.numPages;
 			const pageNum = this.pageNum;
 
-			const pageText = `Page ${pageNum + 1} of ${numPages}`;
+			// Indicate that there are more pages and clips than we
+			// know of if not all clips have been read.
+			const more = this._hasMoreClips ? '+' : '';
+
+			const pageText = `Page ${pageNum + 1} of ${numPages}${more}`;
 
 			const [startNum, endNum] = this.getPageClipNumRange(pageNum);
 
 			const clipsText =
 				endNum - startNum > 1 ?
-				`Clips ${startNum + 1}-${endNum} of ${numClips}` :
-				`Clip ${startNum + 1} of ${numClips}`;
+				`Clips ${startNum + 1}-${endNum} of ${numClips}${more}` :
+				`Clip ${startNum + 1} of ${numClips}${more}`;
 
 			return `${pageText} / ${clipsText}`;
 
@@ -987,7 +1081,8 @@ export class ClipAlbum {
 	    
         const nextButton = document.getElementById('go-to-next-page-button');
 	    nextButton.disabled =
-	        this.numPages === 0 || this.pageNum === this.numPages - 1;
+	        this.numPages === 0 ||
+	        (this.pageNum === this.numPages - 1 && !this._hasMoreClips);
 	    
         const anchor = document.getElementById('go-to-page-anchor');
         const disabled = this.numPages <= 1;
@@ -1521,7 +1616,8 @@ export class ClipAlbum {
 	}
 
 
-	_annotateAllClips(annotations) {
+	async _annotateAllClips(annotations) {
+		await this._readAllClips();
 		this._annotateClips(this.clips, annotations);
 	}
 
@@ -1574,7 +1670,8 @@ export class ClipAlbum {
     }
 
 
-    _unannotateAllClips(annotationNames) {
+    async _unannotateAllClips(annotationNames) {
+        await this._readAllClips();
         this._unannotateClips(this.clips, annotationNames);
     }
 
@@ -1640,7 +1737,8 @@ export class ClipAlbum {
     }
 
 
-    _tagAllClips(tags) {
+    async _tagAllClips(tags) {
+        await this._readAllClips();
         this._tagClips(this.clips, tags);
     }
 
@@ -1693,7 +1791,8 @@ export class ClipAlbum {
     }
 
 
-    _untagAllClips(tags) {
+    async _untagAllClips(tags) {
+        await this._readAllClips();
         this._untagClips(this.clips, tags);
     }
 
@@ -1721,6 +1820,7 @@ export class ClipAlbum {
 	set pageNum(pageNum) {
         if (this._setPageNum(pageNum))
             this._updateUrlAndHistory();
+        this._readMoreClipsIfNeeded(pageNum);
 	}
 
 
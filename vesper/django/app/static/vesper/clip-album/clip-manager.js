@@ -51,6 +51,10 @@ const _MAX_CLIP_SAMPLES_BATCH_SIZE = 200;
 // last batch.
 const _MAX_CLIP_METADATA_BATCH_SIZE = 200;
 
+// Flag that is set in the header of a clip audio batch error record. See
+// the `_decodeClipBatchAudios` method for details.
+const _AUDIO_ERROR_RECORD_FLAG = 0x80000000;
+
 // Set this `true` to randomly simulate load errors for both clip batches
 // and individual clips.
 //
@@ -671,18 +675,38 @@ class _ClipLoader {
 
         // Get array of clip audios from buffer. Audios are stored one
         // after the other, with each prefixed with its size in bytes
-        // in a 32-bit little-endian integer.
+        // in a 32-bit little-endian integer. If the server could not
+        // get the audio of a clip, the audio is replaced by an error
+        // record: a UTF-8 error message, prefixed with its size with
+        // `_AUDIO_ERROR_RECORD_FLAG` set.
 
         const audios = [];
         const dataView = new DataView(arrayBuffer);
+        const textDecoder = new TextDecoder();
         let offset = 0;
 
         while (offset < arrayBuffer.byteLength) {
 
-            // Get audio size, a 32-bit little-endian integer.
-            const size = dataView.getUint32(offset, true);
+            // Get record header, a 32-bit little-endian integer.
+            const header = dataView.getUint32(offset, true);
             offset += 4;
 
+            if ((header & _AUDIO_ERROR_RECORD_FLAG) !== 0) {
+                // error record
+
+                const size = header & ~_AUDIO_ERROR_RECORD_FLAG;
+                const message = textDecoder.decode(
+                    new Uint8Array(arrayBuffer, offset, size));
+                offset += size;
+
+                audios.push(new Error(message));
+
+                continue;
+
+            }
+
+            const size = header;
+
             // Get audio.
             //
             // Note that the ArrayBuffer.prototype.slice method
@@ -702,8 +726,15 @@ class _ClipLoader {
         // Get promises for individual clip audio decodes.
         const promises = [];
         for (let i = 0; i < audios.length; i++) {
-            const promise = this._decodeClipAudio(clips[i], audios[i]);
-            promises.push(promise);
+
+            if (audios[i] instanceof Error)
+                this._onClipSamplesLoadError(clips[i], audios[i]);
+
+            else {
+                const promise = this._decodeClipAudio(clips[i], audios[i]);
+                promises.push(promise);
+            }
+
         }
 
         return Promise.all(promises);
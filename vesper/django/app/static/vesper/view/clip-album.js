@@ -1,6 +1,10 @@
 import { ClipAlbum } from '/static/vesper/clip-album/clip-album.js';
 
 
+// The maximum number of clips to request from the server at a time.
+const _CLIP_PAGE_SIZE = 1000;
+
+
 // Module-level state, set via `init` function.
 let state = null;
 
@@ -20,11 +24,111 @@ export function init(state_) {
 let clipAlbum = null;
 
 
-function onLoad() {
+async function onLoad() {
+
+    const clipPages = new _ClipPageReader(state.clipFilter);
+
+    if (state.clipFilter.date !== null) {
+        // night album
+
+        // The rug plot of a night album shows all of the clips of the
+        // night, so we get them all now. A night has relatively few
+        // clips.
+        state.clips = await clipPages.readRemainingClips();
+
+    } else {
+        // album may span many nights
+
+        // Get just the first page of clips now. The clip album gets
+        // more pages as they are needed.
+        state.clips = await clipPages.readPage();
+
+    }
+
+    state.clipPages = clipPages;
+
     clipAlbum = new ClipAlbum(state);
+
 }
 
 
 function onResize() {
-    clipAlbum.onResize();
+    if (clipAlbum !== null)
+        clipAlbum.onResize();
+}
+
+
+// Reads the clips of an album from the server, one page at a time.
+// Each page is a list of `[id, startIndex, length, sampleRate,
+// startTime]` clip lists, in order of clip start time.
+class _ClipPageReader {
+
+
+    constructor(clipFilter) {
+
+        this._params = new URLSearchParams({
+            'station_mic': clipFilter.stationMicName,
+            'detector': clipFilter.detectorName,
+            'classification': clipFilter.classification,
+            'tag': clipFilter.tag,
+            'limit': _CLIP_PAGE_SIZE
+        });
+
+        if (clipFilter.date !== null)
+            this._params.set('date', clipFilter.date);
+
+        this._cursor = null;
+        this._done = false;
+
+    }
+
+
+    // `true` if and only if all pages have been read.
+    get done() {
+        return this._done;
+    }
+
+
+    // Reads the next page of clips, or returns an empty list if all
+    // pages have been read.
+    async readPage() {
+
+        if (this._done)
+            return [];
+
+        const params = new URLSearchParams(this._params);
+
+        if (this._cursor !== null)
+            params.set('after', this._cursor);
+
+        const response = await fetch(`/get-clips/?${params}`);
+
+        if (!response.ok)
+            throw new Error(
+                `Could not get clips from server. Server responded ` +
+                `with status ${response.status} (${response.statusText}).`);
+
+        const page = await response.json();
+
+        this._cursor = page.next;
+        this._done = page.next === null;
+
+        return page.clips;
+
+    }
+
+
+    // Reads all remaining pages of clips.
+    async readRemainingClips() {
+
+        let clips = [];
+
+        while (!this._done)
+            clips = clips.concat(await this.readPage());
+
+        return clips;
+
+    }
+
+
 }
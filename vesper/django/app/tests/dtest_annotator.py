@@ -0,0 +1,220 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from vesper.command.annotator import Annotator
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, Job, Processor, Recording, RecordingChannel,
+    Station, StationDevice, StringAnnotation, StringAnnotationEdit)
+from vesper.django.app.tests.dtest_case import TestCase
+import vesper.command.annotator as annotator_module
+import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 24000
+
+
+class AnnotatorTests(TestCase):
+
+
+    def setUp(self):
+
+        archive_lock.create_lock()
+
+        self._create_shared_test_models()
+
+        station = Station.objects.get(name='Station 0')
+        recorder = StationDevice.objects.filter(
+            station=station, device__model__type='Audio Recorder')[0].device
+        mic = StationDevice.objects.filter(
+            station=station, device__model__type='Microphone')[0].device
+        mic_output = mic.outputs.all()[0]
+
+        processors = [
+            Processor.objects.get(name='Old Bird Tseep Detector Redux 1.1'),
+            Processor.objects.get(name='Old Bird Thrush Detector Redux 1.1'),
+            None
+        ]
+
+        creation_time = time_utils.get_utc_now()
+        start_time = station.local_to_utc(datetime.datetime(2050, 5, 1, 20))
+        end_time = start_time + datetime.timedelta(hours=1)
+
+        recording = Recording.objects.create(
+            station=station,
+            recorder=recorder,
+            num_channels=1,
+            length=3600 * _SAMPLE_RATE,
+            sample_rate=_SAMPLE_RATE,
+            start_time=start_time,
+            end_time=end_time,
+            creation_time=creation_time)
+
+        channel = RecordingChannel.objects.create(
+            recording=recording,
+            channel_num=0,
+            recorder_channel_num=0,
+            mic_output=mic_output)
+
+        clips = []
+        for i in range(12):
+            clip_start_time = start_time + datetime.timedelta(seconds=i)
+            clips.append(Clip(
+                station=station,
+                mic_output=mic_output,
+                recording_channel=channel,
+                start_index=i * _SAMPLE_RATE,
+                start_time=clip_start_time,
+                end_time=clip_start_time,
+                length=1,
+                sample_rate=_SAMPLE_RATE,
+                date=station.get_night(clip_start_time),
+                creation_time=creation_time,
+                creating_processor=processors[i % 3]))
+
+        Clip.objects.bulk_create(clips)
+        self._clips = list(Clip.objects.order_by('start_time'))
+
+        self._annotation_info = \
+            AnnotationInfo.objects.get(name='Classification')
+
+        job = Job.objects.create(
+            command='{}', creation_time=creation_time, status='Running')
+
+        self._annotator = Annotator(
+            self._annotation_info, creating_job=job,
+            creating_processor=processors[0])
+
+
+    def test_get_annotation_values(self):
+
+        clips = self._clips
+
+        model_utils.annotate_clips(
+            [clips[1].id, clips[5].id], self._annotation_info, 'Call')
+        model_utils.annotate_clips(
+            [clips[2].id], self._annotation_info, 'Noise')
+
+        expected = [None] * len(clips)
+        expected[1] = expected[5] = 'Call'
+        expected[2] = 'Noise'
+
+        with CaptureQueriesContext(connection) as queries:
+            values = self._annotator._get_annotation_values(clips)
+
+        self.assertEqual(values, expected)
+        self.assertEqual(len(queries), 1)
+
+        # Check that values are the same as those obtained one at a time.
+        self.assertEqual(
+            values,
+            [self._annotator._get_annotation_value(c) for c in clips])
+
+
+    def test_get_clip_types(self):
+
+        clips = self._clips
+
+        with CaptureQueriesContext(connection) as queries:
+            clip_types = self._annotator._get_clip_types(clips)
+
+        self.assertEqual(clip_types, ['Tseep', 'Thrush', None] * 4)
+        self.assertEqual(len(queries), 1)
+
+        self.assertEqual(
+            clip_types, [model_utils.get_clip_type(c) for c in clips])
+
+
+    def test_annotate_batch(self):
+
+        clips = self._clips
+
+        # Annotate one clip with a value that will change, and another
+        # with a value that will not.
+        model_utils.annotate_clips(
+            [clips[0].id], self._annotation_info, 'Noise')
+        model_utils.annotate_clips(
+            [clips[1].id], self._annotation_info, 'Call')
+
+        values = ['Call', 'Call', 'Noise'] * 4
+
+        # Use a small batch size so that more than one batch is needed
+        # for each value.
+        batch_size = annotator_module._CLIP_BATCH_SIZE
+        annotator_module._CLIP_BATCH_SIZE = 3
+
+        try:
+            self._annotator._annotate_batch(clips, values)
+        finally:
+            annotator_module._CLIP_BATCH_SIZE = batch_size
+
+        self.assertEqual(
+            self._annotator._get_annotation_values(clips), values)
+
+        annotations = StringAnnotation.objects.filter(
+            info=self._annotation_info)
+        self.assertEqual(annotations.count(), len(clips))
+
+        # Check that annotations that were created or changed were
+        # attributed to the annotator's processor.
+        for annotation in annotations.exclude(clip_id=clips[1].id):
+            self.assertEqual(
+                annotation.creating_processor.name,
+                'Old Bird Tseep Detector Redux 1.1')
+
+        # There should be one edit for each of the two initial
+        # annotations, plus one for each clip except the one whose
+        # annotation did not change.
+        edits = StringAnnotationEdit.objects.filter(
+            info=self._annotation_info)
+        self.assertEqual(edits.count(), 2 + len(clips) - 1)
+
+
+    def test_annotate_batch_with_other_annotation(self):
+
+        clips = self._clips
+
+        score_info = AnnotationInfo.objects.create(
+            name='Classifier Score', type='String',
+            creation_time=time_utils.get_utc_now())
+
+        scores = [str(i) for i in range(len(clips))]
+
+        self._annotator._annotate_batch(clips, scores, score_info)
+
+        self.assertEqual(
+            self._annotator._get_annotation_values(clips, score_info),
+            scores)
+
+        # The annotator's own annotation should be unchanged.
+        self.assertEqual(
+            self._annotator._get_annotation_values(clips),
+            [None] * len(clips))
+
+
+    def test_annotate_clips_individually(self):
+
+        clips = self._clips
+
+        def get_annotation_value(clip):
+            i = clips.index(clip)
+            if i == 4:
+                raise ValueError('Bad clip.')
+            elif i % 2 == 0:
+                return 'Call'
+            else:
+                return None
+
+        count = self._annotator._annotate_clips_individually(
+            clips, get_annotation_value)
+
+        self.assertEqual(count, 5)
+
+        expected = [
+            'Call' if i % 2 == 0 and i != 4 else None
+            for i in range(len(clips))]
+        self.assertEqual(
+            self._annotator._get_annotation_values(clips), expected)
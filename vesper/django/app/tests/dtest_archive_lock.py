@@ -0,0 +1,95 @@
+from concurrent.futures import Future
+
+from django.test import override_settings
+
+from vesper.django.app.models import Job
+from vesper.django.app.tests.dtest_case import TestCase
+import vesper.util.archive_lock as archive_lock
+import vesper.util.time_utils as time_utils
+
+
+def _create_job(status):
+    return Job.objects.create(
+        command='{}', status=status,
+        creation_time=time_utils.get_utc_now())
+
+
+def _fail(status):
+    _create_job(status)
+    raise ValueError('Write failed.')
+
+
+class ArchiveLockTests(TestCase):
+
+
+    def setUp(self):
+        archive_lock.create_lock()
+
+
+    def test_get_lock_policy_name(self):
+
+        # Test database is SQLite.
+        self.assertEqual(archive_lock.get_lock_policy_name(), 'process')
+
+        for name in ('process', 'none'):
+            with override_settings(VESPER_ARCHIVE_LOCK_POLICY=name):
+                self.assertEqual(archive_lock.get_lock_policy_name(), name)
+
+        with override_settings(VESPER_ARCHIVE_LOCK_POLICY='bobo'):
+            self.assert_raises(ValueError, archive_lock.get_lock_policy_name)
+
+
+    def test_create_lock_warning(self):
+
+        # Test database is SQLite, for which the "none" policy should
+        # elicit a warning.
+        with override_settings(VESPER_ARCHIVE_LOCK_POLICY='none'):
+            with self.assertLogs(level='WARNING') as logs:
+                archive_lock.create_lock()
+
+        self.assertIn('"none" archive lock policy', logs.output[0])
+        self.assertIsInstance(
+            archive_lock.get_lock(), archive_lock.DoNothingLock)
+
+        with self.assertNoLogs(level='WARNING'):
+            archive_lock.create_lock()
+
+        self.assertNotIsInstance(
+            archive_lock.get_lock(), archive_lock.DoNothingLock)
+
+
+    def test_write(self):
+
+        # Since Django test cases run in a transaction, `write` should
+        # invoke functions on the calling thread.
+        job = archive_lock.write(_create_job, 'One')
+        self.assertEqual(Job.objects.get(id=job.id).status, 'One')
+
+        self.assert_raises(ValueError, archive_lock.write, _fail, 'Two')
+        self.assertFalse(Job.objects.filter(status='Two').exists())
+
+
+    def test_write_in_lock_context(self):
+        with archive_lock.atomic():
+            job = archive_lock.write(_create_job, 'One')
+        self.assertEqual(Job.objects.get(id=job.id).status, 'One')
+
+
+    def test_write_group(self):
+
+        writes = [
+            (Future(), _create_job, ('One',), {}),
+            (Future(), _fail, ('Two',), {}),
+            (Future(), _create_job, ('Three',), {})]
+
+        archive_lock.write_group(writes)
+
+        # Failure of second write should roll back just that write.
+        statuses = set(Job.objects.values_list('status', flat=True))
+        self.assertEqual(statuses, set(('One', 'Three')))
+
+        futures = [w[0] for w in writes]
+        self.assertEqual(futures[0].result().status, 'One')
+        self.assertIsInstance(futures[1].exception(), ValueError)
+        self.assertEqual(futures[2].result().status, 'Three')
+
@@ -0,0 +1,111 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from vesper.django.app.models import (
+    AnnotationConstraint, AnnotationInfo, ArchiveMetadataVersion, Processor,
+    get_archive_metadata_version, increment_archive_metadata_version)
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.singleton.archive import archive
+import vesper.util.time_utils as time_utils
+
+
+_CONSTRAINT_TEXT = '''
+name: Coarse
+values: [Call, Noise]
+'''
+
+
+class ArchiveMetadataVersionTests(TestCase):
+
+
+    def setUp(self):
+        self._create_shared_test_models()
+
+
+    def test_version_increments(self):
+
+        version = get_archive_metadata_version()
+        self.assertIsNotNone(version)
+
+        processor = Processor.objects.create(name='Bobo', type='Classifier')
+        version = self._assert_version_incremented(version)
+
+        processor.description = 'Bobo classifier.'
+        processor.save()
+        version = self._assert_version_incremented(version)
+
+        constraint = AnnotationConstraint.objects.create(
+            name='Coarse', text=_CONSTRAINT_TEXT,
+            creation_time=time_utils.get_utc_now())
+        version = self._assert_version_incremented(version)
+
+        AnnotationInfo.objects.create(
+            name='Coarse Classification', type='String',
+            constraint=constraint, creation_time=time_utils.get_utc_now())
+        version = self._assert_version_incremented(version)
+
+        processor.delete()
+        version = self._assert_version_incremented(version)
+
+
+    def _assert_version_incremented(self, version):
+        new_version = get_archive_metadata_version()
+        self.assertGreater(new_version, version)
+        return new_version
+
+
+    def test_processor_cache(self):
+
+        name = 'Old Bird Tseep Detector Redux 1.1'
+        archive.get_processor(name)
+
+        # With no metadata changes, only the version should be queried.
+        with CaptureQueriesContext(connection) as queries:
+            processor = archive.get_processor(name)
+        self.assertEqual(processor.name, name)
+        self.assertEqual(len(queries), 1)
+
+        # Create a processor without sending signals, as another
+        # process would from the point of view of this one, and
+        # increment the version.
+        Processor.objects.bulk_create(
+            [Processor(name='Bobo', type='Classifier')])
+        increment_archive_metadata_version()
+
+        self.assertEqual(archive.get_processor('Bobo').name, 'Bobo')
+
+
+    def test_string_annotation_values_cache(self):
+
+        constraint = AnnotationConstraint.objects.create(
+            name='Coarse', text=_CONSTRAINT_TEXT,
+            creation_time=time_utils.get_utc_now())
+        AnnotationInfo.objects.create(
+            name='Coarse Classification', type='String',
+            constraint=constraint, creation_time=time_utils.get_utc_now())
+
+        name = 'Coarse Classification'
+        values = archive.get_string_annotation_values(name)
+        self.assertEqual(values, ('Call', 'Noise'))
+
+        with CaptureQueriesContext(connection) as queries:
+            archive.get_string_annotation_values(name)
+        self.assertEqual(len(queries), 1)
+
+        # Change constraint without sending signals and increment
+        # version.
+        AnnotationConstraint.objects.filter(id=constraint.id).update(
+            text=_CONSTRAINT_TEXT.replace('Noise', 'Other'))
+        increment_archive_metadata_version()
+
+        values = archive.get_string_annotation_values(name)
+        self.assertEqual(values, ('Call', 'Other'))
+
+
+    def test_missing_version(self):
+
+        ArchiveMetadataVersion.objects.all().delete()
+        self.assertIsNone(get_archive_metadata_version())
+
+        increment_archive_metadata_version()
+        self.assertEqual(get_archive_metadata_version(), 1)
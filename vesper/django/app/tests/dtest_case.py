@@ -197,7 +197,7 @@ _TEST_USER_NAME = 'Test'
 _TEST_USER_PASSWORD = 'test'
 
 
-class TestCase(django.test.TestCase, TestCaseMixin):
+class _DjangoTestCaseMixin(TestCaseMixin):
 
 
     def _create_test_user(self):
@@ -248,3 +248,18 @@ class TestCase(django.test.TestCase, TestCaseMixin):
         for name, value in expected_attributes.items():
             if name not in excluded_attribute_names:
                 self.assertEqual(getattr(model, name), value)
+
+
+class TestCase(django.test.TestCase, _DjangoTestCaseMixin):
+    pass
+
+
+class TransactionTestCase(
+        django.test.TransactionTestCase, _DjangoTestCaseMixin):
+
+    """
+    Test case whose tests commit their database transactions.
+
+    Use this test case for tests in which several threads, each with
+    its own database connection, must see each other's writes.
+    """
@@ -0,0 +1,217 @@
+import datetime
+
+import numpy as np
+
+from vesper.django.app.clip_batch_writer import (
+    ClipBatchWriter, get_clip_times, get_nights)
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, Job, Processor, Recording, RecordingChannel,
+    Station, StationDevice, StringAnnotation, StringAnnotationEdit)
+from vesper.django.app.tests.dtest_case import TestCase
+import vesper.util.archive_lock as archive_lock
+import vesper.util.signal_utils as signal_utils
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 22050
+
+
+class ClipBatchWriterTests(TestCase):
+
+
+    def setUp(self):
+
+        archive_lock.create_lock()
+
+        self._create_shared_test_models()
+
+        station = Station.objects.get(name='Station 0')
+        self._station = station
+
+        recorder = StationDevice.objects.filter(
+            station=station, device__model__type='Audio Recorder')[0].device
+        mic = StationDevice.objects.filter(
+            station=station, device__model__type='Microphone')[0].device
+
+        creation_time = time_utils.get_utc_now()
+
+        # Make the recording span local noon so that its clips fall on
+        # two different nights.
+        start_time = station.local_to_utc(datetime.datetime(2050, 5, 1, 11))
+        end_time = station.local_to_utc(datetime.datetime(2050, 5, 1, 13))
+        length = int(
+            (end_time - start_time).total_seconds() * _SAMPLE_RATE)
+
+        recording = Recording.objects.create(
+            station=station,
+            recorder=recorder,
+            num_channels=1,
+            length=length,
+            sample_rate=_SAMPLE_RATE,
+            start_time=start_time,
+            end_time=end_time,
+            creation_time=creation_time)
+
+        self._recording_channel = RecordingChannel.objects.create(
+            recording=recording,
+            channel_num=0,
+            recorder_channel_num=0,
+            mic_output=mic.outputs.all()[0])
+
+        self._processor = Processor.objects.get(
+            name='Old Bird Tseep Detector Redux 1.1')
+
+        self._job = Job.objects.create(
+            command='{}', creation_time=creation_time, status='Running')
+
+        self._annotation_info = AnnotationInfo.objects.get(
+            name='Detector Score')
+
+        self._writer = ClipBatchWriter(
+            self._recording_channel, self._processor, self._job,
+            lambda name: self._annotation_info)
+
+
+    def test_get_clip_times(self):
+
+        start_time = self._recording_channel.recording.start_time
+        start_indices = np.array([0, 1, 12345, 99999999, 158760000])
+        lengths = np.array([0, 1, 2, 8820, 13230])
+
+        for sample_rate in (22050, 24000, 32000.5):
+
+            start_times, end_times = get_clip_times(
+                start_time, sample_rate, start_indices, lengths)
+
+            for i, (start_index, length) in \
+                    enumerate(zip(start_indices, lengths)):
+
+                expected_start_time = start_time + datetime.timedelta(
+                    seconds=int(start_index) / sample_rate)
+                expected_end_time = signal_utils.get_end_time(
+                    expected_start_time, int(length), sample_rate)
+
+                self.assertEqual(start_times[i], expected_start_time)
+                self.assertEqual(end_times[i], expected_end_time)
+
+
+    def test_get_nights(self):
+
+        station = self._station
+        start_time = self._recording_channel.recording.start_time
+        times = [
+            start_time + datetime.timedelta(minutes=m)
+            for m in (0, 59, 60, 61, 119, 60 * 24, 60 * 48 + 30)]
+
+        expected = [station.get_night(t) for t in times]
+
+        self.assertEqual(get_nights(station, times), expected)
+        self.assertEqual(get_nights(station, []), [])
+
+
+    def test_write(self):
+
+        hour = 3600 * _SAMPLE_RATE
+
+        clips = [
+            (0, 100, {'Detector Score': 1.5}),
+            (hour + 10, 200, None),
+            (hour + 20, 300, {'Detector Score': 2})]
+
+        failures = self._writer.write(clips, time_utils.get_utc_now())
+
+        self.assertEqual(failures, [])
+
+        created_clips = Clip.objects.order_by('start_index')
+        self.assertEqual(created_clips.count(), 3)
+
+        start_time = self._recording_channel.recording.start_time
+
+        for clip, (start_index, length, _) in zip(created_clips, clips):
+
+            expected_start_time = signal_utils.index_to_time(
+                start_index, start_time, _SAMPLE_RATE)
+
+            self.assertEqual(clip.start_index, start_index)
+            self.assertEqual(clip.length, length)
+            self.assertEqual(clip.start_time, expected_start_time)
+            self.assertEqual(
+                clip.date, self._station.get_night(expected_start_time))
+            self.assertEqual(clip.creating_processor, self._processor)
+            self.assertEqual(clip.creating_job, self._job)
+
+        self.assertNotEqual(created_clips[0].date, created_clips[2].date)
+
+        values = dict(
+            (a.clip.start_index, a.value)
+            for a in StringAnnotation.objects.all())
+        self.assertEqual(values, {0: '1.5', hour + 20: '2'})
+
+        edits = StringAnnotationEdit.objects.all()
+        self.assertEqual(edits.count(), 2)
+        for edit in edits:
+            self.assertEqual(edit.action, StringAnnotationEdit.ACTION_SET)
+
+
+    def test_write_with_duplicates(self):
+
+        creation_time = time_utils.get_utc_now()
+
+        self._writer.write([(1000, 100, None)], creation_time)
+
+        clips = [
+            (0, 100, {'Detector Score': 1}),
+            (1000, 100, {'Detector Score': 2}),
+            (2000, 100, {'Detector Score': 3})]
+
+        failures = self._writer.write(clips, creation_time)
+
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0].start_index, 1000)
+
+        start_indices = list(Clip.objects.order_by(
+            'start_index').values_list('start_index', flat=True))
+        self.assertEqual(start_indices, [0, 1000, 2000])
+
+        values = dict(
+            (a.clip.start_index, a.value)
+            for a in StringAnnotation.objects.all())
+        self.assertEqual(values, {0: '1', 2000: '3'})
+
+
+    def test_write_skipping_existing(self):
+
+        creation_time = time_utils.get_utc_now()
+        creation_times = [
+            creation_time + datetime.timedelta(seconds=i) for i in range(3)]
+
+        self._writer.write([(1000, 100, {'Detector Score': 0})], creation_time)
+
+        clips = [
+            (0, 100, {'Detector Score': 1}),
+            (1000, 100, {'Detector Score': 2}),
+            (2000, 100, {'Detector Score': 3})]
+
+        failures = self._writer.write(
+            clips, creation_times, skip_existing=True)
+
+        self.assertEqual(failures, [])
+        self.assertEqual(self._writer.skipped_clip_count, 1)
+
+        # Writing the same clips again should skip all of them.
+        failures = self._writer.write(
+            clips, creation_times, skip_existing=True)
+
+        self.assertEqual(failures, [])
+        self.assertEqual(self._writer.skipped_clip_count, 4)
+
+        created_clips = Clip.objects.order_by('start_index')
+        self.assertEqual(
+            [c.creation_time for c in created_clips],
+            [creation_times[0], creation_time, creation_times[2]])
+
+        annotations = StringAnnotation.objects.order_by('clip__start_index')
+        self.assertEqual(
+            [(a.value, a.creation_time) for a in annotations],
+            [('1', creation_times[0]), ('0', creation_time),
+             ('3', creation_times[2])])
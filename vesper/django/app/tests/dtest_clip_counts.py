@@ -0,0 +1,339 @@
+from collections import defaultdict
+from threading import Barrier, Thread
+import datetime
+import random
+import time
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, ClipCount, Processor, Recording, RecordingChannel,
+    Station, StationDevice, TagInfo)
+from vesper.django.app.tests.dtest_case import TestCase, TransactionTestCase
+import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 24000
+
+_COUNT_CASES = (
+    (None, None, None),
+    ('Classification', None, None),
+    ('Classification', 'Call.AMRE', None),
+    ('Classification', 'Call*', None),
+    ('Classification', '*', None),
+    (None, None, 'Review'),
+    ('Classification', None, 'Review'),
+    ('Classification', 'Call*', 'Review'),
+    ('Classification', 'Noise', 'Review'),
+)
+
+
+class ClipCountTests(TestCase):
+
+
+    def setUp(self):
+
+        archive_lock.create_lock()
+
+        self._create_shared_test_models()
+
+        self._station = Station.objects.get(name='Station 0')
+        recorder = StationDevice.objects.filter(
+            station=self._station,
+            device__model__type='Audio Recorder')[0].device
+        mic = StationDevice.objects.filter(
+            station=self._station,
+            device__model__type='Microphone')[0].device
+        self._mic_output = mic.outputs.all()[0]
+
+        self._detectors = [
+            Processor.objects.get(name='Old Bird Tseep Detector Redux 1.1'),
+            Processor.objects.get(name='Old Bird Thrush Detector Redux 1.1')
+        ]
+
+        self._classification = \
+            AnnotationInfo.objects.get(name='Classification')
+        self._review = TagInfo.objects.get(name='Review')
+
+        creation_time = time_utils.get_utc_now()
+
+        self._clips = []
+
+        with archive_lock.atomic(), transaction.atomic():
+
+            # Create clips in recordings on two nights.
+            for day in (1, 2):
+
+                start_time = self._station.local_to_utc(
+                    datetime.datetime(2050, 5, day, 20))
+                end_time = start_time + datetime.timedelta(hours=1)
+
+                recording = Recording.objects.create(
+                    station=self._station,
+                    recorder=recorder,
+                    num_channels=1,
+                    length=3600 * _SAMPLE_RATE,
+                    sample_rate=_SAMPLE_RATE,
+                    start_time=start_time,
+                    end_time=end_time,
+                    creation_time=creation_time)
+
+                channel = RecordingChannel.objects.create(
+                    recording=recording,
+                    channel_num=0,
+                    recorder_channel_num=0,
+                    mic_output=self._mic_output)
+
+                for i in range(6):
+                    clip_start_time = \
+                        start_time + datetime.timedelta(seconds=i)
+                    self._clips.append(model_utils.create_clip(
+                        station=self._station,
+                        mic_output=self._mic_output,
+                        recording_channel=channel,
+                        start_index=i * _SAMPLE_RATE,
+                        length=_SAMPLE_RATE,
+                        sample_rate=_SAMPLE_RATE,
+                        start_time=clip_start_time,
+                        end_time=clip_start_time,
+                        date=self._station.get_night(clip_start_time),
+                        creation_time=creation_time,
+                        creating_processor=self._detectors[i % 2]))
+
+
+    def test_clip_counts(self):
+
+        clips = self._clips
+        ids = [c.id for c in clips]
+        classification = self._classification
+        review = self._review
+
+        self._assert_clip_counts()
+
+        model_utils.annotate_clips(ids[:5], classification, 'Call.AMRE')
+        model_utils.annotate_clips(ids[6:9], classification, 'Call.WIWA')
+        model_utils.annotate_clips(ids[9:10], classification, 'Noise')
+        model_utils.annotate_clips(
+            ids[:3], AnnotationInfo.objects.get(name='Detector Score'), '50')
+        self._assert_clip_counts()
+
+        model_utils.tag_clips(ids[2:8], review)
+        self._assert_clip_counts()
+
+        # Change annotation values of tagged clips.
+        model_utils.annotate_clips(ids[3:7], classification, 'Noise')
+        self._assert_clip_counts()
+
+        model_utils.unannotate_clips(ids[4:6], classification)
+        model_utils.untag_clips(ids[7:8], review)
+        self._assert_clip_counts()
+
+        with archive_lock.atomic(), transaction.atomic():
+            model_utils.delete_clips(Clip.objects.filter(id__in=ids[2:4]))
+        self._assert_clip_counts()
+
+        # Check that no zero counts are stored.
+        self.assertFalse(ClipCount.objects.filter(count=0).exists())
+
+        # Check that rebuilt counts match incrementally maintained ones.
+        clip_counts = _get_clip_count_values()
+        model_utils.rebuild_clip_counts()
+        self.assertEqual(_get_clip_count_values(), clip_counts)
+
+
+    def test_unique_key(self):
+
+        clip_count = ClipCount.objects.filter(
+            detector=self._detectors[0], annotation_info=None,
+            tag_info=None)[0]
+
+        # A duplicate count should be rejected even though its key has
+        # null fields.
+        clip_count.id = None
+        with transaction.atomic():
+            self.assert_raises(IntegrityError, clip_count.save)
+
+
+    def _assert_clip_counts(self):
+
+        for detector in self._detectors:
+
+            for annotation_name, annotation_value, tag_name in _COUNT_CASES:
+
+                counts = model_utils.get_clip_counts(
+                    self._station, self._mic_output, detector,
+                    annotation_name, annotation_value, tag_name)
+
+                expected = self._get_expected_clip_counts(
+                    detector, annotation_name, annotation_value, tag_name)
+
+                self.assertEqual(counts, expected)
+
+
+    def _get_expected_clip_counts(
+            self, detector, annotation_name, annotation_value, tag_name):
+
+        dates = model_utils.get_recording_dates(
+            self._station, self._mic_output)
+
+        counts = defaultdict(int, ((date, 0) for date in dates))
+
+        for clip in Clip.objects.filter(creating_processor=detector):
+
+            annotations = model_utils.get_clip_annotations(clip)
+            tags = model_utils.get_clip_tags(clip)
+
+            if tag_name is not None and tag_name not in tags:
+                continue
+
+            if annotation_name is not None:
+
+                value = annotations.get(annotation_name)
+
+                if annotation_value is None:
+                    if value is not None:
+                        continue
+
+                elif value is None:
+                    continue
+
+                elif annotation_value.endswith('*'):
+                    if not value.startswith(annotation_value[:-1]):
+                        continue
+
+                elif value != annotation_value:
+                    continue
+
+            counts[clip.date] += 1
+
+        return dict(counts)
+
+
+def _get_clip_count_values():
+
+    field_names = (
+        'station_id', 'mic_output_id', 'detector_id', 'date',
+        'annotation_info_id', 'annotation_value', 'tag_info_id', 'count')
+
+    return sorted(
+        ClipCount.objects.values_list(*field_names),
+        key=lambda v: tuple(str(x) for x in v))
+
+
+class ClipCountConcurrencyTests(TransactionTestCase):
+
+
+    def setUp(self):
+
+        self._create_shared_test_models()
+
+        station = Station.objects.get(name='Station 0')
+        mic = StationDevice.objects.filter(
+            station=station, device__model__type='Microphone')[0].device
+        mic_output = mic.outputs.all()[0]
+        classification = AnnotationInfo.objects.get(name='Classification')
+
+        key = (station.id, mic_output.id, None)
+        date = datetime.date(2050, 5, 1)
+
+        # Keys whose counts both writers update in every transaction.
+        self._shared_keys = (
+            key + (date, None, None, None),
+            key + (date, classification.id, 'Call.AMRE', None))
+
+        # Keys whose counts both writers create in the same
+        # transaction, one key per transaction.
+        self._new_keys = [
+            key + (date + datetime.timedelta(days=i + 1), None, None, None)
+            for i in range(_CONCURRENT_WRITE_COUNT)]
+
+
+    def test_concurrent_updates(self):
+
+        # Apply clip count contributions from two threads, each with
+        # its own database connection and neither holding the archive
+        # lock, as under the "none" archive lock policy.
+
+        def add_counts(sign):
+            for key in self._new_keys:
+                contributions = dict.fromkeys(self._shared_keys, 1)
+                contributions[key] = 1
+                yield contributions, sign
+
+        self._run_writers(add_counts(1))
+
+        expected = dict.fromkeys(
+            self._shared_keys, 2 * _CONCURRENT_WRITE_COUNT)
+        expected.update(dict.fromkeys(self._new_keys, 2))
+        self.assertEqual(_get_clip_counts(), expected)
+
+        # Remove the counts of the new keys concurrently. The counts
+        # should become zero and be deleted.
+        def remove_counts():
+            for key in self._new_keys:
+                yield {key: 1}, -1
+
+        self._run_writers(remove_counts())
+
+        expected = dict.fromkeys(
+            self._shared_keys, 2 * _CONCURRENT_WRITE_COUNT)
+        self.assertEqual(_get_clip_counts(), expected)
+
+
+    def _run_writers(self, writes):
+
+        writes = list(writes)
+        barrier = Barrier(2)
+        errors = []
+
+        def write():
+            try:
+                barrier.wait()
+                for contributions, sign in writes:
+                    _update_clip_counts(contributions, sign)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=write) for _ in range(2)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+
+_CONCURRENT_WRITE_COUNT = 20
+
+
+def _update_clip_counts(contributions, sign):
+
+    # SQLite does not allow concurrent write transactions, and reports
+    # an error for a transaction that tries to write to the clip count
+    # table while another connection is writing to it, so we retry
+    # such transactions.
+    while True:
+        try:
+            with transaction.atomic():
+                model_utils._update_clip_counts(contributions, sign)
+            return
+        except OperationalError:
+            time.sleep(random.uniform(0, .005))
+
+
+def _get_clip_counts():
+
+    field_names = (
+        'station_id', 'mic_output_id', 'detector_id', 'date',
+        'annotation_info_id', 'annotation_value', 'tag_info_id')
+
+    return dict(
+        (tuple(values), count)
+        for *values, count in
+        ClipCount.objects.values_list(*field_names, 'count'))
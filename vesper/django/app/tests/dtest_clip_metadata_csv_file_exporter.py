@@ -0,0 +1,305 @@
+from pathlib import Path
+from unittest.mock import patch
+import csv
+import datetime
+import gzip
+import tempfile
+import unittest
+
+from vesper.django.app.models import (
+    AnnotationInfo, Clip, Processor, Recording, RecordingChannel, Station,
+    StationDevice, TagInfo)
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.command.clip_metadata_csv_file_exporter import \
+    ClipMetadataCsvFileExporter
+import vesper.command.clip_metadata_csv_file_exporter as exporter_module
+import vesper.django.app.model_utils as model_utils
+import vesper.util.archive_lock as archive_lock
+import vesper.util.signal_utils as signal_utils
+import vesper.util.time_utils as time_utils
+import vesper.util.yaml_utils as yaml_utils
+
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+_SAMPLE_RATE = 24000
+
+_TABLE_FORMAT = yaml_utils.load('''
+
+columns:
+
+    - ID
+    - Station Name
+    - Microphone Output Name
+    - Sensor Name
+    - Detector Name
+    - Detector Type
+
+    - measurement: Start Time
+      formatter:
+          name: Local Time Formatter
+          settings: {format: "%Y-%m-%d %H:%M:%S.%3f"}
+
+    - measurement: End Time
+      formatter: UTC Time Formatter
+
+    - measurement: Duration
+      formatter:
+          name: Decimal Formatter
+          settings: {detail: ".3"}
+
+    - name: Duration (ms)
+      measurement: Duration
+      formatter:
+          - name: Calculator
+            settings: {code: "x 1000 mul"}
+          - name: Decimal Formatter
+            settings: {detail: ".1"}
+
+    - Start Index
+    - End Index
+
+    - name: End Index From Recording End
+      measurement:
+          name: End Index
+          settings: {reference_index: Recording End Index}
+
+    - Length
+    - Sample Rate
+
+    - name: Classification
+      measurement:
+          name: Annotation Value
+          settings: {annotation_name: Classification}
+      formatter:
+          name: Value Mapper
+          settings:
+              mapping: {Noise: Not Call}
+
+    - name: Score
+      measurement:
+          name: Annotation Value
+          settings: {annotation_name: Detector Score}
+
+    - name: Review
+      measurement:
+          name: Tag Status
+          settings: {tag_name: Review}
+
+    - name: Recent Calls
+      measurement:
+          name: Recent Clip Count
+          settings:
+              included_classifications: [Call*]
+
+    - Recording Start Time
+    - Recording Channel Number
+
+''')
+
+
+class ClipMetadataCsvFileExporterTests(TestCase):
+
+
+    def setUp(self):
+
+        archive_lock.create_lock()
+
+        self._create_shared_test_models()
+
+        station = Station.objects.get(name='Station 0')
+
+        recorder = StationDevice.objects.filter(
+            station=station, device__model__type='Audio Recorder')[0].device
+        mic = StationDevice.objects.filter(
+            station=station, device__model__type='Microphone')[0].device
+        mic_output = mic.outputs.all()[0]
+
+        detectors = [
+            Processor.objects.get(name='Old Bird Tseep Detector Redux 1.1'),
+            Processor.objects.get(name='Old Bird Thrush Detector Redux 1.1')]
+
+        creation_time = time_utils.get_utc_now()
+        start_time = station.local_to_utc(datetime.datetime(2050, 5, 1, 20))
+        end_time = start_time + datetime.timedelta(hours=1)
+
+        recording = Recording.objects.create(
+            station=station,
+            recorder=recorder,
+            num_channels=1,
+            length=3600 * _SAMPLE_RATE,
+            sample_rate=_SAMPLE_RATE,
+            start_time=start_time,
+            end_time=end_time,
+            creation_time=creation_time)
+
+        channel = RecordingChannel.objects.create(
+            recording=recording,
+            channel_num=0,
+            recorder_channel_num=0,
+            mic_output=mic_output)
+
+        for i in range(10):
+
+            start_index = i * 10 * _SAMPLE_RATE + 123
+            length = 1000 * (i + 1)
+            clip_start_time = signal_utils.index_to_time(
+                start_index, start_time, _SAMPLE_RATE)
+
+            Clip.objects.create(
+                station=station,
+                mic_output=mic_output,
+                recording_channel=channel,
+                start_index=start_index,
+                length=length,
+                sample_rate=_SAMPLE_RATE,
+                start_time=clip_start_time,
+                end_time=signal_utils.get_end_time(
+                    clip_start_time, length, _SAMPLE_RATE),
+                date=station.get_night(clip_start_time),
+                creation_time=creation_time,
+                creating_processor=detectors[i % 2])
+
+        clips = list(Clip.objects.order_by('start_time'))
+
+        # Give one clip no start index, so that index columns are
+        # computed one clip at a time for its detector.
+        clip = clips[3]
+        clip.start_index = None
+        clip.save()
+
+        classification = AnnotationInfo.objects.get(name='Classification')
+        model_utils.annotate_clips(
+            [c.id for c in clips[:4]], classification, 'Call.CHSP')
+        model_utils.annotate_clips(
+            [c.id for c in clips[5:7]], classification, 'Noise')
+
+        score = AnnotationInfo.objects.get(name='Detector Score')
+        for i, clip in enumerate(clips):
+            if i != 2:
+                model_utils.annotate_clip(clip, score, str(10 * i))
+
+        review = TagInfo.objects.get(name='Review')
+        model_utils.tag_clips([c.id for c in clips[1::3]], review)
+
+        self._station = station
+        self._mic_output = mic_output
+        self._detectors = detectors
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_csv_file(self):
+        self._test_export('.csv', _read_csv_file)
+
+
+    def test_gzip_csv_file(self):
+        self._test_export('.csv.gz', _read_gzip_csv_file)
+
+
+    @unittest.skipIf(pyarrow is None, 'PyArrow is not installed.')
+    def test_parquet_file(self):
+        self._test_export('.parquet', _read_parquet_file)
+
+
+    def _test_export(self, suffix, read_file):
+
+        batch_rows = read_file(self._export(suffix, True))
+        clip_rows = read_file(self._export(suffix, False))
+
+        # header plus one row per clip
+        self.assertEqual(len(batch_rows), 11)
+
+        self.assertEqual(batch_rows, clip_rows)
+
+        # Check some values that come from annotations, tags, and
+        # index computations, so that the test does not pass merely
+        # because both exports are wrong in the same way.
+        header = batch_rows[0]
+        rows = dict((int(r[0]), r) for r in batch_rows[1:])
+        clips = list(Clip.objects.order_by('start_time'))
+
+        def get(clip_num, column_name):
+            return rows[clips[clip_num].id][header.index(column_name)]
+
+        self.assertEqual(get(0, 'Classification'), 'Call.CHSP')
+        self.assertEqual(get(4, 'Classification'), '')
+        self.assertEqual(get(5, 'Classification'), 'Not Call')
+        self.assertEqual(get(2, 'Score'), '')
+        self.assertEqual(get(9, 'Score'), '90')
+        self.assertEqual(get(1, 'Review'), 'True')
+        self.assertEqual(get(2, 'Review'), 'False')
+        self.assertEqual(get(0, 'Start Index'), '123')
+        self.assertEqual(get(0, 'End Index'), '1123')
+        self.assertEqual(get(3, 'Start Index'), '')
+        self.assertEqual(get(1, 'Duration (ms)'), '83.3')
+        self.assertEqual(
+            get(0, 'End Index From Recording End'),
+            str(1123 - 3600 * _SAMPLE_RATE))
+
+
+    def _export(self, suffix, batch):
+
+        file_path = self._dir_path / f'Clips {batch}{suffix}'
+
+        with patch.object(
+                exporter_module, '_FALLBACK_TABLE_FORMAT', _TABLE_FORMAT):
+
+            exporter = ClipMetadataCsvFileExporter({
+                'table_format': '',
+                'output_file_path': file_path
+            })
+
+        exporter.begin_exports()
+
+        # Export clips of each detector as the export command does.
+        for detector in self._detectors:
+
+            clips = model_utils.get_clips(
+                station=self._station,
+                mic_output=self._mic_output,
+                date=datetime.date(2050, 5, 1),
+                detector=detector
+            ).select_related(
+                *exporter.clip_query_set_select_related_args)
+
+            if batch:
+                exporter.export_subset(clips)
+            else:
+                for clip in clips:
+                    exporter.export(clip)
+
+        exporter.end_exports()
+
+        return file_path
+
+
+def _read_csv_file(file_path):
+    with open(file_path, newline='') as file_:
+        return list(csv.reader(file_))
+
+
+def _read_gzip_csv_file(file_path):
+    with gzip.open(file_path, 'rt', newline='') as file_:
+        return list(csv.reader(file_))
+
+
+def _read_parquet_file(file_path):
+
+    table = pyarrow.parquet.read_table(str(file_path))
+
+    # Represent nulls as empty strings, as in a CSV file.
+    columns = [
+        ['' if v is None else v for v in column.to_pylist()]
+        for column in table.columns]
+
+    return [table.column_names] + [list(r) for r in zip(*columns)]
@@ -0,0 +1,72 @@
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.util.extension_manager import ExtensionManager
+import vesper.util.extension_manager as extension_manager_module
+import vesper.util.yaml_utils as yaml_utils
+
+
+_EXTENSION_SPEC = '''
+
+Command:
+    test: vesper.command.test_command.TestCommand
+    bobo: vesper.nonexistent_module.BoboCommand
+    bobo_2: vesper.command.test_command.TestCommand
+
+'''
+
+
+class ExtensionManagerTests(TestCase):
+
+
+    def setUp(self):
+        self._manager = ExtensionManager(_EXTENSION_SPEC)
+
+
+    def test_extension_names(self):
+
+        # Getting extension names should not import extension modules,
+        # including the nonexistent "bobo" module.
+        extensions = self._manager.get_extensions('Command')
+        self.assertEqual(list(extensions.keys()), ['test', 'bobo', 'bobo_2'])
+        self.assertEqual(len(extensions), 3)
+        self.assertIn('bobo', extensions)
+        self.assertNotIn('fred', extensions)
+
+
+    def test_get_extension(self):
+
+        extensions = self._manager.get_extensions('Command')
+
+        cls = extensions['test']
+        self.assertEqual(cls.extension_name, 'test')
+        self.assertIs(extensions.get('test'), cls)
+        self.assertIsNone(extensions.get('fred'))
+
+        self.assertRaises(KeyError, extensions.__getitem__, 'fred')
+
+        # Extension module is imported only when extension is requested.
+        self.assertRaises(
+            ModuleNotFoundError, extensions.__getitem__, 'bobo')
+
+        # Extension name must match class `extension_name` attribute.
+        self.assertRaises(ValueError, extensions.__getitem__, 'bobo_2')
+
+
+    def test_unrecognized_extension_point_name(self):
+        self.assertRaises(ValueError, self._manager.get_extensions, 'Bobo')
+
+
+    def test_extension_spec(self):
+
+        # Check that the names of the extension spec match the
+        # `extension_name` attributes of their classes. Note that
+        # this does not check TensorFlow extensions unless TensorFlow
+        # is installed.
+
+        manager = ExtensionManager()
+        spec = yaml_utils.load(extension_manager_module._EXTENSION_SPEC)
+
+        for extension_point_name, class_names in spec.items():
+            extensions = manager.get_extensions(extension_point_name)
+            for extension_name in class_names.keys():
+                cls = extensions[extension_name]
+                self.assertEqual(cls.extension_name, extension_name)
@@ -0,0 +1,178 @@
+from io import BytesIO
+import datetime
+import json
+
+from django.test import AsyncClient
+import numpy as np
+
+from vesper.django.app.models import (
+    Clip, Processor, Recording, RecordingChannel, Station, StationDevice)
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.singleton.clip_manager import clip_manager
+import vesper.util.audio_file_utils as audio_file_utils
+import vesper.util.signal_utils as signal_utils
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 24000
+_ERROR_RECORD_FLAG = 0x80000000
+
+
+class GetClipAudiosTests(TestCase):
+
+
+    def setUp(self):
+
+        self._create_shared_test_models()
+
+        station = Station.objects.get(name='Station 0')
+
+        recorder = StationDevice.objects.filter(
+            station=station, device__model__type='Audio Recorder')[0].device
+        mic = StationDevice.objects.filter(
+            station=station, device__model__type='Microphone')[0].device
+        mic_output = mic.outputs.all()[0]
+
+        creation_time = time_utils.get_utc_now()
+        start_time = station.local_to_utc(datetime.datetime(2050, 5, 1, 20))
+        end_time = start_time + datetime.timedelta(hours=1)
+
+        # The recording has no audio files, so clip audio can come only
+        # from clip audio files.
+        recording = Recording.objects.create(
+            station=station,
+            recorder=recorder,
+            num_channels=1,
+            length=3600 * _SAMPLE_RATE,
+            sample_rate=_SAMPLE_RATE,
+            start_time=start_time,
+            end_time=end_time,
+            creation_time=creation_time)
+
+        channel = RecordingChannel.objects.create(
+            recording=recording,
+            channel_num=0,
+            recorder_channel_num=0,
+            mic_output=mic_output)
+
+        processor = Processor.objects.get(
+            name='Old Bird Tseep Detector Redux 1.1')
+
+        self._clips = []
+        for i in range(3):
+            start_index = i * _SAMPLE_RATE
+            length = 100 * (i + 1)
+            clip_start_time = signal_utils.index_to_time(
+                start_index, start_time, _SAMPLE_RATE)
+            clip = Clip.objects.create(
+                station=station,
+                mic_output=mic_output,
+                recording_channel=channel,
+                start_index=start_index,
+                length=length,
+                sample_rate=_SAMPLE_RATE,
+                start_time=clip_start_time,
+                end_time=signal_utils.get_end_time(
+                    clip_start_time, length, _SAMPLE_RATE),
+                date=station.get_night(clip_start_time),
+                creation_time=creation_time,
+                creating_processor=processor)
+            self._clips.append(clip)
+
+        # Create audio files for the first and last clips only.
+        self._audio_file_clips = [self._clips[0], self._clips[2]]
+        for clip in self._audio_file_clips:
+            samples = np.arange(clip.length, dtype='<i2')
+            clip_manager.create_audio_file(clip, samples)
+
+
+    def tearDown(self):
+        for clip in self._audio_file_clips:
+            clip_manager.delete_audio_file(clip)
+
+
+    def test_get_clip_audios(self):
+
+        clip_ids = self._get_request_clip_ids()
+
+        response = self.client.post(
+            '/get-clip-audios/', json.dumps({'clip_ids': clip_ids}),
+            content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        content = b''.join(response.streaming_content)
+        self._assert_records(content, clip_ids)
+
+
+    async def test_get_clip_audios_asgi(self):
+
+        clip_ids = self._get_request_clip_ids()
+
+        client = AsyncClient()
+        response = await client.post(
+            '/get-clip-audios/', json.dumps({'clip_ids': clip_ids}),
+            content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.is_async)
+
+        content = b''.join([r async for r in response.streaming_content])
+        self._assert_records(content, clip_ids)
+
+
+    def _get_request_clip_ids(self):
+        clip_ids = [c.id for c in self._clips]
+        nonexistent_clip_id = max(clip_ids) + 1000
+        return [clip_ids[2], nonexistent_clip_id] + clip_ids[:2]
+
+
+    def _assert_records(self, content, clip_ids):
+
+        records = _parse_records(content)
+
+        self.assertEqual(len(records), 4)
+
+        expected = [
+            300,
+            f'Clip {clip_ids[1]} does not exist.',
+            100,
+            f'Could not get audio for clip {clip_ids[3]}.'
+        ]
+
+        # Each expected record is either an audio length or an error
+        # message.
+        for (is_error, payload), expected_record in zip(records, expected):
+
+            if isinstance(expected_record, str):
+                self.assertTrue(is_error)
+                self.assertEqual(payload.decode('utf-8'), expected_record)
+
+            else:
+                self.assertFalse(is_error)
+                samples, sample_rate = \
+                    audio_file_utils.read_wave_file(BytesIO(payload))
+                self.assertEqual(sample_rate, _SAMPLE_RATE)
+                self.assert_arrays_equal(
+                    samples[0], np.arange(expected_record, dtype='<i2'))
+
+
+def _parse_records(content):
+
+    records = []
+    offset = 0
+
+    while offset < len(content):
+
+        header = int.from_bytes(content[offset:offset + 4], 'little')
+        offset += 4
+
+        is_error = (header & _ERROR_RECORD_FLAG) != 0
+        size = header & ~_ERROR_RECORD_FLAG
+
+        records.append((is_error, content[offset:offset + size]))
+        offset += size
+
+    return records
@@ -0,0 +1,156 @@
+import datetime
+
+from vesper.django.app.models import (
+    Clip, Processor, Recording, RecordingChannel, Station, StationDevice)
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.singleton.archive import archive
+import vesper.django.app.model_utils as model_utils
+import vesper.util.time_utils as time_utils
+
+
+_SAMPLE_RATE = 24000
+
+
+class GetClipsTests(TestCase):
+
+
+    def setUp(self):
+
+        self._create_shared_test_models()
+
+        station = Station.objects.get(name='Station 0')
+        recorder = StationDevice.objects.filter(
+            station=station, device__model__type='Audio Recorder')[0].device
+        mic = StationDevice.objects.filter(
+            station=station, device__model__type='Microphone')[0].device
+        mic_output = mic.outputs.all()[0]
+
+        detector = Processor.objects.get(
+            name='Old Bird Tseep Detector Redux 1.1')
+
+        creation_time = time_utils.get_utc_now()
+
+        clips = []
+
+        for day in (1, 2):
+
+            start_time = station.local_to_utc(
+                datetime.datetime(2050, 5, day, 20))
+            end_time = start_time + datetime.timedelta(hours=1)
+
+            recording = Recording.objects.create(
+                station=station,
+                recorder=recorder,
+                num_channels=2,
+                length=3600 * _SAMPLE_RATE,
+                sample_rate=_SAMPLE_RATE,
+                start_time=start_time,
+                end_time=end_time,
+                creation_time=creation_time)
+
+            channels = [
+                RecordingChannel.objects.create(
+                    recording=recording,
+                    channel_num=i,
+                    recorder_channel_num=i,
+                    mic_output=mic_output)
+                for i in range(2)]
+
+            # Create clips in reverse order of start time, including
+            # pairs of clips with the same start time in different
+            # channels, to check that clips are ordered by start time
+            # and then ID.
+            for i in reversed(range(7)):
+                clip_start_time = start_time + \
+                    datetime.timedelta(seconds=i // 2, milliseconds=250)
+                clips.append(Clip(
+                    station=station,
+                    mic_output=mic_output,
+                    recording_channel=channels[i % 2],
+                    start_index=i * _SAMPLE_RATE,
+                    length=_SAMPLE_RATE,
+                    sample_rate=_SAMPLE_RATE,
+                    start_time=clip_start_time,
+                    end_time=clip_start_time,
+                    date=station.get_night(clip_start_time),
+                    creation_time=creation_time,
+                    creating_processor=detector))
+
+        Clip.objects.bulk_create(clips)
+
+        self._clips = list(Clip.objects.order_by('start_time', 'id'))
+
+        self._params = {
+            'station_mic': model_utils.get_station_mic_output_pair_ui_name(
+                (station, mic_output)),
+            'detector': detector.name,
+            'classification': archive.NULL_CHOICE,
+            'tag': archive.NULL_CHOICE,
+        }
+
+
+    def test_get_clips(self):
+
+        for size in (1, 2, 3, 14, 100):
+            clip_lists = self._get_clips(self._params, size)
+            self.assertEqual(
+                [c[0] for c in clip_lists], [c.id for c in self._clips])
+
+        clip_list = clip_lists[0]
+        clip = self._clips[0]
+        self.assertEqual(
+            clip_list,
+            [clip.id, clip.start_index, clip.length, clip.sample_rate,
+             clip.start_time.isoformat(timespec='milliseconds')[:-6] + 'Z'])
+
+
+    def test_get_night_clips(self):
+
+        params = dict(self._params, date='2050-05-02')
+        clip_lists = self._get_clips(params, 3)
+
+        expected = [
+            c.id for c in self._clips if c.date == datetime.date(2050, 5, 2)]
+
+        self.assertEqual(len(expected), 7)
+        self.assertEqual([c[0] for c in clip_lists], expected)
+
+
+    def test_bad_requests(self):
+
+        cases = (
+            {'limit': '0'},
+            {'limit': 'bobo'},
+            {'after': 'bobo'},
+            {'date': '2050-13-01'},
+            {'date': '2050'},
+            {'date': '2050-05-01-01'},
+        )
+
+        for params in cases:
+            response = self.client.get(
+                '/get-clips/', dict(self._params, **params))
+            self.assertEqual(response.status_code, 400)
+
+
+    def _get_clips(self, params, size):
+
+        params = dict(params, limit=size)
+        clip_lists = []
+
+        while True:
+
+            response = self.client.get('/get-clips/', params)
+            self.assertEqual(response.status_code, 200)
+
+            content = response.json()
+            clips = content['clips']
+            self.assertLessEqual(len(clips), size)
+            clip_lists += clips
+
+            if content['next'] is None:
+                break
+
+            params['after'] = content['next']
+
+        return clip_lists
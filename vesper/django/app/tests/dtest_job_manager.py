@@ -0,0 +1,257 @@
+from unittest.mock import patch
+
+from vesper.command.job_manager import JobManager
+from vesper.django.app.models import Job
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.util.bunch import Bunch
+import vesper.command.job_manager as job_manager_module
+import vesper.util.archive_lock as archive_lock
+
+
+_COMMAND_SPEC = {'name': 'test'}
+
+
+class JobManagerTests(TestCase):
+
+    """
+    Tests of the `JobManager` class.
+
+    The tests replace job worker processes and the job dispatcher
+    thread with fakes, and drive the manager by invoking its
+    `_dispatch` method with worker events. Jobs are created in the
+    test database, so the tests can check the statuses of jobs that
+    end without running.
+    """
+
+
+    def setUp(self):
+
+        archive_lock.create_lock()
+
+        self._processes = []
+
+        patchers = [
+            patch.object(
+                job_manager_module, 'Process', self._create_process),
+            patch.object(job_manager_module, 'Thread', _FakeThread)]
+
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+    def _create_process(self, target, args, name):
+        process = _FakeProcess(args[0])
+        self._processes.append(process)
+        return process
+
+
+    def test_fifo_queueing_and_concurrency_cap(self):
+
+        manager = JobManager(2)
+
+        job_ids = [manager.start_job(_COMMAND_SPEC, None) for _ in range(4)]
+
+        # Only two workers should start, for the first two jobs.
+        self.assertEqual(len(self._processes), 2)
+        self._assert_worker_jobs(manager, job_ids[:2])
+        self._assert_pending_jobs(manager, job_ids[2:])
+
+        for process, job_id in zip(self._processes, job_ids):
+            job = process.worker.job_queue.get(timeout=5)
+            self.assertEqual(job.job_id, job_id)
+            self.assertEqual(job.command_spec, _COMMAND_SPEC)
+
+        # When the second worker finishes its job, it should get the
+        # first pending job.
+        manager._dispatch(('finished', 2, None))
+
+        self.assertEqual(len(self._processes), 2)
+        self._assert_worker_jobs(manager, [job_ids[0], job_ids[2]])
+        self._assert_pending_jobs(manager, job_ids[3:])
+
+        job = self._processes[1].worker.job_queue.get(timeout=5)
+        self.assertEqual(job.job_id, job_ids[2])
+
+        # When both workers finish their jobs, one should get the last
+        # pending job and the other should be idle.
+        manager._dispatch(('finished', 1, None))
+        manager._dispatch(('finished', 2, None))
+
+        self._assert_worker_jobs(manager, [job_ids[3], None])
+        self._assert_pending_jobs(manager, [])
+        self.assertEqual(len(self._processes), 2)
+
+
+    def _assert_worker_jobs(self, manager, job_ids):
+        self.assertEqual([w.job_id for w in manager._workers], job_ids)
+
+
+    def _assert_pending_jobs(self, manager, job_ids):
+        self.assertEqual(
+            [j.job_id for j in manager._pending_jobs], job_ids)
+
+
+    def test_stop_pending_job(self):
+
+        manager = JobManager(1)
+
+        job_ids = [manager.start_job(_COMMAND_SPEC, None) for _ in range(3)]
+
+        manager.stop_job(job_ids[1])
+
+        self._assert_pending_jobs(manager, job_ids[2:])
+        self._assert_job_status(job_ids[1], 'Interrupted')
+        self.assertIsNotNone(Job.objects.get(id=job_ids[1]).end_time)
+
+        # The running job should be unaffected.
+        self._assert_worker_jobs(manager, job_ids[:1])
+        self.assertFalse(self._processes[0].worker.stop_event.is_set())
+        self._assert_job_status(job_ids[0], 'Unstarted')
+
+        # The stopped job should not be started.
+        manager._dispatch(('finished', 1, None))
+        self._assert_worker_jobs(manager, job_ids[2:])
+
+
+    def _assert_job_status(self, job_id, status):
+        self.assertEqual(Job.objects.get(id=job_id).status, status)
+
+
+    def test_stop_running_job(self):
+
+        manager = JobManager(1)
+
+        job_ids = [manager.start_job(_COMMAND_SPEC, None) for _ in range(2)]
+
+        stop_event = self._processes[0].worker.stop_event
+
+        manager.stop_job(job_ids[0])
+
+        # The job manager should ask the worker to stop the job, but
+        # leave the job to end on its own.
+        self.assertTrue(stop_event.is_set())
+        self._assert_worker_jobs(manager, job_ids[:1])
+        self._assert_pending_jobs(manager, job_ids[1:])
+
+        # The stop request should be cleared when the worker gets its
+        # next job.
+        manager._dispatch(('finished', 1, None))
+        self._assert_worker_jobs(manager, job_ids[1:])
+        self.assertFalse(stop_event.is_set())
+
+
+    def test_dead_worker_replacement(self):
+
+        manager = JobManager(2)
+
+        job_ids = [manager.start_job(_COMMAND_SPEC, None) for _ in range(3)]
+
+        # Terminate the first worker while it runs the first job.
+        self._processes[0].terminate(exit_code=-9)
+
+        with self.assertLogs(job_manager_module._logger, 'WARNING') as logs:
+            manager._dispatch(None)
+
+        self.assertIn('Job worker 1 terminated unexpectedly', logs.output[0])
+
+        # The job of the dead worker should have failed, and a new
+        # worker should have been started for the pending job.
+        self._assert_job_status(job_ids[0], 'Failed')
+        self.assertEqual(len(self._processes), 3)
+        self.assertEqual(
+            [w.worker_num for w in manager._workers], [2, 3])
+        self._assert_worker_jobs(manager, job_ids[1:])
+        self._assert_pending_jobs(manager, [])
+
+        # Terminating an idle worker should not fail any jobs.
+        manager._dispatch(('finished', 3, None))
+        self._processes[2].terminate(exit_code=1)
+
+        with self.assertLogs(job_manager_module._logger, 'WARNING'):
+            manager._dispatch(None)
+
+        self._assert_job_status(job_ids[2], 'Unstarted')
+        self.assertEqual([w.worker_num for w in manager._workers], [2])
+
+
+    def test_stats(self):
+
+        manager = JobManager(2)
+
+        stats = manager.get_stats()
+        self.assertEqual(stats.worker_count, 0)
+        self.assertEqual(stats.started_job_count, 0)
+        self.assertIsNone(stats.mean_queue_wait_time)
+        self.assertIsNone(stats.max_startup_time)
+
+        for _ in range(3):
+            manager.start_job(_COMMAND_SPEC, None)
+
+        manager._dispatch(('ready', 1, Bunch(startup_time=2)))
+        manager._dispatch(('ready', 2, Bunch(startup_time=3)))
+
+        manager._dispatch(
+            ('started', 1, Bunch(queue_wait_time=2, startup_time=.1)))
+        manager._dispatch(
+            ('started', 2, Bunch(queue_wait_time=4, startup_time=.3)))
+
+        stats = manager.get_stats()
+        self.assertEqual(stats.pending_job_count, 1)
+        self.assertEqual(stats.running_job_count, 2)
+        self.assertEqual(stats.worker_count, 2)
+        self.assertEqual(stats.worker_startup_times, [2, 3])
+        self.assertEqual(stats.started_job_count, 2)
+        self.assertEqual(stats.finished_job_count, 0)
+        self.assertEqual(stats.mean_queue_wait_time, 3)
+        self.assertEqual(stats.max_queue_wait_time, 4)
+        self.assertAlmostEqual(stats.mean_startup_time, .2)
+        self.assertEqual(stats.max_startup_time, .3)
+
+        manager._dispatch(('finished', 1, None))
+
+        stats = manager.get_stats()
+        self.assertEqual(stats.pending_job_count, 0)
+        self.assertEqual(stats.running_job_count, 2)
+        self.assertEqual(stats.finished_job_count, 1)
+
+
+class _FakeProcess:
+
+    """Stand-in for a job worker process."""
+
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.exitcode = None
+        self._alive = False
+
+
+    def start(self):
+        self._alive = True
+
+
+    def is_alive(self):
+        return self._alive
+
+
+    def terminate(self, exit_code):
+        self._alive = False
+        self.exitcode = exit_code
+
+
+    def join(self):
+        pass
+
+
+class _FakeThread:
+
+    """Stand-in for the job dispatcher thread, which does not run."""
+
+
+    def __init__(self, target, name, daemon):
+        pass
+
+
+    def start(self):
+        pass
@@ -0,0 +1,111 @@
+from multiprocessing import Event
+from queue import Queue
+from unittest.mock import patch
+
+from django.db import connections
+
+from vesper.django.app.models import Processor
+from vesper.django.app.tests.dtest_case import TestCase
+from vesper.singleton.extension_manager import extension_manager
+from vesper.util.bunch import Bunch
+import vesper.birdvox.detectors as birdvox_detectors
+import vesper.command.job_runner as job_runner
+import vesper.util.archive_lock as archive_lock
+
+
+_DETECTOR_NAME = 'BirdVoxDetect 0.5.0 FT 30'
+
+
+class JobRunnerTests(TestCase):
+
+    """
+    Tests of the `run_job_worker` function.
+
+    The tests run a job worker in the test process, replacing the
+    function that runs each job with one that records whether or not
+    a BirdVoxDetect detector is among the detector extensions that the
+    job sees.
+    """
+
+
+    def setUp(self):
+
+        archive_lock.create_lock()
+
+        # Start and end with no archive detector extensions loaded.
+        self._unload_archive_extensions()
+        self.addCleanup(self._unload_archive_extensions)
+
+        patchers = [
+
+            # Django is already set up in the test process.
+            patch.object(job_runner.django_utils, 'set_up_django'),
+
+            # Closing database connections would break the transaction
+            # of the test.
+            patch.object(connections, 'close_all'),
+
+        ]
+
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+    def _unload_archive_extensions(self):
+        extension_manager._extensions['Detector'] = None
+        birdvox_detectors.unload_detector_classes()
+
+
+    def test_detector_created_between_jobs(self):
+
+        detector_visibilities = []
+        detector_extensions = []
+
+        def run_job(job_info, worker_info):
+
+            extensions = extension_manager.get_extensions('Detector')
+            detector_visibilities.append(_DETECTOR_NAME in extensions)
+            detector_extensions.append(extensions)
+
+            # Create detector after first job.
+            if job_info.job_id == 1:
+                Processor.objects.create(name=_DETECTOR_NAME, type='Detector')
+
+        with patch.object(job_runner, '_run_job', run_job):
+            self._run_job_worker(3)
+
+        # The detector should be visible to the jobs that started
+        # after it was created.
+        self.assertEqual(detector_visibilities, [False, True, True])
+
+        # The extensions should be reloaded only when the archive
+        # database changes.
+        self.assertIsNot(detector_extensions[0], detector_extensions[1])
+        self.assertIs(detector_extensions[1], detector_extensions[2])
+
+
+    def _run_job_worker(self, job_count):
+
+        job_queue = Queue()
+        event_queue = Queue()
+
+        for i in range(job_count):
+            job_queue.put(Bunch(job_id=i + 1))
+
+        job_queue.put(None)
+
+        worker_info = Bunch(
+            worker_num=1,
+            archive_lock=archive_lock.get_lock(),
+            stop_event=Event(),
+            job_queue=job_queue,
+            event_queue=event_queue)
+
+        job_runner.run_job_worker(worker_info)
+
+        events = []
+        while not event_queue.empty():
+            events.append(event_queue.get()[0])
+
+        self.assertEqual(events, ['ready'] + ['finished'] * job_count)
@@ -15,6 +15,7 @@ urlpatterns = [
     path('clip-album/', views.clip_album, name='clip-album'),
     path('night/', views.night, name='night'),
     
+    path('get-clips/', views.get_clips, name='get-clips'),
     path('get-clip-audios/', views.get_clip_audios, name='get-clip-audios'),
         
     path('get-clip-metadata/', views.get_clip_metadata,
@@ -79,6 +80,8 @@ if not settings.VESPER_ARCHIVE_READ_ONLY:
         path('refresh-recording-audio-file-paths/',
              views.refresh_recording_audio_file_paths,
              name='refresh-recording-audio-file-paths'),
+        path('rebuild-clip-counts/', views.rebuild_clip_counts,
+             name='rebuild-clip-counts'),
         path('add-recording-audio-files/', views.add_recording_audio_files,
              name='add-recording-audio-files'),
         path('add-old-bird-clip-start-indices/',
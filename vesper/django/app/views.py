@@ -1,17 +1,19 @@
 from collections import defaultdict
 from urllib.parse import quote
 import datetime
-import itertools
 import json
 import logging
 
+from asgiref.sync import sync_to_async
 from django import forms, urls
-from django.db import connection, reset_queries, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, reset_queries
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from django.http import (
     Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed,
-    HttpResponseRedirect, JsonResponse)
+    HttpResponseBadRequest, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import NoReverseMatch, reverse
 from django.views.decorators.csrf import csrf_exempt
@@ -41,6 +43,7 @@ from vesper.django.app.import_metadata_form import ImportMetadataForm
 from vesper.django.app.import_recordings_form import ImportRecordingsForm
 from vesper.django.app.models import (
     AnnotationInfo, Clip, Job, StringAnnotation, Tag, TagInfo)
+from vesper.django.app.rebuild_clip_counts_form import RebuildClipCountsForm
 from vesper.django.app.refresh_recording_audio_file_paths_form import \
     RefreshRecordingAudioFilePathsForm
 from vesper.django.app.tag_clips_form import TagClipsForm
@@ -202,6 +205,9 @@ _DEFAULT_NAVBAR_DATA_READ_WRITE = yaml_utils.load(f'''
       - name: Refresh recording audio file paths
         url_name: refresh-recording-audio-file-paths
         
+      - name: Rebuild clip counts
+        url_name: rebuild-clip-counts
+        
       # - name: Add recording audio files
       #   url_name: add-recording-audio-files
         
@@ -415,7 +421,8 @@ def _create_detect_command_spec(form):
             'start_date': data['start_date'],
             'end_date': data['end_date'],
             'schedule': data['schedule'],
-            'defer_clip_creation': data['defer_clip_creation']
+            'defer_clip_creation': data['defer_clip_creation'],
+            'worker_count': data['worker_count']
         }
     }
 
@@ -883,6 +890,36 @@ def _create_refresh_recording_audio_file_paths_command_spec(form):
     }
 
 
+@login_required
+def rebuild_clip_counts(request):
+
+    if request.method in _GET_AND_HEAD:
+        form = RebuildClipCountsForm()
+
+    elif request.method == 'POST':
+
+        form = RebuildClipCountsForm(request.POST)
+
+        if form.is_valid():
+            command_spec = _create_rebuild_clip_counts_command_spec(form)
+            return _start_job(command_spec, request.user)
+
+    else:
+        return HttpResponseNotAllowed(('GET', 'HEAD', 'POST'))
+
+    context = _create_template_context(request, 'Admin', form=form)
+
+    return render(request, 'vesper/rebuild-clip-counts.html', context)
+
+
+def _create_rebuild_clip_counts_command_spec(form):
+
+    return {
+        'name': 'rebuild_clip_counts',
+        'arguments': {}
+    }
+
+
 @login_required
 def delete_recordings(request):
 
@@ -1210,42 +1247,113 @@ def _get_presets_json(preset_type_name):
 @csrf_exempt
 def get_clip_audios(request):
     if request.method == 'POST':
-        return view_utils.handle_json_post(request, _get_clip_audios_aux)
+        asgi = isinstance(request, ASGIRequest)
+        return view_utils.handle_json_post(
+            request, _get_clip_audios_aux, asgi)
     else:
         return HttpResponseNotAllowed(['POST'])
 
 
-# TODO: Handle errors better in this method. Currently, it responds
-# either with all of the requested clip audios or a server error,
-# even if, say, all but one of the audios are available. A better
-# approach would be to return all of the audios that are available,
-# and some sort of error message for each one that is not.
-def _get_clip_audios_aux(content):
+_AUDIO_ERROR_RECORD_FLAG = 0x80000000
+"""
+Flag that distinguishes error records from audio records in the content
+of a `get-clip-audios` response.
+
+The response content is a sequence of records, one per requested clip,
+in the order of the requested clip IDs. Each record comprises a 32-bit
+little-endian unsigned integer header followed by a payload. For an
+audio record the header is the size in bytes of the payload, a WAVE
+audio file. For an error record the header is the size of the payload,
+a UTF-8 encoded error message, with this flag set.
+"""
+
+
+def _get_clip_audios_aux(content, asgi):
     
     # reset_queries()
 
     clip_ids = content['clip_ids']
 
     # TODO: Limit number of clip IDs per query?
-    clips = Clip.objects.filter(id__in=clip_ids)
+    clips = Clip.objects.filter(id__in=clip_ids).select_related(
+        'station', 'mic_output', 'creating_processor')
 
     # Ensure that clips are ordered as in `clip_ids`.
     clips = {clip.id: clip for clip in clips}
-    clips = [clips[id] for id in clip_ids]
+    clips = [clips.get(id) for id in clip_ids]
 
-    audios = clip_manager.get_audio_file_contents(clips)
+    # Get clip strings for error messages now, so that we do not
+    # query the database while streaming the response.
+    clip_strings = [
+        None if clip is None else str(clip) for clip in clips]
+
+    # Get clip audios, starting reads for clips that exist.
+    existing_clips = [clip for clip in clips if clip is not None]
+    audios = clip_manager.generate_audio_file_contents(existing_clips)
 
-    # Concatenate alternating binary audio sizes and audios to make
-    # response content.
-    audio_sizes = [_get_uint32_bytes(len(a)) for a in audios]
-    pairs = zip(audio_sizes, audios)
-    parts = itertools.chain.from_iterable(pairs)
-    content = b''.join(parts)
-    
     # _show_queries('_get_clip_audios_aux')
 
-    # Construct response
-    return HttpResponse(content, content_type='application/octet-stream')
+    # Stream response content, so that the client can receive the
+    # audios of some clips while those of others are still being read,
+    # and so that we do not hold all of the audios in memory at once.
+    records = _generate_clip_audio_records(clip_ids, clip_strings, audios)
+    
+    if asgi:
+        # Under ASGI, Django consumes a synchronous iterator of
+        # streaming response content all at once, so we stream from
+        # an asynchronous one instead.
+        records = _generate_clip_audio_records_async(records)
+        
+    return StreamingHttpResponse(
+        records, content_type='application/octet-stream')
+
+
+def _generate_clip_audio_records(clip_ids, clip_strings, audios):
+
+    for clip_id, clip_string in zip(clip_ids, clip_strings):
+
+        if clip_string is None:
+            message = f'Clip {clip_id} does not exist.'
+            yield _create_audio_error_record(message)
+
+        else:
+
+            audio, exception = next(audios)
+
+            if exception is None:
+                yield _get_uint32_bytes(len(audio)) + audio
+
+            else:
+
+                _logger.error(
+                    f'Attempt to get audio for clip "{clip_string}" failed '
+                    f'with {exception.__class__.__name__} exception. '
+                    f'Exception message was: {str(exception)}')
+
+                message = f'Could not get audio for clip {clip_id}.'
+                yield _create_audio_error_record(message)
+
+
+async def _generate_clip_audio_records_async(records):
+    
+    # Advance the synchronous record generator, which waits for clip
+    # audio reads, in a worker thread so we don't block the event loop.
+    get_next_record = sync_to_async(next)
+    
+    while True:
+        
+        record = await get_next_record(records, None)
+        
+        if record is None:
+            break
+        
+        yield record
+
+
+def _create_audio_error_record(message):
+    message = message.encode('utf-8')
+    header = _get_uint32_bytes(len(message) | _AUDIO_ERROR_RECORD_FLAG)
+    return header + message
     
 
 def _show_queries(name):
@@ -1400,11 +1508,12 @@ def _edit_clip_metadata(request, edit_function, *args):
         # which no other threads or processes can hold it. This
         # method is several times faster this way, and since it
         # is typically invoked interactively, the improved
-        # performance is especially important.
-        with archive_lock.atomic():
-            with transaction.atomic():
-                edit_function(
-                    clip_ids, creation_time, creating_user, content, *args)
+        # performance is especially important. The archive writer
+        # also combines edits requested concurrently by different
+        # users into one transaction.
+        archive_lock.write(
+            edit_function, clip_ids, creation_time, creating_user,
+            content, *args)
                 
         return HttpResponse()
 
@@ -1850,12 +1959,9 @@ def night(request):
     annotation_ui_value_specs = \
         archive.get_visible_string_annotation_ui_value_specs(annotation_name)
     annotation_value_spec = params['classification']
-    annotation_name, annotation_value = \
-        _get_string_annotation_info(annotation_name, annotation_value_spec)
 
     tag_specs = archive.get_tag_specs()
     tag_spec = _get_tag_spec(tag_specs, params, preferences)
-    tag_name = _get_tag_name(tag_spec)
 
     date_string = params['date']
     date = time_utils.parse_date(*date_string.split('-'))
@@ -1866,16 +1972,6 @@ def night(request):
     recordings = model_utils.get_recordings(station, mic_output, time_interval)
     recordings_json = _get_recordings_json(recordings, station)
 
-    clips = model_utils.get_clips(
-        station=station,
-        mic_output=mic_output,
-        date=date,
-        detector=detector,
-        annotation_name=annotation_name,
-        annotation_value=annotation_value,
-        tag_name=tag_name)
-    clips_json = _get_clips_json(clips, station)
-
     page_num = params.get('page', 1)
     
     settings_presets_json = _get_presets_json('Clip Album Settings')
@@ -1897,7 +1993,6 @@ def night(request):
         date=date_string,
         solar_event_times_json=solar_event_times_json,
         recordings_json=recordings_json,
-        clips_json=clips_json,
         time_zone_name=station.time_zone,
         page_num = page_num,
         settings_presets_json=settings_presets_json,
@@ -1946,17 +2041,6 @@ def _get_recording_dict(recording):
     }
 
 
-def _get_clips_json(clips, station):
-    clip_lists = [_get_clip_list(c) for c in clips]
-    result = json.dumps(clip_lists)
-    return result
-
-
-def _get_clip_list(c):
-    start_time = _format_time(c.start_time)
-    return [c.id, c.start_index, c.length, c.sample_rate, start_time]
-
-
 def _format_time(time):
 
     """
@@ -2028,15 +2112,7 @@ def clip_album(request):
 
     d = _get_clip_filter_data(params, preferences)
 
-    station, mic_output = d.sm_pair
-    clips = model_utils.get_clips(
-        station=station,
-        mic_output=mic_output,
-        detector=d.detector,
-        annotation_name=d.annotation_name,
-        annotation_value=d.annotation_value,
-        tag_name=d.tag_name)
-    clips_json = _get_clips_json(clips, station)
+    station, _ = d.sm_pair
     
     page_num = params.get('page', 1)
 
@@ -2058,7 +2134,6 @@ def clip_album(request):
         tag=d.tag_spec,
         solar_event_times_json='null',
         recordings_json='[]',
-        clips_json=clips_json,
         time_zone_name=station.time_zone,
         page_num=page_num,
         settings_presets_json=settings_presets_json,
@@ -2125,6 +2200,111 @@ def _render_clip_album(request, context):
     return render(request, 'vesper/clip-album.html', context)
 
 
+_DEFAULT_CLIP_PAGE_SIZE = 1000
+_MAX_CLIP_PAGE_SIZE = 10000
+
+_CLIP_PAGE_FIELD_NAMES = (
+    'id', 'start_index', 'length', 'sample_rate', 'start_time')
+
+
+def get_clips(request):
+    
+    """
+    Gets one page of the clips of a clip album as JSON.
+    
+    The `station_mic`, `detector`, `classification`, and `tag` query
+    parameters specify the clips as for the `clip_album` view, and the
+    optional `date` query parameter restricts them to one night as for
+    the `night` view. The optional `after` query parameter is the
+    cursor returned with the previous page, and the optional `limit`
+    query parameter is the maximum number of clips of the page.
+    
+    The response is a JSON object with two properties. The `clips`
+    property is a list of `[id, start_index, length, sample_rate,
+    start_time]` clip lists, in order of clip start time. The `next`
+    property is the cursor of the next page, or `null` if there are
+    no more clips.
+    """
+    
+    if request.method not in _GET_AND_HEAD:
+        return HttpResponseNotAllowed(_GET_AND_HEAD)
+    
+    params = request.GET
+    
+    try:
+        date = _parse_clip_page_date(params.get('date'))
+        after = _parse_clip_page_cursor(params.get('after'))
+        size = _parse_clip_page_size(params.get('limit'))
+    except (TypeError, ValueError) as e:
+        return HttpResponseBadRequest(str(e))
+    
+    d = _get_clip_filter_data(params, preference_manager.preferences)
+    
+    station, mic_output = d.sm_pair
+    clips = model_utils.get_clips(
+        station=station,
+        mic_output=mic_output,
+        date=date,
+        detector=d.detector,
+        annotation_name=d.annotation_name,
+        annotation_value=d.annotation_value,
+        tag_name=d.tag_name,
+        order=False)
+    
+    rows, after = model_utils.get_clip_page(
+        clips, _CLIP_PAGE_FIELD_NAMES, after, size)
+    
+    clip_lists = [
+        [clip_id, start_index, length, sample_rate, _format_time(start_time)]
+        for clip_id, start_index, length, sample_rate, start_time in rows]
+    
+    return JsonResponse({
+        'clips': clip_lists,
+        'next': _format_clip_page_cursor(after)
+    })
+    
+    
+def _parse_clip_page_date(date):
+    if date is None or date == '':
+        return None
+    else:
+        return time_utils.parse_date(*date.split('-'))
+    
+    
+def _parse_clip_page_cursor(cursor):
+    
+    if cursor is None or cursor == '':
+        return None
+    
+    start_time, clip_id = cursor.rsplit(',', 1)
+    
+    return datetime.datetime.fromisoformat(start_time), int(clip_id)
+
+
+def _format_clip_page_cursor(after):
+    
+    if after is None:
+        return None
+    
+    else:
+        start_time, clip_id = after
+        return f'{start_time.isoformat()},{clip_id}'
+    
+    
+def _parse_clip_page_size(size):
+    
+    if size is None or size == '':
+        return _DEFAULT_CLIP_PAGE_SIZE
+    
+    size = int(size)
+    
+    if size < 1 or size > _MAX_CLIP_PAGE_SIZE:
+        raise ValueError(
+            f'Clip page size must be between 1 and {_MAX_CLIP_PAGE_SIZE}.')
+    
+    return size
+
+
 @login_required
 def test_command(request):
 
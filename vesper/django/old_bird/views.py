@@ -7,7 +7,7 @@ from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.views import View
 
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, Processor, Recording, RecordingChannel,
+    AnnotationInfo, Processor, Recording, RecordingChannel,
     StationDevice)
 import vesper.django.app.model_utils as model_utils
 import vesper.django.util.view_utils as view_utils
@@ -141,7 +141,7 @@ class CreateLrgvClipsView(View):
 
         creation_time = time_utils.get_utc_now()
 
-        clip = Clip.objects.create(
+        clip = model_utils.create_clip(
             station=station,
             mic_output=mic_output,
             recording_channel=recording_channel,
@@ -194,12 +194,36 @@ DATABASES = {
 
 VESPER_ARCHIVE_READ_ONLY = env.bool('VESPER_ARCHIVE_READ_ONLY', False)
 
+# The archive lock policy, one of "auto", "process", or "none". The
+# "process" policy serializes archive database writes with a lock
+# shared by all Vesper processes, as SQLite requires. The "none"
+# policy does not, which is appropriate for database servers like
+# PostgreSQL. The "auto" policy is "process" for SQLite archives and
+# "none" for other archives. See `vesper.util.archive_lock`.
+VESPER_ARCHIVE_LOCK_POLICY = env('VESPER_ARCHIVE_LOCK_POLICY', 'auto')
+
+# Set this `True` to use SQLite's write-ahead log journal mode for
+# SQLite archives, so that archive queries are not blocked by writes.
+VESPER_ARCHIVE_SQLITE_WAL = env.bool('VESPER_ARCHIVE_SQLITE_WAL', True)
+
 VESPER_PRESETS_STATIC = env.bool('VESPER_PRESETS_STATIC', True)
 
 VESPER_PREFERENCES_STATIC = env.bool('VESPER_PREFERENCES_STATIC', True)
 
 VESPER_ADMIN_URL_PATTERN = env('VESPER_ADMIN_URL_PATTERN', 'admin/')
 
+# The maximum total size in bytes of the clip features (for example,
+# resampled clip waveforms) that classifiers cache in the "Clip Feature
+# Cache" directory of the archive directory. Set this zero to disable
+# feature caching.
+VESPER_CLIP_FEATURE_CACHE_MAX_SIZE = env.int(
+    'VESPER_CLIP_FEATURE_CACHE_MAX_SIZE', 2 ** 30)
+
+# The maximum number of Vesper jobs (for example, detection or export
+# jobs) that can run at once. Jobs submitted when this many are running
+# wait in a queue until one finishes.
+VESPER_MAX_CONCURRENT_JOBS = env.int('VESPER_MAX_CONCURRENT_JOBS', 4)
+
 # Set this `True` if and only if you want to include the TensorFlow-based
 # detector and classifier extensions in the Vesper core server. These are
 # mostly the MPG Ranch detectors and classifiers. They will move out of
@@ -9,7 +9,6 @@ or alter the classification of a clip that has already been classified.
 
 
 from vesper.command.annotator import Annotator
-import vesper.django.app.model_utils as model_utils
 import vesper.util.nfc_coarse_classifier as nfc_coarse_classifier
 
 
@@ -25,25 +24,20 @@ class CoarseClassifier(Annotator):
             (name, create(name)) for name in ('Tseep', 'Thrush'))
     
     
-    def annotate(self, clip):
+    def annotate_clips(self, clips):
         
-        annotated = False
+        # Get unclassified clips.
+        classifications = self._get_annotation_values(clips)
+        clips = [c for c, v in zip(clips, classifications) if v is None]
         
-        classification = self._get_annotation_value(clip)
+        # Get classifiers of clips detected by Old Bird Tseep or Thrush.
+        clip_types = self._get_clip_types(clips)
+        classifiers = dict(
+            (c.id, self._classifiers.get(t))
+            for c, t in zip(clips, clip_types))
+        clips = [c for c in clips if classifiers[c.id] is not None]
         
-        if classification is None:
-            # clip is unclassified
-            
-            clip_type = model_utils.get_clip_type(clip)
+        def classify(clip):
+            return classifiers[clip.id].classify_clip(clip)
         
-            if clip_type is not None:
-                # clip was detected by Old Bird Tseep or Thrush
-                
-                classifier = self._classifiers[clip_type]
-                classification = classifier.classify_clip(clip)
-                
-                if classification is not None:
-                    self._annotate(clip, classification)
-                    annotated = True
-                    
-        return annotated
+        return self._annotate_clips_individually(clips, classify)
@@ -19,7 +19,6 @@ from vesper.django.app.models import AnnotationInfo
 from vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.inferrer \
     import Inferrer
 from vesper.singleton.clip_manager import clip_manager
-import vesper.django.app.model_utils as model_utils
 import vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.dataset_utils \
     as dataset_utils
 import vesper.util.open_mp_utils as open_mp_utils
@@ -76,6 +75,9 @@ class Annotator(AnnotatorBase):
                
         self._annotation_infos = _get_annotation_infos()
         
+        self._classification_annotation_info = \
+            _get_annotation_info(_CLASSIFICATION_ANNOTATION_NAME)
+        
  
     def annotate_clips(self, clips):
         
@@ -97,15 +99,16 @@ class Annotator(AnnotatorBase):
                 
                 bounds = inferrer.get_call_bounds(waveform_dataset)
                 
-                for clip, (start_index, end_index) in zip(clips, bounds):
-                    
-                    self._annotate_clip(
-                        clip, _START_INDEX_ANNOTATION_NAME, start_index,
-                        inference_sample_rate)
-                    
-                    self._annotate_clip(
-                        clip, _END_INDEX_ANNOTATION_NAME, end_index,
-                        inference_sample_rate)
+                start_indices = [b[0] for b in bounds]
+                end_indices = [b[1] for b in bounds]
+                
+                self._annotate_clips_aux(
+                    clips, _START_INDEX_ANNOTATION_NAME, start_indices,
+                    inference_sample_rate)
+                
+                self._annotate_clips_aux(
+                    clips, _END_INDEX_ANNOTATION_NAME, end_indices,
+                    inference_sample_rate)
                     
                 annotated_clip_count += len(clips)
                 
@@ -117,12 +120,18 @@ class Annotator(AnnotatorBase):
         """Gets a mapping from clip types to lists of call clips."""
         
         
+        # Get call clips.
+        classifications = self._get_annotation_values(
+            clips, self._classification_annotation_info)
+        clips = [
+            clip for clip, classification in zip(clips, classifications)
+            if _is_call_classification(classification)]
+        
         # Get mapping from clip types to call clip lists.
+        clip_types = self._get_clip_types(clips)
         clip_lists = defaultdict(list)
-        for clip in clips:
-            if _is_call_clip(clip):
-                clip_type = model_utils.get_clip_type(clip)
-                clip_lists[clip_type].append(clip)
+        for clip, clip_type in zip(clips, clip_types):
+            clip_lists[clip_type].append(clip)
         
         return clip_lists
     
@@ -169,26 +178,17 @@ class Annotator(AnnotatorBase):
         return samples
 
 
-    def _annotate_clip(
-            self, clip, annotation_name, index, inference_sample_rate):
+    def _annotate_clips_aux(
+            self, clips, annotation_name, indices, inference_sample_rate):
         
-        # If needed, modify index to account for difference between
-        # clip and inference sample rates.
-        if clip.sample_rate != inference_sample_rate:
-            factor = clip.sample_rate / inference_sample_rate
-            index = int(round(index * factor))
-            
-        # Make index a recording index rather than a clip index.
-        index += clip.start_index
+        annotation_values = [
+            str(_convert_clip_index_to_recording_index(
+                clip, index, inference_sample_rate))
+            for clip, index in zip(clips, indices)]
             
         annotation_info = self._annotation_infos[annotation_name]
-        annotation_value = str(index)
         
-        model_utils.annotate_clip(
-            clip, annotation_info, annotation_value,
-            creating_user=self._creating_user,
-            creating_job=self._creating_job,
-            creating_processor=self._creating_processor)
+        self._annotate_batch(clips, annotation_values, annotation_info)
         
         
 def _create_inferrer(clip_type):
@@ -209,9 +209,7 @@ def _get_annotation_info(name):
         raise ValueError(f'Unrecognized annotation "{name}".')
 
 
-def _is_call_clip(clip):
-    annotations = model_utils.get_clip_annotations(clip)
-    classification = annotations.get(_CLASSIFICATION_ANNOTATION_NAME)
+def _is_call_classification(classification):
     return classification is not None and classification.startswith('Call')
 
 
@@ -22,7 +22,6 @@ from vesper.mpg_ranch.nfc_coarse_classifier_2_1.feature_computer import \
     FeatureComputer
 from vesper.singleton.clip_manager import clip_manager
 from vesper.util.settings import Settings
-import vesper.django.app.model_utils as model_utils
 import vesper.mpg_ranch.nfc_coarse_classifier_2_1.classifier_utils as \
     classifier_utils
 import vesper.util.open_mp_utils as open_mp_utils
@@ -45,28 +44,23 @@ class Classifier(Annotator):
             (t, _Classifier(t)) for t in ('Thrush', 'Tseep'))
         
         
-    def annotate(self, clip):
+    def annotate_clips(self, clips):
         
-        annotated = False
+        # Get unclassified clips.
+        classifications = self._get_annotation_values(clips)
+        clips = [c for c, v in zip(clips, classifications) if v is None]
         
-        classification = self._get_annotation_value(clip)
+        # Get classifiers of clips of types for which we have them.
+        clip_types = self._get_clip_types(clips)
+        classifiers = dict(
+            (c.id, self._classifiers.get(t))
+            for c, t in zip(clips, clip_types))
+        clips = [c for c in clips if classifiers[c.id] is not None]
         
-        if classification is None:
-            # clip is unclassified
-            
-            clip_type = model_utils.get_clip_type(clip)
-            classifier = self._classifiers.get(clip_type)
-        
-            if classifier is not None:
-                # clip is of a type for which we have a classifier
-                
-                classification = classifier.classify(clip)
-                
-                if classification is not None:
-                    self._annotate(clip, classification)
-                    annotated = True
-                    
-        return annotated
+        def classify(clip):
+            return classifiers[clip.id].classify(clip)
+        
+        return self._annotate_clips_individually(clips, classify)
     
 
 class _Classifier:
@@ -114,16 +114,18 @@ class Classifier(Annotator):
         """Gets a mapping from clip types to lists of clips to classify."""
         
         
+        if not _EVALUATION_MODE_ENABLED:
+            # classify only unclassified clips
+            
+            values = self._get_annotation_values(clips)
+            clips = [c for c, v in zip(clips, values) if v is None]
+            
+        clip_types = self._get_clip_types(clips)
+        
         clip_lists = defaultdict(list)
         
-        for clip in clips:
-            
-            if _EVALUATION_MODE_ENABLED or \
-                    self._get_annotation_value(clip) is None:
-                # clip should be classified
-                
-                clip_type = model_utils.get_clip_type(clip)
-                clip_lists[clip_type].append(clip)
+        for clip, clip_type in zip(clips, clip_types):
+            clip_lists[clip_type].append(clip)
                 
         return clip_lists
  
@@ -134,6 +136,11 @@ class Classifier(Annotator):
         
         
         num_clips_classified = 0
+        
+        # Clips and classifications for normal mode, which we annotate
+        # in batches after classifying all of the clips.
+        classified_clips = []
+        classifications = []
             
         triples = classifier.classify_clips(clips)
         
@@ -160,8 +167,11 @@ class Classifier(Annotator):
                 else:
                     # normal mode
                     
-                    self._annotate(clip, auto_classification)
+                    classified_clips.append(clip)
+                    classifications.append(auto_classification)
                     num_clips_classified += 1
+                    
+        self._annotate_batch(classified_clips, classifications)
                         
         return num_clips_classified
 
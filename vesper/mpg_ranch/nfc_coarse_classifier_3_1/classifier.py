@@ -25,12 +25,11 @@ import logging
 
 import numpy as np
 import resampy
-import tensorflow as tf
 
 from vesper.command.annotator import Annotator
 from vesper.django.app.models import AnnotationInfo
 from vesper.singleton.clip_manager import clip_manager
-from vesper.util.settings import Settings
+from vesper.singleton.model_registry import model_registry
 import vesper.django.app.model_utils as model_utils
 import vesper.mpg_ranch.nfc_coarse_classifier_3_1.classifier_utils as \
     classifier_utils
@@ -38,7 +37,6 @@ import vesper.mpg_ranch.nfc_coarse_classifier_3_1.dataset_utils as \
     dataset_utils
 import vesper.util.open_mp_utils as open_mp_utils
 import vesper.util.signal_utils as signal_utils
-import vesper.util.yaml_utils as yaml_utils
 
 
 _EVALUATION_MODE_ENABLED = False
@@ -122,16 +120,18 @@ class Classifier(Annotator):
         """Gets a mapping from clip types to lists of clips to classify."""
         
         
+        if not _EVALUATION_MODE_ENABLED:
+            # classify only unclassified clips
+            
+            values = self._get_annotation_values(clips)
+            clips = [c for c, v in zip(clips, values) if v is None]
+            
+        clip_types = self._get_clip_types(clips)
+        
         clip_lists = defaultdict(list)
         
-        for clip in clips:
-            
-            if _EVALUATION_MODE_ENABLED or \
-                    self._get_annotation_value(clip) is None:
-                # clip should be classified
-                
-                clip_type = model_utils.get_clip_type(clip)
-                clip_lists[clip_type].append(clip)
+        for clip, clip_type in zip(clips, clip_types):
+            clip_lists[clip_type].append(clip)
                 
         return clip_lists
  
@@ -142,6 +142,11 @@ class Classifier(Annotator):
         
         
         num_clips_classified = 0
+        
+        # Clips and classifications for normal mode, which we annotate
+        # in batches after classifying all of the clips.
+        classified_clips = []
+        classifications = []
             
         triples = classifier.classify_clips(clips)
         
@@ -168,8 +173,11 @@ class Classifier(Annotator):
                 else:
                     # normal mode
                     
-                    self._annotate(clip, auto_classification)
+                    classified_clips.append(clip)
+                    classifications.append(auto_classification)
                     num_clips_classified += 1
+                    
+        self._annotate_batch(classified_clips, classifications)
                         
         return num_clips_classified
 
@@ -275,8 +283,8 @@ class _Classifier:
         
         self.clip_type = clip_type
         
-        self._model = self._load_model()
         self._settings = self._load_settings()
+        self._model = self._load_model()
         
         # Configure waveform slicing.
         s = self._settings
@@ -291,18 +299,14 @@ class _Classifier:
             self._settings.classification_threshold
     
     
-    def _load_model(self):
-        path = classifier_utils.get_keras_model_file_path(self.clip_type)
-        logging.info(f'Loading classifier model from "{path}"...')
-        return tf.keras.models.load_model(path)
-
-    
     def _load_settings(self):
         path = classifier_utils.get_settings_file_path(self.clip_type)
-        logging.info(f'Loading classifier settings from "{path}"...')
-        text = path.read_text()
-        d = yaml_utils.load(text)
-        return Settings.create_from_dict(d)
+        return model_registry.get_settings(path)
+    
+    
+    def _load_model(self):
+        path = classifier_utils.get_keras_model_file_path(self.clip_type)
+        return model_registry.get_model(path, self._settings)
         
         
     def classify_clips(self, clips):
@@ -23,14 +23,16 @@ were labeled as calls and the others as noises.
 from collections import defaultdict
 import logging
 
+from django.conf import settings as django_settings
 import numpy as np
 import resampy
-import tensorflow as tf
 
+from vesper.archive_paths import archive_paths
 from vesper.command.annotator import Annotator
 from vesper.django.app.models import AnnotationInfo
 from vesper.singleton.clip_manager import clip_manager
-from vesper.util.settings import Settings
+from vesper.singleton.model_registry import model_registry
+from vesper.util.clip_feature_cache import ClipFeatureCache
 import vesper.django.app.model_utils as model_utils
 import vesper.mpg_ranch.nfc_coarse_classifier_4_1.classifier_utils as \
     classifier_utils
@@ -38,7 +40,6 @@ import vesper.mpg_ranch.nfc_coarse_classifier_4_1.dataset_utils as \
     dataset_utils
 import vesper.util.open_mp_utils as open_mp_utils
 import vesper.util.signal_utils as signal_utils
-import vesper.util.yaml_utils as yaml_utils
 
 
 _EVALUATION_MODE_ENABLED = False
@@ -135,6 +136,11 @@ class Classifier(Annotator):
                 num_clips_classified += self._annotate_clips(clips, classifier)
                 
         return num_clips_classified
+    
+    
+    def end_annotations(self):
+        for classifier in self._classifiers.values():
+            classifier.flush_waveform_cache()
                 
                 
     def _get_clip_lists(self, clips):
@@ -142,16 +148,18 @@ class Classifier(Annotator):
         """Gets a mapping from clip types to lists of clips to classify."""
         
         
+        if not _EVALUATION_MODE_ENABLED:
+            # classify only unclassified clips
+            
+            values = self._get_annotation_values(clips)
+            clips = [c for c, v in zip(clips, values) if v is None]
+            
+        clip_types = self._get_clip_types(clips)
+        
         clip_lists = defaultdict(list)
         
-        for clip in clips:
-            
-            if _EVALUATION_MODE_ENABLED or \
-                    self._get_annotation_value(clip) is None:
-                # clip should be classified
-                
-                clip_type = model_utils.get_clip_type(clip)
-                clip_lists[clip_type].append(clip)
+        for clip, clip_type in zip(clips, clip_types):
+            clip_lists[clip_type].append(clip)
                 
         return clip_lists
  
@@ -162,6 +170,11 @@ class Classifier(Annotator):
         
         
         num_clips_classified = 0
+        
+        # Clips and classifications for normal mode, which we annotate
+        # in batches after classifying all of the clips.
+        classified_clips = []
+        classifications = []
             
         triples = classifier.classify_clips(clips)
         
@@ -188,8 +201,11 @@ class Classifier(Annotator):
                 else:
                     # normal mode
                     
-                    self._annotate(clip, auto_classification)
+                    classified_clips.append(clip)
+                    classifications.append(auto_classification)
                     num_clips_classified += 1
+                    
+        self._annotate_batch(classified_clips, classifications)
                         
         return num_clips_classified
 
@@ -302,8 +318,8 @@ class _Classifier:
         
         self.clip_type = clip_type
         
-        self._model = self._load_model()
         self._settings = self._load_settings()
+        self._model = self._load_model()
         
         # Configure waveform slicing.
         s = self._settings
@@ -316,20 +332,67 @@ class _Classifier:
         
         self._classification_threshold = \
             self._settings.classification_threshold
+        
+        self._waveform_cache = self._create_waveform_cache()
     
     
-    def _load_model(self):
-        path = classifier_utils.get_keras_model_file_path(self.clip_type)
-        logging.info(f'Loading classifier model from "{path}"...')
-        return tf.keras.models.load_model(path)
-
-    
     def _load_settings(self):
         path = classifier_utils.get_settings_file_path(self.clip_type)
-        logging.info(f'Loading classifier settings from "{path}"...')
-        text = path.read_text()
-        d = yaml_utils.load(text)
-        return Settings.create_from_dict(d)
+        return model_registry.get_settings(path)
+    
+    
+    def _load_model(self):
+        path = classifier_utils.get_keras_model_file_path(self.clip_type)
+        return model_registry.get_model(path, self._settings)
+        
+        
+    def _create_waveform_cache(self):
+        
+        """
+        Creates a cache of the waveform slices that this classifier
+        classifies, or returns `None` if caching is disabled.
+        
+        Caching waveform slices saves getting clip samples and
+        resampling them when clips are reclassified, for example after
+        a change to the classification threshold.
+        """
+        
+        max_size = django_settings.VESPER_CLIP_FEATURE_CACHE_MAX_SIZE
+        
+        if max_size == 0:
+            return None
+        
+        # Include in the feature settings everything that affects the
+        # waveform slices, so that a change to any of it invalidates
+        # cached slices.
+        feature_settings = {
+            'classifier': Classifier.extension_name,
+            'clip_type': self.clip_type,
+            'feature': 'Waveform',
+            'waveform_sample_rate': self._settings.waveform_sample_rate,
+            'waveform_start_time': self._waveform_start_time,
+            'waveform_duration': self._waveform_duration,
+            'resampy_version': resampy.__version__,
+        }
+        
+        return ClipFeatureCache(
+            archive_paths.clip_feature_cache_dir_path, feature_settings,
+            max_size)
+        
+        
+    def flush_waveform_cache(self):
+        
+        """
+        Writes any pending waveform slices of this classifier's cache
+        to disk.
+        
+        Waveform slices are added to the cache as clips are classified,
+        but written to disk only in full shards until this method is
+        called, which should happen once at the end of a job.
+        """
+        
+        if self._waveform_cache is not None:
+            self._waveform_cache.flush()
         
         
     def classify_clips(self, clips):
@@ -368,26 +431,49 @@ class _Classifier:
     
     def _slice_clip_waveforms(self, clips):
         
+        cache = self._waveform_cache
+        
+        if cache is not None:
+            keys = [(clip.id, clip.start_index) for clip in clips]
+            cached_waveforms = cache.get(keys)
+        else:
+            cached_waveforms = [None] * len(clips)
+        
         waveforms = []
         indices = []
+        new_keys = []
+        new_waveforms = []
         
-        for i, clip in enumerate(clips):
+        for i, (clip, waveform) in enumerate(zip(clips, cached_waveforms)):
             
-            try:
-                waveform = self._get_clip_samples(clip)
+            if waveform is None:
+                # waveform not cached
                 
-            except Exception as e:
+                try:
+                    waveform = self._get_clip_samples(clip)
+                    
+                except Exception as e:
+                    
+                    logging.warning((
+                        'Could not classify clip "{}", since its '
+                        'samples could not be obtained. Error message was: '
+                        '{}').format(str(clip), str(e)))
+                    
+                    continue
                 
-                logging.warning((
-                    'Could not classify clip "{}", since its '
-                    'samples could not be obtained. Error message was: '
-                    '{}').format(str(clip), str(e)))
+                # The spectrogram computation casts waveforms to
+                # float32 anyway, so we do it here to halve the size
+                # of cached waveforms.
+                waveform = waveform.astype(np.float32)
                 
-            else:
-                # got clip samples
+                new_keys.append((clip.id, clip.start_index))
+                new_waveforms.append(waveform)
                 
-                waveforms.append(waveform)
-                indices.append(i)
+            waveforms.append(waveform)
+            indices.append(i)
+            
+        if cache is not None and len(new_keys) != 0:
+            cache.put(new_keys, new_waveforms)
                     
         return waveforms, indices
                 
@@ -77,6 +77,37 @@ def _parse_example(example_proto):
     return waveform, label
 
 
+def create_inference_feature_function(
+        settings, feature_name='spectrogram'):
+    
+    """
+    Creates a function that computes inference features for a batch of
+    waveforms.
+    
+    The returned function accepts a two-dimensional tensor of waveforms,
+    one per row, and returns a features dictionary for input to a Keras
+    neural network. The features are the same as those of a dataset
+    created by `create_spectrogram_dataset_from_waveforms_array` in the
+    `DATASET_MODE_INFERENCE` mode. The function can be invoked within
+    a `tf.function`.
+    """
+    
+    preprocessor = _Preprocessor(
+        DATASET_MODE_INFERENCE, settings, feature_name)
+    
+    def compute_features(waveforms):
+        
+        # Slice and cast waveforms as `_Preprocessor.preprocess_waveform`
+        # does in the inference dataset mode.
+        start_index = preprocessor.time_start_index
+        end_index = preprocessor.time_end_index
+        waveforms = tf.cast(waveforms[:, start_index:end_index], tf.float32)
+        
+        return preprocessor.compute_spectrograms(waveforms)
+    
+    return compute_features
+
+
 def _create_spectrogram_dataset(
         waveform_dataset, mode, settings, num_repeats=1, shuffle=False,
         batch_size=1, feature_name='spectrogram'):
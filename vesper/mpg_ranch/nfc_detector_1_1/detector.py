@@ -25,16 +25,29 @@ produced 12094 clips and each of the tseep detectors produced 5476
 clips. The clips produced by corrseponding detectors had exactly the
 same start indices and lengths, and the scores (on a scale of 0 to 100)
 of the clips of each matching pair differed by less than .001.
+
+The detectors resample their input to 24000 Hz with a streaming
+`vesper.signal.resampling_utils.Resampler`, which keeps its filter
+state from one input chunk to the next. The resampled input is thus
+the same as it would be if the input were resampled all at once. The
+detectors resample 22050 Hz and 44100 Hz input at its actual rate.
+Earlier versions of this module resampled such input as though it
+were 22000 Hz or 44000 Hz input, respectively, for speed, so clips
+detected in 22050 Hz and 44100 Hz input may differ slightly from the
+clips detected by those versions.
 """
 
 
+from functools import partial
 import logging
 # import time
 
-import numpy as np
 import tensorflow as tf
 
+from vesper.singleton.model_registry import model_registry
+from vesper.util.detection_front_end import ResamplingStage
 from vesper.util.detection_score_file_writer import DetectionScoreFileWriter
+from vesper.util.inference_batcher import InferenceBatcher
 from vesper.util.sample_buffer import SampleBuffer
 from vesper.util.settings import Settings
 import vesper.mpg_ranch.nfc_coarse_classifier_4_1.classifier_utils \
@@ -132,8 +145,28 @@ class _Detector:
         
         self._input_chunk_start_index = 0
         
+        self._resampled_chunk_start_index = 0
+        """
+        Index of first sample of current chunk of resampled input.
+        
+        Since the resampler's output lags its input slightly, this
+        is not exactly the input chunk start index converted to the
+        classifier sample rate.
+        """
+        
+        self._resampler = None
+        self._front_end = None
+        self._resampling_stage = None
+        
         self._classifier_settings = self._load_classifier_settings()
         self._model = self._load_model()
+        self._score_records = _get_score_function(
+            self._model, self._classifier_settings)
+        
+        # By default a detector has its own inference batcher, which it
+        # processes itself. See the `set_inference_batcher` method.
+        self._inference_batcher = InferenceBatcher()
+        self._inference_batcher_shared = False
         
         s = self._classifier_settings
         
@@ -145,6 +178,13 @@ class _Detector:
             
         fs = s.waveform_sample_rate
         self._classifier_sample_rate = fs
+        
+        if self._classifier_sample_rate != self._input_sample_rate:
+            # need to resample input
+            
+            self._resampler = resampling_utils.Resampler(
+                self._input_sample_rate, self._classifier_sample_rate)
+            
         self._classifier_waveform_length = s2f(s.waveform_duration, fs)
         fraction = self._settings.hop_size / 100
         self._hop_size = s2f(fraction * s.waveform_duration, fs)
@@ -187,25 +227,79 @@ class _Detector:
     def _load_classifier_settings(self):
         s = self._settings
         path = classifier_utils.get_settings_file_path(s.clip_type)
-        logging.info('Loading classifier settings from "{}"...'.format(path))
-        return Settings.create_from_yaml_file(path)
+        return model_registry.get_settings(path)
         
         
     def _load_model(self):
         s = self._settings
         path = classifier_utils.get_keras_model_file_path(s.clip_type)
-        logging.info(f'Loading classifier model from "{path}"...')
-        return tf.keras.models.load_model(path)
+        return model_registry.get_model(path, self._classifier_settings)
 
     
-    def detect(self, samples):
+    def set_front_end(self, front_end):
+        
+        """
+        Sets the detection front end of this detector.
+        
+        When this detector has a front end and must resample its input,
+        it gets resampled input chunks from the front end rather than
+        resampling its input itself. This allows detectors with the same
+        input chunk size (for example, the tseep and thrush detectors of
+        this module) to share a single resampling computation. The
+        detections of the detector are the same with or without a front
+        end.
+        
+        See the `vesper.util.detection_front_end` module for more about
+        detection front ends.
+        """
+        
+        if self._classifier_sample_rate == self._input_sample_rate:
+            # detector does not resample input, so it has no use for
+            # front end
+            
+            return
+        
+        stage = ResamplingStage(
+            self._input_chunk_size, self._input_sample_rate)
+        
+        self._front_end = front_end
+        self._resampling_stage = front_end.add_stage(stage)
         
-        if self._input_buffer is None:
-            self._input_buffer = SampleBuffer(samples.dtype)
-             
-        self._input_buffer.write(samples)
         
-        self._process_input_chunks()
+    def set_inference_batcher(self, batcher):
+        
+        """
+        Sets the inference batcher of this detector.
+        
+        A detector with a shared inference batcher submits its analysis
+        records to the batcher for scoring together with the records of
+        other detectors, for example the detectors of other channels or
+        with other thresholds. The code that runs the detector must
+        process the batcher as described in the
+        `vesper.util.inference_batcher` module. The detections of the
+        detector are the same with or without a shared batcher.
+        """
+        
+        self._inference_batcher = batcher
+        self._inference_batcher_shared = True
+        
+        
+    def detect(self, samples):
+        
+        if self._front_end is not None:
+            self._process_resampled_input_chunks()
+            
+        else:
+            
+            if self._input_buffer is None:
+                self._input_buffer = SampleBuffer(samples.dtype)
+                
+            self._input_buffer.write(samples)
+            
+            self._process_input_chunks()
+            
+        if not self._inference_batcher_shared:
+            self._inference_batcher.process()
             
             
     def _process_input_chunks(self, process_all_samples=False):
@@ -218,48 +312,30 @@ class _Detector:
             
         # If indicated, process any remaining input samples as one chunk.
         # The size of the chunk will differ from `self._input_chunk_size`.
-        if process_all_samples and len(self._input_buffer) != 0:
+        # If we are resampling, we process the final chunk even if it is
+        # empty, to get the final resampled samples.
+        if process_all_samples and \
+                (len(self._input_buffer) != 0 or self._resampler is not None):
             chunk = self._input_buffer.read()
-            self._process_input_chunk(chunk)
+            self._process_input_chunk(chunk, final=True)
+            
             
+    def _process_resampled_input_chunks(self):
+        chunks = self._front_end.get_output(self._resampling_stage)
+        for input_length, samples in chunks:
+            self._process_resampled_input_chunk(samples, input_length)
             
-    def _process_input_chunk(self, samples):
+            
+    def _process_input_chunk(self, samples, final=False):
         
         input_length = len(samples)
         
-        if self._classifier_sample_rate != self._input_sample_rate:
+        if self._resampler is not None:
             # need to resample input
             
-            # When the input sample rate is 22050 Hz or 44100 Hz,
-            # we resample as though it were 22000 Hz or 44000 Hz,
-            # respectively, resulting in an actual resampled rate of
-            # about 24055 Hz rather than 24000 Hz. This allows us to
-            # resample much faster, and has little or no effect on the
-            # clips [NEED TO SHOW THIS] output by the detector, since
-            # the change to the resampled rate is small (only about a
-            # quarter of a percent), and the detector is fairly
-            # insensitive to small changes in the frequency and duration
-            # of NFCs. We account for such sample rate substitutions
-            # when computing the start index in the input signal of a
-            # detected clip in the `_notify_listener_of_clips` method,
-            # below.
-            #
-            # The lack of rigor inherent in this trick will always make
-            # the processing of 22050 Hz and 44100 Hz input a little
-            # questionable. In the future, I hope to obviate the trick by
-            # implementing faster but proper resampling of 22050 Hz and
-            # 44100 Hz input. 
-            if self._input_sample_rate == 22050:
-                self._purported_input_sample_rate = 22000
-            elif self._input_sample_rate == 44100:
-                self._purported_input_sample_rate = 44000
-            else:
-                self._purported_input_sample_rate = self._input_sample_rate
-             
             # start_time = time.time()
             
-            samples = resampling_utils.resample_to_24000_hz(
-                samples, self._purported_input_sample_rate)
+            samples = self._resampler.resample(samples, flush=final)
             
             # processing_time = time.time() - start_time
             # input_duration = input_length / self._input_sample_rate
@@ -269,32 +345,35 @@ class _Detector:
             #     'or {:.1f} times faster than real time.').format(
             #         input_duration, processing_time, rate))
             
-        else:
-            # don't need to resample input
-            
-            self._purported_input_sample_rate = self._input_sample_rate
-            
-        self._waveforms = _get_analysis_records(
-            samples, self._classifier_waveform_length, self._hop_size)
+        self._process_resampled_input_chunk(samples, input_length)
         
-#         print('Scoring chunk waveforms...')
-#         start_time = time.time()
-         
-        s = self._classifier_settings
-        dataset = \
-            dataset_utils.create_spectrogram_dataset_from_waveforms_array(
-                self._waveforms, dataset_utils.DATASET_MODE_INFERENCE, s,
-                batch_size=64, feature_name=s.model_input_name)
-
-        scores = self._model.predict(dataset).flatten()
+        
+    def _process_resampled_input_chunk(self, samples, input_length):
+        
+        if len(samples) < self._classifier_waveform_length:
+            # chunk too short to classify
             
-#         elapsed_time = time.time() - start_time
-#         num_waveforms = self._waveforms.shape[0]
-#         rate = num_waveforms / elapsed_time
-#         print((
-#             'Scored {} waveforms in {:.1f} seconds, a rate of {:.1f} '
-#             'waveforms per second.').format(
-#                 num_waveforms, elapsed_time, rate))
+            self._input_chunk_start_index += input_length
+            self._resampled_chunk_start_index += len(samples)
+            return
+        
+        # Submit analysis records for scoring. The batcher will invoke
+        # `self._process_scores` with the scores, possibly after this
+        # method returns, so we pass it the current chunk start indices.
+        callback = partial(
+            self._process_scores, samples, input_length,
+            self._input_chunk_start_index, self._resampled_chunk_start_index)
+        self._inference_batcher.score(
+            self._score_records, samples, self._classifier_waveform_length,
+            self._hop_size, callback)
+        
+        self._input_chunk_start_index += input_length
+        self._resampled_chunk_start_index += len(samples)
+        
+        
+    def _process_scores(
+            self, samples, input_length, input_chunk_start_index,
+            resampled_chunk_start_index, scores):
         
         if _SCORE_OUTPUT_ENABLED:
             self._score_file_writer.write(samples, scores)
@@ -303,32 +382,32 @@ class _Detector:
             peak_indices = signal_utils.find_peaks(scores, threshold)
             peak_scores = scores[peak_indices]
             self._notify_listener_of_clips(
-                peak_indices, peak_scores, input_length, threshold)
-        
-        self._input_chunk_start_index += input_length
+                peak_indices, peak_scores, input_length,
+                input_chunk_start_index, resampled_chunk_start_index,
+                threshold)
             
 
     def _notify_listener_of_clips(
-            self, peak_indices, peak_scores, input_length, threshold):
+            self, peak_indices, peak_scores, input_length,
+            input_chunk_start_index, resampled_chunk_start_index, threshold):
         
         # print('Clips:')
         
-        start_offset = self._input_chunk_start_index + self._clip_start_offset
         peak_indices *= self._hop_size
+        peak_indices += resampled_chunk_start_index
         
         for i, score in zip(peak_indices, peak_scores):
             
-            # Convert classification index to input index, accounting for
-            # any difference between classification sample rate and input
-            # rate.
-            f = self._input_sample_rate / self._purported_input_sample_rate
-            classification_sample_rate = f * self._classifier_sample_rate
-            t = signal_utils.get_duration(i, classification_sample_rate)
+            # Convert classification index to input index. Since the
+            # resampled input is exactly at the classification sample
+            # rate, output sample `i` of the resampler is at time
+            # `i / classification_sample_rate` in the input.
+            t = signal_utils.get_duration(i, self._classifier_sample_rate)
             i = signal_utils.seconds_to_frames(t, self._input_sample_rate)
             
-            clip_start_index = i + start_offset
+            clip_start_index = i + self._clip_start_offset
             clip_end_index = clip_start_index + self._clip_length
-            chunk_end_index = self._input_chunk_start_index + input_length
+            chunk_end_index = input_chunk_start_index + input_length
             
             if clip_start_index < 0:
                 logging.warning(
@@ -365,67 +444,71 @@ class _Detector:
         for all input.
         """
         
-        self._process_input_chunks(process_all_samples=True)
+        if self._front_end is not None:
+            self._process_resampled_input_chunks()
+        else:
+            self._process_input_chunks(process_all_samples=True)
+            
+        # Complete processing only after all scores have been processed.
+        self._inference_batcher.call(self._complete_processing)
+        
+        if not self._inference_batcher_shared:
+            self._inference_batcher.complete_processing()
+            
             
+    def _complete_processing(self):
+        
         self._listener.complete_processing()
         
         if _SCORE_OUTPUT_ENABLED:
             self._score_file_writer.close()
 
 
-# TODO: The following two functions were copied from
-# vesper.util.time_frequency_analysis_utils. They should probably both
-# be public, and in a more general-purpose module.
+_score_functions = {}
+"""
+Mapping from Keras model IDs to score functions.
 
+See the `_get_score_function` function below for more about this.
+"""
 
-def _get_analysis_records(samples, record_size, hop_size):
 
+def _get_score_function(model, settings):
+    
     """
-    Creates a sequence of hopped sample records from the specified samples.
-
-    This method uses a NumPy array stride trick to create the desired
-    sequence as a view of the input samples that can be created at very
-    little cost. The caveat is that the view should only be read from,
-    and never written to, since when the hop size is less than the
-    record size the view's records overlap in memory.
-
-    The trick is from the `_fft_helper` function of the
-    `scipy.signal.spectral` module of SciPy.
+    Gets a function that scores a batch of analysis records.
+    
+    The function accepts a two-dimensional NumPy array of records, one
+    per row, and returns a one-dimensional NumPy array of scores. It
+    computes the model's input features and runs the model in a single
+    compiled `tf.function`. TensorFlow traces the `tf.function` once for
+    each batch shape, so it should be invoked with batches of a fixed
+    size, as an inference batcher invokes it.
+    
+    We create only one score function per model and process (the model
+    registry shares models among detectors), so the function is traced
+    only once per process rather than once per detector.
     """
-
-    # Get result shape.
-    num_samples = samples.shape[-1]
-    num_vectors = _get_num_analysis_records(num_samples, record_size, hop_size)
-    shape = samples.shape[:-1] + (num_vectors, record_size)
-
-    # Get result strides.
-    stride = samples.strides[-1]
-    strides = samples.strides[:-1] + (hop_size * stride, stride)
-
-    return np.lib.stride_tricks.as_strided(samples, shape, strides)
-
-
-def _get_num_analysis_records(num_samples, record_size, hop_size):
-
-    if record_size <= 0:
-        raise ValueError('Record size must be positive.')
-
-    elif hop_size <= 0:
-        raise ValueError('Hop size must be positive.')
-
-    elif hop_size > record_size:
-        raise ValueError('Hop size must not exceed record size.')
-
-    if num_samples < record_size:
-        # not enough samples for any records
-
-        return 0
-
-    else:
-        # have enough samples for at least one record
-
-        overlap = record_size - hop_size
-        return (num_samples - overlap) // hop_size
+    
+    key = id(model)
+    
+    score_function = _score_functions.get(key)
+    
+    if score_function is None:
+        
+        compute_features = dataset_utils.create_inference_feature_function(
+            settings, settings.model_input_name)
+        
+        @tf.function
+        def score(records):
+            features = compute_features(records)
+            return tf.reshape(model(features, training=False), [-1])
+        
+        def score_function(records):
+            return score(records).numpy()
+        
+        _score_functions[key] = score_function
+        
+    return score_function
 
 
 class TseepDetector(_Detector):
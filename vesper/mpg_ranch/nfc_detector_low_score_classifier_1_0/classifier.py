@@ -13,7 +13,7 @@ MPG Ranch Thrush Detector 1.0 and the MPG Ranch Tseep Detector 1.0.
 import logging
 
 from vesper.command.annotator import Annotator
-from vesper.django.app.models import AnnotationInfo, StringAnnotation
+from vesper.django.app.models import AnnotationInfo, Processor
 
 
 _logger = logging.getLogger()
@@ -50,47 +50,39 @@ class Classifier(Annotator):
         self._score_thresholds = _SCORE_THRESHOLDS
         
         
-    def annotate(self, clip):
-        
-        annotated = False
-        
-        classification = self._get_annotation_value(clip)
-        
-        if classification is None:
-            # clip is unclassified
-            
-            score = self._get_score(clip)
-            
-            if score is not None:
-                # clip has a detector score
-                
-                threshold = self._get_score_threshold(clip)
-                
-                if threshold is not None and score < threshold:
-                    # detector score is below threshold
-                    
-                    self._annotate(clip, 'LowScore')
-                    annotated = True
-                
-        return annotated
-
-
-    def _get_score(self, clip):
-        try:
-            annotation = StringAnnotation.objects.get(
-                clip=clip, info=self._score_annotation_info)
-        except StringAnnotation.DoesNotExist:
-            return None
-        else:
-            return float(annotation.value)
-        
-        
-    def _get_score_threshold(self, clip):
-        detector = clip.creating_processor
-        if detector is None:
-            return None
-        else:
-            return self._score_thresholds.get(detector.name)
+    def annotate_clips(self, clips):
+        
+        # Get unclassified clips.
+        classifications = self._get_annotation_values(clips)
+        clips = [c for c, v in zip(clips, classifications) if v is None]
+        
+        scores = self._get_annotation_values(
+            clips, self._score_annotation_info)
+        thresholds = self._get_score_thresholds(clips)
+        
+        # Get clips with detector scores below their thresholds.
+        clips = [
+            clip for clip, score, threshold in zip(clips, scores, thresholds)
+            if score is not None and threshold is not None and
+            float(score) < threshold]
+        
+        self._annotate_batch(clips, ['LowScore'] * len(clips))
+        
+        return len(clips)
+        
+        
+    def _get_score_thresholds(self, clips):
+        
+        detector_ids = set(clip.creating_processor_id for clip in clips)
+        detector_ids.discard(None)
+        
+        detectors = Processor.objects.in_bulk(detector_ids)
+        
+        thresholds = dict(
+            (i, self._score_thresholds.get(d.name))
+            for i, d in detectors.items())
+        
+        return [thresholds.get(clip.creating_processor_id) for clip in clips]
         
 
 def _get_annotation_info(name):
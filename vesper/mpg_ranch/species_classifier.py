@@ -13,7 +13,6 @@ import os.path
 import pickle
 
 from vesper.command.annotator import Annotator
-import vesper.django.app.model_utils as model_utils
 
 
 class SpeciesClassifier(Annotator):
@@ -26,27 +25,18 @@ class SpeciesClassifier(Annotator):
         self._classifier = _create_classifier('Tseep')
     
     
-    def annotate(self, clip):
+    def annotate_clips(self, clips):
         
-        annotated = False
+        # Get clips classified as calls, but not to species.
+        classifications = self._get_annotation_values(clips)
+        clips = [c for c, v in zip(clips, classifications) if v == 'Call']
         
-        classification = self._get_annotation_value(clip)
+        # Get clips detected by Old Bird Tseep.
+        clip_types = self._get_clip_types(clips)
+        clips = [c for c, t in zip(clips, clip_types) if t == 'Tseep']
         
-        if classification == 'Call':
-            # clip is classified as a call, but not to species
-            
-            clip_type = model_utils.get_clip_type(clip)
-        
-            if clip_type == 'Tseep':
-                # clip was detected by Old Bird Tseep
-                
-                classification = self._classifier.classify_clip(clip)
-                
-                if classification is not None:
-                    self._annotate(clip, classification)
-                    annotated = True
-                    
-        return annotated
+        return self._annotate_clips_individually(
+            clips, self._classifier.classify_clip)
         
             
 def _create_classifier(name):
@@ -0,0 +1,81 @@
+import importlib.util
+import unittest
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+
+
+_TENSORFLOW_INSTALLED = importlib.util.find_spec('tensorflow') is not None
+
+_RECORD_COUNT = 8
+
+
+@unittest.skipUnless(_TENSORFLOW_INSTALLED, 'TensorFlow is not installed.')
+class NfcDetector11Tests(TestCase):
+
+
+    def test_score_function(self):
+
+        # We import these modules here rather than at the top of this
+        # module since they import TensorFlow.
+        import tensorflow as tf
+        from vesper.util.settings import Settings
+        import vesper.mpg_ranch.nfc_coarse_classifier_4_1.classifier_utils \
+            as classifier_utils
+        import vesper.mpg_ranch.nfc_coarse_classifier_4_1.dataset_utils \
+            as dataset_utils
+        import vesper.mpg_ranch.nfc_detector_1_1.detector as detector
+
+        for clip_type in ('Tseep', 'Thrush'):
+
+            settings = Settings.create_from_yaml_file(
+                classifier_utils.get_settings_file_path(clip_type))
+            feature_name = settings.model_input_name
+
+            record_length = int(round(
+                settings.waveform_duration * settings.waveform_sample_rate))
+            rng = np.random.default_rng(0)
+            records = rng.normal(
+                scale=1000, size=(_RECORD_COUNT, record_length))
+
+            model = _create_model(
+                tf, dataset_utils, settings, feature_name, records)
+
+            # Score records as the detector does, with a compiled
+            # `tf.function`.
+            score = detector._get_score_function(model, settings)
+            scores = score(records)
+
+            # Score records as the detector used to, with an inference
+            # dataset and `Model.predict`.
+            dataset = \
+                dataset_utils.create_spectrogram_dataset_from_waveforms_array(
+                    records, dataset_utils.DATASET_MODE_INFERENCE, settings,
+                    batch_size=_RECORD_COUNT, feature_name=feature_name)
+            expected = model.predict(dataset, verbose=0).flatten()
+
+            self.assertEqual(scores.shape, (_RECORD_COUNT,))
+            np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
+
+            # Score function should be shared by detectors that use the
+            # same model.
+            self.assertIs(detector._get_score_function(model, settings), score)
+
+
+def _create_model(tf, dataset_utils, settings, feature_name, records):
+
+    # Create a small model whose input is the same as that of the
+    # classifier model.
+
+    compute_features = dataset_utils.create_inference_feature_function(
+        settings, feature_name)
+    features = compute_features(tf.constant(records))
+    shape = features[feature_name].shape[1:]
+
+    inputs = tf.keras.Input(shape=shape, name=feature_name)
+    x = tf.keras.layers.Flatten()(inputs)
+    x = tf.keras.layers.Dense(4, activation='relu')(x)
+    outputs = tf.keras.layers.Dense(1, activation='sigmoid')(x)
+
+    return tf.keras.Model(inputs, outputs)
@@ -12,7 +12,7 @@ from pathlib import Path
 from django.db import transaction
 
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, Job, Processor, Recording, RecordingChannel, Station,
+    AnnotationInfo, Job, Processor, Recording, RecordingChannel, Station,
     StationDevice)
 from vesper.singleton.clip_manager import clip_manager
 from vesper.util.bunch import Bunch
@@ -360,7 +360,7 @@ class ClipImporter:
 
         creation_time = time_utils.get_utc_now()
         
-        clip = Clip.objects.create(
+        clip = model_utils.create_clip(
             station=info.station,
             mic_output=mic_output,
             recording_channel=recording_channel,
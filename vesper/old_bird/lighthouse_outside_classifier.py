@@ -9,6 +9,7 @@ classification otherwise.
 
 
 from vesper.command.annotator import Annotator
+from vesper.django.app.models import Station
 from vesper.ephem.sun_moon import SunMoonCache
 
 
@@ -23,35 +24,45 @@ class LighthouseOutsideClassifier(Annotator):
         self._sun_moons = SunMoonCache()
     
     
-    def annotate(self, clip):
+    def annotate_clips(self, clips):
         
-        classification = self._get_annotation_value(clip)
+        # Get unclassified clips.
+        classifications = self._get_annotation_values(clips)
+        clips = [c for c, v in zip(clips, classifications) if v is None]
         
-        if classification is None:
-            # clip is not classified
-            
-            station = clip.station
-            sun_moon = self._sun_moons.get_sun_moon(
-                station.latitude, station.longitude, station.tz)
-            clip_start_time = clip.start_time
-            night = station.get_night(clip_start_time)
-            
-            def get_event_time(event_name):
-                return sun_moon.get_solar_event_time(
-                    night, event_name, day=False)
+        # Get clip stations with one query rather than one per clip.
+        station_ids = set(clip.station_id for clip in clips)
+        stations = Station.objects.in_bulk(station_ids)
+        
+        clips = [
+            clip for clip in clips
+            if self._is_outside(clip, stations[clip.station_id])]
+        
+        self._annotate_batch(clips, ['Outside'] * len(clips))
+        
+        return len(clips)
+    
+    
+    def _is_outside(self, clip, station):
+        
+        sun_moon = self._sun_moons.get_sun_moon(
+            station.latitude, station.longitude, station.tz)
+        clip_start_time = clip.start_time
+        night = station.get_night(clip_start_time)
+        
+        def get_event_time(event_name):
+            return sun_moon.get_solar_event_time(
+                night, event_name, day=False)
 
-            # Check if clip start time precedes analysis period.
-            start_time = get_event_time('Nautical Dusk')
-            if start_time is not None and clip_start_time < start_time:
-                self._annotate(clip, 'Outside')
-                return True
-            
-            # Check if clip start time follows analysis period.
-            end_time = get_event_time('Nautical Dawn')
-            if end_time is not None and clip_start_time > end_time:
-                self._annotate(clip, 'Outside')
-                return True
+        # Check if clip start time precedes analysis period.
+        start_time = get_event_time('Nautical Dusk')
+        if start_time is not None and clip_start_time < start_time:
+            return True
+        
+        # Check if clip start time follows analysis period.
+        end_time = get_event_time('Nautical Dawn')
+        if end_time is not None and clip_start_time > end_time:
+            return True
             
-        # If we get here, the clip is already classified or within the
-        # analysis period (possibly both), so we will not annotate it.
+        # If we get here, the clip is within the analysis period.
         return False
@@ -65,6 +65,14 @@ _THRUSH_SETTINGS = Bunch(
 )
 
 
+_INTEGRATOR_BLOCK_SIZE_FACTOR = 16
+"""
+integrator cumulative sum block size, in integration lengths.
+
+See the `_Integrator` class below for more about this.
+"""
+
+
 # import datetime
 # 
 # 
@@ -301,10 +309,16 @@ class _Detector:
         t = 1 / t
         fall_indices = np.where((x0 >= t) & (x1 < t))[0] + offset
 
-        # Tag rises and falls with booleans, combine, and sort.
-        return sorted(
-            [(i, True) for i in rise_indices] +
-            [(i, False) for i in fall_indices])
+        # Tag rises and falls with booleans, combine, and sort. We put
+        # falls before rises before a stable sort so that a fall would
+        # precede a rise at the same index, as for a sort of
+        # `(index, rise)` tuples.
+        indices = np.concatenate((fall_indices, rise_indices))
+        rises = np.concatenate((
+            np.zeros(len(fall_indices), dtype='bool'),
+            np.ones(len(rise_indices), dtype='bool')))
+        order = np.argsort(indices, kind='stable')
+        return list(zip(indices[order].tolist(), rises[order].tolist()))
     
     
     def _notify_listener(self, clips):
@@ -385,22 +399,83 @@ class _Squarer(_SignalProcessor):
         return x * x
     
     
-class _Integrator(_FirFilter):
+class _Integrator(_SignalProcessor):
+    
+    """
+    Moving average filter.
+    
+    This processor computes the same moving average as an FIR filter
+    whose `integration_length` coefficients are all
+    `1 / integration_length`, but in time linear in the input length
+    rather than via FFT convolution.
+    
+    A simple way to compute a moving sum is to compute the cumulative sum
+    of the input with `np.cumsum` and then the difference between the
+    result and a delayed version of it. That approach has numerical
+    problems for sufficiently long inputs, however: the cumulative sum
+    of the squared samples grows ever larger, but the samples do not, so
+    you eventually start throwing away sample bits. We avoid that problem
+    by computing cumulative sums block by block, re-anchoring the sum at
+    zero at the start of each block. Each block is a small multiple of
+    the integration length long, so each sum window spans at most two
+    blocks, and its sum is the difference of two cumulative sums of one
+    block plus, if the window extends into the next block, the total of
+    the first block. The magnitudes of the cumulative sums are bounded
+    by a small multiple of the magnitudes of the window sums, regardless
+    of the input length.
+    
+    Like the other signal processors of this module, an integrator
+    is stateless: the detector carries the state of the entire processor
+    chain across calls to its `detect` method by prepending the last
+    `latency` samples of each input chunk to the next chunk.
+    """
     
-    # An alternative to making this class an `_FirFilter` subclass would
-    # be to use the `np.cumsum` function to compute the cumulative sum
-    # of the input and then the difference between the result and a
-    # delayed version of the result. That approach is more efficient
-    # but it has numerical problems for sufficiently long inputs
-    # (the cumulative sum of the squared samples grows ever larger, but
-    # the samples do not, so you'll eventually start throwing away sample
-    # bits), so I have chosen not to use it. An alternative would be to use
-    # Cython or Numba or something like that to implement the integration
-    # in a way that is both faster and accurate for arbitrarily long inputs.
     
     def __init__(self, integration_length):
-        coefficients = np.ones(integration_length) / integration_length
-        super().__init__(coefficients)
+        super().__init__(integration_length - 1)
+        self._integration_length = integration_length
+        self._block_size = _INTEGRATOR_BLOCK_SIZE_FACTOR * integration_length
+        
+        
+    def process(self, x):
+        
+        n = self._integration_length
+        b = self._block_size
+        
+        output_length = len(x) - n + 1
+        
+        if output_length <= 0:
+            return np.zeros(0)
+        
+        # Pad input with zeros to a whole number of blocks, with at least
+        # one padding sample so that the exclusive cumulative sum below
+        # is defined at index `len(x)`.
+        block_count = len(x) // b + 1
+        padded = np.zeros(block_count * b)
+        padded[:len(x)] = x
+        blocks = padded.reshape((block_count, b))
+        
+        # Compute block-relative cumulative sums. Element `i` of
+        # `sums` is the sum of the elements of `x` from the start of
+        # the block containing element `i` up to but not including
+        # element `i`.
+        inclusive_sums = np.cumsum(blocks, axis=1)
+        sums = np.zeros_like(blocks)
+        sums[:, 1:] = inclusive_sums[:, :-1]
+        sums = sums.reshape(-1)
+        block_totals = inclusive_sums[:, -1]
+        
+        # Compute moving sums, assuming that every window lies within one
+        # block. We compute a sum for every input block sample, including
+        # padding samples, so we can correct the sums block by block below.
+        y = np.zeros(block_count * b)
+        y[:-n] = sums[n:] - sums[:-n]
+        
+        # Correct sums of windows that extend into the next block. Those
+        # are the windows that start in the last `n` samples of a block.
+        y.reshape((block_count, b))[:, -n:] += block_totals[:, np.newaxis]
+        
+        return y[:output_length] / n
 
 
 class _Divider(_SignalProcessor):
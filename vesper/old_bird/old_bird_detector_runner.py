@@ -11,7 +11,7 @@ import time
 
 from django.db import transaction
 
-from vesper.django.app.models import Clip, Job, RecordingChannel
+from vesper.django.app.models import Job, RecordingChannel
 from vesper.signal.wave_file_signal import WaveFileSignal
 from vesper.util.logging_utils import append_stack_trace
 import vesper.django.app.model_utils as model_utils
@@ -525,7 +525,7 @@ class _DetectorMonitor(Thread):
                 
                 with transaction.atomic():
                     
-                    clip = Clip.objects.create(
+                    clip = model_utils.create_clip(
                         station=station,
                         mic_output=self._mic_output,
                         recording_channel=self._recording_channel,
@@ -1,6 +1,10 @@
 from unittest import TestCase
 
-from vesper.old_bird.old_bird_detector_redux_1_1 import _TransientFinder
+import numpy as np
+import scipy.signal as signal
+
+from vesper.old_bird.old_bird_detector_redux_1_1 import (
+    _Integrator, _TransientFinder, TseepDetector)
 
 
 _MIN_LENGTH = 100
@@ -96,3 +100,66 @@ class TransientFinderTests(TestCase):
                 clips += finder.process([crossing])
             clips += finder.complete_processing([_FINAL_FALL])
             self.assertEqual(clips, expected_clips)
+
+
+class IntegratorTests(TestCase):
+
+
+    def test(self):
+        
+        rng = np.random.default_rng(0)
+        
+        # Include inputs that span from one to many integrator blocks,
+        # and integration lengths longer than some inputs.
+        for x_length in (1000, 2 ** 16, 2 ** 16 + 1, 300000):
+            
+            x = rng.normal(scale=1000, size=x_length) ** 2
+            
+            for integration_length in (1, 2, 100, 2000, 2 ** 16, 70000):
+                
+                integrator = _Integrator(integration_length)
+                self.assertEqual(integrator.latency, integration_length - 1)
+                
+                y = integrator.process(x)
+                
+                if integration_length > x_length:
+                    self.assertEqual(len(y), 0)
+                    
+                else:
+                    coefficients = \
+                        np.ones(integration_length) / integration_length
+                    expected = signal.fftconvolve(x, coefficients, mode='valid')
+                    self.assertEqual(len(y), len(expected))
+                    self.assertTrue(np.allclose(y, expected, rtol=1e-10))
+                    
+                    
+    def test_zeros(self):
+        
+        # The moving average of a run of zeros should be exactly zero,
+        # including for windows that span two blocks.
+        x = np.ones(300000)
+        x[100000:200000] = 0
+        y = _Integrator(2000).process(x)
+        self.assertTrue(np.all(y[100000:198001] == 0))
+
+
+class ThresholdCrossingTests(TestCase):
+
+
+    def test(self):
+        
+        detector = TseepDetector(22050, None)
+        
+        # The Tseep detector ratio threshold is 2.
+        ratios = np.array([1, 3, 3, .4, .4, 2, 2.1, 1, .3, .5, .6, 5])
+        
+        crossings = detector._get_threshold_crossings(ratios, 10)
+        
+        expected = [
+            (11, True), (13, False), (16, True), (18, False), (21, True)]
+        
+        self.assertEqual(crossings, expected)
+        
+        for index, rise in crossings:
+            self.assertIs(type(index), int)
+            self.assertIs(type(rise), bool)
@@ -17,6 +17,7 @@ import numpy as np
 import scipy.signal as signal
 
 from vesper.util.bunch import Bunch
+from vesper.util.detection_front_end import BandPowerStage, SpectrogramStage
 from vesper.util.detection_score_file_writer import DetectionScoreFileWriter
 import vesper.util.time_frequency_analysis_utils as tfa_utils
 
@@ -258,6 +259,11 @@ class Detector:
         self._unprocessed_samples = np.array([], dtype='float')
         self._num_samples_generated = 0
         
+        self._front_end = None
+        self._band_power_stage = None
+        self._power_processor = None
+        self._unprocessed_powers = np.array([], dtype='float')
+        
         if _WRITE_DETECTION_SCORE_FILE:
             file_name = f'{self.extension_name} Audio and Scores.wav'
             file_path = f'/Users/harold/Desktop/{file_name}'
@@ -348,8 +354,54 @@ class Detector:
         return self._transient_finder.listener
     
     
+    def set_front_end(self, front_end):
+        
+        """
+        Sets the detection front end of this detector.
+        
+        When this detector has a front end, it gets the spectrogram band
+        power of its input from the front end rather than computing it
+        itself. This allows detectors with the same spectrogram settings
+        (for example, the tseep and thrush detectors of this module) to
+        share a single spectrogram computation. The detections of the
+        detector are the same with or without a front end.
+        
+        See the `vesper.util.detection_front_end` module for more about
+        detection front ends.
+        """
+        
+        if self._debugging_listener is not None or \
+                _WRITE_DETECTION_SCORE_FILE:
+            # detector needs input samples for debugging or for score
+            # file, so it cannot use front end
+            
+            return
+        
+        spectrograph, frequency_integrator, *power_processors = \
+            self._signal_processor.processors
+        
+        spectrogram_stage = SpectrogramStage(
+            spectrograph.window_type, spectrograph.record_size,
+            spectrograph.hop_size, spectrograph.dft_size)
+        
+        band_power_stage = BandPowerStage(
+            spectrogram_stage, frequency_integrator.start_bin_num,
+            frequency_integrator.end_bin_num)
+        
+        self._front_end = front_end
+        self._band_power_stage = front_end.add_stage(band_power_stage)
+        
+        self._power_processor = _SignalProcessorChain(
+            'Power Processor', power_processors,
+            frequency_integrator.output_sample_rate)
+        
+        
     def detect(self, samples):
         
+        if self._front_end is not None:
+            self._detect_with_front_end()
+            return
+        
         # TODO: Consider having each signal processor keep track of which
         # of its input samples it has processed, saving unprocessed samples
         # for future calls to the `process` function, and remove such
@@ -386,6 +438,34 @@ class Detector:
         self._num_samples_generated += num_samples_generated
             
             
+    def _detect_with_front_end(self):
+        
+        # Concatenate unprocessed band powers from previous calls to
+        # this method with new band powers from front end. The band
+        # powers are the same as those that the `detect` method computes
+        # internally from unprocessed and new samples, since spectrogram
+        # frames always start at multiples of the spectrogram hop size.
+        powers = np.concatenate((
+            self._unprocessed_powers,
+            self._front_end.get_output(self._band_power_stage)))
+        
+        # Run remaining signal processors on band powers.
+        ratios = self._power_processor.process(powers)
+        
+        for threshold in self._settings.thresholds:
+            crossings = self._get_threshold_crossings(ratios, threshold)
+            clips = self._series_processors[threshold].process(crossings)
+            self._notify_listener(clips, threshold)
+            
+        num_samples_generated = len(ratios)
+        num_samples_processed = \
+            num_samples_generated * self._signal_processor.hop_size
+        
+        self._num_samples_processed += num_samples_processed
+        self._unprocessed_powers = powers[num_samples_generated:]
+        self._num_samples_generated += num_samples_generated
+            
+            
     def _get_threshold_crossings(self, ratios, threshold):
       
         x0 = ratios[:-1]
@@ -538,6 +618,7 @@ class _Spectrograph(_SignalProcessor):
         
         super().__init__(name, window_size, hop_size, input_sample_rate)
         
+        self.window_type = window_type
         self.window = signal.get_window(window_type, window_size)
         # self.window = HannWindow(window_size).samples
         self.dft_size = dft_size
@@ -674,6 +755,11 @@ class _SignalProcessorChain(_SignalProcessor):
         self._debugging_listener = debugging_listener
         
         
+    @property
+    def processors(self):
+        return tuple(self._processors)
+    
+    
     def process(self, x):
         for processor in self._processors:
             x = processor.process(x)
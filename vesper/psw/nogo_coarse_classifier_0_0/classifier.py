@@ -14,7 +14,6 @@ import logging
 from vesper.command.annotator import Annotator
 from vesper.django.app.models import AnnotationInfo, TagInfo
 from vesper.singleton.clip_manager import clip_manager
-import vesper.django.app.model_utils as model_utils
 import vesper.psw.nogo_coarse_classifier_0_0.classifier_utils as \
     classifier_utils
 import vesper.psw.nogo_coarse_classifier_0_0.dataset_utils as dataset_utils
@@ -90,29 +89,34 @@ class _Classifier(Annotator):
         else:
             # at least one clip to classify
             
-            dataset = self._create_dataset(clips)
+            clips, annotation_values, dataset = \
+                self._create_dataset(clips, annotation_values)
+            
+            if len(clips) == 0:
+                # could not get samples of any clips
+                
+                return 0
             
             scores = self._model.predict(dataset).flatten()
             
-            for clip, annotation_value, score in \
-                    zip(clips, annotation_values, scores):
-                
-                self._annotate_clip_score(clip, score)
+            self._annotate_clip_scores(clips, scores)
+            
+            if _COMPARISON_MODE_ENABLED:
                 
-                if _COMPARISON_MODE_ENABLED:
+                for clip, annotation_value, score in \
+                        zip(clips, annotation_values, scores):
                     self._tag_clip_if_needed(clip, annotation_value, score)
+                    
+            else:
                 
-                else:
-                    self._annotate_clip(clip, score)
-                    classified_clip_count += 1
+                classifications = [
+                    self._get_classification(score) for score in scores]
+                self._annotate_batch(clips, classifications)
+                classified_clip_count = len(clips)
                     
             return classified_clip_count
 
                 
-    def _get_annotation_values(self, clips):
-        return [self._get_annotation_value(c) for c in clips]
-    
-    
     def _filter_clips(self, clips, annotation_values):
         
         pairs = [
@@ -135,11 +139,15 @@ class _Classifier(Annotator):
             return annotation_value is None
         
 
-    def _create_dataset(self, clips):
+    def _create_dataset(self, clips, annotation_values):
         
         # TODO: Resample clip waveforms if needed. See other recent
         # classifiers for examples of this.
-        waveforms = self._get_clip_waveforms(clips)
+        clips, annotation_values, waveforms = \
+            self._get_clip_waveforms(clips, annotation_values)
+        
+        if len(clips) == 0:
+            return clips, annotation_values, None
         
         # TODO: This is a workaround that compensates for a problem
         # in `dataset_utils._ExampleProcessor._slice_waveform`, which
@@ -152,14 +160,19 @@ class _Classifier(Annotator):
         dataset = \
             dataset_utils.create_inference_dataset(dataset, self._settings)
         
-        return dataset
+        return clips, annotation_values, dataset
     
     
-    def _get_clip_waveforms(self, clips):
+    def _get_clip_waveforms(self, clips, annotation_values):
 
+        # We return only the clips (and their annotation values) whose
+        # samples we could get, so that they correspond to the scores
+        # the model computes from the waveforms.
+        result_clips = []
+        result_values = []
         waveforms = []
 
-        for clip in clips:
+        for clip, annotation_value in zip(clips, annotation_values):
 
             try:
                 waveform = clip_manager.get_samples(clip)
@@ -170,21 +183,17 @@ class _Classifier(Annotator):
                     f'will not be classified. Error message was: {str(e)}')
                 continue
 
+            result_clips.append(clip)
+            result_values.append(annotation_value)
             waveforms.append(waveform)
 
-        return waveforms
+        return result_clips, result_values, waveforms
         
 
-    def _annotate_clip_score(self, clip, score):
-        
+    def _annotate_clip_scores(self, clips, scores):
         annotation_info = self._get_annotation_info('Classifier Score')
-        annotation_value = str(100 * score)
-        
-        model_utils.annotate_clip(
-            clip, annotation_info, annotation_value,
-            creating_user=self._creating_user,
-            creating_job=self._creating_job,
-            creating_processor=self._creating_processor)
+        annotation_values = [str(100 * score) for score in scores]
+        self._annotate_batch(clips, annotation_values, annotation_info)
     
     
     def _get_annotation_info(self, annotation_name):
@@ -245,16 +254,11 @@ class _Classifier(Annotator):
                 self._tag(clip, self._false_negative_tag_info)
                 
 
-    def _annotate_clip(self, clip, score):
-        
+    def _get_classification(self, score):
         if score >= self._threshold:
-            annotation_value = 'NOGO'
+            return 'NOGO'
         else:
-            annotation_value = 'Other'
-            
-        # TODO: `Annotator._annotate` should take an annotation name
-        # as well as an annotation value.
-        self._annotate(clip, annotation_value)
+            return 'Other'
         
         
 def _is_nogo(annotation_value):
@@ -8,11 +8,13 @@ import vesper.util.django_utils as django_utils
 django_utils.set_up_django()
 
 from django.contrib.auth.models import User
+from django.db import transaction
 
 from vesper.django.app.models import (
-    AnnotationInfo, Clip, Processor, Recording, Station)
+    AnnotationInfo, Processor, Recording, Station)
 import vesper.django.app.model_utils as model_utils
 import vesper.psw.util.raven_utils as raven_utils
+import vesper.util.archive_lock as archive_lock
 import vesper.util.signal_utils as signal_utils
 import vesper.util.time_utils as time_utils
 
@@ -163,11 +165,15 @@ def create_clips(station_name, recording_start_time, header, rows):
         (name, AnnotationInfo.objects.get(name=name))
         for name in annotation_names)
     
-    for row in rows:
-        create_clip(
-            station, mic_output, recording_channel, recording_start_time,
-            sample_rate, creation_time, creating_detector,
-            creating_user, annotation_infos, header, row)
+    # Create the clips of a selection table in one transaction, so
+    # that a failed import leaves neither clips nor clip counts behind.
+    with archive_lock.atomic(), transaction.atomic():
+        for row in rows:
+            create_clip(
+                station, mic_output, recording_channel,
+                recording_start_time, sample_rate, creation_time,
+                creating_detector, creating_user, annotation_infos,
+                header, row)
         
         
 def get_station_device(station, device_type):
@@ -195,9 +201,10 @@ def create_clip(
     
     date = station.get_night(start_time)
     
-    clip = Clip(
+    # `model_utils.create_clip` also adds the clip to the clip counts.
+    clip = model_utils.create_clip(
         station=station,
-        mic_output= mic_output,
+        mic_output=mic_output,
         recording_channel=recording_channel,
         start_index=start_index,
         length=length,
@@ -207,8 +214,6 @@ def create_clip(
         date=date,
         creation_time=creation_time,
         creating_processor=creating_detector)
-    
-    clip.save()
 
     for annotation_name in EXTRA_ANNOTATION_NAMES:
         
@@ -29,6 +29,10 @@ class AsyncTaskThread(Thread):
 
 
     async def _run(self):
+
+        # Tasks that are running. We keep references to them here so
+        # they are not garbage collected before they complete.
+        running_tasks = set()
         
         while True:
             
@@ -39,7 +43,12 @@ class AsyncTaskThread(Thread):
                 await asyncio.sleep(self._sleep_period)
 
             else:
-                await task.run()
+                # Run task concurrently with other tasks, so that, for
+                # example, a slow upload of one audio file does not
+                # delay the processing of the next one.
+                running_task = asyncio.create_task(task.run())
+                running_tasks.add(running_task)
+                running_task.add_done_callback(running_tasks.discard)
 
 
 # The one and only `AsyncTaskThread` instance for the Vesper Recorder.
@@ -1,8 +1,39 @@
+"""
+Module containing class `ProcessorGraph`.
+
+By default, a processor graph runs all of its processors on the thread
+that calls its `process` method, pushing each input item through every
+processor before `process` returns. A processor whose settings include
+a `thread` name, however, runs on a *stage thread* of that name, to
+which the graph delivers the processor's input items through a bounded
+queue. Processors that specify the same thread name run on the same
+stage thread, and a processor that does not specify a thread name runs
+on the thread of the processor whose output is its input. So, for
+example, a slow resampler and audio file writer can run on a stage
+thread of their own, leaving the thread that receives audio input
+free to receive the next input chunk. The size of the queue of a stage
+thread is the `input_queue_size` of the first processor that runs on
+it.
+
+When the queue of a stage thread is full, the thread that delivers an
+item to it waits up to the `input_queue_timeout` of the receiving
+processor for space to become available, and then drops the item if
+space does not become available. The graph counts such waits and drops
+for each graph edge (i.e. pair of processors, or audio input and
+processor, connected by a queue), and reports them in its status table.
+"""
+
+
 from collections import defaultdict
+from queue import Full, Queue
+from threading import Thread
 import itertools
 import logging
+import time
 
 from vesper.recorder.processor import Processor
+from vesper.recorder.status_table import StatusTable
+from vesper.util.bunch import Bunch
 
 
 _logger = logging.getLogger(__name__)
@@ -10,6 +41,9 @@ _logger = logging.getLogger(__name__)
 
 _AUDIO_INPUT = 'Audio Input'
 
+_STOP = object()
+"""Stage thread input queue item that tells the thread to exit."""
+
 
 class ProcessorGraph(Processor):
 
@@ -44,6 +78,21 @@ class ProcessorGraph(Processor):
         For the purposes of this map, `_AUDIO_INPUT` is considered to
         be a processor name.
         """
+
+        self._stages = {}
+        """Map from stage thread name to stage."""
+
+        self._processor_stages = {}
+        """
+        Map from processor name to stage for processors that run on
+        stage threads.
+        """
+
+        self._edge_stats = {}
+        """
+        Map from `(source name, processor name)` pairs to statistics
+        for graph edges that deliver items to stage threads.
+        """
         
         for p in settings:
 
@@ -73,19 +122,96 @@ class ProcessorGraph(Processor):
             processors_by_name[processor.name] = processor
             self._downstream_processors[p.input].append(processor)
 
+            # Add processor to stage if needed.
+            if p.thread is not None:
+                self._add_processor_to_stage(processor, p)
+
+
+    def _add_processor_to_stage(self, processor, p):
+
+        stage = self._stages.get(p.thread)
+
+        if stage is None:
+            # first processor of stage
+
+            stage = Bunch(
+                name=p.thread,
+                queue=Queue(p.input_queue_size),
+                thread=None)
+            
+            self._stages[p.thread] = stage
+
+        self._processor_stages[processor.name] = stage
+        stats = Bunch(queue_timeout=p.input_queue_timeout)
+        _clear_edge_stats(stats)
+        self._edge_stats[(p.input, processor.name)] = stats
+        
+        
+    @property
+    def stage_thread_names(self):
+
+        """the names of the stage threads of this graph, a `tuple`."""
+
+        return tuple(self._stages.keys())
+    
+
+    def get_edge_stats(self):
+
+        """
+        Gets statistics for the graph edges that deliver items to
+        stage threads.
+
+        Returns:
+            a `dict` that maps `(source name, processor name)` pairs
+            to `Bunch` objects with `item_count`, `wait_count`,
+            `wait_time`, `drop_count`, and `max_queue_size` attributes.
+            `item_count` is the number of items delivered to the
+            processor, `wait_count` is the number of items whose
+            delivery waited for space in a full queue, `wait_time` is
+            the total time spent waiting in seconds, `drop_count` is
+            the number of items dropped because space did not become
+            available, and `max_queue_size` is the largest number of
+            items in the processor's stage thread queue observed when
+            delivering an item. The source name is `'Audio Input'` for
+            processors whose input is audio input.
+        """
+
+        return {
+            key: Bunch(
+                item_count=s.item_count,
+                wait_count=s.wait_count,
+                wait_time=s.wait_time,
+                drop_count=s.drop_count,
+                max_queue_size=s.max_queue_size)
+            for key, s in self._edge_stats.items()}
+
 
     def _start(self):
+
         for p in self._processors:
             p.start()
 
+        for stats in self._edge_stats.values():
+            _clear_edge_stats(stats)
+
+        for stage in self._stages.values():
+            stage.thread = Thread(
+                target=self._run_stage, args=(stage,),
+                name=f'{self.name} - {stage.name}', daemon=True)
+            stage.thread.start()
+
 
     def _process(self, input_item):
-        self._process_aux([input_item], _AUDIO_INPUT)
+        self._process_aux([input_item], _AUDIO_INPUT, None)
 
 
-    def _process_aux(self, input_items, source_name):
+    def _process_aux(self, input_items, source_name, stage):
 
-        """Process the specified input items from the specified source."""
+        """
+        Process the specified input items from the specified source
+        on the thread of the specified stage, or on the thread that
+        called the `process` method if the stage is `None`.
+        """
 
         # _logger.info(f'ProcessorGraph._process_aux {source_name}')
 
@@ -94,20 +220,163 @@ class ProcessorGraph(Processor):
 
         for processor in processors:
 
-            for input_item in input_items:
+            processor_stage = self._processor_stages.get(processor.name)
+
+            if processor_stage is None or processor_stage is stage:
+                # processor runs on this thread
+
+                for input_item in input_items:
+
+                    output_items = processor.process(input_item)
+
+                    if output_items is not None and len(output_items) != 0:
+                        self._process_aux(
+                            output_items, processor.name, stage)
+                        
+            else:
+                # processor runs on another stage thread
+
+                if source_name == _AUDIO_INPUT:
+                    # Copy audio input items, since the recorder reuses
+                    # their sample buffers as soon as this graph's
+                    # `process` method returns.
+                    input_items = [_copy_audio_item(i) for i in input_items]
+
+                self._deliver_items(
+                    input_items, source_name, processor, processor_stage)
+
+
+    def _deliver_items(self, input_items, source_name, processor, stage):
+
+        stats = self._edge_stats[(source_name, processor.name)]
+        queue = stage.queue
+
+        for input_item in input_items:
+
+            stats.item_count += 1
+            stats.max_queue_size = max(stats.max_queue_size, queue.qsize())
+
+            item = (processor, input_item)
+
+            try:
+                queue.put_nowait(item)
+
+            except Full:
+                # queue full
+
+                stats.wait_count += 1
+                start_time = time.time()
+
+                try:
+                    queue.put(item, timeout=stats.queue_timeout)
+
+                except Full:
+                    # queue still full after timeout
+
+                    stats.drop_count += 1
+
+                    _logger.warning(
+                        f'Input queue of processor graph stage thread '
+                        f'"{stage.name}" was full for more than '
+                        f'{stats.queue_timeout} seconds. Dropped input '
+                        f'item from "{source_name}" to processor '
+                        f'"{processor.name}". This is drop '
+                        f'{stats.drop_count} for that graph edge.')
+                    
+                stats.wait_time += time.time() - start_time
+                
+                
+    def _run_stage(self, stage):
+
+        queue = stage.queue
+
+        while True:
+
+            item = queue.get()
+
+            try:
+
+                if item is _STOP:
+                    return
+                
+                processor, input_item = item
 
                 output_items = processor.process(input_item)
 
                 if output_items is not None and len(output_items) != 0:
-                    self._process_aux(output_items, processor.name)
+                    self._process_aux(output_items, processor.name, stage)
+
+            except Exception:
+                _logger.exception(
+                    f'Processor graph stage thread "{stage.name}" raised '
+                    f'an exception while processing an item. The item '
+                    f'will be ignored.')
+                
+            finally:
+                queue.task_done()
 
 
     def _stop(self):
+
+        stages = self._stages.values()
+
+        # Wait for stage threads to process all of their queued items,
+        # including ones queued by other stage threads while we wait.
+        while any(s.queue.unfinished_tasks != 0 for s in stages):
+            for stage in stages:
+                stage.queue.join()
+
+        for stage in self._stages.values():
+            stage.queue.put(_STOP)
+            stage.thread.join()
+            stage.thread = None
+
         for p in self._processors:
             p.stop()
 
 
     def get_status_tables(self):
+
         chain = itertools.chain.from_iterable
         table_lists = [p.get_status_tables() for p in self._processors]
-        return list(chain(table_lists))
\ No newline at end of file
+        tables = list(chain(table_lists))
+
+        if len(self._edge_stats) != 0:
+            tables.append(self._create_edge_table())
+
+        return tables
+    
+
+    def _create_edge_table(self):
+
+        header = (
+            'Source', 'Processor', 'Stage Thread', 'Items', 'Waits',
+            'Drops', 'Max Queue Size')
+        
+        rows = []
+
+        for (source_name, processor_name), s in \
+                self.get_edge_stats().items():
+            
+            stage = self._processor_stages[processor_name]
+            
+            rows.append((
+                source_name, processor_name, stage.name,
+                str(s.item_count), str(s.wait_count), str(s.drop_count),
+                f'{s.max_queue_size} / {stage.queue.maxsize}'))
+            
+        return StatusTable(f'{self.name} Queues', rows, header)
+
+
+def _clear_edge_stats(stats):
+    stats.item_count = 0
+    stats.wait_count = 0
+    stats.wait_time = 0
+    stats.drop_count = 0
+    stats.max_queue_size = 0
+
+
+def _copy_audio_item(item):
+    frame_count = item.frame_count
+    samples = item.samples[:, :frame_count].copy()
+    return Bunch(samples=samples, frame_count=frame_count)
\ No newline at end of file
@@ -1,10 +1,12 @@
+from pathlib import Path
 import logging
-
-import aioboto3
+import re
 
 from vesper.recorder.audio_file_processor import AudioFileProcessor
+from vesper.recorder.s3_upload_service import S3UploadService
 from vesper.recorder.status_table import StatusTable
 from vesper.util.bunch import Bunch
+import vesper.recorder.async_task_thread as async_task_thread
 
 
 _logger = logging.getLogger(__name__)
@@ -12,6 +14,13 @@ _logger = logging.getLogger(__name__)
 
 _DEFAULT_AWS_PROFILE_NAME = 'default'
 _DEFAULT_S3_OBJECT_KEY_PREFIX = 'recordings'
+_DEFAULT_S3_ENDPOINT_URL = None
+_DEFAULT_MAX_CONCURRENT_UPLOADS = 4
+_DEFAULT_MULTIPART_THRESHOLD = 8 * 2 ** 20          # bytes
+_DEFAULT_MULTIPART_CHUNK_SIZE = 8 * 2 ** 20         # bytes
+_DEFAULT_MAX_UPLOAD_ATTEMPTS = 8
+_DEFAULT_INITIAL_RETRY_DELAY = 1                    # seconds
+_DEFAULT_MAX_RETRY_DELAY = 300                      # seconds
 
 
 class S3AudioFileUploader(AudioFileProcessor):
@@ -31,10 +40,74 @@ class S3AudioFileUploader(AudioFileProcessor):
         s3_object_key_prefix = settings.get(
             's3_object_key_prefix', _DEFAULT_S3_OBJECT_KEY_PREFIX)
         
+        s3_endpoint_url = settings.get(
+            's3_endpoint_url', _DEFAULT_S3_ENDPOINT_URL)
+        
+        upload_journal_file_path = settings.get(
+            'upload_journal_file_path', None)
+        
+        if upload_journal_file_path is None:
+            upload_journal_file_path = _get_default_upload_journal_file_path(
+                s3_bucket_name, s3_object_key_prefix)
+        
+        upload_journal_file_path = Path(upload_journal_file_path).expanduser()
+        
+        # Resolve a relative journal file path against the recorder
+        # home directory, which is the current directory when settings
+        # are parsed at recorder startup.
+        if not upload_journal_file_path.is_absolute():
+            upload_journal_file_path = Path.cwd() / upload_journal_file_path
+
+        max_concurrent_uploads = int(settings.get(
+            'max_concurrent_uploads', _DEFAULT_MAX_CONCURRENT_UPLOADS))
+        
+        multipart_threshold = int(settings.get(
+            'multipart_threshold', _DEFAULT_MULTIPART_THRESHOLD))
+        
+        multipart_chunk_size = int(settings.get(
+            'multipart_chunk_size', _DEFAULT_MULTIPART_CHUNK_SIZE))
+        
+        max_upload_attempts = int(settings.get(
+            'max_upload_attempts', _DEFAULT_MAX_UPLOAD_ATTEMPTS))
+        
+        initial_retry_delay = float(settings.get(
+            'initial_retry_delay', _DEFAULT_INITIAL_RETRY_DELAY))
+        
+        max_retry_delay = float(settings.get(
+            'max_retry_delay', _DEFAULT_MAX_RETRY_DELAY))
+        
         return Bunch(
             aws_profile_name=aws_profile_name,
             s3_bucket_name=s3_bucket_name,
-            s3_object_key_prefix=s3_object_key_prefix)
+            s3_object_key_prefix=s3_object_key_prefix,
+            s3_endpoint_url=s3_endpoint_url,
+            upload_journal_file_path=upload_journal_file_path,
+            max_concurrent_uploads=max_concurrent_uploads,
+            multipart_threshold=multipart_threshold,
+            multipart_chunk_size=multipart_chunk_size,
+            max_upload_attempts=max_upload_attempts,
+            initial_retry_delay=initial_retry_delay,
+            max_retry_delay=max_retry_delay)
+
+
+    def __init__(self, name, settings):
+
+        super().__init__(name, settings)
+
+        s = settings
+
+        self._upload_service = S3UploadService(
+            s.upload_journal_file_path, s.aws_profile_name,
+            s.s3_endpoint_url, s.max_concurrent_uploads,
+            s.multipart_threshold, s.multipart_chunk_size,
+            s.max_upload_attempts, s.initial_retry_delay,
+            s.max_retry_delay)
+        
+        # Resume any uploads that were pending when the recorder last
+        # stopped.
+        if len(self._upload_service.pending_uploads) != 0:
+            task = _ResumeUploadsTask(self._upload_service)
+            async_task_thread.instance.submit(task)
 
 
     async def process_file(self, recording_dir_path, audio_file_path):
@@ -48,38 +121,51 @@ class S3AudioFileUploader(AudioFileProcessor):
         # Get absolute audio file path.
         abs_file_path = recording_dir_path / audio_file_path
 
-        _logger.info(
-            f'Uploading audio file "{abs_file_path}" to S3 bucket '
-            f'"{s.s3_bucket_name}", object key "{object_key}"...')
-        
-        try:
-
-            session = aioboto3.Session(profile_name=s.aws_profile_name)
-
-            async with session.client('s3') as s3:
-
-                await s3.upload_file(
-                    abs_file_path, s.s3_bucket_name, object_key)
-
-        except Exception as e:
-            # TODO: Consider retrying failed uploads some number of times.
-            _logger.warning(
-                f'Could not upload audio file "{abs_file_path}" to S3 '
-                f'bucket "{s.s3_bucket_name}", object key "{object_key}". '
-                f'Exception message was: {e}')
-            raise
+        # The upload service logs upload attempts and failures, and
+        # raises an exception if the upload fails on every attempt.
+        await self._upload_service.upload_file(
+            abs_file_path, s.s3_bucket_name, object_key)
 
 
     def get_status_tables(self):
 
         s = self._settings
+        stats = self._upload_service.get_stats()
         
         rows = (
             ('AWS Profile Name', s.aws_profile_name),
             ('S3 Bucket Name', s.s3_bucket_name),
-            ('S3 Object Key Prefix', s.s3_object_key_prefix)
+            ('S3 Object Key Prefix', s.s3_object_key_prefix),
+            ('Max Concurrent Uploads', s.max_concurrent_uploads),
+            ('Completed Uploads', stats.upload_count),
+            ('Active Uploads', stats.active_upload_count),
+            ('Pending Uploads', stats.pending_upload_count),
+            ('Retried Upload Attempts', stats.retry_count),
+            ('Failed Uploads', stats.failure_count)
         )
 
         table = StatusTable(self.name, rows)
 
         return [table]
+
+
+class _ResumeUploadsTask:
+
+
+    def __init__(self, upload_service):
+        self._upload_service = upload_service
+
+
+    async def run(self):
+        await self._upload_service.resume_uploads()
+
+
+def _get_default_upload_journal_file_path(bucket_name, object_key_prefix):
+
+    # Name the journal for the upload destination, so that uploaders
+    # with different destinations do not share a journal, and an
+    # uploader whose destination changes does not resume uploads to
+    # the old destination.
+    destination = f'{bucket_name}/{object_key_prefix}'.strip('/')
+    destination = re.sub(r'[^\w.-]+', '_', destination)
+    return Path('S3 Upload Journals') / f'{destination}.json'
@@ -0,0 +1,403 @@
+"""Module containing class `S3UploadService`."""
+
+
+from contextlib import AsyncExitStack
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import random
+
+from boto3.s3.transfer import TransferConfig
+import aioboto3
+
+from vesper.util.bunch import Bunch
+
+
+_logger = logging.getLogger(__name__)
+
+
+_DEFAULT_MAX_CONCURRENT_UPLOADS = 4
+_DEFAULT_MULTIPART_THRESHOLD = 8 * 2 ** 20          # bytes
+_DEFAULT_MULTIPART_CHUNK_SIZE = 8 * 2 ** 20         # bytes
+_DEFAULT_MAX_UPLOAD_ATTEMPTS = 8
+_DEFAULT_INITIAL_RETRY_DELAY = 1                    # seconds
+_DEFAULT_MAX_RETRY_DELAY = 300                      # seconds
+
+
+class S3UploadService:
+
+    """
+    Uploads files to AWS S3 concurrently, retrying failed uploads.
+
+    An upload service uploads files with a single S3 client that it
+    creates when it first needs it and shares among all of its uploads.
+    It runs up to `max_concurrent_uploads` uploads at a time, and
+    uploads files of at least `multipart_threshold` bytes in parts of
+    `multipart_chunk_size` bytes. When an upload fails, the service
+    retries it up to `max_upload_attempts - 1` times, waiting before
+    each retry for a delay that starts at `initial_retry_delay` seconds
+    and doubles with each retry, up to `max_retry_delay` seconds. Each
+    delay is reduced by a random amount of up to half, so that stations
+    whose uploads failed together do not all retry together.
+
+    A service records each upload in a *journal* file before it starts
+    the upload, and removes it from the journal only when the upload
+    succeeds. The `resume_uploads` method of a service uploads any
+    files that are in its journal, for example uploads that were
+    interrupted by a recorder restart or that failed on every attempt.
+
+    The `upload_file`, `resume_uploads`, and `close` methods of a
+    service are coroutines that must all run in the same event loop.
+    For the Vesper Recorder, that is the loop of the recorder's async
+    task thread. Setting `endpoint_url` to the URL of a local S3
+    stand-in like a moto server allows a service to be tested without
+    AWS.
+    """
+
+
+    def __init__(
+            self, journal_file_path, aws_profile_name=None,
+            endpoint_url=None,
+            max_concurrent_uploads=_DEFAULT_MAX_CONCURRENT_UPLOADS,
+            multipart_threshold=_DEFAULT_MULTIPART_THRESHOLD,
+            multipart_chunk_size=_DEFAULT_MULTIPART_CHUNK_SIZE,
+            max_upload_attempts=_DEFAULT_MAX_UPLOAD_ATTEMPTS,
+            initial_retry_delay=_DEFAULT_INITIAL_RETRY_DELAY,
+            max_retry_delay=_DEFAULT_MAX_RETRY_DELAY):
+
+        if max_concurrent_uploads <= 0:
+            raise ValueError('Max concurrent uploads must be positive.')
+
+        if max_upload_attempts <= 0:
+            raise ValueError('Max upload attempts must be positive.')
+
+        self._journal = _UploadJournal(Path(journal_file_path))
+        self._aws_profile_name = aws_profile_name
+        self._endpoint_url = endpoint_url
+        self._max_concurrent_uploads = max_concurrent_uploads
+        self._max_upload_attempts = max_upload_attempts
+        self._initial_retry_delay = initial_retry_delay
+        self._max_retry_delay = max_retry_delay
+
+        self._transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunk_size)
+
+        self._semaphore = asyncio.Semaphore(max_concurrent_uploads)
+
+        self._client = None
+        self._client_lock = asyncio.Lock()
+        self._exit_stack = None
+
+        # Uploads in progress, including ones waiting to be retried.
+        self._active_uploads = set()
+
+        self._upload_count = 0
+        self._byte_count = 0
+        self._retry_count = 0
+        self._failure_count = 0
+
+
+    @property
+    def journal_file_path(self):
+        return self._journal.file_path
+
+
+    @property
+    def max_concurrent_uploads(self):
+        return self._max_concurrent_uploads
+
+
+    @property
+    def max_upload_attempts(self):
+        return self._max_upload_attempts
+
+
+    @property
+    def pending_uploads(self):
+
+        """
+        the uploads of this service's journal, a `list` of `Bunch`
+        objects with `file_path`, `bucket_name`, and `object_key`
+        attributes.
+        """
+
+        return self._journal.get_uploads()
+
+
+    async def upload_file(self, file_path, bucket_name, object_key):
+
+        """
+        Uploads a file to S3, retrying failed attempts as needed.
+
+        Raises an exception if the upload fails on every attempt. The
+        upload remains in this service's journal in that case, unless
+        the file no longer exists.
+        """
+
+        upload = Bunch(
+            file_path=str(file_path),
+            bucket_name=bucket_name,
+            object_key=object_key)
+
+        self._journal.add(upload)
+
+        await self._upload_file(upload)
+
+
+    async def resume_uploads(self):
+
+        """
+        Uploads the files of this service's journal.
+
+        Uploads that are already in progress are not resumed. Failures
+        are logged but not raised.
+        """
+
+        uploads = [
+            u for u in self._journal.get_uploads()
+            if _get_upload_key(u) not in self._active_uploads]
+
+        if len(uploads) == 0:
+            return
+
+        _logger.info(
+            f'Resuming {len(uploads)} pending S3 upload(s) from journal '
+            f'"{self._journal.file_path}"...')
+
+        await asyncio.gather(
+            *[self._upload_file(u) for u in uploads],
+            return_exceptions=True)
+
+
+    async def _upload_file(self, upload):
+
+        key = _get_upload_key(upload)
+        self._active_uploads.add(key)
+
+        try:
+            await self._upload_file_aux(upload)
+        finally:
+            self._active_uploads.discard(key)
+
+
+    async def _upload_file_aux(self, upload):
+
+        description = (
+            f'file "{upload.file_path}" to S3 bucket '
+            f'"{upload.bucket_name}", object key "{upload.object_key}"')
+
+        attempt_num = 1
+
+        while True:
+
+            try:
+
+                async with self._semaphore:
+
+                    _logger.info(f'Uploading {description}...')
+
+                    client = await self._get_client()
+
+                    await client.upload_file(
+                        upload.file_path, upload.bucket_name,
+                        upload.object_key, Config=self._transfer_config)
+
+            except FileNotFoundError:
+                # file no longer exists, so retrying is pointless
+
+                _logger.warning(
+                    f'Could not upload {description} since the file '
+                    f'does not exist. The upload will not be retried.')
+
+                self._failure_count += 1
+                self._journal.remove(upload)
+                raise
+
+            except Exception as e:
+
+                if attempt_num == self._max_upload_attempts:
+                    # no attempts left
+
+                    _logger.warning(
+                        f'Could not upload {description} after '
+                        f'{attempt_num} attempt(s). The upload will be '
+                        f'retried when the recorder restarts. Exception '
+                        f'message was: {e}')
+
+                    self._failure_count += 1
+                    raise
+
+                delay = self._get_retry_delay(attempt_num)
+
+                _logger.warning(
+                    f'Attempt {attempt_num} to upload {description} '
+                    f'failed. Will retry in {delay:.1f} seconds. '
+                    f'Exception message was: {e}')
+
+                self._retry_count += 1
+                attempt_num += 1
+
+                await asyncio.sleep(delay)
+
+            else:
+                # upload succeeded
+
+                self._upload_count += 1
+                self._byte_count += _get_file_size(upload.file_path)
+                self._journal.remove(upload)
+                return
+
+
+    def _get_retry_delay(self, attempt_num):
+        delay = min(
+            self._initial_retry_delay * 2 ** (attempt_num - 1),
+            self._max_retry_delay)
+        return delay * random.uniform(.5, 1)
+
+
+    async def _get_client(self):
+
+        async with self._client_lock:
+
+            if self._client is None:
+
+                session = aioboto3.Session(
+                    profile_name=self._aws_profile_name)
+
+                self._exit_stack = AsyncExitStack()
+
+                self._client = await self._exit_stack.enter_async_context(
+                    session.client('s3', endpoint_url=self._endpoint_url))
+
+            return self._client
+
+
+    async def close(self):
+
+        """Closes this service's S3 client, if it has one."""
+
+        async with self._client_lock:
+
+            if self._exit_stack is not None:
+                await self._exit_stack.aclose()
+                self._exit_stack = None
+                self._client = None
+
+
+    def get_stats(self):
+
+        """
+        Gets statistics for this service.
+
+        Returns:
+            a `Bunch` with `upload_count`, `byte_count`, `retry_count`,
+            `failure_count`, `active_upload_count`, and
+            `pending_upload_count` attributes. `failure_count` is the
+            number of uploads that failed on every attempt, and
+            `pending_upload_count` is the number of uploads in this
+            service's journal.
+        """
+
+        return Bunch(
+            upload_count=self._upload_count,
+            byte_count=self._byte_count,
+            retry_count=self._retry_count,
+            failure_count=self._failure_count,
+            active_upload_count=len(self._active_uploads),
+            pending_upload_count=len(self._journal.get_uploads()))
+
+
+def _get_upload_key(upload):
+    return (upload.file_path, upload.bucket_name, upload.object_key)
+
+
+def _get_file_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+class _UploadJournal:
+
+    """
+    JSON file of pending uploads.
+
+    The journal file is rewritten atomically whenever an upload is
+    added to or removed from the journal, so that it is never left
+    partially written by a recorder that stops abruptly.
+    """
+
+
+    def __init__(self, file_path):
+        self._file_path = file_path
+        self._uploads = self._read()
+
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+
+    def _read(self):
+
+        if not self._file_path.exists():
+            return {}
+
+        try:
+            with open(self._file_path) as file:
+                data = json.load(file)
+            uploads = [Bunch(**u) for u in data['uploads']]
+
+        except Exception as e:
+            _logger.warning(
+                f'Could not read S3 upload journal "{self._file_path}". '
+                f'Uploads pending in the journal will not be resumed. '
+                f'Exception message was: {e}')
+            return {}
+
+        return {_get_upload_key(u): u for u in uploads}
+
+
+    def get_uploads(self):
+        return list(self._uploads.values())
+
+
+    def add(self, upload):
+        key = _get_upload_key(upload)
+        if key not in self._uploads:
+            self._uploads[key] = upload
+            self._write()
+
+
+    def remove(self, upload):
+        key = _get_upload_key(upload)
+        if self._uploads.pop(key, None) is not None:
+            self._write()
+
+
+    def _write(self):
+
+        data = {'uploads': [u.__dict__ for u in self._uploads.values()]}
+
+        try:
+
+            self._file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            temp_file_path = self._file_path.with_name(
+                self._file_path.name + '.tmp')
+
+            with open(temp_file_path, 'w') as file:
+                json.dump(data, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(temp_file_path, self._file_path)
+
+        except Exception as e:
+            _logger.warning(
+                f'Could not write S3 upload journal "{self._file_path}". '
+                f'Exception message was: {e}')
@@ -0,0 +1,285 @@
+import time
+
+import numpy as np
+
+from vesper.recorder.processor import Processor
+from vesper.recorder.processor_graph import ProcessorGraph
+from vesper.tests.test_case import TestCase
+from vesper.util.bunch import Bunch
+
+
+_INPUT_INFO = Bunch(channel_count=1, sample_rate=1000)
+
+
+class _Doubler(Processor):
+
+    """Doubles its input samples."""
+
+
+    type_name = 'Doubler'
+
+
+    def __init__(self, name, settings, input_info):
+        super().__init__(name, settings, input_info, input_info)
+
+
+    def _start(self):
+        pass
+
+
+    def _process(self, input_item):
+        samples = 2 * input_item.samples[:, :input_item.frame_count]
+        return [Bunch(samples=samples, frame_count=input_item.frame_count)]
+
+
+    def _stop(self):
+        pass
+
+
+    def get_status_tables(self):
+        return []
+
+
+class _Collector(Processor):
+
+    """
+    Collects its input items, busy waiting for `settings.delay`
+    seconds per item to simulate processing load.
+    """
+
+
+    type_name = 'Collector'
+
+
+    def __init__(self, name, settings, input_info):
+        super().__init__(name, settings, input_info)
+        self.items = []
+        self.stopped = False
+
+
+    def _start(self):
+        self.stopped = False
+
+
+    def _process(self, input_item):
+
+        end_time = time.perf_counter() + self.settings.delay
+        while time.perf_counter() < end_time:
+            pass
+
+        self.items.append(input_item.samples[:, :input_item.frame_count])
+
+        return None
+
+
+    def _stop(self):
+        self.stopped = True
+
+
+    def get_status_tables(self):
+        return []
+
+
+_PROCESSOR_CLASSES = (_Doubler, _Collector)
+
+
+def _create_settings(
+        name, type, input, thread=None, input_queue_size=100,
+        input_queue_timeout=1, delay=0):
+
+    return Bunch(
+        name=name,
+        type=type,
+        input=input,
+        thread=thread,
+        input_queue_size=input_queue_size,
+        input_queue_timeout=input_queue_timeout,
+        settings=Bunch(delay=delay))
+
+
+def _create_graph(settings):
+    graph = ProcessorGraph(
+        'Processor Graph', settings, _INPUT_INFO, _PROCESSOR_CLASSES)
+    processors = {p.name: p for p in graph._processors}
+    return graph, processors
+
+
+def _create_input_item(i, capacity=10, frame_count=8):
+    samples = np.zeros((1, capacity), dtype='float32')
+    samples[0, :frame_count] = i
+    return Bunch(samples=samples, frame_count=frame_count)
+
+
+class ProcessorGraphTests(TestCase):
+
+
+    def test_single_threaded_graph(self):
+
+        settings = [
+            _create_settings('Doubler', 'Doubler', 'Audio Input'),
+            _create_settings('Collector', 'Collector', 'Doubler')]
+
+        graph, processors = _create_graph(settings)
+        collector = processors['Collector']
+
+        self.assertEqual(graph.stage_thread_names, ())
+        self.assertEqual(graph.get_edge_stats(), {})
+
+        graph.start()
+
+        for i in range(3):
+            graph.process(_create_input_item(i))
+            self.assertEqual(len(collector.items), i + 1)
+
+        graph.stop()
+
+        self._assert_items(collector.items, 3, 2)
+        self.assertTrue(collector.stopped)
+
+
+    def _assert_items(self, items, count, factor):
+
+        self.assertEqual(len(items), count)
+
+        for i, samples in enumerate(items):
+            expected = np.full((1, 8), factor * i, dtype='float32')
+            self.assert_arrays_equal(samples, expected)
+
+
+    def test_multithreaded_graph(self):
+
+        settings = [
+            _create_settings(
+                'Doubler', 'Doubler', 'Audio Input', thread='Stage 1'),
+            _create_settings('Collector 1', 'Collector', 'Doubler'),
+            _create_settings(
+                'Collector 2', 'Collector', 'Audio Input', thread='Stage 2',
+                delay=.001),
+            _create_settings(
+                'Collector 3', 'Collector', 'Doubler', thread='Stage 2')]
+
+        graph, processors = _create_graph(settings)
+
+        self.assertEqual(graph.stage_thread_names, ('Stage 1', 'Stage 2'))
+
+        graph.start()
+
+        for i in range(20):
+
+            input_item = _create_input_item(i)
+            graph.process(input_item)
+
+            # Overwrite input samples, as the recorder does when it
+            # reuses an input buffer. Threaded processors should have
+            # received copies of the samples.
+            input_item.samples[:] = -1
+
+        graph.stop()
+
+        self._assert_items(processors['Collector 1'].items, 20, 2)
+        self._assert_items(processors['Collector 2'].items, 20, 1)
+        self._assert_items(processors['Collector 3'].items, 20, 2)
+
+        for p in processors.values():
+            self.assertFalse(p.running)
+
+        stats = graph.get_edge_stats()
+
+        self.assertEqual(
+            set(stats.keys()),
+            set((
+                ('Audio Input', 'Doubler'),
+                ('Audio Input', 'Collector 2'),
+                ('Doubler', 'Collector 3'))))
+
+        for s in stats.values():
+            self.assertEqual(s.item_count, 20)
+            self.assertEqual(s.drop_count, 0)
+
+        # Graph should be restartable.
+        graph.start()
+        graph.process(_create_input_item(20))
+        graph.stop()
+        self.assertEqual(len(processors['Collector 3'].items), 21)
+        stats = graph.get_edge_stats()
+        self.assertEqual(stats[('Doubler', 'Collector 3')].item_count, 1)
+
+
+    def test_queue_overflow(self):
+
+        settings = [
+            _create_settings(
+                'Collector', 'Collector', 'Audio Input', thread='Stage',
+                input_queue_size=1, input_queue_timeout=.01, delay=.1)]
+
+        graph, processors = _create_graph(settings)
+
+        graph.start()
+
+        with self.assertLogs(
+                'vesper.recorder.processor_graph', level='WARNING'):
+            for i in range(5):
+                graph.process(_create_input_item(i))
+
+        graph.stop()
+
+        stats = graph.get_edge_stats()[('Audio Input', 'Collector')]
+        self.assertEqual(stats.item_count, 5)
+        self.assertGreater(stats.wait_count, 0)
+        self.assertGreater(stats.drop_count, 0)
+        self.assertEqual(stats.max_queue_size, 1)
+
+        items = processors['Collector'].items
+        self.assertEqual(len(items), 5 - stats.drop_count)
+
+        tables = graph.get_status_tables()
+        self.assertEqual(len(tables), 1)
+        self.assertEqual(
+            tables[0].rows[0][:3], ('Audio Input', 'Collector', 'Stage'))
+
+
+    def test_soak(self):
+
+        # Deliver synthetic input blocks at a fixed period to a graph
+        # whose threaded processor keeps its thread busy for about half
+        # of each period, as a slow resampler or audio file writer
+        # might. No blocks should be dropped, and delivering a block
+        # should not wait for the processor.
+
+        block_count = 400
+        block_period = .002
+        delay = block_period / 2
+
+        settings = [
+            _create_settings(
+                'Collector', 'Collector', 'Audio Input', thread='Stage',
+                input_queue_size=10, delay=delay)]
+
+        graph, processors = _create_graph(settings)
+
+        graph.start()
+
+        max_process_time = 0
+        start_time = time.perf_counter()
+
+        for i in range(block_count):
+
+            # Wait for next block.
+            block_time = start_time + i * block_period
+            while time.perf_counter() < block_time:
+                time.sleep(block_period / 10)
+
+            process_start_time = time.perf_counter()
+            graph.process(_create_input_item(i))
+            process_time = time.perf_counter() - process_start_time
+            max_process_time = max(max_process_time, process_time)
+
+        graph.stop()
+
+        stats = graph.get_edge_stats()[('Audio Input', 'Collector')]
+        self.assertEqual(stats.item_count, block_count)
+        self.assertEqual(stats.drop_count, 0)
+
+        self._assert_items(processors['Collector'].items, block_count, 1)
+
+        self.assertLess(max_process_time, .1)
@@ -0,0 +1,227 @@
+from pathlib import Path
+from unittest import mock
+import asyncio
+import os
+import tempfile
+import unittest
+import urllib.request
+
+import boto3
+
+from vesper.recorder.s3_upload_service import S3UploadService
+from vesper.tests.test_case import TestCase
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    ThreadedMotoServer = None
+
+
+_BUCKET_NAME = 'vesper-test-bucket'
+_AWS_ENVIRONMENT = {
+    'AWS_ACCESS_KEY_ID': 'test',
+    'AWS_SECRET_ACCESS_KEY': 'test',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+
+
+@unittest.skipIf(ThreadedMotoServer is None, 'moto server not installed')
+class S3UploadServiceTests(TestCase):
+
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls._environment_patcher = mock.patch.dict(
+            os.environ, _AWS_ENVIRONMENT)
+        cls._environment_patcher.start()
+
+        cls._server = ThreadedMotoServer(port=0, verbose=False)
+        cls._server.start()
+        host, port = cls._server.get_host_and_port()
+        cls._endpoint_url = f'http://{host}:{port}'
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.stop()
+        cls._environment_patcher.stop()
+
+
+    def setUp(self):
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._journal_file_path = self._dir_path / 'Journal.json'
+
+        self._s3 = boto3.client('s3', endpoint_url=self._endpoint_url)
+
+        # Start each test with an empty moto backend.
+        request = urllib.request.Request(
+            f'{self._endpoint_url}/moto-api/reset', method='POST')
+        urllib.request.urlopen(request).close()
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _create_service(self, **kwargs):
+        kwargs.setdefault('initial_retry_delay', .01)
+        kwargs.setdefault('max_retry_delay', .05)
+        return S3UploadService(
+            self._journal_file_path, endpoint_url=self._endpoint_url,
+            **kwargs)
+
+
+    def _create_file(self, name, size):
+        path = self._dir_path / name
+        path.write_bytes(os.urandom(size))
+        return path
+
+
+    def _assert_object(self, object_key, file_path):
+        response = self._s3.get_object(Bucket=_BUCKET_NAME, Key=object_key)
+        self.assertEqual(response['Body'].read(), file_path.read_bytes())
+
+
+    def test_upload_file(self):
+
+        self._s3.create_bucket(Bucket=_BUCKET_NAME)
+
+        small_file_path = self._create_file('Small.wav', 1000)
+
+        # moto requires that all but the last part of a multipart
+        # upload be at least 5 MiB.
+        large_file_path = self._create_file('Large.wav', 11 * 2 ** 20)
+
+        service = self._create_service(
+            max_concurrent_uploads=2, multipart_threshold=5 * 2 ** 20,
+            multipart_chunk_size=5 * 2 ** 20)
+
+        async def upload():
+            await asyncio.gather(
+                service.upload_file(small_file_path, _BUCKET_NAME, 'Small'),
+                service.upload_file(large_file_path, _BUCKET_NAME, 'Large'))
+            await service.close()
+
+        asyncio.run(upload())
+
+        self._assert_object('Small', small_file_path)
+        self._assert_object('Large', large_file_path)
+
+        # Multipart upload ETags end with a part count.
+        response = self._s3.head_object(Bucket=_BUCKET_NAME, Key='Large')
+        self.assertTrue(response['ETag'].strip('"').endswith('-3'))
+
+        stats = service.get_stats()
+        self.assertEqual(stats.upload_count, 2)
+        self.assertEqual(stats.byte_count, 1000 + 11 * 2 ** 20)
+        self.assertEqual(stats.retry_count, 0)
+        self.assertEqual(stats.failure_count, 0)
+        self.assertEqual(stats.active_upload_count, 0)
+        self.assertEqual(stats.pending_upload_count, 0)
+        self.assertEqual(service.pending_uploads, [])
+
+
+    def test_retry(self):
+
+        file_path = self._create_file('File.wav', 1000)
+
+        service = self._create_service(max_upload_attempts=20)
+
+        async def upload():
+
+            task = asyncio.create_task(
+                service.upload_file(file_path, _BUCKET_NAME, 'File'))
+
+            # Let first attempt fail because bucket does not exist.
+            while service.get_stats().retry_count == 0:
+                await asyncio.sleep(.01)
+
+            self._s3.create_bucket(Bucket=_BUCKET_NAME)
+
+            await task
+            await service.close()
+
+        with self.assertLogs(
+                'vesper.recorder.s3_upload_service', level='WARNING'):
+            asyncio.run(upload())
+
+        self._assert_object('File', file_path)
+
+        stats = service.get_stats()
+        self.assertEqual(stats.upload_count, 1)
+        self.assertGreater(stats.retry_count, 0)
+        self.assertEqual(stats.pending_upload_count, 0)
+
+
+    def test_resume_uploads(self):
+
+        file_path = self._create_file('File.wav', 1000)
+
+        service = self._create_service(max_upload_attempts=2)
+
+        async def upload():
+            try:
+                await service.upload_file(file_path, _BUCKET_NAME, 'File')
+            finally:
+                await service.close()
+
+        # Upload should fail since bucket does not exist.
+        with self.assertLogs(
+                'vesper.recorder.s3_upload_service', level='WARNING'):
+            self.assert_raises(Exception, asyncio.run, upload())
+
+        stats = service.get_stats()
+        self.assertEqual(stats.retry_count, 1)
+        self.assertEqual(stats.failure_count, 1)
+        self.assertEqual(stats.pending_upload_count, 1)
+
+        # Create new service, as after a recorder restart.
+        service = self._create_service()
+
+        uploads = service.pending_uploads
+        self.assertEqual(len(uploads), 1)
+        upload = uploads[0]
+        self.assertEqual(upload.file_path, str(file_path))
+        self.assertEqual(upload.bucket_name, _BUCKET_NAME)
+        self.assertEqual(upload.object_key, 'File')
+
+        self._s3.create_bucket(Bucket=_BUCKET_NAME)
+
+        async def resume():
+            await service.resume_uploads()
+            await service.close()
+
+        asyncio.run(resume())
+
+        self._assert_object('File', file_path)
+        self.assertEqual(service.pending_uploads, [])
+        self.assertEqual(self._create_service().pending_uploads, [])
+
+
+    def test_missing_file(self):
+
+        self._s3.create_bucket(Bucket=_BUCKET_NAME)
+
+        file_path = self._dir_path / 'Missing.wav'
+        service = self._create_service()
+
+        with self.assertLogs(
+                'vesper.recorder.s3_upload_service', level='WARNING'):
+            self.assert_raises(
+                FileNotFoundError, asyncio.run,
+                service.upload_file(file_path, _BUCKET_NAME, 'Missing'))
+
+        stats = service.get_stats()
+        self.assertEqual(stats.retry_count, 0)
+        self.assertEqual(stats.failure_count, 1)
+        self.assertEqual(stats.pending_upload_count, 0)
+
+
+    def test_initializer_errors(self):
+        self.assert_raises(
+            ValueError, self._create_service, max_concurrent_uploads=0)
+        self.assert_raises(
+            ValueError, self._create_service, max_upload_attempts=0)
@@ -79,6 +79,8 @@ _DEFAULT_STATION_LONGITUDE = None
 _DEFAULT_STATION_TIME_ZONE = 'UTC'
 _DEFAULT_SCHEDULE = {}
 _DEFAULT_SERVER_PORT_NUM = 8001
+_DEFAULT_PROCESSOR_INPUT_QUEUE_SIZE = 100               # items
+_DEFAULT_PROCESSOR_INPUT_QUEUE_TIMEOUT = 1              # seconds
 
 _PROCESSOR_CLASSES = (Resampler, LevelMeter, AudioFileWriter)
 
@@ -673,6 +675,11 @@ def _parse_processor_settings_aux(mapping, processor_classes):
     name = settings.get_required('name')
     type = settings.get_required('type')
     input = settings.get_required('input')
+    thread = settings.get('thread', None)
+    input_queue_size = int(settings.get(
+        'input_queue_size', _DEFAULT_PROCESSOR_INPUT_QUEUE_SIZE))
+    input_queue_timeout = float(settings.get(
+        'input_queue_timeout', _DEFAULT_PROCESSOR_INPUT_QUEUE_TIMEOUT))
     mapping = settings.get('settings', {})
 
     try:
@@ -686,6 +693,9 @@ def _parse_processor_settings_aux(mapping, processor_classes):
         name=name,
         type=type,
         input=input,
+        thread=thread,
+        input_queue_size=input_queue_size,
+        input_queue_timeout=input_queue_timeout,
         settings=settings)
 
 
@@ -0,0 +1,598 @@
+"""
+Module containing class `FlacFileSignal`.
+
+A FLAC file comprises the four-byte marker `b'fLaC'`, a sequence of
+metadata blocks, and a sequence of audio *frames*, each of which
+encodes a block of consecutive sample frames independently of the
+other frames. A `FlacFileSignal` reads samples from a FLAC file by
+decoding only the frames that overlap the requested samples. To find
+them, it uses a *seek table* of the starting sample indices and byte
+offsets of all of the frames of the file. A FLAC file's own SEEKTABLE
+metadata block (if it has one) typically locates only one frame every
+ten seconds, so we do not use it. Instead, we build the seek table from
+the frame headers of the file when the file is first opened in a
+process, and cache it for subsequent openings.
+
+The frames overlapping a read are decoded with the `soundfile` package.
+We give it a small in-memory FLAC stream comprising the file's
+STREAMINFO metadata block, modified to describe just the stream's
+frames, followed by the frames.
+"""
+
+
+from pathlib import Path
+from threading import Lock
+import io
+import os
+
+import numpy as np
+import soundfile
+
+from vesper.signal.audio_file_signal import AudioFileSignal
+from vesper.signal.signal_error import SignalError
+from vesper.util.bunch import Bunch
+from vesper.util.lru_cache import LruCache
+
+
+_FLAC_FILE_EXTENSIONS = frozenset(['.flac', '.FLAC'])
+
+_FLAC_MARKER = b'fLaC'
+
+_STREAMINFO_BLOCK_TYPE = 0
+_STREAMINFO_BLOCK_SIZE = 34
+
+_SCAN_CHUNK_SIZE = 2 ** 24
+"""Size in bytes of the chunks of frame data scanned for frame headers."""
+
+_MAX_FRAME_HEADER_SIZE = 16
+
+_SEEK_TABLE_CACHE_SIZE = 100
+"""Maximum number of seek tables cached per process."""
+
+_seek_table_cache = LruCache(_SEEK_TABLE_CACHE_SIZE)
+_seek_table_cache_lock = Lock()
+
+
+# Mapping from FLAC bits per sample to pairs of signal dtype and
+# `soundfile` read dtype. 24-bit samples are read as 32-bit integers
+# and shifted right by eight bits, so they have the same values as the
+# 24-bit samples, as for a `MappedWaveFileSignal`.
+_SAMPLE_DTYPES = {
+    16: ('<i2', 'int16'),
+    24: ('<i4', 'int32'),
+}
+
+
+class FlacFileSignal(AudioFileSignal):
+
+    """
+    FLAC file signal.
+
+    A `FlacFileSignal` reads samples from a FLAC file by decoding only
+    the FLAC frames that overlap the requested samples, located by
+    means of a seek table that is built when the file is first opened
+    in a process. Reads are performed with positional file reads, so
+    reads from different threads do not interfere with each other.
+
+    This class supports 16- and 24-bit FLAC files. As for a
+    `MappedWaveFileSignal`, 24-bit samples are read as 32-bit integers
+    with the same values as the 24-bit samples.
+    """
+
+
+    @staticmethod
+    def is_flac_file(path):
+
+        if isinstance(path, Path):
+            extension = path.suffix
+        else:
+            extension = os.path.splitext(path)[1]
+
+        return extension in _FLAC_FILE_EXTENSIONS
+
+
+    def __init__(self, path, name=None):
+
+        if not isinstance(path, (str, Path)):
+            raise TypeError(
+                f'FlacFileSignal requires a file path, but got '
+                f'{path.__class__.__name__}.')
+
+        path = Path(path)
+        _check_flac_file_path(path)
+
+        self._file_text = f'FLAC file "{path}"'
+
+        try:
+            self._fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        except OSError as e:
+            raise SignalError(
+                f'Could not open {self._file_text}. Error message was: '
+                f'{str(e)}')
+
+        try:
+            self._stream_info, self._data_offset = \
+                _read_metadata(self._fd, self._file_text)
+            self._seek_table = self._get_seek_table(path)
+        except Exception:
+            self.close()
+            raise
+
+        info = self._stream_info
+
+        dtypes = _SAMPLE_DTYPES.get(info.sample_size)
+
+        if dtypes is None:
+            self.close()
+            raise SignalError(
+                f'{self._file_text} contains {info.sample_size}-bit '
+                f'samples, which are not supported.')
+
+        dtype, self._read_dtype = dtypes
+
+        super().__init__(
+            int(self._seek_table.sample_indices[-1]), info.sample_rate,
+            info.channel_count, np.dtype(dtype), name=name, file_path=path)
+
+
+    def _get_seek_table(self, path):
+
+        stat = os.fstat(self._fd)
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+
+        with _seek_table_cache_lock:
+            seek_table = _seek_table_cache.get(key)
+
+        if seek_table is None:
+
+            seek_table = _build_seek_table(
+                path, self._data_offset, stat.st_size, self._stream_info,
+                self._file_text)
+
+            with _seek_table_cache_lock:
+                _seek_table_cache[key] = seek_table
+
+        return seek_table
+
+
+    @property
+    def frame_count(self):
+
+        """The number of FLAC frames of this signal's file."""
+
+        return len(self._seek_table.sample_indices) - 1
+
+
+    @property
+    def is_open(self):
+        return self._fd is not None
+
+
+    def close(self):
+        if self.is_open:
+            os.close(self._fd)
+            self._fd = None
+
+
+    def _read(self, frame_slice, channel_slice):
+
+        fd = self._fd
+
+        if fd is None:
+            raise SignalError(
+                'Attempt to read samples from closed FLAC file signal.')
+
+        start_index = frame_slice.start
+        end_index = frame_slice.stop
+
+        if start_index == end_index:
+            samples = np.zeros((0, self.channel_count), self.dtype)
+            return samples[:, channel_slice], True
+
+        # Find FLAC frames that overlap read.
+        sample_indices = self._seek_table.sample_indices
+        i = np.searchsorted(sample_indices, start_index, 'right') - 1
+        j = np.searchsorted(sample_indices, end_index, 'left')
+
+        frames_start_index = int(sample_indices[i])
+        frames_length = int(sample_indices[j]) - frames_start_index
+
+        offsets = self._seek_table.offsets
+        start_offset = self._data_offset + int(offsets[i])
+        size = int(offsets[j] - offsets[i])
+
+        try:
+            data = os.pread(fd, size, start_offset)
+        except OSError as e:
+            raise SignalError(
+                f'Could not read FLAC frames from {self._file_text}. '
+                f'Error message was: {str(e)}')
+
+        if len(data) != size:
+            raise SignalError(
+                f'FLAC frame data read yielded {len(data)} bytes rather '
+                f'than expected {size} bytes for {self._file_text}.')
+
+        stream = _create_stream_header(self._stream_info, frames_length) + \
+            data
+
+        try:
+            with soundfile.SoundFile(io.BytesIO(stream)) as file_:
+                samples = file_.read(
+                    frames_length, dtype=self._read_dtype, always_2d=True)
+        except Exception as e:
+            raise SignalError(
+                f'Could not decode FLAC frames of {self._file_text}. '
+                f'Error message was: {str(e)}')
+
+        if len(samples) != frames_length:
+            raise SignalError(
+                f'FLAC frame decoding yielded {len(samples)} sample frames '
+                f'rather than expected {frames_length} for '
+                f'{self._file_text}.')
+
+        # Select requested samples.
+        start = start_index - frames_start_index
+        end = end_index - frames_start_index
+        samples = samples[start:end, channel_slice]
+
+        if self._stream_info.sample_size == 24:
+            samples = samples >> 8
+
+        return samples, True
+
+
+def _check_flac_file_path(path):
+
+    if not path.exists():
+        raise SignalError(f'Purported FLAC file "{path}" does not exist.')
+
+    if not path.is_file():
+        raise SignalError(f'Purported FLAC file "{path}" is not a file.')
+
+    if not FlacFileSignal.is_flac_file(path):
+        raise SignalError(f'File "{path}" does not appear to be a FLAC file.')
+
+
+def _read_metadata(fd, file_text):
+
+    """
+    Reads the metadata of a FLAC file.
+
+    Returns
+    -------
+    tuple
+        `(stream_info, data_offset)`, where `stream_info` is a `Bunch`
+        of the file's STREAMINFO metadata and `data_offset` is the
+        offset of the file's first frame.
+    """
+
+    if os.pread(fd, 4, 0) != _FLAC_MARKER:
+        raise SignalError(f'{file_text} does not start with "fLaC".')
+
+    stream_info = None
+    offset = 4
+
+    while True:
+
+        header = os.pread(fd, 4, offset)
+
+        if len(header) != 4:
+            raise SignalError(f'{file_text} has truncated metadata.')
+
+        is_last = header[0] & 0x80 != 0
+        block_type = header[0] & 0x7F
+        block_size = int.from_bytes(header[1:], 'big')
+
+        if block_type == _STREAMINFO_BLOCK_TYPE:
+
+            if block_size != _STREAMINFO_BLOCK_SIZE:
+                raise SignalError(
+                    f'{file_text} has STREAMINFO metadata block of '
+                    f'unexpected size {block_size}.')
+
+            data = os.pread(fd, block_size, offset + 4)
+
+            if len(data) != block_size:
+                raise SignalError(f'{file_text} has truncated metadata.')
+
+            stream_info = _parse_stream_info(data)
+
+        offset += 4 + block_size
+
+        if is_last:
+            break
+
+    if stream_info is None:
+        raise SignalError(f'{file_text} has no STREAMINFO metadata block.')
+
+    return stream_info, offset
+
+
+def _parse_stream_info(data):
+
+    # The STREAMINFO fields that follow the minimum and maximum block
+    # and frame sizes are packed into 64 bits.
+    bits = int.from_bytes(data[10:18], 'big')
+
+    return Bunch(
+        data=data,
+        min_block_size=int.from_bytes(data[0:2], 'big'),
+        max_block_size=int.from_bytes(data[2:4], 'big'),
+        sample_rate=bits >> 44,
+        channel_count=((bits >> 41) & 0x7) + 1,
+        sample_size=((bits >> 36) & 0x1F) + 1,
+        length=bits & 0xFFFFFFFFF)
+
+
+def _create_stream_header(stream_info, length):
+
+    """
+    Creates the header of an in-memory FLAC stream of `length` sample
+    frames that comprises frames of a FLAC file.
+
+    The header comprises the FLAC marker and a copy of the file's
+    STREAMINFO metadata block with the stream length set to `length`
+    and the MD5 signature cleared, since the stream is only part of
+    the file.
+    """
+
+    data = bytearray(stream_info.data)
+
+    bits = int.from_bytes(data[10:18], 'big')
+    bits = (bits & ~0xFFFFFFFFF) | length
+    data[10:18] = bits.to_bytes(8, 'big')
+    data[18:34] = bytes(16)
+
+    block_header = \
+        bytes([0x80 | _STREAMINFO_BLOCK_TYPE]) + \
+        _STREAMINFO_BLOCK_SIZE.to_bytes(3, 'big')
+
+    return _FLAC_MARKER + block_header + bytes(data)
+
+
+def _build_seek_table(path, data_offset, file_size, stream_info, file_text):
+
+    """
+    Builds the seek table of a FLAC file from its frame headers.
+
+    We locate the frames of a file by scanning its frame data for frame
+    sync codes, and then accepting in order each sync code that begins
+    a valid frame header (including a valid CRC) whose starting sample
+    index is the end index of the previous frame. Sync codes can also
+    occur within the encoded samples of frames, but it is extremely
+    unlikely that one that does will also be followed by a valid header
+    with the right sample index.
+
+    Returns
+    -------
+    Bunch
+        a `Bunch` with attributes `sample_indices` and `offsets`, NumPy
+        arrays of the starting sample indices of the file's frames and
+        of their byte offsets relative to the first frame, each with an
+        additional final element for the end of the last frame.
+    """
+
+    data_size = file_size - data_offset
+
+    if data_size <= 0:
+        candidates = np.zeros(0, dtype='int64')
+        data = None
+    else:
+        data = np.memmap(path, np.uint8, 'r', offset=data_offset)
+        candidates = _find_sync_codes(data)
+
+    sample_indices = []
+    offsets = []
+
+    expected_length = stream_info.length
+    next_index = 0
+    min_offset = 0
+
+    for offset in candidates.tolist():
+
+        if expected_length != 0 and next_index == expected_length:
+            break
+
+        if offset < min_offset:
+            continue
+
+        header = bytes(data[offset:offset + _MAX_FRAME_HEADER_SIZE])
+        frame = _parse_frame_header(header, stream_info)
+
+        if frame is not None and frame.start_index == next_index:
+            sample_indices.append(next_index)
+            offsets.append(offset)
+            next_index += frame.length
+            min_offset = offset + frame.header_size
+
+    if expected_length != 0 and next_index != expected_length:
+        raise SignalError(
+            f'Could not locate all FLAC frames of {file_text}. Found '
+            f'frames for {next_index} of {expected_length} sample frames.')
+
+    sample_indices.append(next_index)
+    offsets.append(data_size)
+
+    return Bunch(
+        sample_indices=np.array(sample_indices, dtype='int64'),
+        offsets=np.array(offsets, dtype='int64'))
+
+
+def _find_sync_codes(data):
+
+    """
+    Finds the offsets of all possible frame sync codes in FLAC frame
+    data.
+
+    A frame sync code is the fourteen bits 11111111111110, which are
+    followed by a reserved zero bit and a blocking strategy bit, so
+    the first two bytes of a frame are either 0xFFF8 or 0xFFF9.
+    """
+
+    offset_arrays = []
+
+    for start in range(0, len(data) - 1, _SCAN_CHUNK_SIZE):
+
+        # Include one extra byte so we find codes that span chunks.
+        chunk = np.asarray(data[start:start + _SCAN_CHUNK_SIZE + 1])
+
+        offsets = np.flatnonzero(
+            (chunk[:-1] == 0xFF) & ((chunk[1:] & 0xFE) == 0xF8))
+
+        offset_arrays.append(offsets + start)
+
+    if len(offset_arrays) == 0:
+        return np.zeros(0, dtype='int64')
+    else:
+        return np.concatenate(offset_arrays)
+
+
+def _parse_frame_header(header, stream_info):
+
+    """
+    Parses a FLAC frame header.
+
+    Returns
+    -------
+    Bunch or None
+        a `Bunch` with attributes `start_index`, `length`, and
+        `header_size` if `header` starts with a valid frame header for
+        the specified stream, or `None` otherwise.
+    """
+
+    if len(header) < 5:
+        return None
+
+    is_variable_block_size = header[1] & 0x01 != 0
+    block_size_code = header[2] >> 4
+    sample_rate_code = header[2] & 0x0F
+    channel_assignment = header[3] >> 4
+    sample_size_code = (header[3] >> 1) & 0x07
+
+    if block_size_code == 0 or sample_rate_code == 15 or \
+            channel_assignment > 10 or header[3] & 0x01 != 0:
+        return None
+
+    # Check channel count and sample size against stream info, which
+    # helps to reject sync codes that do not start frames.
+    channel_count = channel_assignment + 1 if channel_assignment < 8 else 2
+    if channel_count != stream_info.channel_count:
+        return None
+
+    if sample_size_code != 0:
+        sample_size = _SAMPLE_SIZES.get(sample_size_code)
+        if sample_size != stream_info.sample_size:
+            return None
+
+    number, i = _parse_coded_number(header, 4)
+
+    if number is None:
+        return None
+
+    # Get block size.
+    if block_size_code == 1:
+        length = 192
+    elif block_size_code <= 5:
+        length = 576 << (block_size_code - 2)
+    elif block_size_code == 6:
+        if i + 1 > len(header):
+            return None
+        length = header[i] + 1
+        i += 1
+    elif block_size_code == 7:
+        if i + 2 > len(header):
+            return None
+        length = int.from_bytes(header[i:i + 2], 'big') + 1
+        i += 2
+    else:
+        length = 256 << (block_size_code - 8)
+
+    # Skip sample rate, if present.
+    if sample_rate_code == 12:
+        i += 1
+    elif sample_rate_code == 13 or sample_rate_code == 14:
+        i += 2
+
+    if i + 1 > len(header) or _get_crc_8(header[:i]) != header[i]:
+        return None
+
+    if is_variable_block_size:
+        start_index = number
+    else:
+        start_index = number * stream_info.max_block_size
+
+    return Bunch(start_index=start_index, length=length, header_size=i + 1)
+
+
+# Mapping from FLAC frame header sample size codes to sample sizes.
+# Code zero means "get from STREAMINFO", and code three is reserved.
+_SAMPLE_SIZES = {1: 8, 2: 12, 4: 16, 5: 20, 6: 24, 7: 32}
+
+
+def _parse_coded_number(header, i):
+
+    """
+    Parses the "UTF-8" coded frame or sample number of a FLAC frame
+    header.
+
+    Returns
+    -------
+    tuple
+        `(number, i)`, where `number` is the parsed number, or `None`
+        if the number is invalid, and `i` is the index of the header
+        byte following the number.
+    """
+
+    first_byte = header[i]
+
+    if first_byte < 0x80:
+        return first_byte, i + 1
+
+    # Get number of continuation bytes from number of leading one bits.
+    byte_count = 0
+    mask = 0x40
+    while first_byte & mask != 0:
+        byte_count += 1
+        mask >>= 1
+
+    if byte_count == 0 or byte_count > 6 or i + 1 + byte_count > len(header):
+        return None, i
+
+    number = first_byte & (mask - 1)
+
+    for byte in header[i + 1:i + 1 + byte_count]:
+        if byte & 0xC0 != 0x80:
+            return None, i
+        number = (number << 6) | (byte & 0x3F)
+
+    return number, i + 1 + byte_count
+
+
+def _create_crc_8_table():
+
+    table = []
+
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ 0x07) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+        table.append(crc)
+
+    return table
+
+
+_CRC_8_TABLE = _create_crc_8_table()
+
+
+def _get_crc_8(data):
+
+    """Computes the CRC-8 (polynomial 0x07) of a FLAC frame header."""
+
+    crc = 0
+    for byte in data:
+        crc = _CRC_8_TABLE[crc ^ byte]
+    return crc
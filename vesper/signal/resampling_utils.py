@@ -1,16 +1,14 @@
 """Utilities for resampling audio."""
 
 
+from fractions import Fraction
 import numbers
 
+import numpy as np
 import resampy
 import scipy.signal as signal
  
 
-# TODO: Create `Resampler` class whose instances can resample a signal
-# in chunks, producing the same samples that would be produced if the
-# signal was processed all at once.
-
 # TODO: Try using combined fractional delay/lowpass filters designed
 # as such rather than multirate polyphase filters derived from a single
 # lowpass filter for resampling.
@@ -70,10 +68,364 @@ def resample_to_24000_hz(samples, input_rate):
                 
             return result.astype(samples.dtype)
         
+        else:
+            return result
+        
     else:
         return resampy.resample(samples, input_rate, 24000)
        
         
+class Resampler:
+    
+    """
+    Streaming polyphase resampler.
+    
+    A `Resampler` resamples a signal from one sample rate to another.
+    The ratio of the two rates must be rational, and the resampler
+    uses it exactly, e.g. 160/147 for resampling from 22050 Hz to
+    24000 Hz.
+    
+    The signal can be resampled in chunks of arbitrary sizes via
+    successive calls to the `resample` method, followed by a call to
+    the `flush` method after the last chunk (or with a `flush` argument
+    of `True` for the last chunk). The resampler keeps the input
+    samples that it needs from one call to the next in a buffer that it
+    reuses, so the concatenation of the outputs of the calls does not
+    depend on the chunk sizes. The concatenation is the same as the output of
+    `scipy.signal.resample_poly` for the entire signal and the same
+    filter, up to floating point rounding. In particular, output sample
+    `i` is at time `i / output_rate` with respect to the first input
+    sample.
+    
+    Since the resampler's filter looks ahead in the input, the output
+    for a chunk lags it slightly. The `flush` method outputs the final
+    samples.
+    
+    For resampling to 24000 Hz from the input rates for which the
+    `resample_to_24000_hz` function of this module has special filters,
+    the resampler uses the same filters. For other rates, it uses a
+    Kaiser window filter that passes frequencies below nine tenths of
+    the lower of the two Nyquist frequencies and attenuates frequencies
+    above that Nyquist frequency by at least 100 dB.
+    
+    The resampler computes with samples of the dtype with which it is
+    constructed, by default `float32`, converting input samples to
+    that dtype if needed. In particular, it does not convert `float32`
+    samples to `float64`. The `resample` and `flush` methods can write
+    their output to a caller-supplied array, so that a caller that
+    reuses that array from one chunk to the next does not allocate
+    memory for each chunk.
+    
+    Parameters
+    ----------
+    input_rate : int, Fraction, or float
+        the input sample rate.
+        
+    output_rate : int, Fraction, or float
+        the output sample rate.
+        
+    filter_ : sequence of numbers, or None
+        the lowpass FIR filter to use, at the upsampled rate, with
+        unity passband gain. If `None`, the filter is chosen as
+        described above.
+        
+    dtype : NumPy dtype
+        the dtype of output samples.
+    """
+    
+    
+    def __init__(
+            self, input_rate, output_rate, filter_=None, dtype=np.float32):
+        
+        ratio = Fraction(output_rate) / Fraction(input_rate)
+        up = ratio.numerator
+        down = ratio.denominator
+        
+        if filter_ is None:
+            filter_ = _get_resampling_filter(input_rate, output_rate, up)
+        
+        self._input_rate = input_rate
+        self._output_rate = output_rate
+        self._up = up
+        self._down = down
+        self._dtype = np.dtype(dtype)
+        
+        h = np.array(filter_, dtype=np.float64) * up
+        self._half_length = (len(h) - 1) // 2
+        
+        # Number of input samples that contribute to each output sample.
+        self._history_length = -(-len(h) // up)
+        
+        # Polyphase filter bank. Output sample `i` is at index
+        # `t = i * down + half_length` of the upsampled input. It is the
+        # dot product of the `history_length` input samples ending with
+        # the one at index `t // up` and row `t % up` of the filter bank.
+        # The filter is padded with zeros so all rows have the same
+        # length, and the rows are reversed for the dot products.
+        filters = np.zeros(self._history_length * up)
+        filters[:len(h)] = h
+        filters = filters.reshape(self._history_length, up).T[:, ::-1]
+        self._filters = np.ascontiguousarray(filters, dtype=self._dtype)
+        
+        # Input sample buffer. We allocate the buffer once and reuse
+        # it, growing it only when a larger chunk of input arrives.
+        self._buffer = np.zeros(2 * self._history_length, dtype=self._dtype)
+        
+        self._reset()
+        
+        
+    def _reset(self):
+        
+        # The buffer holds `self._buffer_length` input samples, starting
+        # with the one at index `self._buffer_start_index`. Samples with
+        # negative indices are zero.
+        self._buffer[:self._history_length] = 0
+        self._buffer_length = self._history_length
+        self._buffer_start_index = -self._history_length
+        
+        self._input_length = 0
+        self._output_length = 0
+        
+        
+    @property
+    def input_rate(self):
+        return self._input_rate
+    
+    
+    @property
+    def output_rate(self):
+        return self._output_rate
+    
+    
+    @property
+    def up(self):
+        return self._up
+    
+    
+    @property
+    def down(self):
+        return self._down
+    
+    
+    @property
+    def dtype(self):
+        return self._dtype
+    
+    
+    def get_output_length(self, input_length, flush=False):
+        
+        """
+        Gets the number of output samples for the next chunk of input.
+        
+        The number is the length of the array that the `resample`
+        method will return for a chunk of `input_length` samples and
+        the specified `flush` argument. It is useful for allocating
+        output arrays to pass to that method.
+        """
+        
+        n = (self._input_length + input_length) * self._up
+        
+        if flush:
+            end_index = n // self._down + bool(n % self._down)
+        else:
+            end_index = self._get_available_end_index(n)
+            
+        return end_index - self._output_length
+    
+    
+    def resample(self, samples, out=None, flush=False):
+        
+        """
+        Resamples the next chunk of input samples.
+        
+        Returns the output samples for which all needed input samples
+        are available. If `flush` is `True`, the returned samples also
+        include the ones that the `flush` method would return after
+        this call, and the resampler is reset as by that method.
+        
+        If `out` is `None`, the samples are returned in a new array.
+        Otherwise they are written to the start of `out`, which must be
+        long enough to hold them (see the `get_output_length` method),
+        and the method returns a view of the written part of `out`.
+        Reusing an output array from one call to the next saves
+        allocating a new one for each call.
+        """
+        
+        self._append_samples(samples)
+        
+        if flush:
+            return self.flush(out)
+        
+        end_index = self._get_available_end_index(
+            self._input_length * self._up)
+        
+        return self._resample(end_index, out)
+    
+    
+    def _get_available_end_index(self, upsampled_input_length):
+        
+        # Get end index of output samples whose input is all available.
+        # The last input sample needed for output sample `i` has index
+        # `(i * down + half_length) // up`.
+        return max(
+            (upsampled_input_length - 1 - self._half_length) //
+            self._down + 1,
+            self._output_length)
+    
+    
+    def flush(self, out=None):
+        
+        """
+        Outputs any remaining output samples.
+        
+        The remaining samples are computed as though the input were
+        followed by zeros. The total number of output samples is the
+        ceiling of the number of input samples times `up / down`, just
+        as for `scipy.signal.resample_poly`. The `out` argument is as
+        for the `resample` method.
+        
+        After this method returns, the resampler is ready to resample
+        a new signal.
+        """
+        
+        n = self._input_length * self._up
+        end_index = n // self._down + bool(n % self._down)
+        
+        # Append enough zeros to compute the remaining output samples.
+        self._append_samples(
+            np.zeros(self._history_length + 1, dtype=self._dtype))
+        
+        samples = self._resample(end_index, out)
+        
+        self._reset()
+        
+        return samples
+    
+    
+    def _append_samples(self, samples):
+        
+        samples = np.asarray(samples)
+        start_index = self._buffer_length
+        end_index = start_index + len(samples)
+        
+        if end_index > len(self._buffer):
+            # buffer too small for samples
+            
+            # Grow buffer, leaving room for the few more input samples
+            # that the next chunk may need to be buffered with.
+            buffer = np.empty(
+                end_index + self._history_length, dtype=self._dtype)
+            buffer[:start_index] = self._buffer[:start_index]
+            self._buffer = buffer
+            
+        self._buffer[start_index:end_index] = samples
+        self._buffer_length = end_index
+        self._input_length += len(samples)
+        
+        
+    def _resample(self, end_index, out):
+        
+        """Computes output samples up to the specified end index."""
+        
+        start_index = self._output_length
+        count = end_index - start_index
+        
+        if out is None:
+            out = np.empty(count, dtype=self._dtype)
+            
+        elif len(out) < count:
+            raise ValueError((
+                'Resampler output array has length {}, but {} output '
+                'samples are available.').format(len(out), count))
+            
+        else:
+            out = out[:count]
+            
+        if count == 0:
+            return out
+        
+        up = self._up
+        down = self._down
+        history_length = self._history_length
+        
+        # View of buffered input as overlapping windows of length
+        # `history_length`, each the input of one output sample.
+        windows = np.lib.stride_tricks.sliding_window_view(
+            self._buffer[:self._buffer_length], history_length)
+        
+        # Output samples `up` apart use the same filter phase, and their
+        # input windows are `down` apart, so we compute each set of such
+        # samples with one matrix-vector product, written to `out`. We
+        # use `np.einsum` rather than `np.matmul` for the products since
+        # its result for a window does not depend on the number or
+        # spacing of the windows, while BLAS results can. This keeps
+        # the output independent of the input chunk sizes.
+        for i in range(min(up, count)):
+            
+            t = (start_index + i) * down + self._half_length
+            window_index = \
+                t // up - history_length + 1 - self._buffer_start_index
+            window_count = (count - i - 1) // up + 1
+            stop_index = window_index + (window_count - 1) * down + 1
+            
+            np.einsum(
+                'ij,j->i', windows[window_index:stop_index:down],
+                self._filters[t % up], out=out[i::up])
+        
+        self._output_length = end_index
+        
+        # Discard buffered input samples that will not be needed for
+        # subsequent output samples, moving the rest to the start of
+        # the buffer.
+        next_input_index = \
+            (end_index * down + self._half_length) // up - \
+            history_length + 1
+        discard_count = next_input_index - self._buffer_start_index
+        if discard_count > 0:
+            buffer = self._buffer
+            length = self._buffer_length - discard_count
+            buffer[:length] = buffer[discard_count:self._buffer_length]
+            self._buffer_length = length
+            self._buffer_start_index = next_input_index
+            
+        return out
+
+
+def _get_resampling_filter(input_rate, output_rate, up):
+    
+    if output_rate == 24000:
+        
+        case = _24000_HZ_SPECIAL_CASES.get(float(input_rate))
+        
+        if case is not None:
+            # have special filter for input rate
+            
+            _, _, filter_ = case
+            return filter_
+        
+    # Design Kaiser window filter.
+    upsampled_rate = float(input_rate) * up
+    nyquist_rate = float(min(input_rate, output_rate)) / 2
+    passband_edge = _PASSBAND_FRACTION * nyquist_rate
+    transition_width = nyquist_rate - passband_edge
+    tap_count, beta = signal.kaiserord(
+        _STOPBAND_ATTENUATION, transition_width / (upsampled_rate / 2))
+    tap_count |= 1
+    cutoff = (passband_edge + nyquist_rate) / 2
+    return signal.firwin(
+        tap_count, cutoff, window=('kaiser', beta), fs=upsampled_rate)
+
+
+_PASSBAND_FRACTION = .9
+"""
+Passband edge of designed resampling filters, as a fraction of the lower
+of the input and output Nyquist frequencies.
+"""
+
+_STOPBAND_ATTENUATION = 100
+"""Stopband attenuation of designed resampling filters, in decibels."""
+
+
 def _clip_samples(samples, dtype):
     
     """
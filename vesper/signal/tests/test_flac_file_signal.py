@@ -0,0 +1,170 @@
+from pathlib import Path
+from unittest.mock import patch
+import tempfile
+
+import numpy as np
+import soundfile
+
+from vesper.signal.flac_file_signal import FlacFileSignal
+from vesper.signal.signal_error import SignalError
+from vesper.signal.tests.signal_test_case import SignalTestCase
+from vesper.signal.time_axis import TimeAxis
+from vesper.util.lru_cache import LruCache
+import vesper.signal.flac_file_signal as flac_file_signal
+
+
+_SAMPLE_RATE = 24000
+
+
+class FlacFileSignalTests(SignalTestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._temp_dir_path = Path(self._temp_dir.name)
+        self._rng = np.random.default_rng(0)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _write_flac_file(self, samples, subtype='PCM_16'):
+
+        # `samples` is channel-first.
+
+        path = self._temp_dir_path / 'Test.flac'
+        soundfile.write(path, samples.T, _SAMPLE_RATE, subtype=subtype)
+        return path
+
+
+    def _create_samples(self, channel_count, frame_count):
+
+        # Create samples that compress at least a little, so that FLAC
+        # frames vary in size.
+        noise = self._rng.integers(
+            -1000, 1000, (channel_count, frame_count), endpoint=True)
+        ramp = np.arange(frame_count) % 2000
+        return (noise + ramp).astype('<i2')
+
+
+    def test_init(self):
+
+        for channel_count, frame_count in ((1, 1), (1, 10), (2, 100)):
+
+            samples = self._create_samples(channel_count, frame_count)
+            path = self._write_flac_file(samples)
+            time_axis = TimeAxis(frame_count, _SAMPLE_RATE)
+
+            signal = FlacFileSignal(path, name='Bobo')
+            self.assert_signal(
+                signal, 'Bobo', time_axis, channel_count, (), '<i2',
+                samples)
+
+            with FlacFileSignal(str(path)) as signal:
+                self.assertTrue(signal.is_open)
+                self.assert_signal(
+                    signal, 'Signal', time_axis, channel_count, (), '<i2',
+                    samples)
+
+            self.assertFalse(signal.is_open)
+
+
+    def test_multiple_frame_reads(self):
+
+        frame_count = 50000
+        samples = self._create_samples(2, frame_count)
+        path = self._write_flac_file(samples)
+
+        with FlacFileSignal(path) as signal:
+
+            self.assertEqual(len(signal), frame_count)
+            self.assertGreater(signal.frame_count, 5)
+
+            self.assert_arrays_equal(
+                signal.read(frame_first=False), samples)
+
+            for _ in range(100):
+                start_index = int(self._rng.integers(frame_count))
+                length = int(self._rng.integers(frame_count - start_index))
+                self.assert_arrays_equal(
+                    signal.channels[1].read(start_index, length),
+                    samples[1, start_index:start_index + length])
+
+
+    def test_24_bit_samples(self):
+
+        samples = self._rng.integers(
+            -2 ** 23, 2 ** 23, (1, 10000), dtype='<i4')
+        samples[0, :2] = (-2 ** 23, 2 ** 23 - 1)
+
+        # `soundfile` expects 24-bit samples in the upper three bytes
+        # of 32-bit integers.
+        path = self._write_flac_file(samples << 8, 'PCM_24')
+
+        with FlacFileSignal(path) as signal:
+            time_axis = TimeAxis(10000, _SAMPLE_RATE)
+            self.assert_signal(
+                signal, 'Signal', time_axis, 1, (), '<i4', samples)
+
+
+    def test_seek_table_cache(self):
+
+        samples = self._create_samples(1, 20000)
+        path = self._write_flac_file(samples)
+
+        with FlacFileSignal(path) as a, FlacFileSignal(path) as b:
+            self.assertIs(a._seek_table, b._seek_table)
+
+        # Rewrite file with different length.
+        samples = self._create_samples(1, 30000)
+        path = self._write_flac_file(samples)
+
+        with FlacFileSignal(path) as signal:
+            self.assertEqual(len(signal), 30000)
+            self.assert_arrays_equal(
+                signal.channels[0].read(25000, 100), samples[0, 25000:25100])
+
+
+    def test_seek_table_cache_size(self):
+
+        cache = LruCache(2)
+
+        with patch.object(flac_file_signal, '_seek_table_cache', cache):
+
+            paths = []
+            for i in range(3):
+                path = self._temp_dir_path / f'Test {i}.flac'
+                samples = self._create_samples(1, 1000)
+                soundfile.write(path, samples.T, _SAMPLE_RATE)
+                paths.append(path)
+
+            for i in (0, 1, 0, 2):
+                FlacFileSignal(paths[i]).close()
+
+            # The cache holds only the two most recently used tables.
+            self.assertEqual(
+                [key[0] for key in cache], [str(paths[0]), str(paths[2])])
+
+
+    def test_nonexistent_file_error(self):
+        path = self._temp_dir_path / 'Nonexistent.flac'
+        self.assert_raises(SignalError, FlacFileSignal, path)
+
+
+    def test_non_flac_file_error(self):
+
+        path = self._temp_dir_path / 'Test.wav'
+        path.write_bytes(b'RIFF')
+        self.assert_raises(SignalError, FlacFileSignal, path)
+
+        path = self._temp_dir_path / 'Test.flac'
+        path.write_bytes(b'RIFF' + bytes(100))
+        self.assert_raises(SignalError, FlacFileSignal, path)
+
+
+    def test_closed_flac_file_read_error(self):
+        path = self._write_flac_file(self._create_samples(1, 10))
+        signal = FlacFileSignal(path)
+        signal.close()
+        self.assert_raises(SignalError, signal.as_frames.__getitem__, 0)
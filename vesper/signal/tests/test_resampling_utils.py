@@ -0,0 +1,237 @@
+from fractions import Fraction
+
+import numpy as np
+import scipy.signal as signal
+
+from vesper.signal.resampling_utils import Resampler
+from vesper.tests.test_case import TestCase
+import vesper.signal.resampling_utils as resampling_utils
+
+
+_RATE_PAIRS = (
+    (48000, 24000),
+    (32000, 24000),
+    (22000, 24000),
+    (22050, 24000),
+    (44100, 24000),
+    (24000, 22050),
+    (16000, 24000),
+    (Fraction(44100, 2), 24000),
+)
+
+_CHUNK_SIZE_LISTS = (
+    [20000],
+    [1000] * 20,
+    [7, 993, 4321, 1, 0, 14678],
+)
+
+
+class ResamplerTests(TestCase):
+
+
+    def test_init(self):
+
+        cases = (
+            (48000, 24000, 1, 2),
+            (22050, 24000, 160, 147),
+            (44100, 24000, 80, 147),
+            (Fraction(44100, 2), 24000, 160, 147),
+            (24000, 22050, 147, 160),
+        )
+
+        for input_rate, output_rate, up, down in cases:
+            resampler = Resampler(input_rate, output_rate)
+            self.assertEqual(resampler.input_rate, input_rate)
+            self.assertEqual(resampler.output_rate, output_rate)
+            self.assertEqual(resampler.up, up)
+            self.assertEqual(resampler.down, down)
+            self.assertEqual(resampler.dtype, np.float32)
+
+
+    def test_chunk_consistency(self):
+
+        samples = _create_samples(20000)
+
+        for input_rate, output_rate in _RATE_PAIRS:
+
+            resampler = Resampler(input_rate, output_rate)
+            expected = _resample(resampler, samples, [len(samples)])
+
+            for sizes in _CHUNK_SIZE_LISTS:
+                resampled_samples = _resample(resampler, samples, sizes)
+                self.assert_arrays_equal(resampled_samples, expected)
+
+
+    def test_resample_poly_equivalence(self):
+
+        samples = _create_samples(20000)
+
+        for input_rate, output_rate in _RATE_PAIRS:
+
+            resampler = Resampler(input_rate, output_rate)
+            resampled_samples = _resample(resampler, samples, [1000] * 20)
+
+            self.assertEqual(resampled_samples.dtype, np.float32)
+
+            filter_ = resampling_utils._get_resampling_filter(
+                input_rate, output_rate, resampler.up)
+            expected = signal.resample_poly(
+                samples.astype(np.float64), resampler.up, resampler.down,
+                window=np.array(filter_))
+
+            self.assertEqual(len(resampled_samples), len(expected))
+            self.assertTrue(
+                np.allclose(resampled_samples, expected, atol=1e-5))
+
+
+    def test_resample_to_24000_hz_equivalence(self):
+
+        samples = _create_samples(20000)
+
+        for input_rate in (22000, 32000, 44000, 48000):
+
+            resampler = Resampler(input_rate, 24000)
+            resampled_samples = _resample(resampler, samples, [3000] * 7)
+
+            expected = resampling_utils.resample_to_24000_hz(
+                samples, input_rate)
+
+            self.assertEqual(len(resampled_samples), len(expected))
+            self.assertTrue(
+                np.allclose(resampled_samples, expected, atol=1e-5))
+
+
+    def test_sinusoid(self):
+
+        # Check that a sinusoid in the passband is resampled accurately,
+        # away from the ends of the signal.
+
+        input_rate = 22050
+        output_rate = 24000
+        frequency = 5000
+        duration = 1
+
+        def create_sinusoid(sample_rate):
+            times = np.arange(int(duration * sample_rate)) / sample_rate
+            return np.sin(2 * np.pi * frequency * times)
+
+        samples = create_sinusoid(input_rate).astype(np.float32)
+        resampler = Resampler(input_rate, output_rate)
+        resampled_samples = _resample(resampler, samples, [5000] * 5)
+
+        expected = create_sinusoid(output_rate)
+        self.assertEqual(len(resampled_samples), len(expected))
+
+        errors = np.abs(resampled_samples - expected)[1000:-1000]
+        self.assertLess(errors.max(), 1e-3)
+
+
+    def test_flush_resets_resampler(self):
+
+        samples = _create_samples(5000)
+        resampler = Resampler(22050, 24000)
+
+        expected = _resample(resampler, samples, [5000])
+        resampled_samples = _resample(resampler, samples, [5000])
+
+        self.assert_arrays_equal(resampled_samples, expected)
+
+
+    def test_flush_argument(self):
+
+        samples = _create_samples(20000)
+
+        for input_rate, output_rate in _RATE_PAIRS:
+
+            resampler = Resampler(input_rate, output_rate)
+            expected = _resample(resampler, samples, [15000, 5000])
+
+            resampled_samples = np.concatenate((
+                resampler.resample(samples[:15000]),
+                resampler.resample(samples[15000:], flush=True)))
+
+            self.assert_arrays_equal(resampled_samples, expected)
+
+
+    def test_output_array(self):
+
+        samples = _create_samples(20000)
+        chunk_sizes = _CHUNK_SIZE_LISTS[-1]
+
+        for input_rate, output_rate in _RATE_PAIRS:
+
+            resampler = Resampler(input_rate, output_rate)
+            expected = _resample(resampler, samples, chunk_sizes)
+
+            # Resample all chunks into one array.
+            out = np.zeros(
+                resampler.get_output_length(len(samples), flush=True),
+                dtype=np.float32)
+            start_index = 0
+            output_length = 0
+            last_chunk_num = len(chunk_sizes) - 1
+
+            for i, size in enumerate(chunk_sizes):
+
+                end_index = start_index + size
+                flush = i == last_chunk_num
+                length = resampler.get_output_length(size, flush)
+
+                result = resampler.resample(
+                    samples[start_index:end_index], out[output_length:],
+                    flush)
+
+                self.assertEqual(len(result), length)
+                if length != 0:
+                    self.assertTrue(np.shares_memory(result, out))
+
+                start_index = end_index
+                output_length += length
+
+            self.assertEqual(output_length, len(out))
+            self.assert_arrays_equal(out, expected)
+
+
+    def test_output_array_too_short(self):
+        resampler = Resampler(22050, 24000)
+        length = resampler.get_output_length(1000)
+        out = np.zeros(length - 1, dtype=np.float32)
+        self.assert_raises(ValueError, resampler.resample, np.zeros(1000), out)
+
+
+    def test_buffer_reuse(self):
+
+        samples = _create_samples(20000)
+        resampler = Resampler(22050, 24000)
+
+        # The resampler should allocate an input buffer for the first
+        # chunk and reuse it for subsequent chunks of the same size.
+        resampler.resample(samples[:1000])
+        buffer = resampler._buffer
+        for i in range(1, 20):
+            resampler.resample(samples[i * 1000:(i + 1) * 1000])
+            self.assertIs(resampler._buffer, buffer)
+
+        # Flushing should not reallocate the buffer, either.
+        resampler.flush()
+        self.assertIs(resampler._buffer, buffer)
+
+
+def _create_samples(length):
+    return np.random.default_rng(0).normal(size=length).astype(np.float32)
+
+
+def _resample(resampler, samples, chunk_sizes):
+
+    resampled_samples = []
+    start_index = 0
+
+    for size in chunk_sizes:
+        end_index = start_index + size
+        resampled_samples.append(
+            resampler.resample(samples[start_index:end_index]))
+        start_index = end_index
+
+    resampled_samples.append(resampler.flush())
+
+    return np.concatenate(resampled_samples)
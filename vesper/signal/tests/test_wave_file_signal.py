@@ -1,9 +1,14 @@
 from pathlib import Path
+import struct
+import tempfile
+
+import numpy as np
 
 from vesper.signal.signal_error import SignalError
 from vesper.signal.tests.signal_test_case import SignalTestCase
 from vesper.signal.time_axis import TimeAxis
-from vesper.signal.wave_file_signal import WaveFileSignal
+from vesper.signal.wave_file_signal import (
+    MappedWaveFileSignal, WaveFileSignal)
 import vesper.signal.tests.utils as utils
 import vesper.tests.test_utils as test_utils
 
@@ -82,3 +87,210 @@ class WaveFileSignalTests(SignalTestCase):
         time_axis = TimeAxis(10, 22050)
         self.assert_signal(signal, 'Signal', time_axis, 1, (), '<i2')
         self.assert_raises(SignalError, lambda s: s.as_channels[0], signal)
+
+
+class MappedWaveFileSignalTests(SignalTestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._temp_dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_init(self):
+        
+        cases = [
+            ('Header Only.wav', 0, 1, 24000, '<i2'),
+            ('One Channel.wav', 10, 1, 22050, '<i2'),
+            ('Two Channels.wav', 10, 2, 24000, '<i2')
+        ]
+        
+        for (file_name, frame_count, channel_count, frame_rate, dtype) in \
+                cases:
+            
+            file_path = _DATA_DIR_PATH / file_name
+            time_axis = TimeAxis(frame_count, frame_rate)
+            shape = (channel_count, frame_count)
+            samples = utils.create_samples(shape, dtype='<i2')
+            
+            signal = MappedWaveFileSignal(file_path, name=file_name)
+            self.assert_signal(
+                signal, file_name, time_axis, channel_count, (), dtype,
+                samples)
+            
+            with MappedWaveFileSignal(str(file_path)) as signal:
+                self.assertTrue(signal.is_open)
+                self.assert_signal(
+                    signal, 'Signal', time_axis, channel_count, (), dtype,
+                    samples)
+
+            self.assertFalse(signal.is_open)
+
+
+    def test_sample_formats(self):
+
+        cases = [
+            (1, 8, np.uint8, 0, 255),
+            (1, 16, np.int16, -32768, 32767),
+            (1, 24, np.int32, -2 ** 23, 2 ** 23 - 1),
+            (1, 32, np.int32, -2 ** 31, 2 ** 31 - 1),
+            (3, 32, np.float32, -1, 1),
+            (3, 64, np.float64, -1, 1),
+        ]
+
+        rng = np.random.default_rng(0)
+        frame_count = 100
+        channel_count = 3
+
+        for format_code, sample_size, dtype, min_value, max_value in cases:
+
+            if np.issubdtype(dtype, np.integer):
+                samples = rng.integers(
+                    min_value, max_value, (channel_count, frame_count),
+                    dtype=dtype, endpoint=True)
+                samples[0, :2] = (min_value, max_value)
+            else:
+                samples = rng.uniform(
+                    min_value, max_value, (channel_count, frame_count))
+                samples = samples.astype(dtype)
+
+            for extensible in (False, True):
+
+                path = self._temp_dir_path / 'Test.wav'
+                _write_wave_file(
+                    path, samples, 24000, format_code, sample_size,
+                    extensible)
+
+                with MappedWaveFileSignal(path) as signal:
+
+                    time_axis = TimeAxis(frame_count, 24000)
+                    self.assert_signal(
+                        signal, 'Signal', time_axis, channel_count, (),
+                        dtype, samples)
+
+                    channel_samples = signal.channels[1].read(10, 20)
+                    self.assert_arrays_equal(
+                        channel_samples, samples[1, 10:30])
+
+
+    def test_reads_are_views(self):
+
+        file_path = _DATA_DIR_PATH / 'Two Channels.wav'
+
+        with MappedWaveFileSignal(file_path) as signal:
+
+            samples = signal.read(2, 5, frame_first=False)
+            channel_samples = signal.channels[1].read(2, 5)
+
+        self.assertIsNotNone(samples.base)
+        self.assertFalse(samples.flags.writeable)
+        self.assertTrue(np.shares_memory(samples[1], channel_samples))
+
+        # Samples remain readable after signal is closed.
+        expected = utils.create_samples((2, 10), dtype='<i2')
+        self.assert_arrays_equal(samples, expected[:, 2:7])
+
+
+    def test_unsupported_format_error(self):
+        path = self._temp_dir_path / 'Test.wav'
+        samples = np.zeros((1, 10), dtype=np.float32)
+        _write_wave_file(path, samples, 24000, 3, 16, False)
+        self.assert_raises(SignalError, MappedWaveFileSignal, path)
+
+
+    def test_short_extensible_fmt_chunk_error(self):
+
+        # Write file with WAVE_FORMAT_EXTENSIBLE fmt chunk of 18 bytes,
+        # which lacks the subformat GUID.
+        fmt = struct.pack('<HHIIHHH', 0xFFFE, 1, 24000, 48000, 2, 16, 0)
+        data = bytes(20)
+        chunks = \
+            b'fmt ' + struct.pack('<I', len(fmt)) + fmt + \
+            b'data' + struct.pack('<I', len(data)) + data
+
+        path = self._temp_dir_path / 'Test.wav'
+        with open(path, 'wb') as f:
+            f.write(b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE')
+            f.write(chunks)
+
+        self.assert_raises(SignalError, MappedWaveFileSignal, path)
+
+
+    def test_file_like_object_error(self):
+        file_path = _DATA_DIR_PATH / 'One Channel.wav'
+        with open(file_path, 'rb') as f:
+            self.assert_raises(TypeError, MappedWaveFileSignal, f)
+
+
+    def test_nonexistent_file_error(self):
+        file_path = _DATA_DIR_PATH / 'Nonexistent'
+        self.assert_raises(SignalError, MappedWaveFileSignal, file_path)
+
+
+    def test_nonfile_error(self):
+        file_path = _DATA_DIR_PATH / 'Directory'
+        self.assert_raises(SignalError, MappedWaveFileSignal, file_path)
+
+
+    def test_non_wav_file_error(self):
+        file_path = _DATA_DIR_PATH / 'Empty'
+        self.assert_raises(SignalError, MappedWaveFileSignal, file_path)
+        
+        
+    def test_empty_wav_file_error(self):
+        file_path = _DATA_DIR_PATH / 'Empty.wav'
+        self.assert_raises(SignalError, MappedWaveFileSignal, file_path)
+
+
+    def test_closed_wav_file_read_error(self):
+        file_path = _DATA_DIR_PATH / 'One Channel.wav'
+        signal = MappedWaveFileSignal(file_path)
+        signal.close()
+        self.assert_raises(SignalError, signal.as_frames.__getitem__, 0)
+
+        
+    def test_truncated_file_read_error(self):
+        file_path = _DATA_DIR_PATH / 'Truncated.wav'
+        signal = MappedWaveFileSignal(file_path)
+        time_axis = TimeAxis(10, 22050)
+        self.assert_signal(signal, 'Signal', time_axis, 1, (), '<i2')
+        self.assert_raises(SignalError, lambda s: s.as_channels[0], signal)
+
+
+def _write_wave_file(
+        path, samples, sample_rate, format_code, sample_size, extensible):
+
+    channel_count, frame_count = samples.shape
+    sample_width = sample_size // 8
+    block_size = channel_count * sample_width
+
+    if sample_width == 3:
+        samples = np.ascontiguousarray(samples.T, dtype='<i4')
+        data = samples.view(np.uint8).reshape(
+            (frame_count, channel_count, 4))[:, :, :3].tobytes()
+    else:
+        dtype = samples.dtype.newbyteorder('<')
+        data = np.ascontiguousarray(samples.T, dtype=dtype).tobytes()
+
+    fmt = struct.pack(
+        '<HHIIHH', format_code, channel_count, sample_rate,
+        sample_rate * block_size, block_size, sample_size)
+
+    if extensible:
+        # Subformat GUID is format code followed by fixed 14 bytes.
+        guid = struct.pack('<H', format_code) + \
+            b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+        fmt = struct.pack('<H', 0xFFFE) + fmt[2:] + \
+            struct.pack('<HHI', 22, sample_size, 0) + guid
+
+    chunks = \
+        b'fmt ' + struct.pack('<I', len(fmt)) + fmt + \
+        b'data' + struct.pack('<I', len(data)) + data
+
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE')
+        f.write(chunks)
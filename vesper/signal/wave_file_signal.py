@@ -1,7 +1,8 @@
-"""Module containing class `WaveFileSignal`."""
+"""Module containing classes `WaveFileSignal` and `MappedWaveFileSignal`."""
 
 
 from pathlib import Path
+import struct
 import wave
 import os
 
@@ -9,6 +10,8 @@ import numpy as np
 
 from vesper.signal.audio_file_signal import AudioFileSignal
 from vesper.signal.signal_error import SignalError
+from vesper.util.bunch import Bunch
+import vesper.util.wave_file_utils as wave_file_utils
 
 
 _WAVE_FILE_EXTENSIONS = frozenset(['.wav', '.WAV'])
@@ -136,6 +139,245 @@ class WaveFileSignal(AudioFileSignal):
         return samples, True
         
 
+class MappedWaveFileSignal(AudioFileSignal):
+
+    """
+    WAVE file signal whose sample data are memory mapped.
+
+    A `MappedWaveFileSignal` parses the RIFF header of its file once,
+    when it is created, and then exposes the data chunk of the file as
+    a read-only NumPy memory map. Reads return views of the map rather
+    than copies of the file data, so reading is much less expensive
+    than for a `WaveFileSignal`, and reads from different threads do
+    not interfere with each other.
+
+    In addition to the 8- and 16-bit PCM formats supported by
+    `WaveFileSignal`, this class supports 24- and 32-bit PCM and 32-
+    and 64-bit IEEE float formats. 24-bit samples have no NumPy type
+    of their own, so they are read as 32-bit integers (with the same
+    values as the 24-bit samples) and reads of them return copies.
+
+    Unlike a `WaveFileSignal`, a `MappedWaveFileSignal` must be created
+    from a file path rather than a file-like object. Arrays returned by
+    reads remain valid after the signal is closed.
+    """
+
+
+    def __init__(self, path, name=None):
+
+        if not isinstance(path, (str, Path)):
+            raise TypeError(
+                f'MappedWaveFileSignal requires a file path, but got '
+                f'{path.__class__.__name__}.')
+
+        path = Path(path)
+        _check_wave_file_path(path)
+
+        self._file_text = _get_file_text(str(path))
+
+        try:
+            with open(path, 'rb') as f:
+                header = _parse_wave_file_header(f)
+        except OSError as e:
+            raise SignalError(
+                f'Could not open {self._file_text}. Error message was: '
+                f'{str(e)}')
+        except (wave_file_utils.WaveFileFormatError, UnicodeDecodeError,
+                struct.error) as e:
+            raise SignalError(
+                f'Could not read metadata from {self._file_text}. Error '
+                f'message was: {str(e)}')
+
+        channel_count = header.channel_count
+
+        try:
+            dtype, mapped_dtype = _get_sample_dtypes(header)
+        except wave_file_utils.WaveFileFormatError as e:
+            raise SignalError(f'{self._file_text} {str(e)}')
+
+        sample_width = header.sample_size // 8
+        frame_size = channel_count * sample_width
+        frame_count = header.data_size // frame_size
+
+        # The file may contain fewer sample frames than its header says
+        # it does, for example if recording was interrupted. We map only
+        # the frames that are actually present, and reads of other
+        # frames fail.
+        self._mapped_frame_count = \
+            min(frame_count, header.available_data_size // frame_size)
+
+        self._data = _map_data(
+            path, header.data_offset, self._mapped_frame_count,
+            channel_count, sample_width, mapped_dtype)
+
+        self._is_24_bit = sample_width == 3
+
+        super().__init__(
+            frame_count, header.sample_rate, channel_count, dtype,
+            name=name, file_path=path)
+
+
+    @property
+    def is_open(self):
+        return self._data is not None
+
+
+    def close(self):
+
+        # We just drop our reference to the memory map rather than
+        # closing it explicitly, since arrays returned by reads may
+        # still refer to it. The map is closed when the last such
+        # array is deleted.
+        self._data = None
+
+
+    def _read(self, frame_slice, channel_slice):
+
+        data = self._data
+
+        if data is None:
+            raise SignalError(
+                'Attempt to read samples from closed WAVE file signal.')
+
+        if frame_slice.stop > self._mapped_frame_count:
+            raise SignalError(
+                f'Attempt to read sample frames [{frame_slice.start}, '
+                f'{frame_slice.stop}) from {self._file_text}, which '
+                f'contains only {self._mapped_frame_count} frames of its '
+                f'purported {len(self)}.')
+
+        samples = data[frame_slice, channel_slice]
+
+        if self._is_24_bit:
+            samples = _decode_24_bit_samples(samples)
+
+        return samples, True
+
+
+def _parse_wave_file_header(f):
+
+    riff_chunk = wave_file_utils.parse_riff_chunk_header(f)
+
+    file_size = os.fstat(f.fileno()).st_size
+    riff_end = min(riff_chunk.size + 8, file_size)
+
+    fmt_chunk = None
+    offset = 12
+
+    while offset + 8 <= riff_end:
+
+        chunk = wave_file_utils.parse_subchunk(f, offset)
+
+        if chunk.id == wave_file_utils.FMT_CHUNK_ID:
+
+            if not hasattr(chunk, 'format_code'):
+                raise wave_file_utils.WaveFileFormatError(
+                    f'WAVE file fmt chunk has unexpected size of '
+                    f'{chunk.size} bytes.')
+
+            if chunk.format_code == _EXTENSIBLE_FORMAT_CODE and \
+                    not hasattr(chunk, 'subformat_code'):
+                raise wave_file_utils.WaveFileFormatError(
+                    f'WAVE file has WAVE_FORMAT_EXTENSIBLE fmt chunk of '
+                    f'unexpected size {chunk.size} bytes rather than 40 '
+                    f'bytes.')
+
+            fmt_chunk = chunk
+
+        elif chunk.id == wave_file_utils.DATA_CHUNK_ID:
+
+            if fmt_chunk is None:
+                raise wave_file_utils.WaveFileFormatError(
+                    'WAVE file data chunk precedes fmt chunk.')
+
+            data_offset = offset + 8
+
+            format_code = fmt_chunk.format_code
+            if format_code == _EXTENSIBLE_FORMAT_CODE:
+                format_code = fmt_chunk.subformat_code
+
+            return Bunch(
+                format_code=format_code,
+                channel_count=fmt_chunk.channel_count,
+                sample_rate=fmt_chunk.sample_rate,
+                sample_size=fmt_chunk.sample_size,
+                data_offset=data_offset,
+                data_size=chunk.size,
+                available_data_size=max(file_size - data_offset, 0))
+
+        # Chunks are padded to even sizes.
+        offset += 8 + chunk.size + (chunk.size % 2)
+
+    raise wave_file_utils.WaveFileFormatError(
+        'WAVE file has no data chunk.')
+
+
+_PCM_FORMAT_CODE = 0x0001
+_FLOAT_FORMAT_CODE = 0x0003
+_EXTENSIBLE_FORMAT_CODE = 0xFFFE
+
+
+# Mapping from (format code, sample size) pairs to pairs of NumPy
+# dtypes. The first dtype of each pair is the signal dtype, and the
+# second is the dtype of the memory mapped file data.
+_SAMPLE_DTYPES = {
+    (_PCM_FORMAT_CODE, 8): (np.uint8, np.uint8),   # unsigned by spec
+    (_PCM_FORMAT_CODE, 16): ('<i2', '<i2'),        # little-endian by spec
+    (_PCM_FORMAT_CODE, 24): ('<i4', np.uint8),     # decoded on read
+    (_PCM_FORMAT_CODE, 32): ('<i4', '<i4'),
+    (_FLOAT_FORMAT_CODE, 32): ('<f4', '<f4'),
+    (_FLOAT_FORMAT_CODE, 64): ('<f8', '<f8'),
+}
+
+
+def _get_sample_dtypes(header):
+
+    dtypes = _SAMPLE_DTYPES.get((header.format_code, header.sample_size))
+
+    if dtypes is None:
+        format_ = wave_file_utils.get_audio_data_format(header.format_code)
+        raise wave_file_utils.WaveFileFormatError(
+            f'contains {header.sample_size}-bit {format_} samples, which '
+            f'are not supported.')
+
+    return tuple(np.dtype(d) for d in dtypes)
+
+
+def _map_data(
+        path, data_offset, frame_count, channel_count, sample_width,
+        dtype):
+
+    shape = (frame_count, channel_count)
+
+    if dtype.itemsize != sample_width:
+        # samples must be decoded from bytes
+
+        shape += (sample_width,)
+
+    if frame_count == 0:
+        # nothing to map
+
+        # `np.memmap` does not support empty maps.
+        data = np.zeros(shape, dtype)
+        data.flags.writeable = False
+        return data
+
+    else:
+        return np.memmap(
+            path, dtype=dtype, mode='r', offset=data_offset, shape=shape)
+
+
+def _decode_24_bit_samples(data):
+
+    # Put the three bytes of each sample into the upper three bytes
+    # of a little-endian 32-bit integer and then shift right by one
+    # byte, which extends the sign of the sample.
+    frame_count, channel_count = data.shape[:2]
+    buffer = np.zeros((frame_count, channel_count, 4), np.uint8)
+    buffer[:, :, 1:] = data
+    return buffer.view('<i4')[:, :, 0] >> 8
+
+
 def _get_file_and_path(file):
 
     if isinstance(file, Path):
@@ -0,0 +1,7 @@
+"""Module containing Vesper's model registry singleton instance."""
+
+
+from vesper.util.model_registry import ModelRegistry
+
+
+model_registry = ModelRegistry()
@@ -42,13 +42,35 @@ resulting lock should then be passed to other processes for them to
 use.
 
 Vesper archives that use a database engine that supports concurrent
-writes better than SQLite (perhaps PostgreSQL, for example) may not
-require this lock. In that case, we could make the value of the
-`_lock` attribute of this module an instance of our own context
-manager that can behave differently for different database back ends.
-Such a context manager might behave as the current one does when the
-database back end is SQLite, but do nothing when the back end is
-PostgreSQL.
+writes better than SQLite (PostgreSQL, for example) do not require
+this lock. The archive lock *policy*, specified by the
+`VESPER_ARCHIVE_LOCK_POLICY` setting, determines what kind of lock
+`create_lock` creates. The "process" policy creates a lock shared by
+all Vesper processes, and the "none" policy creates a lock that does
+nothing. The default "auto" policy is the "process" policy for SQLite
+archives and the "none" policy for other archives. `create_lock` logs
+a warning if the "none" policy is used for an SQLite archive, since
+concurrent writes may then fail with "database is locked" errors.
+Archive data that several writers update, like clip counts, are
+maintained with database updates that do not rely on the lock, so
+they remain consistent under either policy.
+
+For SQLite archives, `set_lock` also arranges for each new database
+connection to use SQLite's write-ahead log (WAL) journal mode, unless
+the `VESPER_ARCHIVE_SQLITE_WAL` setting is false or the archive is
+read-only. In WAL mode, readers do not block the writer and the writer
+does not block readers, so queries (which need not and do not obtain
+the archive lock) can run while another process writes, for example
+while a detection job creates clips.
+
+The `write` function of this module invokes a function that writes to
+the archive database in a transaction, while holding the archive lock.
+With the "process" policy it funnels writes through a single writer
+thread in each process, which groups writes submitted at about the
+same time by different threads (for example, clip annotation requests
+from several users of a Vesper server) into one transaction, so that
+the lock is obtained and the transaction committed just once for the
+group.
 
 I also tried using a semaphore that allowed just two concurrent
 transactions (see commented-out code below) and setting the SQLite
@@ -66,9 +88,16 @@ transactions at all.
 """
 
 
+from concurrent.futures import Future
 from multiprocessing import RLock
+from queue import Empty, SimpleQueue
+from threading import Thread, local
+import logging
+import os
 
 from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
 
 
 class DoNothingLock:
@@ -82,27 +111,118 @@ class DoNothingLock:
         pass
 
 
+_LOCK_POLICY_NAMES = ('auto', 'process', 'none')
+"""Names of the archive lock policies."""
+
+_MAX_WRITE_GROUP_SIZE = 100
+"""Maximum number of writes that an archive writer groups together."""
+
+
 _lock = None
 
+_lock_policy_name = None
+
+_thread_state = local()
+"""
+Thread-local state, with a `lock_depth` attribute that counts the
+archive lock contexts that the current thread has entered but not
+exited.
+"""
+
+_writer = None
+
 
 def create_lock():
     
-    if is_database_sqlite():
+    """
+    Creates the archive lock according to the archive lock policy.
+    
+    This function should be called just once, by the main Vesper
+    process. The resulting lock should be passed to other processes
+    that write to the archive, which should call `set_lock` with it.
+    """
+    
+    policy_name = get_lock_policy_name()
+    
+    if policy_name == 'process':
         lock_class = RLock
+        
     else:
+        
         lock_class = DoNothingLock
         
+        if is_database_sqlite():
+            logging.getLogger().warning(
+                'The "none" archive lock policy is in effect for an '
+                'SQLite archive. Concurrent archive writes may fail with '
+                '"database is locked" errors. Use the "process" or "auto" '
+                'policy for SQLite archives.')
+        
     set_lock(lock_class())
 
 
+def get_lock_policy_name():
+    
+    """
+    Gets the name of the archive lock policy, either "process" or
+    "none".
+    """
+    
+    name = settings.VESPER_ARCHIVE_LOCK_POLICY
+    
+    if name not in _LOCK_POLICY_NAMES:
+        names = ', '.join(f'"{n}"' for n in _LOCK_POLICY_NAMES)
+        raise ValueError(
+            f'Unrecognized archive lock policy "{name}". The policy '
+            f'must be one of {names}.')
+        
+    if name == 'auto':
+        return 'process' if is_database_sqlite() else 'none'
+    else:
+        return name
+
+
 def is_database_sqlite():
     engine = settings.DATABASES['default']['ENGINE']
     return engine == 'django.db.backends.sqlite3'
 
 
+def _is_wal_enabled():
+    return settings.VESPER_ARCHIVE_SQLITE_WAL and \
+        not settings.VESPER_ARCHIVE_READ_ONLY
+
+
+def _configure_sqlite_connection(sender, connection, **kwargs):
+    
+    if connection.vendor == 'sqlite':
+        
+        with connection.cursor() as cursor:
+            
+            # Use write-ahead log journal mode. This setting is
+            # persistent, but setting it again is inexpensive.
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
+            # Synchronize the database file less often than in the
+            # default "FULL" mode, which is safe in WAL mode. This
+            # setting is per connection.
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+
 def set_lock(lock):
-    global _lock
+    
+    global _lock, _lock_policy_name
+    
     _lock = lock
+    _lock_policy_name = \
+        'none' if isinstance(lock, DoNothingLock) else 'process'
+    
+    # Configure SQLite connections of this process. We do this here
+    # rather than in `create_lock` since some SQLite settings are
+    # per connection, and so must be made in every process.
+    if is_database_sqlite() and _is_wal_enabled():
+        connection_created.connect(
+            _configure_sqlite_connection,
+            dispatch_uid='vesper.util.archive_lock')
      
      
 def get_lock():
@@ -115,6 +235,28 @@ def _check_lock():
         raise ValueError('Archive lock has not yet been created or set.')
  
  
+class _LockContext:
+    
+    """
+    Context manager that obtains the archive lock.
+    
+    The context manager keeps track of whether or not the current
+    thread holds the archive lock, for the `write` function.
+    """
+    
+    def __enter__(self):
+        _lock.__enter__()
+        _thread_state.lock_depth = _get_lock_depth() + 1
+    
+    def __exit__(self, *args):
+        _thread_state.lock_depth -= 1
+        return _lock.__exit__(*args)
+
+
+def _get_lock_depth():
+    return getattr(_thread_state, 'lock_depth', 0)
+
+
 def atomic(arg=None):
     
     """
@@ -130,8 +272,8 @@ def atomic(arg=None):
     if arg is None:
         # invoked without argument
         
-        # Context manager mode: return archive lock.
-        return _lock
+        # Context manager mode: return archive lock context manager.
+        return _LockContext()
     
     elif callable(arg):
         # invoked on callable
@@ -140,8 +282,8 @@ def atomic(arg=None):
         # obtaining archive lock.
         
         def decorated(*args, **kwargs):
-            with _lock:
-                arg(*args, **kwargs)
+            with _LockContext():
+                return arg(*args, **kwargs)
                 
         return decorated
     
@@ -150,3 +292,157 @@ def atomic(arg=None):
         
         raise ValueError(
             'Decorator argument does not appear to be a callable.')
+
+
+def write(function, *args, **kwargs):
+    
+    """
+    Invokes a function that writes to the archive database.
+    
+    The function is invoked with the specified arguments in a database
+    transaction, while holding the archive lock, and this function
+    returns its result or raises the exception that it raised.
+    
+    With the "process" archive lock policy, the function is invoked on
+    this process's archive writer thread rather than on the calling
+    thread, unless the calling thread holds the archive lock or is in a
+    transaction, in which case it is invoked immediately on the calling
+    thread. The writer thread invokes functions submitted to it at about
+    the same time by different threads in a single transaction, each in
+    its own savepoint so that an exception raised by one function does
+    not roll back the writes of the others. The transaction includes
+    at most `_MAX_WRITE_GROUP_SIZE` functions.
+    
+    With the "none" archive lock policy, the function is always invoked
+    immediately on the calling thread.
+    """
+    
+    _check_lock()
+    
+    if _lock_policy_name == 'none' or _get_lock_depth() != 0 or \
+            transaction.get_connection().in_atomic_block:
+        # archive writes do not need to be funneled through writer
+        # thread, or calling thread holds archive lock or is in a
+        # transaction
+        
+        # Invoke function on calling thread. We must do this if the
+        # calling thread holds the archive lock, since otherwise the
+        # writer thread might wait forever for the lock. We must also
+        # do this if the calling thread is in a transaction, since
+        # the function's writes should be part of that transaction.
+        with _LockContext(), transaction.atomic():
+            return function(*args, **kwargs)
+        
+    else:
+        return _get_writer().write(function, args, kwargs)
+
+
+def _get_writer():
+    
+    global _writer
+    
+    # Create a new writer if we don't have one or if we have one that
+    # was inherited by this process from its parent, and so has no
+    # thread in this process.
+    if _writer is None or _writer.process_id != os.getpid():
+        _writer = _ArchiveWriter()
+        
+    return _writer
+
+
+class _ArchiveWriter:
+    
+    """
+    Archive writer thread.
+    
+    An archive writer invokes functions that write to the archive
+    database on a thread of its own, grouping functions submitted at
+    about the same time into one transaction.
+    """
+    
+    
+    def __init__(self):
+        
+        self.process_id = os.getpid()
+        
+        self._queue = SimpleQueue()
+        
+        self._thread = Thread(
+            target=self._run, name='Archive Writer', daemon=True)
+        self._thread.start()
+        
+        
+    def write(self, function, args, kwargs):
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        return future.result()
+    
+    
+    def _run(self):
+        
+        while True:
+            
+            writes = [self._queue.get()]
+            
+            # Get any other writes that are waiting.
+            while len(writes) < _MAX_WRITE_GROUP_SIZE:
+                try:
+                    writes.append(self._queue.get_nowait())
+                except Empty:
+                    break
+                
+            write_group(writes)
+            
+            
+def write_group(writes):
+    
+    """
+    Invokes a group of functions that write to the archive database,
+    in one transaction and with one acquisition of the archive lock.
+    
+    This function is used by archive writer threads. It is public only
+    so that it can be tested.
+    
+    Parameters
+    ----------
+    writes : list
+        list of `(future, function, args, kwargs)` tuples, where
+        `future` is a `concurrent.futures.Future` to which to deliver
+        the result of invoking `function` with `args` and `kwargs`.
+    """
+    
+    results = []
+    
+    try:
+        
+        with _LockContext(), transaction.atomic():
+            
+            for future, function, args, kwargs in writes:
+                
+                try:
+                    with transaction.atomic():
+                        result = function(*args, **kwargs)
+                        
+                except Exception as e:
+                    results.append((future, None, e))
+                    
+                else:
+                    results.append((future, result, None))
+                    
+    except Exception as e:
+        # transaction failed, e.g. when it was committed
+        
+        logging.getLogger().error(
+            f'Archive database transaction for {len(writes)} writes '
+            f'failed with exception: {e}')
+        
+        for future, _, _, _ in writes:
+            future.set_exception(e)
+            
+        return
+            
+    for future, result, exception in results:
+        if exception is None:
+            future.set_result(result)
+        else:
+            future.set_exception(exception)
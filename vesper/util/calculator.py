@@ -4,6 +4,10 @@
 import math
 import operator
 
+import numpy as np
+
+from vesper.util.lru_cache import LruCache
+
 
 class CalculatorError(Exception):
     pass
@@ -42,39 +46,260 @@ class Calculator:
     
     
     def execute(self, code):
+        program = compile_program(code)
+        program.execute(self)
+
+
+class Program:
+    
+    """
+    Compiled calculator program.
+    
+    A program is compiled from calculator code once, when it is
+    created, rather than each time it is executed. Compilation parses
+    numeric literals and binds names of system operators to those
+    operators, much as the PostScript `bind` operator does. When a
+    program is executed by a calculator whose user dictionary
+    redefines one of those names, however, the program looks up its
+    names as it executes, so that the redefinition takes effect just
+    as it would for uncompiled code.
+    
+    The `evaluate` method of a program evaluates the program for a
+    whole column of values at once.
+    """
+    
+    
+    def __init__(self, code):
+        
+        self._code = code
         
-        tokens = code.split()
+        self._instructions = tuple(_compile_token(t) for t in code.split())
         
-        for token in tokens:
+        self._operator_names = frozenset(
+            obj.name for kind, obj in self._instructions
+            if kind is _OPERATE)
+    
+    
+    @property
+    def code(self):
+        return self._code
+    
+    
+    def execute(self, calc):
+        
+        """Executes this program with the specified calculator."""
+        
+        dict_stack = calc.dict_stack
+        
+        if dict_stack.shadows(self._operator_names):
+            self._execute_unbound(calc)
+            return
+        
+        push = calc.operand_stack.push
+        
+        for kind, obj in self._instructions:
             
-            # integer
-            try:
-                obj = int(token)
-            except ValueError:
-                pass
+            if kind is _PUSH:
+                push(obj)
+                
+            elif kind is _OPERATE:
+                obj.execute(calc)
+                
             else:
-                self._operand_stack.push(obj)
-                continue
+                # name lookup
+                
+                _execute_name(calc, obj)
+    
+    
+    def _execute_unbound(self, calc):
+        
+        push = calc.operand_stack.push
+        
+        for kind, obj in self._instructions:
             
-            # float
-            try:
-                obj = float(token)
-            except ValueError:
-                pass
+            if kind is _PUSH:
+                push(obj)
+            
+            elif kind is _OPERATE:
+                _execute_name(calc, obj.name)
+                
             else:
-                self._operand_stack.push(obj)
-                continue
+                _execute_name(calc, obj)
+    
+    
+    def evaluate(self, values, name='x'):
+        
+        """
+        Evaluates this program once for each of a sequence of values.
+        
+        For each value, the program is executed by a calculator whose
+        operand stack is initially empty and whose user dictionary
+        binds `name` to the value. The result for the value is the
+        object on top of the operand stack after the execution.
+        
+        When the values are all integers, all floats, or all booleans
+        and the program uses only operators with vectorized
+        implementations, the program is executed once with NumPy
+        arrays in place of individual values. Otherwise the program is
+        executed separately for each value. Either way, the results
+        are identical to those of executing the program separately for
+        each value, including their types.
+        
+        Parameters
+        ----------
+        values : sequence or one-dimensional NumPy array
+            the values for which to evaluate this program.
+        name : str
+            the name to which to bind the values.
+            
+        Returns
+        -------
+        list
+            the results of the evaluations.
+            
+        Raises
+        ------
+        CalculatorError
+            if execution of this program fails for any value.
+        """
+        
+        if len(values) == 0:
+            return []
+        
+        if name not in self._operator_names:
             
-            # name
             try:
-                obj = self._dict_stack.get(token)
-            except KeyError:
-                raise CalculatorError(f'Unrecognized name "{token}".')
-            else:
-                if isinstance(obj, _Operator):
-                    obj.execute(self)
+                with np.errstate(all='ignore'):
+                    return self._evaluate_vectorized(values, name)
+            except _VectorizationError:
+                pass
+            
+        # If we get here, we could not vectorize the evaluation, for
+        # example because the program uses an operator that has no
+        # vectorized implementation or because execution would fail
+        # for some value. We execute the program separately for each
+        # value so that the results or the error are exactly as for
+        # separate executions.
+        
+        return self._evaluate_separately(values, name)
+    
+    
+    def _evaluate_vectorized(self, values, name):
+        
+        column = _get_column(values)
+        size = len(column)
+        stack = []
+        
+        for kind, obj in self._instructions:
+            
+            if kind is _PUSH:
+                stack.append(_get_constant_column(obj, size))
+                
+            elif kind is _OPERATE:
+                
+                if isinstance(obj, _ConstantOperator):
+                    stack.append(_get_constant_column(obj.constant, size))
+                    
                 else:
-                    self._operand_stack.push(obj)
+                    
+                    try:
+                        function = _VECTOR_FUNCTIONS[obj.name]
+                    except KeyError:
+                        raise _VectorizationError()
+                    
+                    function(stack)
+                    
+            elif obj == name:
+                stack.append(column)
+                
+            else:
+                # name for which we have no value
+                
+                raise _VectorizationError()
+            
+        if len(stack) == 0:
+            raise _VectorizationError()
+        
+        return stack[-1].tolist()
+    
+    
+    def _evaluate_separately(self, values, name):
+        
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+            
+        calc = Calculator()
+        results = []
+        
+        for value in values:
+            calc.clear()
+            calc.dict_stack.put(name, value)
+            self.execute(calc)
+            results.append(calc.operand_stack.pop())
+            
+        return results
+
+
+# Program instruction kinds.
+_PUSH = 'push'
+_OPERATE = 'operate'
+_LOOK_UP = 'look up'
+
+
+def _compile_token(token):
+    
+    # integer
+    try:
+        return _PUSH, int(token)
+    except ValueError:
+        pass
+    
+    # float
+    try:
+        return _PUSH, float(token)
+    except ValueError:
+        pass
+    
+    # system operator
+    try:
+        return _OPERATE, _SYSTEM_DICT[token]
+    except KeyError:
+        pass
+    
+    # other name
+    return _LOOK_UP, token
+
+
+def _execute_name(calc, name):
+    obj = calc.dict_stack.get(name)
+    if isinstance(obj, _Operator):
+        obj.execute(calc)
+    else:
+        calc.operand_stack.push(obj)
+
+
+_PROGRAM_CACHE_SIZE = 100
+"""Maximum number of programs cached by `compile_program`."""
+
+_programs = LruCache(_PROGRAM_CACHE_SIZE)
+
+
+def compile_program(code):
+    
+    """
+    Compiles calculator code into a `Program`.
+    
+    This function caches the programs it compiles, so compiling the
+    same code repeatedly is inexpensive.
+    """
+    
+    try:
+        return _programs[code]
+    
+    except KeyError:
+        program = Program(code)
+        _programs[code] = program
+        return program
 
 
 class _DictionaryStack:
@@ -105,6 +330,16 @@ class _DictionaryStack:
     
     def put(self, name, value):
         self._user_dict[name] = value
+    
+    
+    def shadows(self, names):
+        
+        """
+        Returns `True` if and only if the user dictionary of this
+        stack defines any of the specified names.
+        """
+        
+        return not self._user_dict.keys().isdisjoint(names)
 
 
 class _OperandStack:
@@ -299,6 +534,10 @@ class _ConstantOperator(_Operator):
     def __init__(self, name, constant):
         super().__init__(name, ())
         self._constant = constant
+    
+    @property
+    def constant(self):
+        return self._constant
         
     def execute(self, calc):
         calc.operand_stack.push(self._constant)
@@ -622,3 +861,370 @@ _OPERATORS = (
 
 
 _SYSTEM_DICT = dict((op.name, op) for op in _OPERATORS)
+
+
+class _VectorizationError(Exception):
+    
+    """
+    Raised when a program cannot be evaluated for a column of values
+    via NumPy with results identical to those of separate executions.
+    """
+
+
+# The vectorized operator implementations that follow maintain the
+# invariant that the magnitudes of all integer column elements are at
+# most `_MAX_INTEGER`. Integers of that size convert to floats
+# exactly, so mixed integer and float arithmetic and comparisons
+# with NumPy yield the same results as with Python. Integer results
+# that might exceed the limit cause evaluation to fall back on
+# separate executions, which use Python's unbounded integers.
+_MAX_INTEGER = 2 ** 53
+
+# Bound on the estimated magnitude of an integer product or power
+# below which computing it with 64-bit integers cannot overflow.
+_MAX_INTEGER_ESTIMATE = 2 ** 60
+
+
+def _get_column(values):
+    
+    if isinstance(values, np.ndarray):
+        
+        if values.ndim != 1:
+            raise _VectorizationError()
+        
+        kind = values.dtype.kind
+        
+        if kind == 'b':
+            return values
+        elif kind in 'iu':
+            return _check_integers(values).astype('int64')
+        elif kind == 'f':
+            return values.astype('float64')
+        else:
+            raise _VectorizationError()
+        
+    else:
+        
+        types = frozenset(type(v) for v in values)
+        
+        if types == _BOOLEAN_TYPES:
+            return np.array(values, dtype='bool')
+        
+        elif types == _INTEGER_TYPES:
+            
+            try:
+                column = np.array(values, dtype='int64')
+            except OverflowError:
+                raise _VectorizationError()
+            
+            return _check_integers(column)
+            
+        elif types == _FLOAT_TYPES:
+            return np.array(values, dtype='float64')
+        
+        else:
+            raise _VectorizationError()
+        
+        
+_BOOLEAN_TYPES = frozenset((bool,))
+_INTEGER_TYPES = frozenset((int,))
+_FLOAT_TYPES = frozenset((float,))
+
+
+def _get_constant_column(value, size):
+    if isinstance(value, int) and not isinstance(value, bool):
+        column = np.full(size, value, dtype='int64')
+        return _check_integers(column)
+    else:
+        return np.full(size, value)
+
+
+def _check_integers(x):
+    if x.max() > _MAX_INTEGER or x.min() < -_MAX_INTEGER:
+        raise _VectorizationError()
+    return x
+
+
+def _is_boolean(x):
+    return x.dtype.kind == 'b'
+
+
+def _is_integer(x):
+    return x.dtype.kind == 'i'
+
+
+def _is_float(x):
+    return x.dtype.kind == 'f'
+
+
+def _is_number(x):
+    return x.dtype.kind in 'if'
+
+
+def _pop_operands(stack, count):
+    
+    if len(stack) < count:
+        raise _VectorizationError()
+    
+    operands = stack[-count:]
+    del stack[-count:]
+    
+    return operands
+
+
+def _require(condition):
+    if not condition:
+        raise _VectorizationError()
+
+
+def _dup_v(stack):
+    _require(len(stack) != 0)
+    stack.append(stack[-1])
+
+
+def _exch_v(stack):
+    x, y = _pop_operands(stack, 2)
+    stack.extend((y, x))
+
+
+def _pop_v(stack):
+    _pop_operands(stack, 1)
+
+
+def _clear_v(stack):
+    stack.clear()
+
+
+def _arithmetic_v(function):
+    
+    def execute(stack):
+        x, y = _pop_operands(stack, 2)
+        _require(_is_number(x) and _is_number(y))
+        result = function(x, y)
+        if _is_integer(result):
+            _check_integers(result)
+        stack.append(result)
+        
+    return execute
+
+
+def _mul_v(x, y):
+    if _is_integer(x) and _is_integer(y):
+        estimate = np.abs(x.astype('float64') * y)
+        _require(estimate.max() <= _MAX_INTEGER_ESTIMATE)
+    return x * y
+
+
+def _div_v(x, y):
+    _require(not np.any(y == 0))
+    return np.true_divide(x, y)
+
+
+def _mod_v(x, y):
+    _require(not np.any(y == 0))
+    _require_finite(x, y)
+    return np.remainder(x, y)
+
+
+def _require_finite(*args):
+    for x in args:
+        if _is_float(x):
+            _require(np.all(np.isfinite(x)))
+
+
+def _pow_v(x, y):
+    
+    _require_finite(x, y)
+    
+    if _is_integer(x) and _is_integer(y):
+        # Python yields an integer unless the exponent is negative.
+        
+        _require(np.all(y >= 0))
+        
+        estimate = np.abs(x.astype('float64')) ** y
+        _require(estimate.max() <= _MAX_INTEGER_ESTIMATE)
+        
+        return np.power(x, y)
+    
+    else:
+        # Python yields a float unless the base is negative and the
+        # exponent is not an integer (in which case Python yields a
+        # complex number), and raises an exception if the base is zero
+        # and the exponent is negative or if the result overflows.
+        
+        _require(not np.any((x < 0) & (y != np.floor(y))))
+        _require(not np.any((x == 0) & (y < 0)))
+        
+        result = np.power(x.astype('float64'), y.astype('float64'))
+        
+        _require(np.all(np.isfinite(result)))
+        
+        return result
+
+
+def _unary_v(function):
+    
+    def execute(stack):
+        x, = _pop_operands(stack, 1)
+        stack.append(function(x))
+        
+    return execute
+
+
+def _neg_v(x):
+    _require(_is_number(x))
+    return -x
+
+
+def _abs_v(x):
+    _require(_is_number(x))
+    return np.abs(x)
+
+
+def _rounding_v(function):
+    
+    # Python's `math.ceil`, `math.floor`, and `round` functions yield
+    # integers for both integer and float arguments, and raise
+    # exceptions for infinite and NaN arguments. `np.rint` rounds
+    # halfway cases to even, as does `round`.
+    
+    def execute(x):
+        
+        _require(_is_number(x))
+        
+        if _is_integer(x):
+            return x
+        
+        _require_finite(x)
+        
+        return _check_integers(function(x)).astype('int64')
+    
+    return execute
+
+
+def _math_v(function):
+    
+    # We apply the `math` module function to each element rather than
+    # using the corresponding NumPy function, since the NumPy function
+    # may differ from it in the last bit of some results.
+    
+    def execute(x):
+        
+        _require(_is_number(x))
+        
+        try:
+            results = [function(v) for v in x.tolist()]
+        except Exception:
+            raise _VectorizationError()
+        
+        return np.array(results, dtype='float64')
+    
+    return execute
+
+
+def _integer_v(x):
+    
+    _require(_is_number(x))
+    
+    if _is_integer(x):
+        return x
+    
+    _require_finite(x)
+    
+    return _check_integers(np.trunc(x)).astype('int64')
+
+
+def _float_v(x):
+    _require(_is_number(x))
+    return x.astype('float64')
+
+
+def _comparison_v(function):
+    
+    def execute(stack):
+        x, y = _pop_operands(stack, 2)
+        stack.append(function(x, y))
+        
+    return execute
+
+
+def _eq_v(x, y):
+    if _is_boolean(x) == _is_boolean(y):
+        return np.equal(x, y)
+    else:
+        return np.zeros(len(x), dtype='bool')
+    
+    
+def _ne_v(x, y):
+    return np.logical_not(_eq_v(x, y))
+
+
+def _logical_v(function):
+    
+    def execute(stack):
+        x, y = _pop_operands(stack, 2)
+        _require(_is_boolean(x) and _is_boolean(y))
+        stack.append(function(x, y))
+        
+    return execute
+
+
+def _not_v(x):
+    _require(_is_boolean(x))
+    return np.logical_not(x)
+
+
+_VECTOR_FUNCTIONS = {
+    
+    # stack manipulation
+    'dup': _dup_v,
+    'exch': _exch_v,
+    'pop': _pop_v,
+    'clear': _clear_v,
+    
+    # binary arithmetic
+    'add': _arithmetic_v(np.add),
+    'sub': _arithmetic_v(np.subtract),
+    'mul': _arithmetic_v(_mul_v),
+    'div': _arithmetic_v(_div_v),
+    'mod': _arithmetic_v(_mod_v),
+    'pow': _arithmetic_v(_pow_v),
+    
+    # unary arithmetic
+    'neg': _unary_v(_neg_v),
+    'abs': _unary_v(_abs_v),
+    'ceiling': _unary_v(_rounding_v(np.ceil)),
+    'floor': _unary_v(_rounding_v(np.floor)),
+    'round': _unary_v(_rounding_v(np.rint)),
+    'exp': _unary_v(_math_v(math.exp)),
+    'ln': _unary_v(_math_v(math.log)),
+    'log2': _unary_v(_math_v(math.log2)),
+    'log10': _unary_v(_math_v(math.log10)),
+    
+    # coercion
+    'integer': _unary_v(_integer_v),
+    'float': _unary_v(_float_v),
+    
+    # comparison
+    'eq': _comparison_v(_eq_v),
+    'ne': _comparison_v(_ne_v),
+    'gt': _comparison_v(np.greater),
+    'ge': _comparison_v(np.greater_equal),
+    'lt': _comparison_v(np.less),
+    'le': _comparison_v(np.less_equal),
+    
+    # logic
+    'and': _logical_v(np.logical_and),
+    'or': _logical_v(np.logical_or),
+    'xor': _logical_v(np.logical_xor),
+    'not': _unary_v(_not_v),
+    
+}
+"""
+Vectorized operator implementations, by operator name.
+
+Each implementation operates on a list of NumPy arrays that serves as
+an operand stack. An implementation raises a `_VectorizationError` if
+it cannot produce results identical to those of the scalar operator,
+including if the scalar operator would raise an exception.
+"""
@@ -0,0 +1,771 @@
+"""
+Module containing class `ClipAudioPackStore`.
+
+A clip audio pack store stores the audio of the clips of an archive in
+a few large *pack* files rather than in one audio file per clip. There
+is one pack per station-night, which comprises two files in the store's
+directory, with paths of the form:
+
+    Station <station ID>/<night>.pack
+    Station <station ID>/<night>.index
+
+where `<night>` is an ISO 8601 date like "2050-05-01".
+
+The pack data file is a sequence of clip records. A clip record
+comprises a 28-byte header followed by the clip's samples as 16-bit,
+little-endian integers. The header contains the four-byte magic string
+`b'VCAP'`, the clip ID (a 64-bit integer), the clip sample rate (a
+64-bit float), and the clip length in samples (a 64-bit integer).
+
+The pack index file is a sequence of 32-byte index records, each of
+which contains a clip ID, the offset of the clip's record in the data
+file, the clip length, and the clip sample rate. A record whose offset
+is -1 indicates that a clip was deleted. When there is more than one
+index record for a clip, the last one is the current one.
+
+Clip records and index records are only ever appended to pack files,
+with one write per record, so several processes can write to a pack at
+once. Clip audio that is replaced or deleted remains in a pack data
+file until the pack is *compacted*, which rewrites both of its files
+without the unused audio. A pack must not be written while it is being
+compacted.
+
+A store reads clip samples from a pack data file with a single
+positional read, using an in-memory copy of the pack's index that it
+updates from the index file when it does not find a clip in it. Since
+clip records are self-describing, a pack's index can be rebuilt from
+its data file if needed, for example if compaction is interrupted after
+the data file is replaced but before the index file is replaced.
+
+Concurrent writes to a pack by several processes and compaction of a
+pack while other processes have it open are supported only on POSIX
+systems. They rely on appends to files opened in append mode going to
+the end of the file even when other processes append to it, and on
+`os.replace` replacing a file that other processes have open, neither
+of which is guaranteed on Windows. On Windows, only one process at a
+time should use a pack store.
+"""
+
+
+from threading import Lock
+import datetime
+import os
+import struct
+
+import numpy as np
+
+from vesper.util.bunch import Bunch
+from vesper.util.lru_cache import LruCache
+
+
+_MAGIC = b'VCAP'
+
+_CLIP_HEADER_FORMAT = '<4sqdq'
+_CLIP_HEADER_SIZE = struct.calcsize(_CLIP_HEADER_FORMAT)
+
+_INDEX_RECORD_DTYPE = np.dtype([
+    ('clip_id', '<i8'),
+    ('offset', '<i8'),
+    ('length', '<i8'),
+    ('sample_rate', '<f8')])
+
+_DELETED_OFFSET = -1
+
+_SAMPLE_DTYPE = np.dtype('<i2')
+
+_DEFAULT_MAX_OPEN_PACK_COUNT = 64
+"""Default maximum number of packs that a store keeps open at once."""
+
+
+class ClipAudioPackStoreError(Exception):
+    pass
+
+
+class ClipAudioPackStore:
+
+    """
+    Stores clip audio in per-station-night pack files.
+
+    Clips are identified to the methods of this class by station ID,
+    night, and clip ID, all of which are available from a `Clip`
+    without any database queries.
+
+    The methods of this class are thread-safe. A store keeps up to
+    `max_open_pack_count` packs open at once.
+    """
+
+
+    def __init__(
+            self, dir_path, max_open_pack_count=_DEFAULT_MAX_OPEN_PACK_COUNT):
+
+        self._dir_path = dir_path
+        self._packs = LruCache(max_open_pack_count)
+        self._lock = Lock()
+
+
+    @property
+    def dir_path(self):
+        return self._dir_path
+
+
+    def has_clip(self, station_id, night, clip_id):
+        return self._get_pack(station_id, night).get_entry(clip_id) \
+            is not None
+
+
+    def read_samples(
+            self, station_id, night, clip_id, start_offset=0, length=None):
+
+        """
+        Reads samples of a clip.
+
+        Parameters
+        ----------
+        station_id : int
+            the ID of the clip's station.
+
+        night : date
+            the clip's night.
+
+        clip_id : int
+            the clip's ID.
+
+        start_offset : int
+            the offset from the start of the clip of the samples to
+            read.
+
+        length : int or None
+            the number of samples to read, or `None` to read samples
+            through the end of the clip.
+
+        Returns
+        -------
+        tuple
+            `(samples, sample_rate)`, where `samples` is a NumPy array
+            of 16-bit integers, or `None` if the store does not have
+            the clip.
+        """
+
+        return self._get_pack(station_id, night).read_samples(
+            clip_id, start_offset, length)
+
+
+    def write_samples(self, station_id, night, clip_id, samples, sample_rate):
+
+        """
+        Writes the samples of a clip, replacing any existing samples.
+
+        Samples that are not 16-bit integers are rounded and converted
+        to them.
+        """
+
+        if samples.dtype != _SAMPLE_DTYPE:
+            samples = np.array(np.round(samples), dtype=_SAMPLE_DTYPE)
+
+        self._get_pack(station_id, night).write_samples(
+            clip_id, samples.reshape(-1), sample_rate)
+
+
+    def delete_clip(self, station_id, night, clip_id):
+
+        """
+        Deletes a clip from this store.
+
+        Returns
+        -------
+        bool
+            `True` if and only if the store had the clip.
+        """
+
+        return self._get_pack(station_id, night).delete_clip(clip_id)
+
+
+    def flush(self, station_id, night):
+
+        """
+        Flushes the writes of a pack to storage.
+
+        Call this method before deleting data that a pack now holds
+        copies of, for example audio files that were migrated to the
+        pack.
+        """
+
+        self._get_pack(station_id, night).flush()
+
+
+    def get_pack_keys(self):
+
+        """
+        Gets the `(station_id, night)` pairs of the packs of this store.
+        """
+
+        if not self._dir_path.exists():
+            return []
+
+        keys = []
+
+        for station_dir_path in sorted(self._dir_path.glob('Station *')):
+
+            station_id = int(station_dir_path.name.split()[1])
+
+            for data_file_path in sorted(station_dir_path.glob('*.pack')):
+                night = datetime.date.fromisoformat(data_file_path.stem)
+                keys.append((station_id, night))
+
+        return keys
+
+
+    def get_pack_stats(self, station_id, night):
+
+        """
+        Gets statistics for a pack.
+
+        Returns
+        -------
+        Bunch
+            a `Bunch` with attributes `clip_count`, the number of clips
+            in the pack, `data_size`, the size of the pack's data file
+            in bytes, and `unused_size`, the number of bytes of the
+            data file that compacting the pack would free.
+        """
+
+        return self._get_pack(station_id, night).get_stats()
+
+
+    def compact(self, station_id, night):
+
+        """
+        Compacts a pack, freeing space used by replaced and deleted
+        clips.
+
+        The pack must not be written by another store while it is being
+        compacted.
+
+        Returns
+        -------
+        int
+            the number of bytes freed.
+        """
+
+        return self._get_pack(station_id, night).compact()
+
+
+    def _get_pack(self, station_id, night):
+
+        key = (station_id, night)
+
+        with self._lock:
+
+            try:
+                return self._packs[key]
+
+            except KeyError:
+
+                dir_path = self._dir_path / f'Station {station_id}'
+                file_name = night.isoformat()
+
+                pack = _Pack(
+                    dir_path / f'{file_name}.pack',
+                    dir_path / f'{file_name}.index')
+
+                self._packs[key] = pack
+
+                return pack
+
+
+class _Pack:
+
+    """
+    Pack of a clip audio pack store.
+
+    A pack that is evicted from its store's pack cache while another
+    thread is reading from it is closed only after the read completes,
+    since the pack's files are closed only when the pack is garbage
+    collected.
+    """
+
+
+    def __init__(self, data_file_path, index_file_path):
+
+        self._data_file_path = data_file_path
+        self._index_file_path = index_file_path
+
+        self._lock = Lock()
+
+        self._entries = {}
+        """
+        Mapping from clip ID to `(offset, length, sample_rate)` tuple.
+        """
+
+        self._index_file_id = None
+        self._index_file_size = 0
+
+        self._data_file = None
+        self._data_append_file = None
+        self._index_append_file = None
+
+
+    def get_entry(self, clip_id):
+
+        entry = self._entries.get(clip_id)
+
+        if entry is None:
+            # clip not in our copy of index
+
+            # Clip may have been written by another store, so update
+            # our copy of index and try again.
+            with self._lock:
+                self._update_entries()
+                entry = self._entries.get(clip_id)
+
+        return entry
+
+
+    def _update_entries(self):
+
+        try:
+            stat = os.stat(self._index_file_path)
+        except FileNotFoundError:
+            return
+
+        file_id = (stat.st_dev, stat.st_ino)
+
+        if file_id != self._index_file_id or \
+                stat.st_size < self._index_file_size:
+            # index file is new to us or was replaced
+
+            if self._index_file_id is not None:
+                # index file was replaced, for example when another
+                # store compacted pack
+
+                # Data file was probably replaced, too, so reopen it
+                # when we next need it.
+                self._data_file = None
+                self._close_append_files()
+
+            self._entries = {}
+            self._index_file_id = file_id
+            self._index_file_size = 0
+
+        if stat.st_size == self._index_file_size:
+            return
+
+        with open(self._index_file_path, 'rb') as file_:
+            file_.seek(self._index_file_size)
+            data = file_.read()
+
+        # Ignore any partial record at end of file, which a concurrent
+        # write may not have completed.
+        record_count = len(data) // _INDEX_RECORD_DTYPE.itemsize
+        size = record_count * _INDEX_RECORD_DTYPE.itemsize
+        records = np.frombuffer(data[:size], dtype=_INDEX_RECORD_DTYPE)
+
+        self._add_entries(records)
+        self._index_file_size += size
+
+
+    def _add_entries(self, records):
+
+        entries = self._entries
+
+        for clip_id, offset, length, sample_rate in records.tolist():
+            if offset == _DELETED_OFFSET:
+                entries.pop(clip_id, None)
+            else:
+                entries[clip_id] = (offset, length, sample_rate)
+
+
+    def read_samples(self, clip_id, start_offset, length):
+
+        entry = self.get_entry(clip_id)
+
+        if entry is None:
+            return None
+
+        offset, clip_length, sample_rate = entry
+
+        if length is None:
+            length = max(clip_length - start_offset, 0)
+
+        end_offset = start_offset + length
+
+        if start_offset < 0 or end_offset > clip_length:
+            raise ClipAudioPackStoreError(
+                f'Requested samples [{start_offset}, {end_offset}) of clip '
+                f'{clip_id} are not all in clip, which has length '
+                f'{clip_length}.')
+
+        # Read clip header and samples through end of requested samples
+        # in one read.
+        size = _CLIP_HEADER_SIZE + end_offset * _SAMPLE_DTYPE.itemsize
+        data = _read(self._get_data_file(), offset, size)
+
+        if not _is_clip_record(data, clip_id, size):
+            # index inconsistent with data file
+            data = self._reread_samples(clip_id, size)
+
+        samples = np.frombuffer(data, dtype=_SAMPLE_DTYPE, offset=(
+            _CLIP_HEADER_SIZE + start_offset * _SAMPLE_DTYPE.itemsize))
+
+        return samples, sample_rate
+
+
+    def _reread_samples(self, clip_id, size):
+
+        with self._lock:
+
+            # Our copy of the index can be inconsistent with the data
+            # file we have open if another store compacted the pack
+            # since we last read the index, so reopen the data file,
+            # reread the index, and try again.
+            self._data_file = None
+            self._close_append_files()
+            self._index_file_id = None
+            self._update_entries()
+
+            data = self._read_clip_record(clip_id, size)
+
+            if data is None:
+                # index still inconsistent with data file
+
+                # This can happen if compaction was interrupted after
+                # the data file was replaced but before the index file
+                # was. Rebuild index and try again. We hold our lock
+                # while we do this so that no other thread of this
+                # store can append to the pack meanwhile.
+                self._rebuild_index()
+                data = self._read_clip_record(clip_id, size)
+
+            if data is None:
+                raise ClipAudioPackStoreError(
+                    f'Could not find audio for clip {clip_id} in clip '
+                    f'audio pack data file "{self._data_file_path}", '
+                    f'though it is in the pack index.')
+
+            return data
+
+
+    def _read_clip_record(self, clip_id, size):
+
+        # This method must be called with our lock held.
+
+        entry = self._entries.get(clip_id)
+
+        if entry is None:
+            return None
+
+        if self._data_file is None:
+            self._data_file = open(self._data_file_path, 'rb')
+
+        data = _read(self._data_file, entry[0], size)
+
+        if _is_clip_record(data, clip_id, size):
+            return data
+        else:
+            return None
+
+
+    def _get_data_file(self):
+
+        with self._lock:
+
+            if self._data_file is None:
+                self._data_file = open(self._data_file_path, 'rb')
+
+            return self._data_file
+
+
+    def write_samples(self, clip_id, samples, sample_rate):
+
+        length = len(samples)
+
+        header = struct.pack(
+            _CLIP_HEADER_FORMAT, _MAGIC, clip_id, sample_rate, length)
+
+        with self._lock:
+
+            self._open_append_files()
+
+            offset = _append(
+                self._data_append_file, header + samples.tobytes())
+
+            self._append_index_record(clip_id, offset, length, sample_rate)
+
+
+    def _open_append_files(self):
+
+        # Update our copy of index first, since that closes our append
+        # files if the pack was compacted by another store.
+        self._update_entries()
+
+        if self._data_append_file is None:
+
+            self._data_file_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # Open files unbuffered in append mode, so each record is
+            # appended with one write.
+            self._data_append_file = open(
+                self._data_file_path, 'ab', buffering=0)
+            self._index_append_file = open(
+                self._index_file_path, 'ab', buffering=0)
+
+            if self._index_file_id is None:
+                # index file did not exist before we opened it
+                self._update_entries()
+
+
+    def _append_index_record(self, clip_id, offset, length, sample_rate):
+
+        record = np.array(
+            [(clip_id, offset, length, sample_rate)],
+            dtype=_INDEX_RECORD_DTYPE)
+
+        offset = _append(self._index_append_file, record.tobytes())
+
+        if offset == self._index_file_size:
+            # no other store has appended to index file since we last
+            # read it
+
+            self._add_entries(record)
+            self._index_file_size += record.itemsize
+
+        else:
+            # another store has appended to index file since we last
+            # read it
+
+            self._update_entries()
+
+
+    def delete_clip(self, clip_id):
+
+        if self.get_entry(clip_id) is None:
+            return False
+
+        with self._lock:
+            self._open_append_files()
+            self._append_index_record(clip_id, _DELETED_OFFSET, 0, 0)
+
+        return True
+
+
+    def flush(self):
+
+        with self._lock:
+
+            if self._data_append_file is not None:
+                os.fsync(self._data_append_file.fileno())
+                os.fsync(self._index_append_file.fileno())
+
+
+    def get_stats(self):
+
+        with self._lock:
+
+            self._update_entries()
+
+            try:
+                data_size = os.path.getsize(self._data_file_path)
+            except FileNotFoundError:
+                data_size = 0
+
+            used_size = sum(
+                _get_clip_record_size(length)
+                for _, length, _ in self._entries.values())
+
+            return Bunch(
+                clip_count=len(self._entries),
+                data_size=data_size,
+                unused_size=data_size - used_size)
+
+
+    def compact(self):
+
+        with self._lock:
+
+            if not self._data_file_path.exists():
+                return 0
+
+            self._update_entries()
+
+            old_size = os.path.getsize(self._data_file_path)
+
+            data_file_path = _get_temp_file_path(self._data_file_path)
+            index_file_path = _get_temp_file_path(self._index_file_path)
+
+            # Copy records of current clips to new data file in order
+            # of their offsets in old data file, and create new index.
+            entries = sorted(
+                self._entries.items(), key=lambda item: item[1][0])
+
+            records = np.zeros(len(entries), dtype=_INDEX_RECORD_DTYPE)
+
+            with open(self._data_file_path, 'rb') as old_file, \
+                    open(data_file_path, 'wb') as new_file:
+
+                for i, (clip_id, (offset, length, sample_rate)) in \
+                        enumerate(entries):
+
+                    size = _get_clip_record_size(length)
+                    data = _read(old_file, offset, size)
+
+                    records[i] = (
+                        clip_id, new_file.tell(), length, sample_rate)
+
+                    new_file.write(data)
+
+                new_file.flush()
+                os.fsync(new_file.fileno())
+                new_size = new_file.tell()
+
+            with open(index_file_path, 'wb') as file_:
+                file_.write(records.tobytes())
+                file_.flush()
+                os.fsync(file_.fileno())
+
+            # Close our files, since the files they refer to are about
+            # to be replaced.
+            self._close_append_files()
+            self._data_file = None
+
+            # Replace data file before index file. If we are interrupted
+            # between the two, the old index will be inconsistent with
+            # the new data file, but a new index can be built from the
+            # new data file. See `_rebuild_index`.
+            os.replace(data_file_path, self._data_file_path)
+            os.replace(index_file_path, self._index_file_path)
+
+            # Force reread of index.
+            self._index_file_id = None
+            self._update_entries()
+
+            return old_size - new_size
+
+
+    def _close_append_files(self):
+
+        if self._data_append_file is not None:
+            self._data_append_file.close()
+            self._index_append_file.close()
+            self._data_append_file = None
+            self._index_append_file = None
+
+
+    def rebuild_index(self):
+
+        """
+        Rebuilds this pack's index file from its data file.
+
+        Clips that were deleted after the pack was last compacted will
+        reappear in the rebuilt index.
+        """
+
+        with self._lock:
+            self._rebuild_index()
+
+
+    def _rebuild_index(self):
+
+        # This method must be called with our lock held.
+
+        records = []
+
+        with open(self._data_file_path, 'rb') as file_:
+
+            offset = 0
+
+            while True:
+
+                header = _read(file_, offset, _CLIP_HEADER_SIZE)
+
+                if len(header) < _CLIP_HEADER_SIZE:
+                    break
+
+                magic, clip_id, sample_rate, length = \
+                    struct.unpack(_CLIP_HEADER_FORMAT, header)
+
+                if magic != _MAGIC:
+                    raise ClipAudioPackStoreError(
+                        f'Clip audio pack data file '
+                        f'"{self._data_file_path}" is corrupt at '
+                        f'byte offset {offset}.')
+
+                records.append((clip_id, offset, length, sample_rate))
+
+                offset += _get_clip_record_size(length)
+
+        records = np.array(records, dtype=_INDEX_RECORD_DTYPE)
+
+        index_file_path = _get_temp_file_path(self._index_file_path)
+
+        with open(index_file_path, 'wb') as file_:
+            file_.write(records.tobytes())
+            file_.flush()
+            os.fsync(file_.fileno())
+
+        self._close_append_files()
+
+        os.replace(index_file_path, self._index_file_path)
+
+        self._index_file_id = None
+        self._update_entries()
+
+
+def _is_clip_record(data, clip_id, size):
+
+    if len(data) != size:
+        return False
+
+    magic, header_clip_id, _, _ = \
+        struct.unpack_from(_CLIP_HEADER_FORMAT, data)
+
+    return magic == _MAGIC and header_clip_id == clip_id
+
+
+def _get_clip_record_size(length):
+    return _CLIP_HEADER_SIZE + length * _SAMPLE_DTYPE.itemsize
+
+
+def _get_temp_file_path(path):
+    return path.with_name(path.name + '.tmp')
+
+
+def _append(file_, data):
+
+    """
+    Appends data to a file opened unbuffered in append mode, returning
+    the offset at which the data were written.
+
+    Even if other processes append to the file concurrently, the file
+    position after our write is the end of our data, since each write
+    to a file opened in append mode moves to the end of the file and
+    writes atomically.
+    """
+
+    # An unbuffered write may write only some of the data, in which
+    # case we write the rest with more writes. The data are then
+    # written atomically only if no other process appends to the file
+    # meanwhile, but short writes to regular files are rare in practice.
+    data = memoryview(data)
+    size = file_.write(data)
+    offset = file_.tell() - size
+
+    while size < len(data):
+        size += file_.write(data[size:])
+
+    return offset
+
+
+if hasattr(os, 'pread'):
+
+    def _read(file_, offset, size):
+        return os.pread(file_.fileno(), size, offset)
+
+else:
+    # no `os.pread`, as on Windows
+
+    _read_lock = Lock()
+
+    def _read(file_, offset, size):
+        with _read_lock:
+            file_.seek(offset)
+            return file_.read(size)
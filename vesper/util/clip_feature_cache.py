@@ -0,0 +1,469 @@
+"""
+Module containing class `ClipFeatureCache`.
+
+A clip feature cache stores features computed from clip audio, for
+example resampled waveform slices or spectrograms, on disk so that they
+need not be recomputed each time the clips are processed, for example
+when a classifier is rerun on a season of clips after a change to its
+classification threshold.
+
+The features of a cache are identified by clip and by *feature
+settings*, a JSON-serializable dictionary that describes how the
+features are computed. Features computed with different settings are
+stored in different subdirectories of the cache directory, named for
+a hash of the settings, so a change to any setting invalidates all
+previously cached features without any explicit bookkeeping.
+
+Within a settings subdirectory, features are stored in immutable
+*shards*. Each shard comprises two NumPy `.npy` files, one containing
+an array of the features of up to `_MAX_SHARD_FEATURE_COUNT` clips and
+the other containing the keys of those clips. Feature files are read
+with memory mapping, so reading a feature reads only the pages of the
+file that contain it.
+
+The total size of the shards of all of the settings subdirectories of a
+cache directory is bounded. When the bound is exceeded, least recently
+used shards are deleted until it is not.
+"""
+
+
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+import numpy as np
+
+
+_MAX_SHARD_FEATURE_COUNT = 1000
+"""Maximum number of clip features per shard."""
+
+_SETTINGS_FILE_NAME = 'Settings.json'
+_KEYS_FILE_NAME_SUFFIX = '.keys.npy'
+_FEATURES_FILE_NAME_SUFFIX = '.features.npy'
+
+
+_logger = logging.getLogger()
+
+
+class ClipFeatureCache:
+
+    """
+    On-disk cache of clip features.
+
+    A `ClipFeatureCache` caches features computed with one set of
+    feature settings. All of the features of a cache must have the
+    same shape and dtype.
+
+    Clips are identified by `(clip_id, start_index)` pairs rather than
+    by clip IDs alone, so that a cached feature of a deleted clip is
+    not mistaken for that of a new clip that reuses the deleted clip's
+    ID. A start index of `None` is stored as -1.
+
+    Features added to a cache with the `put` method are written to disk
+    in shards of up to `_MAX_SHARD_FEATURE_COUNT` features, and least
+    recently used shards are evicted as needed each time a full shard
+    is written. Call the `flush` method to write any remaining features
+    to disk when you are done adding features.
+    """
+
+
+    def __init__(self, dir_path, settings, max_size):
+
+        """
+        Initializes this cache.
+
+        Parameters
+        ----------
+        dir_path : str or Path
+            the cache directory. The directory is created if needed.
+
+        settings : dict
+            JSON-serializable dictionary of feature settings.
+
+        max_size : int
+            the maximum total size in bytes of the shards of the cache
+            directory.
+        """
+
+        self._dir_path = Path(dir_path)
+        self._settings_key = get_settings_key(settings)
+        self._settings_dir_path = self._dir_path / self._settings_key
+        self._max_size = max_size
+
+        self._create_settings_dir(settings)
+
+        # Mapping from clip keys to (shard name, feature index) pairs.
+        self._index = {}
+
+        # Mapping from shard names to memory mapped feature arrays.
+        self._shard_features = {}
+
+        self._load_index()
+
+        self._pending_keys = []
+        self._pending_features = []
+
+        self._hit_count = 0
+        self._miss_count = 0
+
+
+    def _create_settings_dir(self, settings):
+
+        self._settings_dir_path.mkdir(parents=True, exist_ok=True)
+
+        # Write settings to settings directory to document the
+        # settings of its features. This is for people, not for us.
+        path = self._settings_dir_path / _SETTINGS_FILE_NAME
+        if not path.exists():
+            _write_atomically(
+                path, lambda f: f.write(_get_settings_json(settings)),
+                mode='w')
+
+
+    def _load_index(self):
+
+        shard_names = _get_shard_names(self._settings_dir_path)
+
+        # Load older shards first so that entries of newer shards
+        # supersede those of older ones.
+        shard_names.sort(key=self._get_shard_modification_time)
+
+        for shard_name in shard_names:
+
+            try:
+                keys = np.load(self._get_keys_file_path(shard_name))
+
+            except Exception as e:
+                _logger.warning(
+                    f'Could not load clip feature cache shard keys '
+                    f'file for shard "{shard_name}". The shard will be '
+                    f'ignored. Error message was: {e}')
+                continue
+
+            for i, key in enumerate(keys.tolist()):
+                self._index[tuple(key)] = shard_name, i
+
+
+    def _get_shard_modification_time(self, shard_name):
+        try:
+            return self._get_keys_file_path(shard_name).stat().st_mtime
+        except OSError:
+            return 0
+
+
+    def _get_keys_file_path(self, shard_name):
+        return self._settings_dir_path / (shard_name + _KEYS_FILE_NAME_SUFFIX)
+
+
+    def _get_features_file_path(self, shard_name):
+        return self._settings_dir_path / \
+            (shard_name + _FEATURES_FILE_NAME_SUFFIX)
+
+
+    @property
+    def dir_path(self):
+        return self._dir_path
+
+
+    @property
+    def settings_key(self):
+        return self._settings_key
+
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+
+    @property
+    def hit_count(self):
+        return self._hit_count
+
+
+    @property
+    def miss_count(self):
+        return self._miss_count
+
+
+    def get(self, keys):
+
+        """
+        Gets cached features.
+
+        Parameters
+        ----------
+        keys : sequence of (int, int or None) pairs
+            `(clip_id, start_index)` pairs of the clips whose features
+            to get.
+
+        Returns
+        -------
+        list
+            the features of the specified clips, in the order of `keys`.
+            The feature of a clip is a NumPy array if the feature is
+            in the cache or `None` if it is not. Arrays read from disk
+            are read-only memory mapped views.
+        """
+
+        features = []
+        used_shard_names = set()
+
+        for key in keys:
+
+            key = _normalize_key(key)
+            location = self._index.get(key)
+            feature = None
+
+            if location is not None:
+
+                shard_name, i = location
+
+                shard_features = self._get_shard_features(shard_name)
+
+                if shard_features is not None:
+                    feature = shard_features[i]
+                    used_shard_names.add(shard_name)
+
+            if feature is None:
+                self._miss_count += 1
+            else:
+                self._hit_count += 1
+
+            features.append(feature)
+
+        # Mark shards as recently used for eviction.
+        now = time.time()
+        for shard_name in used_shard_names:
+            try:
+                os.utime(self._get_keys_file_path(shard_name), (now, now))
+            except OSError:
+                pass
+
+        return features
+
+
+    def _get_shard_features(self, shard_name):
+
+        features = self._shard_features.get(shard_name)
+
+        if features is None:
+
+            path = self._get_features_file_path(shard_name)
+
+            try:
+                features = np.load(path, mmap_mode='r')
+
+            except Exception as e:
+                # shard deleted (for example, evicted by another
+                # process) or damaged
+
+                _logger.warning(
+                    f'Could not load clip feature cache features file '
+                    f'"{path}". Error message was: {e}')
+
+                self._remove_shard_from_index(shard_name)
+
+                return None
+
+            self._shard_features[shard_name] = features
+
+        return features
+
+
+    def put(self, keys, features):
+
+        """
+        Adds features to this cache.
+
+        Parameters
+        ----------
+        keys : sequence of (int, int or None) pairs
+            `(clip_id, start_index)` pairs of the clips whose features
+            to add.
+
+        features : sequence of NumPy arrays
+            the features to add.
+        """
+
+        for key, feature in zip(keys, features):
+
+            self._pending_keys.append(_normalize_key(key))
+            self._pending_features.append(feature)
+
+            if len(self._pending_keys) == _MAX_SHARD_FEATURE_COUNT:
+                self._write_shard()
+                self._evict_shards()
+
+
+    def flush(self):
+
+        """
+        Writes any pending features of this cache to disk, and evicts
+        least recently used shards from the cache directory as needed
+        to keep its size within bounds.
+        """
+
+        if len(self._pending_keys) != 0:
+            self._write_shard()
+
+        self._evict_shards()
+
+
+    def _write_shard(self):
+
+        keys = np.array(self._pending_keys, dtype='int64')
+        features = np.stack(self._pending_features)
+
+        self._pending_keys = []
+        self._pending_features = []
+
+        # Use unique shard names so that processes that add features
+        # to the same cache directory do not clobber each other's
+        # shards.
+        shard_name = uuid.uuid4().hex
+
+        try:
+
+            # Write features file first, since a shard is considered
+            # present only once its keys file exists.
+            _write_atomically(
+                self._get_features_file_path(shard_name),
+                lambda f: np.save(f, features))
+
+            _write_atomically(
+                self._get_keys_file_path(shard_name),
+                lambda f: np.save(f, keys))
+
+        except OSError as e:
+            _logger.warning(
+                f'Could not write clip feature cache shard to directory '
+                f'"{self._settings_dir_path}". Error message was: {e}')
+            return
+
+        for i, key in enumerate(keys.tolist()):
+            self._index[tuple(key)] = shard_name, i
+
+
+    def _evict_shards(self):
+
+        shards = []
+        total_size = 0
+
+        for settings_dir_path in self._dir_path.iterdir():
+
+            if not settings_dir_path.is_dir():
+                continue
+
+            for shard_name in _get_shard_names(settings_dir_path):
+
+                keys_file_path = \
+                    settings_dir_path / (shard_name + _KEYS_FILE_NAME_SUFFIX)
+                features_file_path = settings_dir_path / \
+                    (shard_name + _FEATURES_FILE_NAME_SUFFIX)
+
+                try:
+                    access_time = keys_file_path.stat().st_mtime
+                    size = \
+                        keys_file_path.stat().st_size + \
+                        features_file_path.stat().st_size
+                except OSError:
+                    # shard incomplete or being deleted
+                    continue
+
+                shards.append(
+                    (access_time, size, settings_dir_path, shard_name,
+                     keys_file_path, features_file_path))
+
+                total_size += size
+
+        shards.sort(key=lambda s: s[0])
+
+        for (_, size, settings_dir_path, shard_name, keys_file_path,
+                features_file_path) in shards:
+
+            if total_size <= self._max_size:
+                break
+
+            try:
+                # Delete keys file first so that other processes will
+                # not see an incomplete shard.
+                keys_file_path.unlink()
+                features_file_path.unlink()
+
+            except OSError:
+                # could not delete shard (for example, it may have been
+                # deleted by another process, or on Windows it may be
+                # open in another process)
+
+                continue
+
+            total_size -= size
+
+            if settings_dir_path == self._settings_dir_path:
+                self._remove_shard_from_index(shard_name)
+
+
+    def _remove_shard_from_index(self, shard_name):
+
+        self._shard_features.pop(shard_name, None)
+
+        self._index = dict(
+            (key, location) for key, location in self._index.items()
+            if location[0] != shard_name)
+
+
+def get_settings_key(settings):
+
+    """
+    Gets the key of the specified feature settings.
+
+    The key is a hexadecimal hash of a canonical JSON representation of
+    the settings, and is used as the name of the cache subdirectory
+    that contains features computed with the settings.
+    """
+
+    settings_json = _get_settings_json(settings)
+    return hashlib.sha256(settings_json.encode('utf-8')).hexdigest()[:16]
+
+
+def _get_settings_json(settings):
+    return json.dumps(settings, sort_keys=True, indent=4)
+
+
+def _normalize_key(key):
+    clip_id, start_index = key
+    if start_index is None:
+        start_index = -1
+    return int(clip_id), int(start_index)
+
+
+def _get_shard_names(dir_path):
+    suffix = _KEYS_FILE_NAME_SUFFIX
+    return [
+        p.name[:-len(suffix)] for p in dir_path.glob('*' + suffix)]
+
+
+def _write_atomically(path, write, mode='wb'):
+
+    # Write to a temporary file and then rename it, so that other
+    # processes never see a partially written file.
+
+    temp_path = path.with_name(path.name + '.tmp' + uuid.uuid4().hex[:8])
+
+    try:
+        with open(temp_path, mode) as f:
+            write(f)
+        os.replace(temp_path, path)
+
+    except Exception:
+
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+
+        raise
@@ -1,8 +1,9 @@
 """Module containing `ClipManager` class."""
 
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from threading import Lock
 import asyncio
 import os.path
 
@@ -11,21 +12,73 @@ import aioboto3
 import numpy as np
 
 from vesper.archive_paths import archive_paths
-from vesper.signal.wave_file_signal import WaveFileSignal
 from vesper.singleton.recording_manager import recording_manager
 from vesper.util.bunch import Bunch
+from vesper.util.clip_audio_pack_store import ClipAudioPackStore
+from vesper.util.recording_file_pool import RecordingFilePool
 import vesper.util.audio_file_utils as audio_file_utils
 import vesper.util.os_utils as os_utils
 import vesper.util.signal_utils as signal_utils
 
 
+_RECORDING_FILE_POOL_SIZE = 16
+"""
+Maximum number of recording files that a clip manager keeps open at once.
+
+Keeping several recording files open allows a clip manager to serve
+requests for clips from different recordings (for example, from a clip
+album page that includes clips from more than one night, or from several
+users viewing different nights) without repeatedly closing and reopening
+files.
+"""
+
+
+_AUDIO_FILE_READ_THREAD_COUNT = 8
+"""
+Number of threads that a clip manager uses to read clip audio files.
+
+The threads are shared by all calls to a clip manager's
+`generate_audio_file_contents` method, so this also bounds the number
+of concurrent clip audio file reads across requests.
+"""
+
+
+_MAX_PENDING_AUDIO_FILE_READ_COUNT = 2 * _AUDIO_FILE_READ_THREAD_COUNT
+"""
+Maximum number of clip audio file reads that a generator returned by
+`ClipManager.generate_audio_file_contents` has pending at once.
+
+This bounds the amount of clip audio that a generator buffers when its
+consumer falls behind.
+"""
+
+
+_CLIP_AUDIO_STORAGE_TYPES = ('Files', 'Packs')
+"""
+Clip audio storage types.
+
+With "Files" storage, the audio of each clip is stored in its own
+WAVE file. With "Packs" storage, clip audio is stored in a
+`ClipAudioPackStore`, with one pack per station-night. With either
+type of storage, clip audio can also be read from S3 (see below).
+"""
+
+
 class ClipManagerError(Exception):
     pass
 
 
 class ClipManager:
     
-    """Gets the audio data of the clips of a Vesper archive."""
+    """
+    Gets the audio data of the clips of a Vesper archive.
+    
+    The clip manager stores clip audio according to the
+    `VESPER_CLIP_AUDIO_STORAGE` environment variable, either "Files"
+    (the default) or "Packs". With "Packs" storage, the manager still
+    reads and deletes clip audio files that have not yet been migrated
+    to packs (see the `migrate_clip_audio_files` command).
+    """
     
     
     def __init__(self):
@@ -33,11 +86,23 @@ class ClipManager:
         self._rm = recording_manager
         self._recording_channel_info_cache = {}
         self._recording_info_cache = {}
-        self._recording_file_signal_cache = {}
-        self._read_lock = Lock()
+        self._recording_file_pool = \
+            RecordingFilePool(_RECORDING_FILE_POOL_SIZE)
+        self._audio_file_read_executor = ThreadPoolExecutor(
+            _AUDIO_FILE_READ_THREAD_COUNT,
+            thread_name_prefix='ClipAudioFileRead')
         
-        # Get S3 clip info, if present.
         env = Env()
+        
+        self._clip_audio_storage_type = \
+            env('VESPER_CLIP_AUDIO_STORAGE', 'Files')
+        if self._clip_audio_storage_type not in _CLIP_AUDIO_STORAGE_TYPES:
+            raise ClipManagerError(
+                f'Unrecognized clip audio storage type '
+                f'"{self._clip_audio_storage_type}".')
+        self._clip_audio_pack_store = None
+        
+        # Get S3 clip info, if present.
         self._aws_access_key_id = env('VESPER_AWS_ACCESS_KEY_ID', None)
         self._aws_secret_access_key = env('VESPER_AWS_SECRET_ACCESS_KEY', None)
         self._aws_region_name = env('VESPER_AWS_REGION_NAME', None)
@@ -52,13 +117,62 @@ class ClipManager:
             self._aws_s3_clip_folder_path += '/'
 
 
+    @property
+    def recording_file_pool_stats(self):
+        
+        """
+        Statistics for this clip manager's pool of open recording files.
+        
+        See the `stats` property of the `RecordingFilePool` class for
+        a description of the statistics.
+        """
+        
+        return self._recording_file_pool.stats
+    
+    
+    @property
+    def clip_audio_storage_type(self):
+        return self._clip_audio_storage_type
+    
+    
+    @property
+    def clip_audio_pack_store(self):
+        
+        """
+        The clip audio pack store of this clip manager's archive.
+        
+        The store is available regardless of the clip audio storage
+        type, for example to migrate clip audio files to it.
+        """
+        
+        if self._clip_audio_pack_store is None:
+            self._clip_audio_pack_store = \
+                ClipAudioPackStore(archive_paths.clip_audio_pack_dir_path)
+            
+        return self._clip_audio_pack_store
+    
+    
+    @property
+    def _packs_enabled(self):
+        return self._clip_audio_storage_type == 'Packs'
+    
+    
     def get_audio_file_path(self, clip):
         return _get_audio_file_path(clip.id)
     
         
     def has_audio_file(self, clip):
+        
+        if self._packs_enabled and self._has_packed_audio(clip):
+            return True
+        
         path = self.get_audio_file_path(clip)
         return os.path.exists(path)
+    
+    
+    def _has_packed_audio(self, clip):
+        return self.clip_audio_pack_store.has_clip(
+            clip.station_id, clip.date, clip.id)
         
     
     def get_audio(self, clip):
@@ -127,6 +241,15 @@ class ClipManager:
             
        
     def _get_samples_from_audio_file(self, clip, start_index, length):
+        
+        if self._packs_enabled:
+            
+            result = self.clip_audio_pack_store.read_samples(
+                clip.station_id, clip.date, clip.id, start_index, length)
+            
+            if result is not None:
+                return result[0]
+            
         path = self.get_audio_file_path(clip)
         samples, _ = audio_file_utils.read_wave_file(path)
         end_index = start_index + length
@@ -263,79 +386,16 @@ class ClipManager:
                 'Could not read clip samples from recording file. '
                 '{}').format(str(e)))
         
-        # Since the file signal cache may be shared among threads, we
-        # use a lock to make getting a file signal for a clip and reading
-        # samples from it atomic.
-        #
-        # Without the lock, we have observed that reads can return the
-        # wrong samples. For example, suppose that this method is called
-        # on separate threads for two different clips, clips 1 and 2,
-        # that are in the same file and hence will use the same file
-        # signal. We want the seek and read operations for the two clips
-        # to be ordered like this:
-        #
-        #     1. Seek clip 1.
-        #     2. Read clip 1.
-        #     3. Seek clip 2.
-        #     4. Read clip 2.
-        #
-        # (or perhaps with operations 3 and 4 preceding 1 and 2). If we
-        # don't make the seek/read combinations atomic, however, we can
-        # get this instead:
-        #
-        #     1. Seek clip 1.
-        #     2. Seek clip 2.
-        #     3. Read clip 1.
-        #     4. Read clip 2.
-        #
-        # which reads the wrong samples for both clips.
-        #
-        # If we don't make the combination of getting the file signal
-        # for a clip and reading from the signal atomic, the following
-        # can happen when we try to read two clips whose samples are in
-        # different files:
-        #
-        #     1. Get signal for clip 1.
-        #     2. Get signal for clip 2, closing signal for clip 1.
-        #     3. Attempt to read samples from signal for clip 1.
-        #
-        # Step 3 results in an exception since the signal for clip 1
-        # was closed in step 2.
-        
-        with self._read_lock:
-            signal = self._get_recording_file_signal(path)
-            channel = signal.channels[channel_num]
-            return channel.read(start_index, length)
-    
-    
-    def _get_recording_file_signal(self, path):
-        
-        try:
-            signal = self._recording_file_signal_cache[path]
-        
-        except KeyError:
-            # cache miss
-            
-            # Clear cache. We cache just one signal at a time, which
-            # goes a long way since in typical use our accesses don't
-            # switch files very often.
-            self._clear_recording_file_signal_cache()
-            
-            # Create new signal.
-            signal = WaveFileSignal(path)
-            
-            # Cache new signal.
-            self._recording_file_signal_cache[path] = signal
-            
-        return signal
-    
-    
-    def _clear_recording_file_signal_cache(self):
-        
-        for signal in self._recording_file_signal_cache.values():
-            signal.close()
-            
-        self._recording_file_signal_cache = {}
+        # Recording files are read by the pool without seeking (WAVE
+        # files are memory mapped and FLAC files are read with
+        # positional reads), so unlike with a `WaveFileSignal` (whose
+        # seek and read operations are stateful) we do not need to
+        # serialize reads, even reads from the same file on different
+        # threads. The pool also ensures
+        # that a file is not closed by one thread while another thread
+        # is reading from it.
+        return self._recording_file_pool.read(
+            path, channel_num, start_index, length)
     
     
     def get_audio_file_contents(self, clips):
@@ -350,7 +410,92 @@ class ClipManager:
             return self._get_audio_file_contents(clips)
         
 
-    def _get_s3_audio_file_contents(self, clips):
+    def generate_audio_file_contents(self, clips):
+        
+        """
+        Generates the audio file contents of the specified clips.
+        
+        The returned generator yields a `(contents, exception)` pair
+        for each clip, in the order of `clips`. If the contents of a
+        clip's audio file were obtained, `contents` is a `bytes` object
+        and `exception` is `None`. Otherwise `contents` is `None` and
+        `exception` is the exception that was raised when the contents
+        were requested. Unlike the exceptions raised by
+        `get_audio_file_contents`, these exceptions are not wrapped in
+        `ClipManagerError` exceptions whose messages describe the clips.
+        
+        When clip audio is stored in the file system, the contents are
+        read in parallel on a bounded pool of threads, so the generator
+        can yield the contents of a clip while the contents of later
+        clips are still being read.
+        
+        Any database queries needed to locate clip audio are performed
+        by this method, before it returns, rather than by the threads.
+        """
+        
+        if self._aws_s3_clip_bucket_name is not None:
+            
+            contents = self._get_s3_audio_file_contents(
+                clips, return_exceptions=True)
+            
+            return (_get_contents_pair(c) for c in contents)
+        
+        else:
+            # using file system clip storage
+            
+            self._cache_recording_file_info(clips)
+            
+            return self._generate_audio_file_contents(clips)
+        
+        
+    def _cache_recording_file_info(self, clips):
+        
+        # Cache recording file info for the specified clips so that
+        # clip audio read threads will not perform database queries
+        # when they read clip samples from recordings. If getting
+        # the info for a clip fails, the failure will recur (and
+        # be reported) when a thread tries to read the clip's samples.
+        
+        for clip in clips:
+            if clip.start_index is not None:
+                try:
+                    self._get_recording_file_info_aux(clip)
+                except Exception:
+                    pass
+                
+                
+    def _generate_audio_file_contents(self, clips):
+        
+        executor = self._audio_file_read_executor
+        pending = deque()
+        
+        try:
+            
+            for clip in clips:
+                
+                # We call `_read_audio_file_contents` rather than
+                # `_get_audio_file_contents_aux` since the latter
+                # formats errors with `str(clip)`, which can query
+                # the database.
+                future = executor.submit(
+                    self._read_audio_file_contents, clip)
+                pending.append(future)
+                
+                if len(pending) == _MAX_PENDING_AUDIO_FILE_READ_COUNT:
+                    yield _get_future_contents_pair(pending.popleft())
+                    
+            while len(pending) != 0:
+                yield _get_future_contents_pair(pending.popleft())
+                
+        finally:
+            
+            # Cancel any reads that have not started, for example if
+            # the generator was closed early.
+            for future in pending:
+                future.cancel()
+        
+        
+    def _get_s3_audio_file_contents(self, clips, return_exceptions=False):
 
         # Get clip IDs. We must do this before calling asynchronous code
         # since Django will raise a `SynchronousOnlyOperation` exception
@@ -358,10 +503,12 @@ class ClipManager:
         # function.
         clip_ids = [clip.id for clip in clips]
 
-        return asyncio.run(self._get_s3_audio_file_contents_async(clip_ids))
+        return asyncio.run(self._get_s3_audio_file_contents_async(
+            clip_ids, return_exceptions))
     
 
-    async def _get_s3_audio_file_contents_async(self, clip_ids):
+    async def _get_s3_audio_file_contents_async(
+            self, clip_ids, return_exceptions=False):
 
         object_keys = [
             self._get_s3_audio_file_object_key(i)
@@ -376,7 +523,8 @@ class ClipManager:
             coroutines = [
                 self._get_s3_audio_file_contents_aux(s3, object_key)
                 for object_key in object_keys]
-            return await asyncio.gather(*coroutines)
+            return await asyncio.gather(
+                *coroutines, return_exceptions=return_exceptions)
 
 
     def _get_s3_audio_file_object_key(self, i):
@@ -410,12 +558,7 @@ class ClipManager:
     def _get_audio_file_contents_aux(self, clip):
         
         try:
-
-            try:
-                return self._get_audio_file_contents_from_audio_file(clip)
-                
-            except FileNotFoundError:
-                return self._get_audio_file_contents_from_recording(clip)
+            return self._read_audio_file_contents(clip)
             
         except Exception as e:
             raise ClipManagerError(
@@ -424,7 +567,26 @@ class ClipManager:
                 f'exception. Exception message was: {e}')
             
             
+    def _read_audio_file_contents(self, clip):
+        
+        try:
+            return self._get_audio_file_contents_from_audio_file(clip)
+            
+        except FileNotFoundError:
+            return self._get_audio_file_contents_from_recording(clip)
+            
+            
     def _get_audio_file_contents_from_audio_file(self, clip):
+        
+        if self._packs_enabled:
+            
+            result = self.clip_audio_pack_store.read_samples(
+                clip.station_id, clip.date, clip.id)
+            
+            if result is not None:
+                samples, sample_rate = result
+                return _create_audio_file_contents(samples, sample_rate)
+            
         path = self.get_audio_file_path(clip)
         with open(path, 'rb') as file_:
             return file_.read()
@@ -441,6 +603,8 @@ class ClipManager:
         Deletes the audio file of the specified clip.
         
         If the audio file is not present, this method does nothing.
+        With "Packs" clip audio storage, this method deletes the clip's
+        audio from its pack as well as any audio file.
         
         Parameters
         ----------
@@ -448,6 +612,10 @@ class ClipManager:
             the clip whose audio file should be deleted.
         """
         
+        if self._packs_enabled:
+            self.clip_audio_pack_store.delete_clip(
+                clip.station_id, clip.date, clip.id)
+            
         path = self.get_audio_file_path(clip)
         os_utils.delete_file(path)
         
@@ -479,6 +647,12 @@ class ClipManager:
         
     def _create_audio_file(self, clip, samples, path=None):
         
+        if path is None and self._packs_enabled:
+            self.clip_audio_pack_store.write_samples(
+                clip.station_id, clip.date, clip.id, samples,
+                clip.sample_rate)
+            return
+        
         # Get 2-D version of `samples` for call to
         # `audio_file_utils.write_wave_file`.
         # TODO: Enhance `audio_file_utils.write_wave_file` to obviate this.
@@ -559,6 +733,20 @@ def _get_clip_id_parts(num, format_):
     return parts
     
     
+def _get_future_contents_pair(future):
+    try:
+        return future.result(), None
+    except Exception as e:
+        return None, e
+
+
+def _get_contents_pair(contents):
+    if isinstance(contents, BaseException):
+        return None, contents
+    else:
+        return contents, None
+
+
 def _get_clip_time_interval_length(clip, start_offset, length):
     
     if length is None:
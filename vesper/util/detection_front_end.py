@@ -0,0 +1,419 @@
+"""
+Module containing class `FrontEnd` and related front-end stage classes.
+
+Several detectors running on the same audio channel often perform some
+of the same computations on their input. For example, the PNF tseep and
+thrush energy detectors compute identical spectrograms, and the MPG
+Ranch tseep and thrush detectors resample their input identically. A
+`FrontEnd` allows such detectors to share these *front-end stages*, so
+that each stage is computed only once per chunk of input rather than
+once per detector.
+
+A front-end stage is a named, streaming computation on the samples of
+one audio channel. Each stage has either the channel samples or the
+output of another stage as its input. Two stages with the same name,
+settings, and input are considered equal, and a front end computes only
+one of them.
+
+A detector that supports a front end has a `set_front_end` method. The
+method adds the stages that the detector needs to the front end via its
+`add_stage` method, retaining the stages returned by that method. The
+detector's `detect` method then gets the outputs of its stages for the
+current chunk via the front end's `get_output` method rather than
+computing them itself. The code that runs the detectors must invoke the
+front end's `process` method for each chunk before invoking the `detect`
+methods of its detectors for that chunk, and the front end's
+`complete_processing` method before invoking the `complete_detection`
+methods of its detectors.
+"""
+
+
+import time
+
+import numpy as np
+import scipy.signal as signal
+
+from vesper.util.bunch import Bunch
+from vesper.util.sample_buffer import SampleBuffer
+import vesper.signal.resampling_utils as resampling_utils
+import vesper.util.time_frequency_analysis_utils as tfa_utils
+
+
+class FrontEndStage:
+
+    """
+    Front-end stage.
+
+    A front-end stage processes a sequence of consecutive inputs, which
+    are either chunks of channel samples or the outputs of another stage,
+    and produces one output for each input. A stage may retain state
+    between inputs.
+    """
+
+
+    def __init__(self, name, settings, input=None):
+
+        """
+        Initializes this stage.
+
+        Parameters
+        ----------
+        name : str
+            the name of this stage, for example `'Spectrogram'`.
+
+        settings : tuple
+            the settings of this stage. The settings must be hashable.
+
+        input : FrontEndStage or None
+            the input stage of this stage, or `None` if the input of
+            this stage is channel samples.
+        """
+
+        self._name = name
+        self._settings = settings
+        self._input = input
+
+        input_key = None if input is None else input.key
+        self._key = (name, settings, input_key)
+
+
+    @property
+    def name(self):
+        return self._name
+
+
+    @property
+    def settings(self):
+        return self._settings
+
+
+    @property
+    def input(self):
+        return self._input
+
+
+    @property
+    def key(self):
+        return self._key
+
+
+    def process(self, x):
+        raise NotImplementedError()
+
+
+    def complete_processing(self, x):
+
+        """
+        Processes the final input of this stage.
+
+        `x` is an empty array for stages whose input is channel samples.
+        By default this method simply invokes the `process` method.
+        """
+
+        return self.process(x)
+
+
+class SpectrogramStage(FrontEndStage):
+
+    """
+    Spectrogram stage.
+
+    The output of this stage for each input chunk is a two-dimensional
+    array containing the spectra of all spectrogram frames that ended in
+    the chunk. The stage retains any samples following the start of the
+    first frame that did not end in the chunk for subsequent processing.
+    """
+
+
+    def __init__(self, window_type, window_size, hop_size, dft_size):
+
+        settings = (window_type, window_size, hop_size, dft_size)
+        super().__init__('Spectrogram', settings)
+
+        self._window = signal.get_window(window_type, window_size)
+        self._hop_size = hop_size
+        self._dft_size = dft_size
+
+        self._unprocessed_samples = np.array([], dtype='float')
+
+
+    def process(self, samples):
+
+        samples = np.concatenate((self._unprocessed_samples, samples))
+
+        spectra = tfa_utils.compute_spectrogram(
+            samples, self._window, self._hop_size, self._dft_size)
+
+        num_samples_processed = len(spectra) * self._hop_size
+        self._unprocessed_samples = samples[num_samples_processed:]
+
+        return spectra
+
+
+class BandPowerStage(FrontEndStage):
+
+    """
+    Band power stage.
+
+    The input of this stage is the output of a `SpectrogramStage`, and
+    its output is the sum of the spectral values of each spectrogram
+    frame over a range of bins.
+    """
+
+
+    def __init__(self, spectrogram_stage, start_bin_num, end_bin_num):
+
+        settings = (start_bin_num, end_bin_num)
+        super().__init__('Band Power', settings, spectrogram_stage)
+
+        self._start_bin_num = start_bin_num
+        self._end_bin_num = end_bin_num
+
+
+    def process(self, spectra):
+        return spectra[:, self._start_bin_num:self._end_bin_num].sum(axis=1)
+
+
+class ResamplingStage(FrontEndStage):
+
+    """
+    Resampling stage.
+
+    This stage resamples its input to 24000 hertz in blocks of a fixed
+    size using a `vesper.signal.resampling_utils.Resampler`. The output
+    of the stage for each input chunk is a list of
+    `(block_length, resampled_samples)` pairs, one for each block that
+    was completed by the chunk. The final block, which is output by the
+    `complete_processing` method, may be shorter than the others, and
+    may even be empty.
+
+    Since the resampler keeps its state from one block to the next, the
+    concatenation of the resampled samples of all blocks is the same as
+    the result of resampling all of the input at once. Note, however,
+    that since the resampler's output lags its input slightly, the
+    resampled samples for a block are not exactly the resampled block.
+    """
+
+
+    def __init__(self, block_size, input_sample_rate):
+
+        settings = (block_size, input_sample_rate)
+        super().__init__('Resampling', settings)
+
+        self._block_size = block_size
+        self._input_sample_rate = input_sample_rate
+        self._buffer = None
+        self._resampler = resampling_utils.Resampler(input_sample_rate, 24000)
+
+
+    def process(self, samples):
+        return self._process(samples, False)
+
+
+    def complete_processing(self, samples):
+        return self._process(samples, True)
+
+
+    def _process(self, samples, process_all_samples):
+
+        if self._buffer is None:
+            self._buffer = SampleBuffer(samples.dtype)
+
+        self._buffer.write(samples)
+
+        blocks = []
+
+        while len(self._buffer) >= self._block_size:
+            block = self._buffer.read(self._block_size)
+            blocks.append((len(block), self._resampler.resample(block)))
+
+        if process_all_samples:
+            block = self._buffer.read()
+            resampled_samples = self._resampler.resample(block, flush=True)
+            blocks.append((len(block), resampled_samples))
+
+        return blocks
+
+
+class FrontEnd:
+
+    """
+    Detection front end for one audio channel.
+
+    A front end computes each of its stages once for each chunk of
+    channel samples, and makes the stage outputs available to all of
+    the detectors that use them. It also keeps statistics that estimate
+    the computation time saved by sharing stages among detectors.
+    """
+
+
+    def __init__(self):
+        self._stages = {}
+        self._stats = {}
+        self._outputs = {}
+
+
+    @property
+    def stages(self):
+        return tuple(self._stages.values())
+
+
+    def add_stage(self, stage):
+
+        """
+        Adds a stage to this front end.
+
+        If the front end already has a stage equal to the specified
+        one, the existing stage is used instead. The stage is considered
+        to be used once more each time it is added, as is each of its
+        input stages.
+
+        Returns
+        -------
+        FrontEndStage
+            the front end's stage that is equal to the specified stage.
+            The caller should use this stage rather than the specified
+            one to get stage outputs.
+        """
+
+        stage = self._get_stage(stage)
+
+        s = stage
+        while s is not None:
+            self._stats[s.key].use_count += 1
+            s = s.input
+
+        return stage
+
+
+    def _get_stage(self, stage):
+
+        existing_stage = self._stages.get(stage.key)
+
+        if existing_stage is not None:
+            return existing_stage
+
+        if stage.input is not None:
+            stage._input = self._get_stage(stage.input)
+
+        # Since a stage's input stage is always added to `self._stages`
+        # before the stage itself, the iteration order of the dictionary
+        # is a valid processing order.
+        self._stages[stage.key] = stage
+        self._stats[stage.key] = Bunch(
+            use_count=0, processing_count=0, processing_time=0)
+
+        return stage
+
+
+    def process(self, samples):
+
+        """Computes the outputs of all stages for a chunk of samples."""
+
+        self._process(samples, False)
+
+
+    def complete_processing(self):
+
+        """
+        Computes the final outputs of all stages after the `process`
+        method has been invoked for all chunks of samples.
+        """
+
+        self._process(np.array([], dtype='float'), True)
+
+
+    def _process(self, samples, final):
+
+        self._outputs = {}
+
+        for key, stage in self._stages.items():
+
+            if stage.input is None:
+                x = samples
+            else:
+                x = self._outputs[stage.input.key]
+
+            start_time = time.time()
+
+            if final:
+                output = stage.complete_processing(x)
+            else:
+                output = stage.process(x)
+
+            stats = self._stats[key]
+            stats.processing_count += 1
+            stats.processing_time += time.time() - start_time
+
+            self._outputs[key] = output
+
+
+    def get_output(self, stage):
+
+        """Gets the output of the specified stage for the current chunk."""
+
+        return self._outputs[stage.key]
+
+
+    def get_stage_stats(self):
+
+        """
+        Gets statistics for the stages of this front end.
+
+        Returns
+        -------
+        list of Bunch
+            a list of stage statistics, with one item per stage. Each
+            item has `stage_name`, `use_count`, `processing_count`,
+            `processing_time`, and `time_saved` attributes. The
+            `time_saved` attribute is the estimated processing time
+            saved by computing the stage once rather than once per use.
+        """
+
+        return [
+            Bunch(
+                stage_name=stage.name,
+                use_count=s.use_count,
+                processing_count=s.processing_count,
+                processing_time=s.processing_time,
+                time_saved=(s.use_count - 1) * s.processing_time)
+            for stage, s in (
+                (stage, self._stats[key])
+                for key, stage in self._stages.items())]
+
+
+def create_front_ends(detectors, channel_count):
+
+    """
+    Creates one front end per channel for the specified detectors.
+
+    Each detector must have a `channel_num` attribute. Detectors that
+    have a `set_front_end` method are given the front end of their
+    channel. Other detectors are left as they are.
+
+    Returns
+    -------
+    list of FrontEnd
+        the front ends, indexed by channel number.
+    """
+
+    front_ends = [FrontEnd() for _ in range(channel_count)]
+
+    for detector in detectors:
+        if hasattr(detector, 'set_front_end'):
+            detector.set_front_end(front_ends[detector.channel_num])
+
+    return front_ends
+
+
+def get_time_saved(front_ends):
+
+    """
+    Gets the estimated total processing time saved by the specified
+    front ends, in seconds.
+    """
+
+    return sum(
+        stats.time_saved
+        for front_end in front_ends
+        for stats in front_end.get_stage_stats())
@@ -1,5 +1,16 @@
-"""Provides access to the extensions of a program."""
+"""
+Provides access to the extensions of a program.
 
+The extension manager imports the module of an extension only when the
+extension's class is first requested. Its extension spec is a manifest
+that maps extension names to class paths, and nothing more: it holds no
+extension types, versions, settings, or other metadata. Such metadata
+are available only as attributes of extension classes, so getting them
+imports the modules of the extensions.
+"""
+
+
+from collections.abc import Mapping
 
 # As of Python 3.10.10, if we just do `import importlib`, then
 # `importlib` is defined (as expected) but `importlib.metadata` is not
@@ -7,12 +18,13 @@
 # Python 3.10.x). If we do `import importlib.metadata`, however, then
 # both `importlib` and `importlib.metadata` are defined.
 import importlib.metadata
+import importlib.util
 
 import itertools
 
 from django.db.models import Q
 
-from vesper.django.app.models import Processor
+from vesper.django.app.models import Processor, get_archive_metadata_version
 import vesper.birdvox.detectors as birdvox_detectors
 import vesper.django.project.settings as settings
 import vesper.util.yaml_utils as yaml_utils
@@ -22,20 +34,23 @@ import vesper.util.yaml_utils as yaml_utils
 # singleton, we make it a class rather than a module to facilitate testing.
 #
 # Note also that rather than loading extensions eagerly in the `__init__`
-# method, an `ExtensionManager` instead loads them lazily in its
-# `get_extensions` method. Loading extensions in the `__init__` method
-# would not work since we want to allow extension modules to use the
-# extension manager on import, but it is not available until after its
-# `__init__` method executes.
+# method, an `ExtensionManager` instead loads them lazily. Loading
+# extensions in the `__init__` method would not work since we want to
+# allow extension modules to use the extension manager on import, but
+# it is not available until after its `__init__` method executes.
 #
-# The `get_extensions` method also loads extensions only of the requested
-# type. This avoids loading extensions of types that are never used.
-
-# TODO: Would it be possible to load extension modules and their
-# dependencies only when they are actually used? This might be
-# accomplished by separating extension metadata from code modules and
-# only loading the code modules when they are actually needed. This
-# would help avoid unnecessary and undesirable imports in some cases.
+# The extension spec below is a static manifest that maps the name of
+# each extension of each extension point to the name of the class that
+# implements the extension. The manifest is only for lazy class import,
+# and includes no other information about extensions. The
+# `get_extensions` method returns a mapping from extension names to
+# extension classes that imports the module of an extension only when
+# the extension's class is first requested from the mapping. Thus, for
+# example, a process that runs only the Old Bird detectors never imports
+# the modules of the TensorFlow detectors, and hence never imports
+# TensorFlow. The names of the spec must match the `extension_name`
+# attributes of their classes, which is checked when the classes are
+# loaded.
 
 # TODO: Use a hierarchical name space for plugins, extension points, and
 # extensions?
@@ -45,127 +60,162 @@ def _chain(iterable):
     return itertools.chain.from_iterable(iterable)
         
 
-if settings.VESPER_INCLUDE_TENSORFLOW_PROCESSORS:
+_TENSORFLOW_DISTRIBUTION_NAMES = (
+    'tensorflow', 'tensorflow-cpu', 'tensorflow-gpu', 'tensorflow-intel',
+    'tensorflow-macos')
+"""Names of distribution packages that provide the `tensorflow` package."""
 
+
+def _get_tensorflow_major_version():
+    
+    """
+    Gets the major version number of TensorFlow.
+    
+    Returns `None` if TensorFlow is not installed.
+    
+    We get the version from distribution package metadata when we can,
+    since importing TensorFlow takes several seconds.
+    """
+    
+    if importlib.util.find_spec('tensorflow') is None:
+        return None
+    
+    for name in _TENSORFLOW_DISTRIBUTION_NAMES:
+        try:
+            version = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            continue
+        return int(version.split('.')[0])
+    
+    # If we get here, TensorFlow is installed but we could not find its
+    # distribution package metadata, so we fall back on importing it.
     import tensorflow as tf
+    return int(tf.__version__.split('.')[0])
+
+
+if settings.VESPER_INCLUDE_TENSORFLOW_PROCESSORS:
+    _TF_VERSION = _get_tensorflow_major_version()
+else:
+    _TF_VERSION = None
 
-    _TF_VERSION = int(tf.__version__.split('.')[0])
+
+if _TF_VERSION is not None:
 
     _TF1_CLASSIFIERS = '''
-    - vesper.mpg_ranch.nfc_coarse_classifier_2_1.classifier.Classifier
-    - vesper.mpg_ranch.nfc_coarse_classifier_3_0.classifier.Classifier
-    - vesper.mpg_ranch.nfc_coarse_classifier_4_0.classifier.Classifier
+    MPG Ranch NFC Coarse Classifier 2.1: vesper.mpg_ranch.nfc_coarse_classifier_2_1.classifier.Classifier
+    MPG Ranch NFC Coarse Classifier 3.0: vesper.mpg_ranch.nfc_coarse_classifier_3_0.classifier.Classifier
+    MPG Ranch NFC Coarse Classifier 4.0: vesper.mpg_ranch.nfc_coarse_classifier_4_0.classifier.Classifier
 '''
 
     _TF1_DETECTORS = '''
 
     # MPG Ranch Thrush Detector 0.0
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector40
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector50
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector60
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector70
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector80
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector90
+    MPG Ranch Thrush Detector 0.0: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector
+    MPG Ranch Thrush Detector 0.0 40: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector40
+    MPG Ranch Thrush Detector 0.0 50: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector50
+    MPG Ranch Thrush Detector 0.0 60: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector60
+    MPG Ranch Thrush Detector 0.0 70: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector70
+    MPG Ranch Thrush Detector 0.0 80: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector80
+    MPG Ranch Thrush Detector 0.0 90: vesper.mpg_ranch.nfc_detector_0_0.detector.ThrushDetector90
     
     # MPG Ranch Tseep Detector 0.0
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector40
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector50
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector60
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector70
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector80
-    - vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector90
+    MPG Ranch Tseep Detector 0.0: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector
+    MPG Ranch Tseep Detector 0.0 40: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector40
+    MPG Ranch Tseep Detector 0.0 50: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector50
+    MPG Ranch Tseep Detector 0.0 60: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector60
+    MPG Ranch Tseep Detector 0.0 70: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector70
+    MPG Ranch Tseep Detector 0.0 80: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector80
+    MPG Ranch Tseep Detector 0.0 90: vesper.mpg_ranch.nfc_detector_0_0.detector.TseepDetector90
     
     # MPG Ranch Thrush Detector 0.1
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector40
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector50
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector60
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector70
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector80
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector90
+    MPG Ranch Thrush Detector 0.1: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector
+    MPG Ranch Thrush Detector 0.1 40: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector40
+    MPG Ranch Thrush Detector 0.1 50: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector50
+    MPG Ranch Thrush Detector 0.1 60: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector60
+    MPG Ranch Thrush Detector 0.1 70: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector70
+    MPG Ranch Thrush Detector 0.1 80: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector80
+    MPG Ranch Thrush Detector 0.1 90: vesper.mpg_ranch.nfc_detector_0_1.detector.ThrushDetector90
     
     # MPG Ranch Tseep Detector 0.1
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector40
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector50
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector60
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector70
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector80
-    - vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector90
+    MPG Ranch Tseep Detector 0.1: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector
+    MPG Ranch Tseep Detector 0.1 40: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector40
+    MPG Ranch Tseep Detector 0.1 50: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector50
+    MPG Ranch Tseep Detector 0.1 60: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector60
+    MPG Ranch Tseep Detector 0.1 70: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector70
+    MPG Ranch Tseep Detector 0.1 80: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector80
+    MPG Ranch Tseep Detector 0.1 90: vesper.mpg_ranch.nfc_detector_0_1.detector.TseepDetector90
     
     # MPG Ranch Thrush Detector 1.0
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector20
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector30
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector40
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector50
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector60
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector70
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector80
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector90
+    MPG Ranch Thrush Detector 1.0: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector
+    MPG Ranch Thrush Detector 1.0 20: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector20
+    MPG Ranch Thrush Detector 1.0 30: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector30
+    MPG Ranch Thrush Detector 1.0 40: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector40
+    MPG Ranch Thrush Detector 1.0 50: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector50
+    MPG Ranch Thrush Detector 1.0 60: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector60
+    MPG Ranch Thrush Detector 1.0 70: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector70
+    MPG Ranch Thrush Detector 1.0 80: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector80
+    MPG Ranch Thrush Detector 1.0 90: vesper.mpg_ranch.nfc_detector_1_0.detector.ThrushDetector90
     
     # MPG Ranch Tseep Detector 1.0
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector20
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector30
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector40
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector50
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector60
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector70
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector80
-    - vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector90
+    MPG Ranch Tseep Detector 1.0: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector
+    MPG Ranch Tseep Detector 1.0 20: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector20
+    MPG Ranch Tseep Detector 1.0 30: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector30
+    MPG Ranch Tseep Detector 1.0 40: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector40
+    MPG Ranch Tseep Detector 1.0 50: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector50
+    MPG Ranch Tseep Detector 1.0 60: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector60
+    MPG Ranch Tseep Detector 1.0 70: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector70
+    MPG Ranch Tseep Detector 1.0 80: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector80
+    MPG Ranch Tseep Detector 1.0 90: vesper.mpg_ranch.nfc_detector_1_0.detector.TseepDetector90
 
 '''
 
     _TF2_CLASSIFIERS = '''
 
     # MPG Ranch
-    - vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.annotator.Annotator
-    - vesper.mpg_ranch.nfc_coarse_classifier_3_1.classifier.Classifier
-    - vesper.mpg_ranch.nfc_coarse_classifier_4_1.classifier.Classifier
+    MPG Ranch NFC Bounding Interval Annotator 1.0: vesper.mpg_ranch.nfc_bounding_interval_annotator_1_0.annotator.Annotator
+    MPG Ranch NFC Coarse Classifier 3.1: vesper.mpg_ranch.nfc_coarse_classifier_3_1.classifier.Classifier
+    MPG Ranch NFC Coarse Classifier 4.1: vesper.mpg_ranch.nfc_coarse_classifier_4_1.classifier.Classifier
     
     # PSW
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier10
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier20
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier30
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier40
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier50
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier60
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier70
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier80
-    - vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier90
+    PSW NOGO Coarse Classifier 0.0 10: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier10
+    PSW NOGO Coarse Classifier 0.0 20: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier20
+    PSW NOGO Coarse Classifier 0.0 30: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier30
+    PSW NOGO Coarse Classifier 0.0 40: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier40
+    PSW NOGO Coarse Classifier 0.0 50: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier50
+    PSW NOGO Coarse Classifier 0.0 60: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier60
+    PSW NOGO Coarse Classifier 0.0 70: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier70
+    PSW NOGO Coarse Classifier 0.0 80: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier80
+    PSW NOGO Coarse Classifier 0.0 90: vesper.psw.nogo_coarse_classifier_0_0.classifier.Classifier90
     
 '''
 
     _TF2_DETECTORS = '''
 
     # MPG Ranch Thrush Detector 1.1
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector20
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector30
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector40
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector50
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector60
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector70
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector70_25
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector70_12
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector80
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector90
+    MPG Ranch Thrush Detector 1.1: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector
+    MPG Ranch Thrush Detector 1.1 20: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector20
+    MPG Ranch Thrush Detector 1.1 30: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector30
+    MPG Ranch Thrush Detector 1.1 40: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector40
+    MPG Ranch Thrush Detector 1.1 50: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector50
+    MPG Ranch Thrush Detector 1.1 60: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector60
+    MPG Ranch Thrush Detector 1.1 70: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector70
+    MPG Ranch Thrush Detector 1.1 70 25: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector70_25
+    MPG Ranch Thrush Detector 1.1 70 12.5: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector70_12
+    MPG Ranch Thrush Detector 1.1 80: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector80
+    MPG Ranch Thrush Detector 1.1 90: vesper.mpg_ranch.nfc_detector_1_1.detector.ThrushDetector90
     
     # MPG Ranch Tseep Detector 1.1
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector20
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector30
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector40
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector50
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector60
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector60_25
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector60_12
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector70
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector80
-    - vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector90
+    MPG Ranch Tseep Detector 1.1: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector
+    MPG Ranch Tseep Detector 1.1 20: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector20
+    MPG Ranch Tseep Detector 1.1 30: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector30
+    MPG Ranch Tseep Detector 1.1 40: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector40
+    MPG Ranch Tseep Detector 1.1 50: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector50
+    MPG Ranch Tseep Detector 1.1 60: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector60
+    MPG Ranch Tseep Detector 1.1 60 25: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector60_25
+    MPG Ranch Tseep Detector 1.1 60 12.5: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector60_12
+    MPG Ranch Tseep Detector 1.1 70: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector70
+    MPG Ranch Tseep Detector 1.1 80: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector80
+    MPG Ranch Tseep Detector 1.1 90: vesper.mpg_ranch.nfc_detector_1_1.detector.TseepDetector90
 
 '''
 
@@ -177,7 +227,7 @@ if settings.VESPER_INCLUDE_TENSORFLOW_PROCESSORS:
         _TF_DETECTORS = _TF2_DETECTORS
 
 else:
-    # don't include TensorFlow processors.
+    # don't include TensorFlow processors
 
     _TF_CLASSIFIERS = ''
     _TF_DETECTORS = ''
@@ -189,74 +239,84 @@ Classifier:
 
 {_TF_CLASSIFIERS}
 
-    - vesper.mpg_ranch.nfc_detector_low_score_classifier_1_0.classifier.Classifier
-    - vesper.mpg_ranch.outside_classifier.OutsideClassifier
-    - vesper.old_bird.lighthouse_outside_classifier.LighthouseOutsideClassifier
+    MPG Ranch NFC Detector Low Score Classifier 1.0: vesper.mpg_ranch.nfc_detector_low_score_classifier_1_0.classifier.Classifier
+    MPG Ranch Outside Classifier 1.1: vesper.mpg_ranch.outside_classifier.OutsideClassifier
+    Lighthouse Outside Classifier 1.1: vesper.old_bird.lighthouse_outside_classifier.LighthouseOutsideClassifier
     
 Command:
-    - vesper.command.add_recording_audio_files_command.AddRecordingAudioFilesCommand
-    - vesper.command.classify_command.ClassifyCommand
-    - vesper.command.create_clip_audio_files_command.CreateClipAudioFilesCommand
-    - vesper.command.create_random_clips_command.CreateRandomClipsCommand
-    - vesper.command.delete_clip_audio_files_command.DeleteClipAudioFilesCommand
-    - vesper.command.delete_clips_command.DeleteClipsCommand
-    - vesper.command.delete_recordings_command.DeleteRecordingsCommand
-    - vesper.command.detect_command.DetectCommand
-    - vesper.command.execute_deferred_actions_command.ExecuteDeferredActionsCommand
-    - vesper.command.export_clip_counts_by_classification_to_csv_file_command.ExportClipCountsByClassificationToCsvFileCommand
-    - vesper.command.export_clip_counts_by_tag_to_csv_file_command.ExportClipCountsByTagToCsvFileCommand
-    - vesper.command.export_command.ExportCommand
-    - vesper.command.import_command.ImportCommand
-    - vesper.command.refresh_recording_audio_file_paths_command.RefreshRecordingAudioFilePathsCommand
-    - vesper.command.tag_clips_command.TagClipsCommand
-    - vesper.command.test_command.TestCommand
-    - vesper.command.transfer_clip_classifications_command.TransferClipClassificationsCommand
-    - vesper.command.untag_clips_command.UntagClipsCommand
-    - vesper.old_bird.add_old_bird_clip_start_indices_command.AddOldBirdClipStartIndicesCommand
+    add_recording_audio_files: vesper.command.add_recording_audio_files_command.AddRecordingAudioFilesCommand
+    classify: vesper.command.classify_command.ClassifyCommand
+    compact_clip_audio_packs: vesper.command.compact_clip_audio_packs_command.CompactClipAudioPacksCommand
+    create_clip_audio_files: vesper.command.create_clip_audio_files_command.CreateClipAudioFilesCommand
+    create_random_clips: vesper.command.create_random_clips_command.CreateRandomClipsCommand
+    delete_clip_audio_files: vesper.command.delete_clip_audio_files_command.DeleteClipAudioFilesCommand
+    delete_clips: vesper.command.delete_clips_command.DeleteClipsCommand
+    delete_recordings: vesper.command.delete_recordings_command.DeleteRecordingsCommand
+    detect: vesper.command.detect_command.DetectCommand
+    execute_deferred_actions: vesper.command.execute_deferred_actions_command.ExecuteDeferredActionsCommand
+    export_clip_counts_by_classification_to_csv_file: vesper.command.export_clip_counts_by_classification_to_csv_file_command.ExportClipCountsByClassificationToCsvFileCommand
+    export_clip_counts_by_tag_to_csv_file: vesper.command.export_clip_counts_by_tag_to_csv_file_command.ExportClipCountsByTagToCsvFileCommand
+    export: vesper.command.export_command.ExportCommand
+    import: vesper.command.import_command.ImportCommand
+    migrate_clip_audio_files: vesper.command.migrate_clip_audio_files_command.MigrateClipAudioFilesCommand
+    rebuild_clip_counts: vesper.command.rebuild_clip_counts_command.RebuildClipCountsCommand
+    refresh_recording_audio_file_paths: vesper.command.refresh_recording_audio_file_paths_command.RefreshRecordingAudioFilePathsCommand
+    tag_clips: vesper.command.tag_clips_command.TagClipsCommand
+    test: vesper.command.test_command.TestCommand
+    transfer_clip_classifications: vesper.command.transfer_clip_classifications_command.TransferClipClassificationsCommand
+    untag_clips: vesper.command.untag_clips_command.UntagClipsCommand
+    add_old_bird_clip_start_indices: vesper.old_bird.add_old_bird_clip_start_indices_command.AddOldBirdClipStartIndicesCommand
     
 Detector:
 
 {_TF_DETECTORS}
 
     # Old Bird redux detectors 1.0
-    - vesper.old_bird.old_bird_detector_redux_1_0.ThrushDetector
-    - vesper.old_bird.old_bird_detector_redux_1_0.TseepDetector
+    Old Bird Thrush Detector Redux 1.0: vesper.old_bird.old_bird_detector_redux_1_0.ThrushDetector
+    Old Bird Tseep Detector Redux 1.0: vesper.old_bird.old_bird_detector_redux_1_0.TseepDetector
     
     # Old Bird redux detectors 1.1
-    - vesper.old_bird.old_bird_detector_redux_1_1.ThrushDetector
-    - vesper.old_bird.old_bird_detector_redux_1_1.TseepDetector
+    Old Bird Thrush Detector Redux 1.1: vesper.old_bird.old_bird_detector_redux_1_1.ThrushDetector
+    Old Bird Tseep Detector Redux 1.1: vesper.old_bird.old_bird_detector_redux_1_1.TseepDetector
     
     # Pacific Southwest (PSW) Research Station detectors
-    - vesper.psw.nogo_detector_0_0.detector.Detector
+    PSW NOGO Detector 0.0: vesper.psw.nogo_detector_0_0.detector.Detector
     
 Exporter:
-    - vesper.command.clip_audio_file_exporter.ClipAudioFileExporter
-    - vesper.command.clip_hdf5_file_exporter.ClipHdf5FileExporter
-    - vesper.command.clip_metadata_csv_file_exporter.ClipMetadataCsvFileExporter
+    Clip Audio File Exporter: vesper.command.clip_audio_file_exporter.ClipAudioFileExporter
+    Clip HDF5 File Exporter: vesper.command.clip_hdf5_file_exporter.ClipHdf5FileExporter
+    Clip Metadata CSV File Exporter: vesper.command.clip_metadata_csv_file_exporter.ClipMetadataCsvFileExporter
     
 Importer:
-    - vesper.command.metadata_importer.MetadataImporter
-    - vesper.command.recording_importer.RecordingImporter
-    - vesper.old_bird.clip_importer.ClipImporter
+    Metadata Importer: vesper.command.metadata_importer.MetadataImporter
+    Recording Importer: vesper.command.recording_importer.RecordingImporter
+    Old Bird Clip Importer: vesper.old_bird.clip_importer.ClipImporter
 
 Preset:
-    - vesper.command.clip_audio_file_export_settings_preset.ClipAudioFileExportSettingsPreset
-    - vesper.command.clip_hdf5_file_export_settings_preset.ClipHdf5FileExportSettingsPreset
-    - vesper.command.clip_table_format_preset.ClipTableFormatPreset
-    - vesper.command.detection_schedule_preset.DetectionSchedulePreset
-    - vesper.command.station_name_aliases_preset.StationNameAliasesPreset
-    - vesper.django.app.clip_album_commands_preset.ClipAlbumCommandsPreset
-    - vesper.django.app.clip_album_settings_preset.ClipAlbumSettingsPreset
+    Clip Audio File Export Settings: vesper.command.clip_audio_file_export_settings_preset.ClipAudioFileExportSettingsPreset
+    Clip HDF5 File Export Settings: vesper.command.clip_hdf5_file_export_settings_preset.ClipHdf5FileExportSettingsPreset
+    Clip Table Format: vesper.command.clip_table_format_preset.ClipTableFormatPreset
+    Detection Schedule: vesper.command.detection_schedule_preset.DetectionSchedulePreset
+    Station Name Aliases: vesper.command.station_name_aliases_preset.StationNameAliasesPreset
+    Clip Album Commands: vesper.django.app.clip_album_commands_preset.ClipAlbumCommandsPreset
+    Clip Album Settings: vesper.django.app.clip_album_settings_preset.ClipAlbumSettingsPreset
     
 Recording File Parser:
-    - vesper.mpg_ranch.recording_file_parser.RecordingFileParser
+    MPG Ranch Recording File Parser: vesper.mpg_ranch.recording_file_parser.RecordingFileParser
     
 Clip File Name Formatter:
-    - vesper.command.clip_audio_file_exporter.SimpleClipFileNameFormatter
+    Simple Clip File Name Formatter: vesper.command.clip_audio_file_exporter.SimpleClipFileNameFormatter
     
 '''
 
 
+_ARCHIVE_EXTENSION_POINT_NAME = 'Detector'
+"""
+Name of the extension point with extensions derived from the archive
+database.
+"""
+
+
 class ExtensionManager:
     
     
@@ -270,9 +330,23 @@ class ExtensionManager:
         extension_point_names = sorted(self._extension_spec.keys())
         self._extensions = dict((name, None) for name in extension_point_names)
         
+        # Archive metadata version from which the extensions that are
+        # derived from the archive database were loaded.
+        self._archive_metadata_version = None
+        
         
     def get_extensions(self, extension_point_name):
         
+        """
+        Gets the extensions of the specified extension point.
+        
+        Returns a read-only mapping from extension names to extension
+        classes. The module of an extension class is imported only when
+        the class is first requested from the mapping, so getting the
+        names of extensions (e.g. via the mapping's `keys` method) does
+        not import any extension modules.
+        """
+        
         try:
             extensions = self._extensions[extension_point_name]
         except KeyError:
@@ -286,15 +360,46 @@ class ExtensionManager:
             self._extensions[extension_point_name] = extensions
             # self._show_loaded_extensions(extension_point_name)
             
-        return dict((e.extension_name, e) for e in extensions)
+        return extensions
     
     
+    def refresh_archive_extensions(self):
+        
+        """
+        Unloads the extensions that are derived from the archive
+        database if the database has changed since they were loaded.
+        
+        Some detector extensions are created according to the detectors
+        of the archive database. A long-running process, like a job
+        worker, should call this method before it uses extensions, so
+        that it sees detectors created since the extensions were
+        loaded. The extensions are reloaded when they are next
+        requested.
+        """
+        
+        if self._extensions.get(_ARCHIVE_EXTENSION_POINT_NAME) is None:
+            # extensions not loaded
+            
+            return
+        
+        version = self._archive_metadata_version
+        
+        if version is None or version != get_archive_metadata_version():
+            self._extensions[_ARCHIVE_EXTENSION_POINT_NAME] = None
+            birdvox_detectors.unload_detector_classes()
+            
+            
     def _load_extensions(self, extension_point_name):
         
-        module_class_names = self._extension_spec[extension_point_name]
-        extensions = [_load_extension(name) for name in module_class_names]
+        class_names = self._extension_spec[extension_point_name] or {}
+        classes = []
         
-        if extension_point_name == 'Detector':
+        if extension_point_name == _ARCHIVE_EXTENSION_POINT_NAME:
+            
+            # Get version before reading detectors so that if detectors
+            # change while we read them the extensions will be
+            # refreshed again.
+            self._archive_metadata_version = get_archive_metadata_version()
             
             # Load BirdVoxDetect detector extensions. These classes
             # are created dynamically according to the detectors
@@ -304,11 +409,11 @@ class ExtensionManager:
             # need no special knowledge to get BirdVox detectors, but
             # rather will discover them at load time just like all
             # other plugins.
-            extensions += birdvox_detectors.get_detector_classes()
+            classes += birdvox_detectors.get_detector_classes()
 
-            extensions += self._get_detector_provider_detector_classes()
+            classes += self._get_detector_provider_detector_classes()
             
-        return extensions
+        return _ExtensionMapping(class_names, classes)
     
     
     def _get_detector_provider_detector_classes(self):
@@ -366,10 +471,75 @@ class ExtensionManager:
     def _show_loaded_extensions(self, extension_point_name):
         print(f'Loaded "{extension_point_name}" extensions:')
         extensions = self._extensions[extension_point_name]
-        names = sorted(e.extension_name for e in extensions)
-        for name in names:
+        for name in sorted(extensions.keys()):
             print(f'    {name}')
                 
+
+class _ExtensionMapping(Mapping):
+    
+    """
+    Mapping from extension names to extension classes.
+    
+    The mapping imports the module of an extension class only when the
+    class is first requested.
+    """
+    
+    
+    def __init__(self, class_names, classes=()):
+        
+        self._class_names = class_names
+        """Mapping from extension names to extension class names."""
+        
+        self._classes = dict((c.extension_name, c) for c in classes)
+        """Mapping from extension names to loaded extension classes."""
+        
+        self._extension_names = tuple(
+            itertools.chain(
+                class_names.keys(),
+                (n for n in self._classes.keys() if n not in class_names)))
+        
+        
+    def __getitem__(self, extension_name):
+        
+        try:
+            return self._classes[extension_name]
+        
+        except KeyError:
+            # class not yet loaded
+            
+            # Raises `KeyError` if extension name is not recognized.
+            class_name = self._class_names[extension_name]
+            
+            cls = _load_extension(class_name)
+            
+            if cls.extension_name != extension_name:
+                raise ValueError(
+                    f'Extension class "{class_name}" has extension name '
+                    f'"{cls.extension_name}" rather than the name '
+                    f'"{extension_name}" given for it in the extension '
+                    f'spec.')
+            
+            self._classes[extension_name] = cls
+            
+            return cls
+    
+    
+    def __iter__(self):
+        return iter(self._extension_names)
+    
+    
+    def __len__(self):
+        return len(self._extension_names)
+    
+    
+    def __contains__(self, extension_name):
+        
+        # We override this method since the inherited one calls
+        # `__getitem__`, which would load the extension's module.
+        
+        return extension_name in self._class_names or \
+            extension_name in self._classes
+    
     
 def _load_extension(module_class_name):
     module_name, class_name = module_class_name.rsplit('.', 1)
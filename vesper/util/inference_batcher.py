@@ -0,0 +1,354 @@
+"""
+Module containing class `InferenceBatcher`.
+
+A neural network detector scores a sequence of overlapping *analysis
+records* of its input, each a fixed number of samples long. Scoring the
+records of each chunk of each channel separately for each detector
+leaves most of a CPU idle and pays the per-invocation overhead of the
+scoring model many times. An `InferenceBatcher` instead collects the
+records that detectors submit for all channels, detectors, and
+consecutive input chunks, and scores them in large batches of a fixed
+size. It also scores records only once when several detectors submit
+the same records for scoring with the same model, for example detectors
+that differ only in their thresholds, sharing the scores among them.
+
+A detector that supports an inference batcher has a
+`set_inference_batcher` method. Rather than scoring records itself,
+the detector submits them to the batcher via the batcher's `score`
+method, along with a *score function* that scores a batch of records
+and a callback that the batcher invokes with the scores. The batcher
+invokes callbacks in the order in which their requests were submitted,
+and a detector can use the batcher's `call` method to have the batcher
+invoke other callbacks in that order, too, for example to complete
+processing after it has been notified of all of its scores.
+
+The code that runs the detectors must invoke the batcher's `process`
+method after invoking the `detect` methods of its detectors for each
+chunk of input, and the batcher's `complete_processing` method after
+invoking the `complete_detection` methods of its detectors. The
+`process` method scores as many full batches of records as possible,
+leaving any remaining records to be scored with records submitted
+later, and the `complete_processing` method scores all remaining
+records.
+"""
+
+
+from collections import deque
+import time
+
+import numpy as np
+
+from vesper.util.bunch import Bunch
+
+
+_DEFAULT_BATCH_SIZE = 1024
+"""Default inference batch size, in records."""
+
+
+class InferenceBatcher:
+
+    """
+    Batches the analysis records of detectors for scoring.
+
+    See the module docstring for more about inference batchers.
+    """
+
+
+    def __init__(self, batch_size=_DEFAULT_BATCH_SIZE):
+
+        if batch_size <= 0:
+            raise ValueError('Batch size must be positive.')
+
+        self._batch_size = batch_size
+
+        # Pending requests and callbacks, in the order they were
+        # submitted.
+        self._queue = deque()
+
+        # Mapping from `(score_function, record_size)` pairs to deques
+        # of requests with unscored records.
+        self._unscored_requests = {}
+
+        # Requests submitted since the last invocation of `process`
+        # or `complete_processing`, with which subsequent requests for
+        # the same records can share scores.
+        self._recent_requests = []
+
+        self._record_count = 0
+        self._shared_record_count = 0
+        self._batch_count = 0
+        self._scoring_time = 0
+
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+
+    def score(self, score, samples, record_size, hop_size, callback):
+
+        """
+        Submits analysis records for scoring.
+
+        Parameters
+        ----------
+        score : function
+            a function that scores a batch of records. The function
+            must accept a two-dimensional `float32` NumPy array with one
+            record per row and return a one-dimensional array with one
+            score per record. The batcher always passes arrays with
+            `batch_size` rows to the function, padding the final batch
+            of records with zeros if needed.
+
+        samples : NumPy array
+            the samples from which to extract records. The samples must
+            not be modified until the callback has been invoked.
+
+        record_size : int
+            the record size, in samples.
+
+        hop_size : int
+            the record hop size, in samples.
+
+        callback : function
+            a function of one argument that the batcher will invoke
+            with a one-dimensional NumPy array of the record scores.
+        """
+
+        if record_size <= 0:
+            raise ValueError('Record size must be positive.')
+
+        elif hop_size <= 0:
+            raise ValueError('Hop size must be positive.')
+
+        if len(samples) < record_size:
+            record_count = 0
+        else:
+            record_count = (len(samples) - record_size) // hop_size + 1
+
+        request = Bunch(
+            score=score,
+            samples=samples,
+            record_size=record_size,
+            hop_size=hop_size,
+            record_count=record_count,
+            scored_record_count=0,
+            scores=np.zeros(record_count, dtype='float32'),
+            source=None,
+            callback=callback)
+
+        self._record_count += record_count
+
+        source = self._find_request_with_same_records(request)
+
+        if source is not None:
+            # can share scores with earlier request
+
+            request.source = source
+            self._shared_record_count += record_count
+
+        elif record_count != 0:
+            # need to score records
+
+            key = (score, record_size)
+            requests = self._unscored_requests.get(key)
+            if requests is None:
+                requests = deque()
+                self._unscored_requests[key] = requests
+            requests.append(request)
+
+        self._recent_requests.append(request)
+        self._queue.append(request)
+
+
+    def _find_request_with_same_records(self, request):
+
+        for r in self._recent_requests:
+
+            if r.source is None and r.score is request.score and \
+                    r.record_size == request.record_size and \
+                    r.hop_size == request.hop_size and \
+                    _arrays_equal(r.samples, request.samples):
+
+                return r
+
+        return None
+
+
+    def call(self, callback):
+
+        """
+        Submits a callback.
+
+        The batcher will invoke the callback, with no arguments, after
+        the callbacks of all previously submitted requests.
+        """
+
+        self._queue.append(Bunch(callback=callback))
+
+
+    def process(self):
+
+        """
+        Scores as many full batches of submitted records as possible,
+        and invokes the callbacks of completed requests.
+        """
+
+        self._process(False)
+
+
+    def complete_processing(self):
+
+        """
+        Scores all submitted records, and invokes all pending callbacks.
+        """
+
+        self._process(True)
+
+
+    def _process(self, final):
+
+        for (score, record_size), requests in \
+                self._unscored_requests.items():
+
+            unscored_count = sum(
+                r.record_count - r.scored_record_count for r in requests)
+
+            while unscored_count >= self._batch_size or \
+                    (final and unscored_count != 0):
+
+                unscored_count -= self._score_batch(
+                    score, record_size, requests)
+
+        self._recent_requests = []
+
+        self._invoke_callbacks()
+
+
+    def _score_batch(self, score, record_size, requests):
+
+        batch = np.zeros((self._batch_size, record_size), dtype='float32')
+        segments = []
+
+        # Fill batch with records of requests.
+        batch_record_count = 0
+        while batch_record_count != self._batch_size and len(requests) != 0:
+
+            request = requests[0]
+
+            start = request.scored_record_count
+            count = min(
+                request.record_count - start,
+                self._batch_size - batch_record_count)
+            end = start + count
+
+            records = _get_analysis_records(
+                request.samples, record_size, request.hop_size)
+            batch[batch_record_count:batch_record_count + count] = \
+                records[start:end]
+
+            segments.append((request, start, end, batch_record_count))
+
+            batch_record_count += count
+            request.scored_record_count = end
+
+            if end == request.record_count:
+                requests.popleft()
+
+        start_time = time.time()
+        scores = score(batch)
+        self._scoring_time += time.time() - start_time
+        self._batch_count += 1
+
+        # Route scores to requests.
+        for request, start, end, i in segments:
+            request.scores[start:end] = scores[i:i + end - start]
+
+        return batch_record_count
+
+
+    def _invoke_callbacks(self):
+
+        while len(self._queue) != 0:
+
+            item = self._queue[0]
+
+            if 'score' not in item:
+                # callback
+
+                self._queue.popleft()
+                item.callback()
+
+            else:
+                # request
+
+                source = item if item.source is None else item.source
+
+                if source.scored_record_count != source.record_count:
+                    # request not yet complete
+
+                    break
+
+                self._queue.popleft()
+                item.callback(source.scores)
+
+
+    def get_stats(self):
+
+        """
+        Gets statistics for this batcher.
+
+        Returns
+        -------
+        Bunch
+            statistics with `record_count`, `shared_record_count`,
+            `batch_count`, `batch_size`, and `scoring_time` attributes.
+            `record_count` is the total number of records submitted for
+            scoring, including `shared_record_count` records whose
+            scores were shared with other requests rather than computed.
+            `scoring_time` is the total time spent in score functions,
+            in seconds.
+        """
+
+        return Bunch(
+            record_count=self._record_count,
+            shared_record_count=self._shared_record_count,
+            batch_count=self._batch_count,
+            batch_size=self._batch_size,
+            scoring_time=self._scoring_time)
+
+
+def _arrays_equal(a, b):
+    return a is b or (
+        a.shape == b.shape and a.dtype == b.dtype and np.array_equal(a, b))
+
+
+def _get_analysis_records(samples, record_size, hop_size):
+
+    # This returns a read-only view of the samples, without copying them.
+    windows = np.lib.stride_tricks.sliding_window_view(samples, record_size)
+    return windows[::hop_size]
+
+
+
+def create_inference_batcher(detectors):
+
+    """
+    Creates an inference batcher for the specified detectors.
+
+    Detectors that have a `set_inference_batcher` method are given the
+    batcher. Other detectors are left as they are.
+
+    Returns
+    -------
+    InferenceBatcher
+        the inference batcher.
+    """
+
+    batcher = InferenceBatcher()
+
+    for detector in detectors:
+        if hasattr(detector, 'set_inference_batcher'):
+            detector.set_inference_batcher(batcher)
+
+    return batcher
@@ -45,6 +45,16 @@ class LruCache(OrderedDict):
         
         return value
     
+    
+    def get(self, key, default=None):
+        
+        # `OrderedDict.get` does not call `__getitem__`, so we override
+        # it to make it mark the item as most recently used, too.
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
 
     def __setitem__(self, key, value):
         
@@ -0,0 +1,259 @@
+"""Module containing class `ModelRegistry`."""
+
+
+from pathlib import Path
+from threading import Lock
+import hashlib
+import json
+import logging
+import os
+import time
+
+from vesper.util.bunch import Bunch
+from vesper.util.settings import Settings
+import vesper.util.text_utils as text_utils
+
+
+_MODEL = 'model'
+_SETTINGS = 'settings'
+
+
+class ModelRegistry:
+
+    """
+    Process-wide registry of machine learning models and their settings.
+
+    A model registry loads each model and settings file that it is asked
+    for at most once per process, and hands out the already-loaded model
+    or settings to subsequent requesters. A detection job, for example,
+    creates new detectors for every channel of every recording file
+    interval that it processes, and a detector that gets its model from
+    a registry loads the model only for the first of those intervals
+    rather than for every one of them.
+
+    A registry keys models by model file path and settings hash, where
+    the settings are those with which a model is used. A registry keys
+    settings by settings file path. Paths are resolved before they are
+    used as keys, so different paths to the same file yield the same
+    model or settings.
+
+    The models and settings that a registry hands out are shared by all
+    of their requesters, who must not modify them.
+
+    A registry keeps load and request statistics for each of its models
+    and settings, and can log them with its `log_stats` method.
+
+    A registry is safe to use from multiple threads. It loads at most
+    one model or settings file at a time. A registry that is used in a
+    child process forked from the process in which it was last used
+    starts afresh in the child, since the child must load its own
+    copies of models for them to work reliably.
+    """
+
+
+    def __init__(self):
+        self._lock = Lock()
+        self._clear()
+
+
+    def _clear(self):
+        self._process_id = os.getpid()
+        self._items = {}
+        self._stats = {}
+
+
+    def get_model(self, path, settings=None, load_model=None):
+
+        """
+        Gets a model from this registry, loading it if needed.
+
+        Parameters:
+
+            path : `str` or `pathlib.Path`
+                the path of the model's file or directory.
+
+            settings : `vesper.util.settings.Settings` or `None`
+                the settings with which the model will be used. The
+                registry loads a model for each distinct combination
+                of path and settings.
+
+            load_model : function or `None`
+                a function of a single `pathlib.Path` argument that
+                loads a model. If `None`, the registry loads a Keras
+                model with `tf.keras.models.load_model`.
+
+        Returns:
+            the requested model.
+        """
+
+        if load_model is None:
+            load_model = _load_keras_model
+
+        path = Path(path)
+        key = (_MODEL, _get_path_key(path), _get_settings_hash(settings))
+        return self._get_item(key, path, load_model)
+
+
+    def get_settings(self, path):
+
+        """
+        Gets settings from this registry, loading them if needed.
+
+        Parameters:
+
+            path : `str` or `pathlib.Path`
+                the path of a YAML settings file.
+
+        Returns:
+            the requested settings, a `vesper.util.settings.Settings`.
+        """
+
+        path = Path(path)
+        key = (_SETTINGS, _get_path_key(path), None)
+        return self._get_item(key, path, Settings.create_from_yaml_file)
+
+
+    def _get_item(self, key, path, load):
+
+        with self._lock:
+
+            if os.getpid() != self._process_id:
+                # in child process forked from process in which registry
+                # was last used
+
+                self._clear()
+
+            stats = self._stats.get(key)
+
+            if stats is None:
+                stats = Bunch(
+                    kind=key[0], path=key[1], load_count=0, load_time=0,
+                    request_count=0)
+                self._stats[key] = stats
+
+            stats.request_count += 1
+
+            try:
+                return self._items[key]
+
+            except KeyError:
+                # item not yet loaded
+
+                kind = key[0]
+                logging.info(f'Loading {kind} from "{path}"...')
+
+                start_time = time.time()
+                item = load(path)
+                stats.load_time += time.time() - start_time
+                stats.load_count += 1
+
+                self._items[key] = item
+
+                return item
+
+
+    def get_stats(self):
+
+        """
+        Gets load and request statistics for this registry.
+
+        Returns:
+            a list of `Bunch` objects, one for each model and settings
+            requested of this registry in this process. Each `Bunch`
+            has `kind`, `path`, `load_count`, `load_time`, and
+            `request_count` attributes. `kind` is either `'model'` or
+            `'settings'`, and `load_time` is the total load time in
+            seconds.
+        """
+
+        with self._lock:
+
+            if os.getpid() != self._process_id:
+                return []
+
+            return [Bunch(s) for s in self._stats.values()]
+
+
+    def log_stats(self, logger=None, registry_name='Model registry'):
+
+        """
+        Logs load and request statistics for this registry.
+
+        The statistics are logged at the INFO level. Nothing is logged
+        if no models or settings have been requested of this registry
+        in this process.
+
+        Parameters:
+
+            logger : `logging.Logger` or `None`
+                the logger to log to, or `None` for the root logger.
+
+            registry_name : `str`
+                the name of this registry in log messages, for example
+                `'Model registry of detection worker 1'`.
+        """
+
+        if logger is None:
+            logger = logging.getLogger()
+
+        stats = self.get_stats()
+
+        if len(stats) == 0:
+            return
+
+        format_ = text_utils.format_number
+        count_text = text_utils.create_count_text
+
+        load_count = sum(s.load_count for s in stats)
+        load_time = sum(s.load_time for s in stats)
+        request_count = sum(s.request_count for s in stats)
+
+        lines = [(
+            f'{registry_name} loaded {count_text(load_count, "item")} '
+            f'in {format_(load_time)} seconds to satisfy '
+            f'{count_text(request_count, "request")}:')]
+
+        for s in stats:
+            lines.append(
+                f'    {s.kind.capitalize()} "{s.path}" was loaded '
+                f'{count_text(s.load_count, "time")} in '
+                f'{format_(s.load_time)} seconds and requested '
+                f'{count_text(s.request_count, "time")}.')
+
+        logger.info('\n'.join(lines))
+
+
+def _get_path_key(path):
+    return str(path.resolve())
+
+
+def _get_settings_hash(settings):
+
+    if settings is None:
+        return None
+
+    else:
+        text = json.dumps(settings, sort_keys=True, default=_get_json_value)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _get_json_value(x):
+
+    # Get JSON-serializable value for settings objects, including
+    # nested ones. Settings values that are not JSON-serializable
+    # and are not settings objects are represented by their string
+    # representations.
+    if isinstance(x, Bunch):
+        return x.__dict__
+    else:
+        return repr(x)
+
+
+def _load_keras_model(path):
+
+    # We import TensorFlow here rather than at the top of this module
+    # since it takes a long time to import and many users of this
+    # module do not need it.
+    import tensorflow as tf
+
+    return tf.keras.models.load_model(path)
@@ -0,0 +1,287 @@
+"""Module containing class `RecordingFilePool`."""
+
+
+from collections import OrderedDict
+from threading import Event, Lock
+
+import numpy as np
+
+from vesper.signal.signal_error import SignalError
+from vesper.util.bunch import Bunch
+from vesper.util.recording_manager import RecordingManager
+
+
+class RecordingFilePool:
+
+    """
+    Bounded pool of open recording audio files.
+
+    A `RecordingFilePool` keeps up to a fixed number of recording
+    files open, closing the least recently used file when it must open
+    a file and the pool is full. The files are opened with
+    `RecordingManager.open_recording_file`, so WAVE files are opened
+    as `MappedWaveFileSignal` objects and FLAC files are opened as
+    `FlacFileSignal` objects. Samples are read from either kind of file
+    without any seeking, so concurrent reads, whether from the same
+    file or different files, do not block each other.
+
+    A file is opened without the pool lock held, so that opening a file
+    (which for a FLAC file may mean scanning the file to build a seek
+    table) does not block reads from other files. Other threads that
+    request a file while it is being opened wait for it to open.
+
+    A file that is evicted from the pool while another thread is reading
+    from it is closed only after the read completes.
+    """
+
+
+    def __init__(self, max_size):
+
+        if max_size < 1:
+            raise ValueError('Recording file pool size must be positive.')
+
+        self._max_size = max_size
+        self._files = OrderedDict()
+        self._lock = Lock()
+
+        self._hit_count = 0
+        self._miss_count = 0
+        self._eviction_count = 0
+
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+
+    @property
+    def stats(self):
+
+        """
+        Statistics for this pool.
+
+        The statistics are returned as a `Bunch` with attributes
+        `size`, `max_size`, `hit_count`, `miss_count`, `eviction_count`,
+        and `hit_rate`. The hit rate is `None` if there have been no
+        file requests.
+        """
+
+        with self._lock:
+
+            request_count = self._hit_count + self._miss_count
+
+            if request_count == 0:
+                hit_rate = None
+            else:
+                hit_rate = self._hit_count / request_count
+
+            return Bunch(
+                size=len(self._files),
+                max_size=self._max_size,
+                hit_count=self._hit_count,
+                miss_count=self._miss_count,
+                eviction_count=self._eviction_count,
+                hit_rate=hit_rate)
+
+
+    def read(self, path, channel_num, start_index, length):
+
+        """
+        Reads samples of one channel of a recording file.
+
+        Parameters
+        ----------
+        path : str or Path
+            the path of the recording file.
+
+        channel_num : int
+            the number of the channel to read.
+
+        start_index : int
+            the index of the first sample frame to read.
+
+        length : int
+            the number of samples to read.
+
+        Returns
+        -------
+        NumPy array
+            the samples that were read.
+
+        Raises
+        ------
+        SignalError
+            if the file cannot be opened or parsed, or the read extends
+            outside the file.
+        """
+
+        file_ = self._acquire_file(str(path))
+
+        try:
+            return file_.read(channel_num, start_index, length)
+
+        finally:
+            self._release_file(file_)
+
+
+    def _acquire_file(self, path):
+
+        with self._lock:
+
+            file_ = self._files.get(path)
+
+            if file_ is not None:
+                # pool hit
+
+                self._hit_count += 1
+                self._files.move_to_end(path)
+                opening = False
+
+            else:
+                # pool miss
+
+                self._miss_count += 1
+
+                # Add an unopened file to the pool as a placeholder.
+                # We open the file below, after releasing the lock.
+                file_ = _RecordingFile(path)
+                opening = True
+
+                if len(self._files) == self._max_size:
+                    _, evicted_file = self._files.popitem(last=False)
+                    evicted_file.evict()
+                    self._eviction_count += 1
+
+                self._files[path] = file_
+
+            file_.user_count += 1
+
+        try:
+
+            if opening:
+                file_.open()
+            else:
+                file_.wait_until_open()
+
+        except Exception:
+
+            with self._lock:
+
+                # Remove file from pool so that a later request for it
+                # will try to open it again.
+                if self._files.get(path) is file_:
+                    del self._files[path]
+
+                file_.user_count -= 1
+
+            raise
+
+        return file_
+
+
+    def _release_file(self, file_):
+        with self._lock:
+            file_.user_count -= 1
+            if file_.evicted and file_.user_count == 0:
+                file_.close()
+
+
+    def clear(self):
+
+        """Closes all of the files of this pool."""
+
+        with self._lock:
+
+            for file_ in self._files.values():
+                file_.evict()
+                if file_.user_count == 0:
+                    file_.close()
+
+            self._files.clear()
+
+
+class _RecordingFile:
+
+    """
+    Recording file of a `RecordingFilePool`.
+
+    A recording file is created unopened. One thread opens it with the
+    `open` method, and any other threads that want to read it wait for
+    that with the `wait_until_open` method.
+
+    The `user_count` and `evicted` attributes of a recording file are
+    managed by its pool, with the pool lock held.
+    """
+
+
+    def __init__(self, path):
+
+        self._path = path
+        self._signal = None
+        self._open_error = None
+        self._open_done = Event()
+
+        self.user_count = 0
+        self.evicted = False
+
+
+    def open(self):
+
+        try:
+            self._signal = RecordingManager.open_recording_file(self._path)
+
+        except Exception as e:
+            self._open_error = e
+            raise
+
+        finally:
+            self._open_done.set()
+
+
+    def wait_until_open(self):
+
+        self._open_done.wait()
+
+        if self._open_error is not None:
+            raise SignalError(
+                f'Could not open recording file "{self._path}". Error '
+                f'message was: {str(self._open_error)}')
+
+
+    @property
+    def path(self):
+        return self._path
+
+
+    def read(self, channel_num, start_index, length):
+
+        signal = self._signal
+
+        if channel_num < 0 or channel_num >= signal.channel_count:
+            raise SignalError(
+                f'Channel number {channel_num} is out of range for '
+                f'recording file "{self._path}", which has '
+                f'{signal.channel_count} channels.')
+
+        if start_index < 0 or length < 0 or \
+                start_index + length > len(signal):
+            raise SignalError(
+                f'Read of {length} sample frames starting at index '
+                f'{start_index} extends outside recording file '
+                f'"{self._path}", which has {len(signal)} frames.')
+
+        samples = signal.channels[channel_num].read(start_index, length)
+
+        # Return a contiguous copy of the channel samples rather than
+        # a view of a WAVE file's memory map, so that the file can be
+        # unmapped when it is evicted from the pool.
+        return np.array(samples, copy=True, order='C')
+
+
+    def evict(self):
+        self.evicted = True
+
+
+    def close(self):
+        if self._signal is not None:
+            self._signal.close()
@@ -12,7 +12,9 @@ class RecordingManager:
     Manages the recordings of a Vesper archive.
     
     The main responsibility of a recording manager is to convert
-    recording file paths between relative and absolute forms. The
+    recording file paths between relative and absolute forms. It also
+    opens recording files as signals, via the `open_recording_file`
+    method, so that other code need not know their formats. The
     relative form of a recording file path, stored in the archive
     database, is converted to its absolute form by appending it
     to the absolute path of one of the archive's *recording
@@ -212,6 +214,57 @@ class RecordingManager:
                 raise ValueError(start + end)
         
     
+    @staticmethod
+    def open_recording_file(path):
+        
+        """
+        Opens a recording file as an audio file signal.
+        
+        The type of the signal depends on the format of the file, as
+        indicated by its file name extension. WAVE files are opened
+        as `MappedWaveFileSignal` objects and FLAC files are opened
+        as `FlacFileSignal` objects.
+        
+        Parameters
+        ----------
+        path: str or pathlib.Path
+            The absolute path of the recording file to open.
+            
+        Returns
+        -------
+        AudioFileSignal
+            The opened file.
+            
+        Raises
+        ------
+        SignalError:
+            if the file does not exist, is of an unsupported format,
+            or could not be opened.
+        """
+        
+        from vesper.signal.signal_error import SignalError
+        from vesper.signal.wave_file_signal import (
+            MappedWaveFileSignal, WaveFileSignal)
+        
+        path = _get_path_object(path)
+        
+        if WaveFileSignal.is_wave_file(path):
+            return MappedWaveFileSignal(path)
+        
+        elif path.suffix.lower() == '.flac':
+            
+            # This import is here rather than at the top of this
+            # method so that only archives with FLAC recordings need
+            # the `soundfile` package.
+            from vesper.signal.flac_file_signal import FlacFileSignal
+            
+            return FlacFileSignal(path)
+        
+        else:
+            raise SignalError(
+                f'Recording file "{path}" is of an unsupported format.')
+    
+    
     def _create_recording_dirs_list(self):
         return str([str(p) for p in self.recording_dir_paths])
 
@@ -1,7 +1,10 @@
 import math
 
+import numpy as np
+
 from vesper.tests.test_case import TestCase
-from vesper.util.calculator import Calculator, CalculatorError
+from vesper.util.calculator import (
+    Calculator, CalculatorError, compile_program)
 
 
 class CalculatorTests(TestCase):
@@ -489,6 +492,114 @@ class CalculatorTests(TestCase):
             self._assert_calculator([result], [('x', x)])
     
     
+    def test_compile_program(self):
+        code = 'x 3 mul 1 add'
+        program = compile_program(code)
+        self.assertEqual(program.code, code)
+        self.assertIs(compile_program(code), program)
+    
+    
+    def test_redefined_operator_name(self):
+        
+        # A program should look up names that are defined in the user
+        # dictionary even if they are also system operator names.
+        
+        c = self.calculator
+        
+        c.execute('1 2 add')
+        self._assert_calculator([3])
+        
+        c.clear()
+        c.dict_stack.put('add', 5)
+        c.execute('1 2 add')
+        self._assert_calculator([1, 2, 5])
+    
+    
+    def test_evaluate(self):
+        
+        integers = [0, 1, -2, 3, 7, 100]
+        floats = [.5, 1.5, 2.5, -2.5, -0., 1e10, 3.7]
+        booleans = [True, False, True]
+        
+        cases = (
+            
+            ('x 60 div 1000 mul round', (integers, floats)),
+            ('x 3 mul 1 add', (integers, floats)),
+            ('x 3 exch sub neg abs', (integers, floats)),
+            ('x 2 mod x 2 pow add', (integers, floats)),
+            ('x .5 pow', (floats[:3],)),
+            ('x ceiling x floor x integer x float', (integers, floats)),
+            ('x abs 1 add ln x abs 1 add log2 add', (integers, floats)),
+            ('x exp', (integers, floats[:5])),
+            ('4 x mul 1 gt', (integers, floats)),
+            ('x 1 ge x 0 lt x 1 le', (integers, floats, booleans)),
+            ('x 1 eq x 1 ne', (integers, floats, booleans)),
+            ('x true and x not or false xor', (booleans,)),
+            ('x dup pop 1 exch 2 clear 5', (integers,)),
+            
+            # These cases cannot be vectorized.
+            ('x 2 mul', ([1, 2.5], [2 ** 60, 1])),
+            ('x -1 pow', (integers[1:],)),
+            ('x -.5 pow', (floats[:4],)),
+            ('x y', ([],)),
+            
+        )
+        
+        for code, value_lists in cases:
+            
+            program = compile_program(code)
+            
+            for values in value_lists:
+                
+                # Evaluate for both a list and an array. Note that the
+                # array elements may have different types than the
+                # list elements, for example if the list contains both
+                # integers and floats.
+                for v in (values, np.array(values)):
+                    
+                    if isinstance(v, np.ndarray):
+                        expected = self._execute(code, v.tolist())
+                    else:
+                        expected = self._execute(code, v)
+                        
+                    actual = program.evaluate(v)
+                    
+                    self.assertEqual(actual, expected)
+                    self.assertEqual(
+                        [type(a) for a in actual],
+                        [type(e) for e in expected])
+    
+    
+    def _execute(self, code, values):
+        
+        c = self.calculator
+        results = []
+        
+        for value in values:
+            c.clear()
+            c.dict_stack.put('x', value)
+            c.execute(code)
+            results.append(c.operand_stack.pop())
+            
+        return results
+    
+    
+    def test_evaluate_errors(self):
+        
+        cases = (
+            ('x 0 div', [1, 2]),
+            ('x ln', [1., 0.]),
+            ('x 1 add', [True]),
+            ('x not', [1]),
+            ('y', [1]),
+            ('pop', [1]),
+        )
+        
+        for code, values in cases:
+            program = compile_program(code)
+            self.assert_raises(CalculatorError, program.evaluate, values)
+    
+    
     def _set_up(self, operand_stack=[], bindings=[]):
         
         c = self.calculator
@@ -0,0 +1,220 @@
+from pathlib import Path
+import datetime
+import os
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.clip_audio_pack_store import (
+    _append, ClipAudioPackStore, ClipAudioPackStoreError)
+
+
+_NIGHT = datetime.date(2050, 5, 1)
+_SAMPLE_RATE = 24000
+
+
+def _create_samples(clip_id, length=100):
+    return np.arange(length, dtype='int16') + clip_id
+
+
+class ClipAudioPackStoreTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+        self._store = ClipAudioPackStore(self._dir_path)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def _write(self, clip_id, samples=None, station_id=1, store=None):
+
+        if samples is None:
+            samples = _create_samples(clip_id)
+
+        if store is None:
+            store = self._store
+
+        store.write_samples(station_id, _NIGHT, clip_id, samples, _SAMPLE_RATE)
+
+
+    def _assert_samples(self, clip_id, expected, store=None, **kwargs):
+
+        if store is None:
+            store = self._store
+
+        samples, sample_rate = store.read_samples(1, _NIGHT, clip_id, **kwargs)
+
+        self.assert_arrays_equal(samples, expected)
+        self.assertEqual(samples.dtype, np.dtype('<i2'))
+        self.assertEqual(sample_rate, _SAMPLE_RATE)
+
+
+    def test_write_and_read(self):
+
+        for clip_id in (1, 2, 3):
+            self._write(clip_id)
+
+        # Write to another pack.
+        self._write(4, station_id=2)
+
+        for clip_id in (1, 2, 3):
+            self.assertTrue(self._store.has_clip(1, _NIGHT, clip_id))
+            self._assert_samples(clip_id, _create_samples(clip_id))
+
+        self.assertFalse(self._store.has_clip(1, _NIGHT, 4))
+        self.assertTrue(self._store.has_clip(2, _NIGHT, 4))
+        self.assertIsNone(self._store.read_samples(1, _NIGHT, 4))
+        self.assertIsNone(self._store.read_samples(3, _NIGHT, 1))
+
+        # Read parts of clip.
+        samples = _create_samples(2)
+        self._assert_samples(2, samples[10:], start_offset=10)
+        self._assert_samples(2, samples[10:30], start_offset=10, length=20)
+        self._assert_samples(2, samples[:0], start_offset=100)
+
+        self.assertEqual(
+            self._store.get_pack_keys(), [(1, _NIGHT), (2, _NIGHT)])
+
+
+    def test_write_float_samples(self):
+        self._write(1, np.array([1.4, -1.6, 3]))
+        self._assert_samples(1, np.array([1, -2, 3]))
+
+
+    def test_read_errors(self):
+        self._write(1)
+        for start_offset, length in ((-1, 10), (0, 101), (95, 10)):
+            self.assert_raises(
+                ClipAudioPackStoreError, self._store.read_samples, 1,
+                _NIGHT, 1, start_offset, length)
+
+
+    def test_replace_and_delete(self):
+
+        self._write(1)
+        self._write(2)
+
+        samples = _create_samples(10, 50)
+        self._write(1, samples)
+        self._assert_samples(1, samples)
+
+        self.assertTrue(self._store.delete_clip(1, _NIGHT, 2))
+        self.assertFalse(self._store.delete_clip(1, _NIGHT, 2))
+        self.assertFalse(self._store.has_clip(1, _NIGHT, 2))
+
+        stats = self._store.get_pack_stats(1, _NIGHT)
+        self.assertEqual(stats.clip_count, 1)
+        self.assertEqual(stats.data_size, 3 * 28 + 250 * 2)
+        self.assertEqual(stats.unused_size, 2 * 28 + 200 * 2)
+
+        # Another store should see the same clips.
+        store = ClipAudioPackStore(self._dir_path)
+        self._assert_samples(1, samples, store=store)
+        self.assertFalse(store.has_clip(1, _NIGHT, 2))
+
+
+    def test_compact(self):
+
+        for clip_id in (1, 2, 3):
+            self._write(clip_id)
+
+        self._store.delete_clip(1, _NIGHT, 2)
+        self._write(3, _create_samples(30, 10))
+
+        # Read from another store before compaction.
+        store = ClipAudioPackStore(self._dir_path)
+        self._assert_samples(1, _create_samples(1), store=store)
+
+        freed_size = self._store.compact(1, _NIGHT)
+        self.assertEqual(freed_size, 2 * (28 + 200))
+
+        stats = self._store.get_pack_stats(1, _NIGHT)
+        self.assertEqual(stats.unused_size, 0)
+        self.assertEqual(stats.data_size, 2 * 28 + 110 * 2)
+
+        for s in (self._store, store, ClipAudioPackStore(self._dir_path)):
+            self._assert_samples(1, _create_samples(1), store=s)
+            self._assert_samples(3, _create_samples(30, 10), store=s)
+            self.assertFalse(s.has_clip(1, _NIGHT, 2))
+
+        # Write to other store after compaction.
+        self._write(4, store=store)
+        self._assert_samples(4, _create_samples(4))
+
+
+    def test_interrupted_compaction(self):
+
+        for clip_id in (1, 2, 3):
+            self._write(clip_id)
+
+        self._store.delete_clip(1, _NIGHT, 1)
+
+        # Simulate compaction interrupted after data file replacement
+        # by restoring old index file after compaction.
+        index_file_path = self._dir_path / 'Station 1' / '2050-05-01.index'
+        index = index_file_path.read_bytes()
+        self._store.compact(1, _NIGHT)
+        os.remove(index_file_path)
+        index_file_path.write_bytes(index)
+
+        store = ClipAudioPackStore(self._dir_path)
+        self._assert_samples(2, _create_samples(2), store=store)
+        self._assert_samples(3, _create_samples(3), store=store)
+        self.assertFalse(store.has_clip(1, _NIGHT, 1))
+
+
+    def test_read_after_compaction_by_other_store(self):
+
+        for clip_id in (1, 2, 3):
+            self._write(clip_id)
+
+        # Read index of other store, but not data file.
+        store = ClipAudioPackStore(self._dir_path)
+        self.assertTrue(store.has_clip(1, _NIGHT, 1))
+
+        self._store.delete_clip(1, _NIGHT, 2)
+        self._store.compact(1, _NIGHT)
+        self._store.delete_clip(1, _NIGHT, 1)
+
+        # The other store's index is inconsistent with the compacted
+        # data file. The store should reread the index rather than
+        # rebuild it, which would restore clip 1.
+        self._assert_samples(3, _create_samples(3), store=store)
+        self.assertFalse(store.has_clip(1, _NIGHT, 1))
+        self.assertFalse(store.has_clip(1, _NIGHT, 2))
+
+
+    def test_short_appends(self):
+
+        path = self._dir_path / 'Test'
+        path.write_bytes(b'abc')
+
+        with open(path, 'ab', buffering=0) as file_:
+            short_write_file = _ShortWriteFile(file_, 2)
+            self.assertEqual(_append(short_write_file, b'defgh'), 3)
+            self.assertEqual(_append(short_write_file, b'ij'), 8)
+
+        self.assertEqual(path.read_bytes(), b'abcdefghij')
+
+
+class _ShortWriteFile:
+
+    """File that writes at most a fixed number of bytes per write."""
+
+
+    def __init__(self, file_, max_write_size):
+        self._file = file_
+        self._max_write_size = max_write_size
+
+
+    def write(self, data):
+        return self._file.write(data[:self._max_write_size])
+
+
+    def tell(self):
+        return self._file.tell()
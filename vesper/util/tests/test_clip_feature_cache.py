@@ -0,0 +1,198 @@
+from pathlib import Path
+import os
+import tempfile
+
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.clip_feature_cache import ClipFeatureCache
+import vesper.util.clip_feature_cache as clip_feature_cache
+
+
+_SETTINGS = {'feature': 'Waveform', 'sample_rate': 24000, 'duration': .1}
+
+_FEATURE_LENGTH = 100
+_FEATURE_SIZE = _FEATURE_LENGTH * 4
+
+
+class ClipFeatureCacheTests(TestCase):
+
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_get_and_put(self):
+
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, 2 ** 20)
+
+        keys = [(i, 1000 * i) for i in range(10)]
+        features = _create_features(keys)
+
+        self.assertEqual(cache.get(keys), [None] * 10)
+
+        cache.put(keys[:5], features[:5])
+        cache.flush()
+
+        cache.put(keys[5:8], features[5:8])
+        cache.flush()
+
+        self._assert_features(cache, keys, features, 8)
+        self.assertEqual(cache.hit_count, 8)
+        self.assertEqual(cache.miss_count, 12)
+
+        # Check that new cache finds features written by first one.
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, 2 ** 20)
+        self._assert_features(cache, keys, features, 8)
+
+        # Check that a clip with the same ID but a different start index
+        # misses.
+        self.assertEqual(cache.get([(0, 1)]), [None])
+
+        # Check that different settings miss.
+        settings = dict(_SETTINGS, sample_rate=22050)
+        cache = ClipFeatureCache(self._dir_path, settings, 2 ** 20)
+        self.assertEqual(cache.get(keys), [None] * 10)
+
+
+    def _assert_features(self, cache, keys, features, count):
+
+        cached_features = cache.get(keys)
+
+        for i, (cached_feature, feature) in \
+                enumerate(zip(cached_features, features)):
+
+            if i < count:
+                self.assert_arrays_equal(cached_feature, feature)
+                self.assertEqual(cached_feature.dtype, feature.dtype)
+            else:
+                self.assertIsNone(cached_feature)
+
+
+    def test_none_start_index(self):
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, 2 ** 20)
+        keys = [(1, None)]
+        features = _create_features(keys)
+        cache.put(keys, features)
+        cache.flush()
+        self.assert_arrays_equal(cache.get(keys)[0], features[0])
+
+
+    def test_large_put(self):
+
+        max_count = clip_feature_cache._MAX_SHARD_FEATURE_COUNT
+        count = 2 * max_count + 1
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, 2 ** 30)
+
+        keys = [(i, 0) for i in range(count)]
+        features = _create_features(keys)
+        cache.put(keys, features)
+
+        # Two full shards should have been written by now.
+        self._assert_features(cache, keys, features, 2 * max_count)
+
+        cache.flush()
+        self._assert_features(cache, keys, features, count)
+
+
+    def test_eviction(self):
+
+        # Make cache large enough for three one-feature shards, but not
+        # four.
+        max_size = 3 * _get_shard_size() + _get_shard_size() // 2
+
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, max_size)
+
+        keys = [(i, 0) for i in range(4)]
+        features = _create_features(keys)
+
+        for i in range(3):
+            cache.put(keys[i:i + 1], features[i:i + 1])
+            cache.flush()
+            _set_shard_times(self._dir_path, i)
+
+        # Use first feature so that second is least recently used.
+        self.assertIsNotNone(cache.get(keys[:1])[0])
+
+        cache.put(keys[3:], features[3:])
+        cache.flush()
+
+        cached_features = cache.get(keys)
+        self.assertIsNotNone(cached_features[0])
+        self.assertIsNone(cached_features[1])
+        self.assertIsNotNone(cached_features[2])
+        self.assertIsNotNone(cached_features[3])
+
+        # Check that new cache also does not find evicted feature.
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, max_size)
+        self.assertIsNone(cache.get(keys[1:2])[0])
+
+
+    def test_eviction_on_full_shard_write(self):
+
+        max_count = clip_feature_cache._MAX_SHARD_FEATURE_COUNT
+
+        # Make cache large enough for one full shard, but not two.
+        max_size = 256 + 16 * max_count + 128 + _FEATURE_SIZE * max_count
+        max_size += max_size // 2
+
+        cache = ClipFeatureCache(self._dir_path, _SETTINGS, max_size)
+
+        keys = [(i, 0) for i in range(2 * max_count + 1)]
+        features = _create_features(keys)
+
+        cache.put(keys[:max_count], features[:max_count])
+        _set_shard_times(self._dir_path, 0)
+
+        # Writing the second full shard should evict the first one
+        # without a flush.
+        cache.put(keys[max_count:], features[max_count:])
+
+        cached_features = cache.get(keys)
+        self.assertTrue(all(f is None for f in cached_features[:max_count]))
+        self.assertTrue(all(
+            f is not None for f in cached_features[max_count:-1]))
+        self.assertIsNone(cached_features[-1])
+
+
+    def test_get_settings_key(self):
+
+        get_key = clip_feature_cache.get_settings_key
+
+        key = get_key(_SETTINGS)
+
+        # Key should not depend on settings order.
+        settings = dict(reversed(list(_SETTINGS.items())))
+        self.assertEqual(get_key(settings), key)
+
+        self.assertNotEqual(get_key(dict(_SETTINGS, duration=.2)), key)
+
+
+def _create_features(keys):
+    return [
+        np.arange(_FEATURE_LENGTH, dtype=np.float32) + clip_id
+        for clip_id, _ in keys]
+
+
+def _get_shard_size():
+    # Size of a one-feature shard's keys and features files, each of
+    # which has a 128-byte header.
+    return 128 + 16 + 128 + _FEATURE_SIZE
+
+
+def _set_shard_times(dir_path, i):
+
+    # Set the modification times of newly written shard files to
+    # distinct times in the past, so that the order of the shards for
+    # eviction does not depend on file system timestamp resolution.
+
+    t = 1000000 + i
+
+    for path in dir_path.glob('*/*.npy'):
+        if path.stat().st_mtime > 2000000:
+            os.utime(path, (t, t))
@@ -0,0 +1,101 @@
+import numpy as np
+import scipy.signal as signal
+
+from vesper.tests.test_case import TestCase
+from vesper.util.detection_front_end import (
+    BandPowerStage, FrontEnd, ResamplingStage, SpectrogramStage)
+import vesper.signal.resampling_utils as resampling_utils
+import vesper.util.time_frequency_analysis_utils as tfa_utils
+
+
+class DetectionFrontEndTests(TestCase):
+
+
+    def test_stage_sharing(self):
+
+        front_end = FrontEnd()
+
+        a = front_end.add_stage(
+            BandPowerStage(SpectrogramStage('hann', 8, 4, 8), 1, 3))
+        b = front_end.add_stage(
+            BandPowerStage(SpectrogramStage('hann', 8, 4, 8), 1, 3))
+        c = front_end.add_stage(
+            BandPowerStage(SpectrogramStage('hann', 8, 4, 8), 2, 4))
+
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertIs(a.input, c.input)
+        self.assertEqual(len(front_end.stages), 3)
+
+        front_end.process(np.arange(100, dtype='float'))
+
+        stats = dict(
+            (s.stage_name, s) for s in front_end.get_stage_stats()[:2])
+        self.assertEqual(stats['Spectrogram'].use_count, 3)
+        self.assertEqual(stats['Spectrogram'].processing_count, 1)
+        self.assertEqual(stats['Band Power'].use_count, 2)
+
+
+    def test_spectrogram_and_band_power_stages(self):
+
+        window_type = 'hann'
+        window_size = 16
+        hop_size = 8
+        dft_size = 16
+
+        samples = np.random.default_rng(0).normal(size=1000)
+
+        front_end = FrontEnd()
+        spectrogram_stage = front_end.add_stage(SpectrogramStage(
+            window_type, window_size, hop_size, dft_size))
+        band_power_stage = front_end.add_stage(
+            BandPowerStage(spectrogram_stage, 2, 5))
+
+        spectra = []
+        powers = []
+        start_index = 0
+        for chunk_size in (5, 100, 17, 300, 578):
+            end_index = start_index + chunk_size
+            front_end.process(samples[start_index:end_index])
+            spectra.append(front_end.get_output(spectrogram_stage))
+            powers.append(front_end.get_output(band_power_stage))
+            start_index = end_index
+
+        front_end.complete_processing()
+        self.assertEqual(len(front_end.get_output(spectrogram_stage)), 0)
+
+        window = signal.get_window(window_type, window_size)
+        expected = tfa_utils.compute_spectrogram(
+            samples, window, hop_size, dft_size)
+
+        spectra = np.concatenate(spectra)
+        self.assertTrue(np.allclose(spectra, expected))
+        self.assertTrue(
+            np.allclose(np.concatenate(powers), expected[:, 2:5].sum(axis=1)))
+
+
+    def test_resampling_stage(self):
+
+        samples = np.random.default_rng(0).normal(size=25000)
+
+        front_end = FrontEnd()
+        stage = front_end.add_stage(ResamplingStage(10000, 32000))
+
+        blocks = []
+        for i in range(0, len(samples), 7000):
+            front_end.process(samples[i:i + 7000])
+            blocks += front_end.get_output(stage)
+
+        self.assertEqual([b[0] for b in blocks], [10000, 10000])
+
+        front_end.complete_processing()
+        blocks += front_end.get_output(stage)
+
+        self.assertEqual([b[0] for b in blocks], [10000, 10000, 5000])
+
+        # The resampled blocks should be the same as the resampling of
+        # all of the samples at once.
+        resampled_samples = np.concatenate([b[1] for b in blocks])
+        expected = resampling_utils.resample_to_24000_hz(samples, 32000)
+        self.assertEqual(len(resampled_samples), len(expected))
+        self.assertTrue(np.allclose(resampled_samples, expected, atol=1e-5))
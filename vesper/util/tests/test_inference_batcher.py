@@ -0,0 +1,203 @@
+import numpy as np
+
+from vesper.tests.test_case import TestCase
+from vesper.util.inference_batcher import (
+    InferenceBatcher, create_inference_batcher)
+
+
+class _ScoreFunction:
+
+    """Scores records by their means, recording batch shapes."""
+
+
+    def __init__(self):
+        self.batch_shapes = []
+
+
+    def __call__(self, records):
+        self.batch_shapes.append(records.shape)
+        return records.mean(axis=1)
+
+
+class _Callback:
+
+
+    def __init__(self, name, calls):
+        self._name = name
+        self._calls = calls
+
+
+    def __call__(self, *args):
+        self._calls.append((self._name, *args))
+
+
+class _Detector:
+
+
+    def __init__(self):
+        self.batcher = None
+
+
+    def set_inference_batcher(self, batcher):
+        self.batcher = batcher
+
+
+def _get_expected_scores(samples, record_size, hop_size):
+    count = (len(samples) - record_size) // hop_size + 1
+    return np.array([
+        samples[i * hop_size:i * hop_size + record_size].mean()
+        for i in range(count)], dtype='float32')
+
+
+class InferenceBatcherTests(TestCase):
+
+
+    def test_initializer_errors(self):
+        for batch_size in (0, -1):
+            self.assert_raises(ValueError, InferenceBatcher, batch_size)
+
+
+    def test_score_errors(self):
+
+        batcher = InferenceBatcher(4)
+        score = _ScoreFunction()
+        samples = np.zeros(10, dtype='float32')
+
+        self.assert_raises(
+            ValueError, batcher.score, score, samples, 0, 1, None)
+        self.assert_raises(
+            ValueError, batcher.score, score, samples, 2, 0, None)
+
+
+    def test_scores(self):
+
+        batcher = InferenceBatcher(4)
+        score = _ScoreFunction()
+        calls = []
+
+        rng = np.random.default_rng(0)
+        samples = [
+            rng.normal(size=n).astype('float32') for n in (20, 13, 7, 2)]
+
+        for i, s in enumerate(samples):
+            batcher.score(score, s, 3, 2, _Callback(i, calls))
+
+        batcher.process()
+
+        # 9, 6, 3, and 0 records were submitted, so `process` should
+        # score four full batches and invoke the callbacks of the first
+        # two requests.
+        self.assertEqual(score.batch_shapes, [(4, 3)] * 4)
+        self.assertEqual([c[0] for c in calls], [0, 1])
+
+        batcher.complete_processing()
+
+        # The remaining two records should be scored in a final, padded
+        # batch.
+        self.assertEqual(score.batch_shapes, [(4, 3)] * 5)
+        self.assertEqual([c[0] for c in calls], [0, 1, 2, 3])
+
+        for (i, scores), s in zip(calls, samples):
+            if len(s) < 3:
+                self.assertEqual(len(scores), 0)
+            else:
+                expected = _get_expected_scores(s, 3, 2)
+                self.assertTrue(np.allclose(scores, expected, atol=1e-6))
+
+        stats = batcher.get_stats()
+        self.assertEqual(stats.record_count, 18)
+        self.assertEqual(stats.shared_record_count, 0)
+        self.assertEqual(stats.batch_count, 5)
+        self.assertEqual(stats.batch_size, 4)
+        self.assertGreaterEqual(stats.scoring_time, 0)
+
+
+    def test_score_functions_batched_separately(self):
+
+        batcher = InferenceBatcher(8)
+        score_a = _ScoreFunction()
+        score_b = _ScoreFunction()
+        calls = []
+
+        samples = np.arange(10, dtype='float32')
+
+        batcher.score(score_a, samples, 4, 1, _Callback('a', calls))
+        batcher.score(score_b, samples, 4, 1, _Callback('b', calls))
+        batcher.score(score_a, samples, 2, 1, _Callback('c', calls))
+
+        batcher.complete_processing()
+
+        self.assertEqual(score_a.batch_shapes, [(8, 4), (8, 2), (8, 2)])
+        self.assertEqual(score_b.batch_shapes, [(8, 4)])
+
+        self.assertEqual([c[0] for c in calls], ['a', 'b', 'c'])
+
+        expected = _get_expected_scores(samples, 4, 1)
+        self.assertTrue(np.allclose(calls[0][1], expected))
+        self.assertTrue(np.allclose(calls[1][1], expected))
+        expected = _get_expected_scores(samples, 2, 1)
+        self.assertTrue(np.allclose(calls[2][1], expected))
+
+
+    def test_shared_scores(self):
+
+        batcher = InferenceBatcher(4)
+        score = _ScoreFunction()
+        calls = []
+
+        samples = np.arange(10, dtype='float32')
+
+        batcher.score(score, samples, 3, 1, _Callback('a', calls))
+
+        # Equal records.
+        batcher.score(score, samples.copy(), 3, 1, _Callback('b', calls))
+
+        # Different hop size.
+        batcher.score(score, samples, 3, 2, _Callback('c', calls))
+
+        batcher.complete_processing()
+
+        # Records of second request should not have been scored.
+        self.assertEqual(len(score.batch_shapes), 3)
+        self.assertIs(calls[0][1], calls[1][1])
+
+        stats = batcher.get_stats()
+        self.assertEqual(stats.record_count, 20)
+        self.assertEqual(stats.shared_record_count, 8)
+
+        # Scores are not shared with requests submitted before the
+        # last invocation of `complete_processing`.
+        batcher.score(score, samples, 3, 1, _Callback('d', calls))
+        batcher.complete_processing()
+        self.assertEqual(len(score.batch_shapes), 5)
+        self.assertEqual(batcher.get_stats().shared_record_count, 8)
+
+
+    def test_call(self):
+
+        batcher = InferenceBatcher(4)
+        score = _ScoreFunction()
+        calls = []
+
+        samples = np.arange(11, dtype='float32')
+
+        batcher.call(_Callback('a', calls))
+        batcher.score(score, samples, 3, 1, _Callback('b', calls))
+        batcher.call(_Callback('c', calls))
+
+        batcher.process()
+
+        # Callbacks `'b'` and `'c'` must wait for the last record of
+        # request `'b'`, which does not fill a batch.
+        self.assertEqual([c[0] for c in calls], ['a'])
+
+        batcher.complete_processing()
+        self.assertEqual([c[0] for c in calls], ['a', 'b', 'c'])
+        self.assertEqual(calls[2], ('c',))
+
+
+    def test_create_inference_batcher(self):
+        detectors = [_Detector(), object(), _Detector()]
+        batcher = create_inference_batcher(detectors)
+        self.assertIs(detectors[0].batcher, batcher)
+        self.assertIs(detectors[2].batcher, batcher)
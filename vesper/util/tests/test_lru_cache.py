@@ -32,6 +32,22 @@ class LruCacheTests(TestCase):
         self._assert_cache(c, [('c', 2), ('b', 3)])
     
     
+    def test_get_method(self):
+        
+        c = LruCache(2)
+        
+        c['a'] = 0
+        c['b'] = 1
+        
+        self.assertEqual(c.get('a'), 0)
+        self.assertIsNone(c.get('c'))
+        self.assertEqual(c.get('c', 2), 2)
+        
+        # `get` makes an item most recently used.
+        c['c'] = 2
+        self._assert_cache(c, [('a', 0), ('c', 2)])
+    
+    
     def _assert_cache(self, c, expected_items):
         
         self.assertEqual(len(c), len(expected_items))
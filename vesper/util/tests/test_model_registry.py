@@ -0,0 +1,174 @@
+from pathlib import Path
+from threading import Thread
+import tempfile
+
+from vesper.tests.test_case import TestCase
+from vesper.util.model_registry import ModelRegistry
+from vesper.util.settings import Settings
+
+
+class _ModelLoader:
+
+
+    def __init__(self):
+        self.paths = []
+
+
+    def __call__(self, path):
+        self.paths.append(path)
+        return object()
+
+
+class ModelRegistryTests(TestCase):
+
+
+    def setUp(self):
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._dir_path = Path(self._temp_dir.name)
+
+        self._model_path = self._dir_path / 'Model.h5'
+        self._model_path.write_bytes(b'')
+
+        self._settings_path = self._dir_path / 'Settings.yaml'
+        self._settings_path.write_text('sample_rate: 24000\nduration: .5\n')
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_get_model(self):
+
+        registry = ModelRegistry()
+        load = _ModelLoader()
+
+        model = registry.get_model(self._model_path, load_model=load)
+        self.assertEqual(load.paths, [self._model_path])
+
+        # Same path.
+        self.assertIs(
+            registry.get_model(self._model_path, load_model=load), model)
+
+        # Equivalent path.
+        path = self._dir_path / '.' / 'Model.h5'
+        self.assertIs(registry.get_model(path, load_model=load), model)
+
+        # String path.
+        path = str(self._model_path)
+        self.assertIs(registry.get_model(path, load_model=load), model)
+
+        self.assertEqual(len(load.paths), 1)
+
+
+    def test_get_model_with_settings(self):
+
+        registry = ModelRegistry()
+        load = _ModelLoader()
+        path = self._model_path
+
+        settings_a = Settings(x=1, y=Settings(z=[1, 2]))
+        settings_b = Settings(x=1, y=Settings(z=[1, 3]))
+
+        model = registry.get_model(path, settings_a, load)
+        self.assertIsNot(registry.get_model(path, load_model=load), model)
+        self.assertIsNot(registry.get_model(path, settings_b, load), model)
+        self.assertEqual(len(load.paths), 3)
+
+        # Equal settings.
+        settings = Settings(y=Settings(z=[1, 2]), x=1)
+        self.assertIs(registry.get_model(path, settings, load), model)
+        self.assertEqual(len(load.paths), 3)
+
+
+    def test_get_settings(self):
+
+        registry = ModelRegistry()
+
+        settings = registry.get_settings(self._settings_path)
+        self.assertEqual(settings, Settings(sample_rate=24000, duration=.5))
+
+        self.assertIs(registry.get_settings(self._settings_path), settings)
+        self.assertIs(
+            registry.get_settings(str(self._settings_path)), settings)
+
+
+    def test_stats(self):
+
+        registry = ModelRegistry()
+        load = _ModelLoader()
+
+        self.assertEqual(registry.get_stats(), [])
+
+        with self.assertNoLogs(level='INFO'):
+            registry.log_stats()
+
+        for _ in range(3):
+            settings = registry.get_settings(self._settings_path)
+            registry.get_model(self._model_path, settings, load)
+
+        stats = sorted(registry.get_stats(), key=lambda s: s.kind)
+        self.assertEqual(len(stats), 2)
+
+        model_path = str(self._model_path.resolve())
+        settings_path = str(self._settings_path.resolve())
+
+        for s, kind, path in zip(
+                stats, ('model', 'settings'), (model_path, settings_path)):
+            self.assertEqual(s.kind, kind)
+            self.assertEqual(s.path, path)
+            self.assertEqual(s.load_count, 1)
+            self.assertGreaterEqual(s.load_time, 0)
+            self.assertEqual(s.request_count, 3)
+
+        with self.assertLogs(level='INFO') as logs:
+            registry.log_stats(registry_name='Test registry')
+
+        self.assertEqual(len(logs.output), 1)
+        message = logs.records[0].getMessage()
+        self.assertTrue(message.startswith('Test registry loaded 2 items'))
+        self.assertIn('to satisfy 6 requests:', message)
+        self.assertIn(
+            f'Model "{model_path}" was loaded 1 time', message)
+        self.assertIn(
+            f'Settings "{settings_path}" was loaded 1 time', message)
+
+
+    def test_forked_process(self):
+
+        registry = ModelRegistry()
+        load = _ModelLoader()
+
+        model = registry.get_model(self._model_path, load_model=load)
+
+        # Simulate use of registry in forked child process.
+        registry._process_id -= 1
+
+        self.assertEqual(registry.get_stats(), [])
+
+        self.assertIsNot(
+            registry.get_model(self._model_path, load_model=load), model)
+        self.assertEqual(len(load.paths), 2)
+        self.assertEqual(len(registry.get_stats()), 1)
+
+
+    def test_threads(self):
+
+        registry = ModelRegistry()
+        load = _ModelLoader()
+        models = []
+
+        def get_model():
+            models.append(
+                registry.get_model(self._model_path, load_model=load))
+
+        threads = [Thread(target=get_model) for _ in range(10)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(load.paths), 1)
+        self.assertTrue(all(m is models[0] for m in models))
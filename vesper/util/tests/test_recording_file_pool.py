@@ -0,0 +1,193 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event
+from unittest.mock import patch
+import tempfile
+
+import numpy as np
+
+from vesper.signal.signal_error import SignalError
+from vesper.tests.test_case import TestCase
+from vesper.util.recording_file_pool import RecordingFilePool
+from vesper.util.recording_manager import RecordingManager
+import vesper.util.audio_file_utils as audio_file_utils
+
+
+_CHANNEL_COUNT = 2
+_FRAME_COUNT = 10000
+_SAMPLE_RATE = 24000
+
+
+class RecordingFilePoolTests(TestCase):
+
+
+    def setUp(self):
+
+        self._temp_dir = tempfile.TemporaryDirectory()
+        dir_path = Path(self._temp_dir.name)
+
+        self._paths = []
+        self._samples = []
+
+        for i in range(4):
+            samples = _create_samples(i)
+            path = dir_path / f'Recording {i}.wav'
+            audio_file_utils.write_wave_file(
+                str(path), samples, _SAMPLE_RATE)
+            self._paths.append(path)
+            self._samples.append(samples)
+
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+
+    def test_read(self):
+
+        pool = RecordingFilePool(2)
+
+        cases = (
+            (0, 0, 0, 100),
+            (1, 1, 50, 1000),
+            (2, 0, _FRAME_COUNT - 10, 10),
+            (3, 1, 0, _FRAME_COUNT),
+            (0, 1, 7, 0),
+        )
+
+        for file_num, channel_num, start_index, length in cases:
+            samples = pool.read(
+                self._paths[file_num], channel_num, start_index, length)
+            end_index = start_index + length
+            expected = \
+                self._samples[file_num][channel_num, start_index:end_index]
+            self.assert_arrays_equal(samples, expected)
+            self.assertEqual(samples.dtype, np.dtype('<i2'))
+
+        pool.clear()
+
+
+    def test_stats(self):
+
+        pool = RecordingFilePool(2)
+
+        self.assertIsNone(pool.stats.hit_rate)
+
+        for file_num in (0, 0, 1, 0, 2, 1, 1):
+            pool.read(self._paths[file_num], 0, 0, 10)
+
+        stats = pool.stats
+        self.assertEqual(stats.size, 2)
+        self.assertEqual(stats.max_size, 2)
+        self.assertEqual(stats.hit_count, 3)
+        self.assertEqual(stats.miss_count, 4)
+        self.assertEqual(stats.eviction_count, 2)
+        self.assertEqual(stats.hit_rate, 3 / 7)
+
+        pool.clear()
+
+
+    def test_concurrent_reads(self):
+
+        pool = RecordingFilePool(2)
+
+        rng = np.random.default_rng(0)
+        reads = [
+            (int(rng.integers(4)), int(rng.integers(_CHANNEL_COUNT)),
+             int(rng.integers(_FRAME_COUNT - 500)), 500)
+            for _ in range(200)]
+
+        def read(args):
+            file_num, channel_num, start_index, length = args
+            return pool.read(
+                self._paths[file_num], channel_num, start_index, length)
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(read, reads))
+
+        for (file_num, channel_num, start_index, length), samples in \
+                zip(reads, results):
+            end_index = start_index + length
+            expected = \
+                self._samples[file_num][channel_num, start_index:end_index]
+            self.assert_arrays_equal(samples, expected)
+
+        pool.clear()
+
+
+    def test_read_errors(self):
+
+        pool = RecordingFilePool(2)
+        path = self._paths[0]
+
+        cases = (
+            (2, 0, 10),
+            (0, -1, 10),
+            (0, _FRAME_COUNT - 5, 10),
+        )
+
+        for channel_num, start_index, length in cases:
+            self.assert_raises(
+                SignalError, pool.read, path, channel_num, start_index,
+                length)
+
+        self.assert_raises(
+            SignalError, pool.read, path.parent / 'Nonexistent.wav', 0, 0,
+            10)
+
+        # A file that could not be opened is not kept in the pool.
+        self.assertEqual(pool.stats.size, 1)
+
+        pool.clear()
+
+
+    def test_open_outside_lock(self):
+
+        pool = RecordingFilePool(2)
+        slow_path = str(self._paths[0])
+        open_recording_file = RecordingManager.open_recording_file
+        open_counts = Counter()
+        open_started = Event()
+        open_may_finish = Event()
+
+        def open_slowly(path):
+            open_counts[path] += 1
+            if path == slow_path:
+                open_started.set()
+                open_may_finish.wait(5)
+            return open_recording_file(path)
+
+        with patch.object(
+                RecordingManager, 'open_recording_file', open_slowly), \
+                ThreadPoolExecutor(2) as executor:
+
+            slow_reads = [
+                executor.submit(pool.read, slow_path, 0, 0, 10)]
+            self.assertTrue(open_started.wait(5))
+            slow_reads.append(
+                executor.submit(pool.read, slow_path, 1, 10, 10))
+
+            # Read from another file while the first is still opening.
+            samples = pool.read(self._paths[1], 0, 0, 10)
+            self.assert_arrays_equal(samples, self._samples[1][0, :10])
+            self.assertFalse(any(r.done() for r in slow_reads))
+
+            open_may_finish.set()
+
+            self.assert_arrays_equal(
+                slow_reads[0].result(), self._samples[0][0, :10])
+            self.assert_arrays_equal(
+                slow_reads[1].result(), self._samples[0][1, 10:20])
+
+        # The slow file was opened only once, by the first read.
+        self.assertEqual(open_counts[slow_path], 1)
+        self.assertEqual(pool.stats.hit_count, 1)
+
+        pool.clear()
+
+
+def _create_samples(file_num):
+    offset = file_num * _CHANNEL_COUNT * _FRAME_COUNT
+    samples = np.arange(_CHANNEL_COUNT * _FRAME_COUNT) + offset
+    samples = (samples % 65536) - 32768
+    return samples.reshape((_CHANNEL_COUNT, _FRAME_COUNT)).astype('<i2')
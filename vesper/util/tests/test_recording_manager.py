@@ -1,8 +1,16 @@
 from pathlib import Path
+import tempfile
 
+import numpy as np
+import soundfile
+
+from vesper.signal.flac_file_signal import FlacFileSignal
+from vesper.signal.signal_error import SignalError
+from vesper.signal.wave_file_signal import MappedWaveFileSignal
 from vesper.tests.test_case import TestCase
 from vesper.util.recording_manager import RecordingManager
 import vesper.tests.test_utils as test_utils
+import vesper.util.audio_file_utils as audio_file_utils
 
 
 # TODO: Update `test_utils` to use `pathlib.Path`.
@@ -120,6 +128,38 @@ class RecordingManagerTests(TestCase):
         self._test_conversion(manager, cases)
          
         self._test_conversion_errors(manager)
+        
+        
+    def test_open_recording_file(self):
+        
+        samples = np.arange(20, dtype='<i2').reshape((2, 10))
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            
+            dir_path = Path(dir_path)
+            
+            wave_file_path = dir_path / 'Recording.wav'
+            audio_file_utils.write_wave_file(
+                str(wave_file_path), samples, 24000)
+            
+            flac_file_path = dir_path / 'Recording.flac'
+            soundfile.write(flac_file_path, samples.T, 24000)
+            
+            cases = [
+                (wave_file_path, MappedWaveFileSignal),
+                (str(flac_file_path), FlacFileSignal)
+            ]
+            
+            for path, cls in cases:
+                with RecordingManager.open_recording_file(path) as signal:
+                    self.assertIsInstance(signal, cls)
+                    self.assert_arrays_equal(
+                        signal.read(frame_first=False), samples)
+                    
+            path = dir_path / 'Recording.mp3'
+            path.write_bytes(bytes(10))
+            self.assert_raises(
+                SignalError, RecordingManager.open_recording_file, path)
          
 
 def _get_path_object(p):
@@ -97,6 +97,16 @@ def parse_fmt_chunk(f, offset, chunk):
         if chunk.size > 16:
             chunk.extension_size = read_u2(f, offset + 24)
 
+        if chunk.size == 40:
+            # extensible format
+
+            chunk.valid_sample_size = read_u2(f, offset + 26)
+            chunk.channel_mask = read_u4(f, offset + 28)
+
+            # The first two bytes of the subformat GUID are the format
+            # code of the audio data.
+            chunk.subformat_code = read_u2(f, offset + 32)
+
 
 _subchunk_parsers = {
     FACT_CHUNK_ID: parse_fact_chunk,
@@ -143,6 +153,14 @@ def show_fmt_chunk(chunk):
             print(
                 f'            extension_size (bytes): {chunk.extension_size}')
 
+        if chunk.size == 40:
+            subformat = get_audio_data_format(chunk.subformat_code)
+            print(
+                f'            valid sample size (bits): '
+                f'{chunk.valid_sample_size}')
+            print(f'            channel mask: {chunk.channel_mask:#x}')
+            print(f'            subformat: {subformat}')
+
 
 _subchunk_formatters = {
     FACT_CHUNK_ID: show_fact_chunk,